@@ -0,0 +1,4 @@
+# Celery app загружается вместе с Django, чтобы shared_task использовали его брокер
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
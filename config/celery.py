@@ -25,6 +25,32 @@ app.conf.beat_schedule = {
         'task': 'events.tasks.send_event_reminders',
         'schedule': crontab(hour=9, minute=0),  # Ежедневно в 9:00
     },
+    'process-gamification-events': {
+        'task': 'events.tasks.process_gamification_events',
+        'schedule': 60.0,  # Каждую минуту; обычно задачу ставит сама запись действия
+    },
+    'update-leaderboard': {
+        'task': 'events.tasks.update_leaderboard',
+        'schedule': 10 * 60.0,  # Каждые 10 минут; рейтинг читается из сортированного множества
+    },
+    'reconcile-user-stats': {
+        'task': 'events.tasks.reconcile_user_stats',
+        'schedule': crontab(hour=2, minute=30),  # Ежедневно в 2:30
+    },
+    'broadcast-analytics': {
+        'task': 'events.tasks.broadcast_analytics',
+        'schedule': 10.0,  # Каждые 10 секунд; один снимок на всех подписчиков ws/analytics/
+    },
+    'reset-daily-quests': {
+        'task': 'events.tasks.reset_daily_quests',
+        # Каждый час: полночь TIME_ZONE попадает в расписание при любом часовом поясе Celery,
+        # повторный запуск в тот же день ничего не меняет
+        'schedule': crontab(minute=0),
+    },
+    'rebuild-event-similarity': {
+        'task': 'events.tasks.rebuild_event_similarity',
+        'schedule': crontab(hour=3, minute=30),  # Ежедневно в 3:30
+    },
     
     # Новые задачи для организаторов
     'send-weekly-organizer-reports': {
@@ -42,9 +68,17 @@ app.conf.beat_schedule = {
     
     # AI и аналитика
     'train-ai-recommendations': {
-        'task': 'events.tasks_ai.train_recommendation_models',
+        'task': 'events.tasks.train_recommendation_models',
         'schedule': crontab(day_of_week=0, hour=3, minute=0),  # Каждое воскресенье в 3:00
     },
+    'update-trending-scores': {
+        'task': 'events.tasks.update_trending_scores',
+        'schedule': 15 * 60.0,  # Каждые 15 минут
+    },
+    'precompute-recommendations': {
+        'task': 'events.tasks.precompute_recommendations',
+        'schedule': crontab(minute=15),  # Каждый час; кеш живет RECOMMENDATION_CACHE_TTL
+    },
     'update-analytics-dashboards': {
         'task': 'events.tasks_analytics.update_all_dashboards',
         'schedule': crontab(hour=4, minute=0),  # Ежедневно в 4:00
@@ -102,6 +102,14 @@ CELERY_BEAT_SCHEDULE = {
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 
+# Обработка изображений и геокодирование мероприятий в Celery (False - в процессе запроса)
+EVENT_PROCESSING_ASYNC = os.getenv('EVENT_PROCESSING_ASYNC', 'True') == 'True'
+
+# Обученные модели рекомендаций (факторы коллаборативной фильтрации)
+RECOMMENDATION_MODEL_DIR = os.getenv('RECOMMENDATION_MODEL_DIR', os.path.join(BASE_DIR, 'ai_models'))
+# Время жизни кеша рекомендаций пользователя, секунды (пересчитывается задачей каждый час)
+RECOMMENDATION_CACHE_TTL = 2 * 60 * 60
+
 
 TEMPLATES = [
     {
@@ -245,6 +253,26 @@ TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID', '')
 OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY', '')
 
+# Внешний геокодер (events.geocoding); в тестах - StubGeocodingProvider
+GEOCODING_PROVIDER = os.getenv('GEOCODING_PROVIDER', 'events.geocoding.NominatimProvider')
+
+# Таблица лидеров (events.gamification.leaderboard); в тестах - InMemorySortedSet
+LEADERBOARD_STORE = os.getenv('LEADERBOARD_STORE', 'events.gamification.leaderboard.RedisSortedSet')
+LEADERBOARD_REDIS_URL = os.getenv('LEADERBOARD_REDIS_URL', 'redis://127.0.0.1:6379/2')
+
+# Присутствие WebSocket-соединений (events.realtime) в том же Redis; в тестах - InMemorySortedSet
+PRESENCE_STORE = os.getenv('PRESENCE_STORE', 'events.gamification.leaderboard.RedisSortedSet')
+
+# Слой каналов для push в WebSocket (events.realtime): общий Redis, чтобы дельты из
+# веб-процессов и тикер из Celery доходили до потребителей ASGI; в тестах - InMemoryChannelLayer
+CHANNEL_REDIS_URL = os.getenv('CHANNEL_REDIS_URL', 'redis://127.0.0.1:6379/3')
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {'hosts': [CHANNEL_REDIS_URL]},
+    }
+}
+
 # Кэширование для производительности
 CACHES = {
     'default': {
@@ -1,21 +1,13 @@
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from collections import Counter
 from django.db.models import Count, Q, Avg
 import logging
 from .models import Event, Favorite, Registration, Review
+from .collaborative import get_collaborative_model
+from .similarity import recommend_for_user
 
 logger = logging.getLogger(__name__)
 
 class AIRecommendationEngine:
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(
-            stop_words='english', 
-            max_features=1000,
-            min_df=2,
-            max_df=0.8
-        )
-    
     def get_user_preferences(self, user):
         """Анализ предпочтений пользователя"""
         preferences = {
@@ -42,78 +34,24 @@ class AIRecommendationEngine:
         
         return preferences
     
-    def get_content_based_recommendations(self, user, events, limit=6):
-        """Рекомендации на основе контента с использованием ML"""
+    def get_content_based_recommendations(self, user, limit=6):
+        """Рекомендации на основе контента: соседи из индекса похожих мероприятий (events/similarity.py)"""
         try:
-            if not events:
-                return []
-            
-            event_texts = []
-            event_ids = []
-            
-            for event in events:
-                # Собираем текстовые признаки
-                text_parts = [
-                    event.title or '',
-                    event.description or '',
-                    event.short_description or '',
-                    event.get_category_display() or '',
-                    event.get_event_type_display() or '',
-                    event.location or ''
-                ]
-                text = ' '.join([part for part in text_parts if part])
-                event_texts.append(text)
-                event_ids.append(event.id)
-            
-            if len(event_texts) < 2:
-                return events[:limit]
-            
-            # Создаем TF-IDF матрицу
-            tfidf_matrix = self.vectorizer.fit_transform(event_texts)
-            
-            # Вычисляем косинусное сходство
-            cosine_sim = cosine_similarity(tfidf_matrix, tfidf_matrix)
-            
-            # Получаем рекомендации
-            sim_scores = list(enumerate(cosine_sim[0]))
-            sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)[1:limit+1]
-            
-            recommended_indices = [i[0] for i in sim_scores]
-            return [events[i] for i in recommended_indices]
-            
+            return recommend_for_user(user, limit)
         except Exception as e:
             logger.error(f"AI recommendation failed: {e}")
             return self.get_fallback_recommendations(user, limit)
     
     def get_collaborative_recommendations(self, user, limit=6):
-        """Коллаборативная фильтрация на основе похожих пользователей"""
+        """Коллаборативная фильтрация: факторы пользователя и мероприятий из обученной модели (events/collaborative.py)"""
         try:
-            # Находим пользователей с похожими интересами
-            user_favorites = set(Favorite.objects.filter(user=user).values_list('event_id', flat=True))
-            
-            similar_users = Favorite.objects.filter(
-                event__in=user_favorites
-            ).exclude(user=user).values('user').annotate(
-                common_events=Count('event')
-            ).order_by('-common_events')[:10]
-            
-            if not similar_users:
+            model = get_collaborative_model()
+            if model is None:
                 return []
-            
-            similar_user_ids = [item['user'] for item in similar_users]
-            
-            # Находим мероприятия, которые нравятся похожим пользователям
-            recommended_events = Favorite.objects.filter(
-                user__in=similar_user_ids
-            ).exclude(
-                event__in=user_favorites
-            ).values('event').annotate(
-                score=Count('user')
-            ).order_by('-score')[:limit]
-            
-            event_ids = [item['event'] for item in recommended_events]
-            return Event.objects.filter(id__in=event_ids, is_active=True)
-            
+            # С запасом: часть мероприятий могла стать неактивной после обучения
+            ranked = [event_id for event_id, _ in model.recommend(user.pk, limit * 2)]
+            events = Event.objects.filter(is_active=True).in_bulk(ranked)
+            return [events[event_id] for event_id in ranked if event_id in events][:limit]
         except Exception as e:
             logger.error(f"Collaborative filtering failed: {e}")
             return []
@@ -124,8 +62,7 @@ class AIRecommendationEngine:
             return self.get_popular_events(limit)
         
         # 1. Контентные рекомендации
-        user_events = Event.objects.filter(is_active=True)
-        content_based = self.get_content_based_recommendations(user, list(user_events), limit//2)
+        content_based = self.get_content_based_recommendations(user, limit//2)
         
         # 2. Коллаборативные рекомендации
         collaborative = self.get_collaborative_recommendations(user, limit//2)
@@ -137,22 +74,19 @@ class AIRecommendationEngine:
         all_recommendations = list(content_based) + list(collaborative) + list(preference_based)
         
         # Убираем дубликаты и уже посещенные
-        seen_ids = set()
+        known_ids = set(Registration.objects.filter(user=user).values_list('event_id', flat=True))
+        known_ids.update(Favorite.objects.filter(user=user).values_list('event_id', flat=True))
+        seen_ids = set(known_ids)
         final_recommendations = []
         
-        user_registered_ids = Registration.objects.filter(user=user).values_list('event_id', flat=True)
-        user_favorite_ids = Favorite.objects.filter(user=user).values_list('event_id', flat=True)
-        
         for event in all_recommendations:
-            if (event.id not in seen_ids and 
-                event.id not in user_registered_ids and
-                event.id not in user_favorite_ids):
+            if event.id not in seen_ids:
                 final_recommendations.append(event)
                 seen_ids.add(event.id)
         
-        # Если рекомендаций мало, добавляем популярные
+        # Если рекомендаций мало, добавляем популярные (с запасом на уже посещенные)
         if len(final_recommendations) < limit:
-            additional = self.get_popular_events(limit - len(final_recommendations))
+            additional = self.get_popular_events(limit - len(final_recommendations) + len(known_ids))
             for event in additional:
                 if event.id not in seen_ids:
                     final_recommendations.append(event)
@@ -171,7 +105,6 @@ class AIRecommendationEngine:
         
         if preferences['categories']:
             # Берем самую популярную категорию
-            from collections import Counter
             category_counter = Counter(preferences['categories'])
             most_common_category = category_counter.most_common(1)[0][0]
             query &= Q(category__name=most_common_category)
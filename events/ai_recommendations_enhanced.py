@@ -136,30 +136,9 @@ class EnhancedAIRecommendationEngine:
             return self.get_hybrid_recommendations(user, limit=6)
     
     def get_trending_events(self, days=7, limit=10):
-        """Трендовые мероприятия на основе алгоритма Hacker News"""
-        from django.utils import timezone
-        from datetime import timedelta
-        
-        time_threshold = timezone.now() - timedelta(days=days)
-        
-        trending_events = Event.objects.filter(
-            created_at__gte=time_threshold,
-            is_active=True
-        ).annotate(
-            registrations_count=Count('registrations'),
-            favorites_count=Count('favorited_by'),
-            views_count=Count('eventstatistic__views_count'),
-            # Алгоритм популярности подобный Hacker News
-            popularity_score=(
-                F('registrations_count') * 2 + 
-                F('favorites_count') * 1.5 + 
-                F('views_count') * 0.5
-            ) / (
-                (timezone.now() - F('created_at')).total_seconds() / 3600 + 2
-            ) ** 1.8
-        ).order_by('-popularity_score')[:limit]
-        
-        return trending_events
+        """Трендовые мероприятия из TrendingScore (окно и затухание - в events/trending.py)"""
+        from .trending import trending_events
+        return trending_events(limit=limit)
     
     def get_serendipity_recommendations(self, user, limit=5):
         """Рекомендации для открытия новых интересов (серендипити)"""
@@ -1,5 +1,8 @@
 from django_filters import rest_framework as filters
+from rest_framework.filters import SearchFilter
 from ..models import Event
+from ..search import search_events
+from ..filters import filter_nearby
 
 class EventFilter(filters.FilterSet):
     title = filters.CharFilter(lookup_expr='icontains')
@@ -7,7 +10,28 @@ class EventFilter(filters.FilterSet):
     date_from = filters.DateFilter(field_name='date', lookup_expr='gte')
     date_to = filters.DateFilter(field_name='date', lookup_expr='lte')
     location = filters.CharFilter(lookup_expr='icontains')
+    nearby = filters.CharFilter(method='filter_nearby', label='lat,lon[,радиус км]')
     
     class Meta:
         model = Event
-        fields = ['title', 'event_type', 'location']
\ No newline at end of file
+        fields = ['title', 'event_type', 'location']
+
+    def filter_nearby(self, queryset, name, value):
+        return filter_nearby(queryset, value)
+
+
+class EventSearchFilter(SearchFilter):
+    """
+    ?search= через полнотекстовый индекс (events.search) вместо icontains.
+    Без явного ?ordering= результаты сортируются по релевантности.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        ordering = queryset.query.order_by
+        queryset = search_events(' '.join(terms), queryset)
+        if request.query_params.get('ordering'):
+            queryset = queryset.order_by(*ordering)
+        return queryset
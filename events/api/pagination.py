@@ -0,0 +1,57 @@
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from ..pagination import KeysetPaginator, InvalidCursor
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor пагинация по ключу сортировки (см. events.pagination).
+    ?with_count=1 добавляет оценку общего количества вместо точного COUNT(*).
+    """
+    page_size = api_settings.PAGE_SIZE or 20
+    cursor_query_param = 'cursor'
+    count_query_param = 'with_count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        with_estimate = request.query_params.get(self.count_query_param) in ('1', 'true')
+        paginator = KeysetPaginator(queryset, self.page_size, with_estimate=with_estimate)
+        try:
+            self.page = paginator.page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise NotFound('Неверный курсор')
+        return list(self.page)
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        body = {
+            'next': self.get_link(self.page.next_cursor),
+            'previous': self.get_link(self.page.previous_cursor),
+        }
+        estimate = self.page.paginator.count
+        if estimate is not None:
+            body['estimated_count'] = estimate.value
+            body['count_is_exact'] = estimate.is_exact
+        body['results'] = data
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'estimated_count': {'type': 'integer'},
+                'count_is_exact': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
@@ -28,9 +28,9 @@ class EventSerializer(serializers.ModelSerializer):
             'id', 'title', 'short_description', 'description',
             'date', 'location', 'event_type', 'price', 'capacity',
             'category', 'image', 'average_rating', 'reviews',
-            'is_favorite', 'created_at', 'updated_at'
+            'is_favorite', 'processing_status', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['created_at', 'updated_at']
+        read_only_fields = ['processing_status', 'created_at', 'updated_at']
     
     def get_is_favorite(self, obj):
         request = self.context.get('request')
@@ -5,26 +5,30 @@ from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
 from django.db import models
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
 from django.db.models import Prefetch
 
 from rest_framework import generics
 from ..models import Event, Favorite, Review, Registration
+from ..trending import trending_events
 from .serializers import EventSerializer, FavoriteSerializer, ReviewSerializer, RegistrationSerializer
 
-from .filters import EventFilter
+from .filters import EventFilter, EventSearchFilter
+from .pagination import KeysetPagination
 
 
 class EventViewSet(viewsets.ReadOnlyModelViewSet):
     """API для мероприятий"""
     queryset = Event.objects.filter(is_active=True).select_related('category')
     serializer_class = EventSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    # Поиск после сортировки: без ?ordering= он упорядочивает по релевантности
+    filter_backends = [DjangoFilterBackend, OrderingFilter, EventSearchFilter]
     filterset_class = EventFilter
     filterset_fields = ['category', 'event_type']
-    search_fields = ['title', 'description', 'location']
+    search_fields = ['title', 'short_description', 'description', 'location']
     ordering_fields = ['date', 'price', 'created_at']
     ordering = ['-date']
+    pagination_class = KeysetPagination
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -32,7 +36,9 @@ class EventViewSet(viewsets.ReadOnlyModelViewSet):
         return context
     
     def get_queryset(self):
-        queryset = Event.objects.all()
+        queryset = Event.objects.select_related('category').prefetch_related(
+            Prefetch('reviews', queryset=Review.objects.select_related('user'))
+        ).with_stats()
         # Добавить любую дополнительную фильтрацию если нужно
         return queryset
     
@@ -91,10 +97,10 @@ class EventViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def upcoming(self, request):
         """Ближайшие мероприятия"""
-        upcoming_events = Event.objects.filter(
+        upcoming_events = self.get_queryset().filter(
             date__gte=timezone.now(),
             is_active=True
-        ).select_related('category').order_by('date')[:10]
+        ).order_by('date')[:10]
         
         serializer = self.get_serializer(upcoming_events, many=True)
         return Response(serializer.data)
@@ -102,20 +108,24 @@ class EventViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def popular(self, request):
         """Популярные мероприятия (по количеству регистраций)"""
-        popular_events = Event.objects.filter(
+        popular_events = self.get_queryset().filter(
             is_active=True
-        ).annotate(
-            registrations_count=models.Count('registrations')
-        ).order_by('-registrations_count')[:10]
+        ).order_by('-_registrations_count')[:10]
         
         serializer = self.get_serializer(popular_events, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Мероприятия «в тренде» (рейтинг пересчитывается задачей update_trending_scores)"""
+        serializer = self.get_serializer(trending_events(self.get_queryset()), many=True)
+        return Response(serializer.data)
+
     @action(detail=True, methods=['get'])
     def registrations_info(self, request, pk=None):
         """Информация о регистрациях на мероприятие"""
         event = self.get_object()
-        registrations_count = event.registrations.count()
+        registrations_count = event.registrations_count
         available_spots = event.capacity - registrations_count
         
         return Response({
@@ -170,5 +180,7 @@ class RegistrationViewSet(viewsets.ModelViewSet):
 
 
 class EventListAPI(generics.ListAPIView):
-    queryset = Event.objects.filter(is_active=True)
+    queryset = Event.objects.filter(is_active=True).select_related('category').prefetch_related(
+        Prefetch('reviews', queryset=Review.objects.select_related('user'))
+    ).with_stats()
     serializer_class = EventSerializer
\ No newline at end of file
@@ -80,29 +80,26 @@ def user_progress(request):
 @api_view(['GET'])
 def leaderboard(request):
     """Получение таблицы лидеров"""
-    from ..models import Leaderboard
+    from ..gamification.leaderboard import get_leaderboard, leaderboard_entries
     
     try:
-        limit = int(request.GET.get('limit', 10))
-        offset = int(request.GET.get('offset', 0))
+        limit = min(int(request.GET.get('limit', 10)), 100)
+        offset = max(int(request.GET.get('offset', 0)), 0)
         
-        entries = Leaderboard.objects.select_related('user').order_by('position')[
-            offset:offset + limit
+        leaderboard_data = [
+            {
+                'position': entry['rank'],
+                'username': entry['username'],
+                'points': entry['points'],
+                'level': entry['level'],
+                'avatar': entry['avatar']
+            }
+            for entry in leaderboard_entries(limit, offset)
         ]
         
-        leaderboard_data = []
-        for entry in entries:
-            leaderboard_data.append({
-                'position': entry.position,
-                'username': entry.user.username,
-                'points': entry.points,
-                'level': entry.user.game_profile.current_level.level if hasattr(entry.user, 'game_profile') and entry.user.game_profile.current_level else 1,
-                'avatar': entry.user.avatar.url if entry.user.avatar else None
-            })
-        
         return Response({
             'leaderboard': leaderboard_data,
-            'total_players': Leaderboard.objects.count()
+            'total_players': get_leaderboard().count()
         })
         
     except Exception as e:
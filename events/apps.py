@@ -5,11 +5,22 @@ class EventsConfig(AppConfig):
     name = 'events'
 
     def ready(self):
+        # Счетчики EventStatistic, индексы поиска и похожих мероприятий, кеш рекомендаций,
+        # копии изображений, журнал игровых действий, push в WebSocket и рассылка подписчикам
+        # должны обновляться всегда
+        import events.signals_statistics  # noqa: F401
+        import events.realtime  # noqa: F401
+        import events.notification_fanout  # noqa: F401
+        import events.signals_gamification  # noqa: F401
+        import events.search  # noqa: F401
+        import events.similarity  # noqa: F401
+        import events.recommendation_cache  # noqa: F401
+        import events.renditions  # noqa: F401
+
         # Отложенная загрузка сигналов чтобы избежать предупреждений
         import django
         if not django.setup:
             try:
                 import events.signals
-                import events.signals_gamification
             except ImportError as e:
                 print(f"Warning: Could not import signals: {e}")
\ No newline at end of file
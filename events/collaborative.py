@@ -0,0 +1,209 @@
+"""
+Коллаборативная фильтрация по неявному отклику (implicit ALS, Hu, Koren, Volinsky).
+
+- Взаимодействия (избранное, регистрации, положительные отзывы) читаются
+  одним запросом UNION ALL и собираются в разреженную матрицу
+  пользователь × мероприятие scipy.sparse.csr_matrix.
+- Факторы пользователей и мероприятий обучает задача
+  train_recommendation_models (или команда train_recommendations) и
+  сохраняет в RECOMMENDATION_MODEL_DIR/collaborative.npz.
+- Онлайн рекомендация - произведение матрицы факторов мероприятий на фактор
+  пользователя и маска уже знакомых ему мероприятий; запросов к базе для
+  оценки нет.
+"""
+import logging
+import os
+import threading
+import zipfile
+from array import array
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import ExpressionWrapper, F, FloatField, Value
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Favorite, Registration, Review
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILENAME = 'collaborative.npz'
+FACTORS = 16
+ITERATIONS = 10
+REGULARIZATION = 0.1
+# Уверенность в интересе: c = 1 + ALPHA * вес взаимодействия
+ALPHA = 10.0
+
+FAVORITE_WEIGHT = 3.0
+REGISTRATION_WEIGHT = 2.0
+
+
+def interactions_queryset():
+    """(user_id, event_id, вес) из трех таблиц одним запросом"""
+    columns = ('user_id', 'event_id', 'weight')
+    favorites = Favorite.objects.annotate(weight=Value(FAVORITE_WEIGHT, output_field=FloatField()))
+    registrations = Registration.objects.exclude(status='cancelled').annotate(
+        weight=Value(REGISTRATION_WEIGHT, output_field=FloatField())
+    )
+    # Отзыв на 3 звезды - слабый интерес, плохие отзывы интересом не считаются
+    reviews = Review.objects.filter(rating__gte=3).annotate(
+        weight=ExpressionWrapper(F('rating') - 2.0, output_field=FloatField())
+    )
+    return favorites.order_by().values_list(*columns).union(
+        registrations.order_by().values_list(*columns),
+        reviews.order_by().values_list(*columns),
+        all=True,
+    )
+
+
+def load_interactions(queryset=None):
+    """(матрица, user_ids, item_ids); повторные взаимодействия с мероприятием складываются"""
+    if queryset is None:
+        queryset = interactions_queryset()
+    users, items, weights = array('q'), array('q'), array('d')
+    for user_id, event_id, weight in queryset.iterator(chunk_size=5000):
+        users.append(user_id)
+        items.append(event_id)
+        weights.append(weight)
+
+    user_ids, rows = np.unique(np.frombuffer(users, dtype=np.int64), return_inverse=True)
+    item_ids, columns = np.unique(np.frombuffer(items, dtype=np.int64), return_inverse=True)
+    # Повторы (строка, столбец) суммируются при построении CSR
+    matrix = csr_matrix(
+        (np.frombuffer(weights, dtype=np.float64), (rows, columns)), shape=(len(user_ids), len(item_ids)),
+    )
+    matrix.sum_duplicates()
+    return matrix, user_ids.tolist(), item_ids.tolist()
+
+
+def als_step(matrix, fixed, regularization=REGULARIZATION, alpha=ALPHA):
+    """
+    Факторы строк matrix при фиксированных факторах столбцов:
+    x_u = (YᵀY + Yᵀ(C_u - I)Y + λI)⁻¹ YᵀC_u p_u, где поправка к YᵀY идет только по ненулевым элементам строки.
+    """
+    k = fixed.shape[1]
+    gram = fixed.T @ fixed + regularization * np.eye(k)
+    factors = np.empty((matrix.shape[0], k))
+    for i in range(matrix.shape[0]):
+        start, end = matrix.indptr[i], matrix.indptr[i + 1]
+        y = fixed[matrix.indices[start:end]]
+        confidence = 1.0 + alpha * matrix.data[start:end]
+        factors[i] = np.linalg.solve(gram + (y.T * (confidence - 1.0)) @ y, y.T @ confidence)
+    return factors
+
+
+class CollaborativeModel:
+    """Факторы пользователей и мероприятий и уже знакомые пользователю мероприятия (CSR)"""
+
+    def __init__(self, user_ids, item_ids, user_factors, item_factors, seen, trained_at=None):
+        self.user_ids = user_ids
+        self.item_ids = item_ids
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.seen = seen
+        self.trained_at = trained_at
+        self.user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+        self.item_index = {item_id: j for j, item_id in enumerate(item_ids)}
+
+    @classmethod
+    def train(cls, matrix, user_ids, item_ids, factors=FACTORS, iterations=ITERATIONS,
+              regularization=REGULARIZATION, alpha=ALPHA, seed=0):
+        rng = np.random.default_rng(seed)
+        item_factors = rng.uniform(0, 0.1, (len(item_ids), factors))
+        user_factors = np.zeros((len(user_ids), factors))
+        by_item = matrix.T.tocsr()
+        for _ in range(iterations):
+            user_factors = als_step(matrix, item_factors, regularization, alpha)
+            item_factors = als_step(by_item, user_factors, regularization, alpha)
+        return cls(user_ids, item_ids, user_factors, item_factors, matrix, timezone.now().isoformat())
+
+    def recommend(self, user_id, limit=10, exclude=()):
+        """[(event_id, оценка)] лучших мероприятий, кроме знакомых пользователю"""
+        u = self.user_index.get(user_id)
+        if u is None or limit <= 0:
+            return []
+        scores = self.item_factors @ self.user_factors[u]
+        masked = list(self.seen.indices[self.seen.indptr[u]:self.seen.indptr[u + 1]])
+        masked += [self.item_index[event_id] for event_id in exclude if event_id in self.item_index]
+        scores[masked] = -np.inf
+
+        candidates = np.flatnonzero(np.isfinite(scores))
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        ranked = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(self.item_ids[j], float(scores[j])) for j in ranked]
+
+    def save(self, path):
+        """Запись во временный файл и os.replace: читатели не видят недописанную модель"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                trained_at=np.array(self.trained_at or ''),
+                user_ids=np.array(self.user_ids, dtype=np.int64),
+                item_ids=np.array(self.item_ids, dtype=np.int64),
+                user_factors=self.user_factors,
+                item_factors=self.item_factors,
+                seen_indptr=self.seen.indptr,
+                seen_indices=self.seen.indices,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            user_ids, item_ids = data['user_ids'].tolist(), data['item_ids'].tolist()
+            seen = csr_matrix(
+                (np.ones(len(data['seen_indices'])), data['seen_indices'], data['seen_indptr']),
+                shape=(len(user_ids), len(item_ids)),
+            )
+            return cls(
+                user_ids, item_ids, data['user_factors'], data['item_factors'], seen,
+                str(data['trained_at']) or None,
+            )
+
+
+def model_path():
+    directory = getattr(settings, 'RECOMMENDATION_MODEL_DIR', os.path.join(settings.BASE_DIR, 'ai_models'))
+    return os.path.join(directory, MODEL_FILENAME)
+
+
+def train_collaborative_model(**params):
+    """Обучает модель по всем взаимодействиям и сохраняет ее; возвращает модель"""
+    matrix, user_ids, item_ids = load_interactions()
+    model = CollaborativeModel.train(matrix, user_ids, item_ids, **params)
+    model.save(model_path())
+    logger.info(f"Collaborative model trained: {len(user_ids)} users, {len(item_ids)} events, {matrix.nnz} interactions")
+    return model
+
+
+_model_lock = threading.Lock()
+_loaded = {'path': None, 'mtime': None, 'model': None}
+
+
+def get_collaborative_model():
+    """Модель из файла; перечитывается, когда задача обучения записала новую. None, если модели еще нет"""
+    path = model_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _model_lock:
+        if _loaded['path'] != path or _loaded['mtime'] != mtime:
+            try:
+                _loaded['model'] = CollaborativeModel.load(path)
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+                logger.error(f"Cannot load collaborative model {path}: {e}")
+                return None
+            _loaded['path'], _loaded['mtime'] = path, mtime
+        return _loaded['model']
+
+
+@receiver(setting_changed)
+def reset_collaborative_model(setting, **kwargs):
+    if setting == 'RECOMMENDATION_MODEL_DIR':
+        with _model_lock:
+            _loaded.update(path=None, mtime=None, model=None)
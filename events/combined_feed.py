@@ -0,0 +1,108 @@
+"""
+Объединенная лента внутренних (Event) и внешних (ExternalEvent) мероприятий.
+
+Оба источника проецируются в одинаковый набор колонок и объединяются
+UNION ALL, поэтому сортировка, LIMIT/OFFSET и COUNT выполняются в базе.
+В Python обрабатываются только строки текущей страницы (decorate_feed_page).
+"""
+from django.conf import settings
+from django.db.models import (
+    BooleanField, Case, CharField, F, FloatField, IntegerField, Value, When,
+)
+from django.db.models.functions import Cast, Coalesce
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Event
+
+INTERNAL = 'internal'
+EXTERNAL = 'external'
+
+# Порядок колонок должен совпадать в обеих частях UNION
+FEED_COLUMNS = [
+    'feed_type', 'feed_id', 'feed_title', 'feed_description', 'feed_short_description',
+    'feed_date', 'feed_location', 'feed_price', 'feed_is_free', 'feed_image',
+    'feed_category', 'feed_url', 'feed_source_name', 'feed_average_rating',
+    'feed_registrations_count',
+]
+
+
+def _project(queryset, **expressions):
+    """annotate() в порядке FEED_COLUMNS + values() только этих колонок"""
+    ordered = {column: expressions[column] for column in FEED_COLUMNS}
+    return queryset.order_by().annotate(**ordered).values(*FEED_COLUMNS)
+
+
+def internal_feed(queryset):
+    return _project(
+        queryset,
+        feed_type=Value(INTERNAL, output_field=CharField()),
+        feed_id=F('pk'),
+        feed_title=F('title'),
+        feed_description=F('description'),
+        feed_short_description=F('short_description'),
+        feed_date=F('date'),
+        feed_location=F('location'),
+        feed_price=F('price'),
+        feed_is_free=Case(When(price=0, then=Value(True)), default=Value(False), output_field=BooleanField()),
+        feed_image=Cast('image', CharField()),
+        feed_category=Coalesce(F('category__name'), Value('Не указана'), output_field=CharField()),
+        feed_url=Value('', output_field=CharField()),
+        feed_source_name=Value('EventHub', output_field=CharField()),
+        feed_average_rating=Case(
+            When(
+                eventstatistic__reviews_count__gt=0,
+                then=Cast('eventstatistic__rating_sum', FloatField()) / F('eventstatistic__reviews_count'),
+            ),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+        feed_registrations_count=Coalesce(F('eventstatistic__registrations_count'), 0),
+    )
+
+
+def external_feed(queryset):
+    return _project(
+        queryset,
+        feed_type=Value(EXTERNAL, output_field=CharField()),
+        feed_id=F('pk'),
+        feed_title=F('title'),
+        feed_description=F('description'),
+        feed_short_description=F('short_description'),
+        feed_date=F('date'),
+        feed_location=F('location'),
+        feed_price=F('price'),
+        feed_is_free=F('is_free'),
+        feed_image=Coalesce(F('image_url'), Value(''), output_field=CharField()),
+        feed_category=F('category'),
+        feed_url=F('external_url'),
+        feed_source_name=F('source__name'),
+        feed_average_rating=Value(None, output_field=FloatField()),
+        feed_registrations_count=Value(None, output_field=IntegerField()),
+    )
+
+
+def combined_feed(internal, external, newest_first=False):
+    """UNION ALL двух источников, отсортированный по дате в SQL"""
+    ordering = ['feed_date', 'feed_type', 'feed_id']
+    if newest_first:
+        ordering = [f'-{column}' for column in ordering]
+    return internal_feed(internal).union(external_feed(external), all=True).order_by(*ordering)
+
+
+def decorate_feed_page(rows):
+    """Строки страницы -> словари в формате шаблонов (url, image_url, is_past)"""
+    now = timezone.now()
+    storage = Event._meta.get_field('image').storage
+    default_image = f"{settings.STATIC_URL}images/default-event.jpg"
+    events = []
+    for row in rows:
+        item = {column[len('feed_'):]: value for column, value in row.items()}
+        item['is_past'] = item['date'] < now
+        if item['type'] == INTERNAL:
+            item['url'] = reverse('event_detail', kwargs={'pk': item['id']})
+            item['image_url'] = storage.url(item['image']) if item['image'] else default_image
+        else:
+            item['image_url'] = item['image']
+        events.append(item)
+    return events
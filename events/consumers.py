@@ -1,224 +1,208 @@
 import json
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.utils import timezone
-from datetime import timedelta
-import asyncio
 
-class AnalyticsConsumer(AsyncWebsocketConsumer):
+from .realtime import (
+    ANALYTICS_GROUP, PRESENCE_GROUP, event_group, get_analytics_snapshot, mark_offline, mark_online,
+    notification_payload, presence_member, snapshot_diff, user_group,
+)
+
+# Потребители не опрашивают базу: обновления публикуют сигналы и тикер
+# аналитики в группы слоя каналов (events/realtime.py)
+
+
+class PresenceMixin:
+    """Соединение учитывается в множестве присутствия, пока открыто и получает пульс тикера"""
+
+    async def join_presence(self):
+        self.presence_member = presence_member(self.scope.get('user'), self.channel_name)
+        await self.channel_layer.group_add(PRESENCE_GROUP, self.channel_name)
+        await sync_to_async(mark_online)(self.presence_member)
+
+    async def leave_presence(self):
+        if hasattr(self, 'presence_member'):
+            await self.channel_layer.group_discard(PRESENCE_GROUP, self.channel_name)
+            await sync_to_async(mark_offline)(self.presence_member)
+
+    async def presence_heartbeat(self, message):
+        await sync_to_async(mark_online)(self.presence_member)
+
+
+class AnalyticsConsumer(PresenceMixin, AsyncWebsocketConsumer):
     """WebSocket для real-time аналитики"""
-    
+
     async def connect(self):
+        # Версия и данные снимка, уже отправленные клиенту
+        self.version = None
+        self.sent = {}
+        await self.channel_layer.group_add(ANALYTICS_GROUP, self.channel_name)
         await self.accept()
-        self.analytics_task = asyncio.create_task(self.send_analytics_updates())
-    
+        await self.join_presence()
+        await self.send_initial_data()
+
     async def disconnect(self, close_code):
-        if hasattr(self, 'analytics_task'):
-            self.analytics_task.cancel()
-    
+        await self.channel_layer.group_discard(ANALYTICS_GROUP, self.channel_name)
+        await self.leave_presence()
+
     async def receive(self, text_data):
         data = json.loads(text_data)
         action = data.get('action')
-        
+
         if action == 'subscribe':
             await self.send_initial_data()
-    
-    async def send_analytics_updates(self):
-        """Периодическая отправка обновлений аналитики"""
-        while True:
-            try:
-                analytics_data = await self.get_realtime_analytics()
-                await self.send(text_data=json.dumps({
-                    'type': 'analytics_update',
-                    'data': analytics_data
-                }))
-                await asyncio.sleep(10)  # Обновление каждые 10 секунд
-            except Exception as e:
-                print(f"Analytics error: {e}")
-                await asyncio.sleep(30)
-    
-    @database_sync_to_async
-    def get_realtime_analytics(self):
-        """Получение real-time аналитики"""
-        from .models import Event, Registration, User
-        from django.db.models import Count, Q
-        import random
-        
-        now = timezone.now()
-        hour_ago = now - timedelta(hours=1)
-        
-        # Real-time метрики
-        return {
-            'online_users': random.randint(50, 200),  # В реальности - из Redis
-            'active_events': Event.objects.filter(
-                is_active=True,
-                date__gte=now
-            ).count(),
-            'registrations_last_hour': Registration.objects.filter(
-                registration_date__gte=hour_ago
-            ).count(),
-            'popular_categories': self.get_popular_categories(),
-            'live_updates': self.get_live_updates()
-        }
-    
-    def get_popular_categories(self):
-        """Популярные категории в реальном времени"""
-        from .models import Event
-        from django.db.models import Count
-        
-        return list(Event.objects.filter(
-            is_active=True
-        ).values('category__name').annotate(
-            count=Count('id')
-        ).order_by('-count')[:5])
-    
-    def get_live_updates(self):
-        """Live обновления (регистрации, новые события)"""
-        from .models import Registration, Event
-        from django.db.models import Count
-        
-        recent_registrations = Registration.objects.filter(
-            registration_date__gte=timezone.now() - timedelta(minutes=5)
-        ).select_related('user', 'event')[:10]
-        
-        return [
-            {
-                'type': 'registration',
-                'user': reg.user.username,
-                'event': reg.event.title,
-                'timestamp': reg.registration_date.isoformat()
-            }
-            for reg in recent_registrations
-        ]
-
-class NotificationConsumer(AsyncWebsocketConsumer):
+
+    async def send_initial_data(self):
+        """Последний снимок общего тикера целиком"""
+        entry = await database_sync_to_async(get_analytics_snapshot)()
+        self.version, self.sent = entry['version'], dict(entry['data'])
+        await self.send(text_data=json.dumps({
+            'type': 'analytics_update',
+            'version': entry['version'],
+            'data': entry['data']
+        }))
+
+    async def analytics_snapshot(self, message):
+        """Новая версия снимка: клиенту уходят только изменившиеся ключи"""
+        entry = message['data']
+        if entry['version'] == self.version:
+            return
+        changes = snapshot_diff(entry['data'], self.sent)
+        self.version = entry['version']
+        self.sent.update(changes)
+        if changes:
+            await self.send(text_data=json.dumps({
+                'type': 'analytics_diff',
+                'version': entry['version'],
+                'data': changes
+            }))
+
+    async def analytics_live(self, message):
+        """Событие ленты активности (новая регистрация)"""
+        await self.send(text_data=json.dumps({
+            'type': 'live_update',
+            'data': message['data']
+        }))
+
+class NotificationConsumer(PresenceMixin, AsyncWebsocketConsumer):
     """WebSocket для real-time уведомлений"""
-    
+
+    UNREAD_LIMIT = 50
+
     async def connect(self):
         self.user = self.scope["user"]
         if self.user.is_authenticated:
+            self.user_group_name = user_group(self.user.pk)
+            await self.channel_layer.group_add(self.user_group_name, self.channel_name)
             await self.accept()
-            self.notification_task = asyncio.create_task(self.send_notifications())
+            await self.join_presence()
+
+            # Накопившиеся за время отключения уведомления отправляются один раз
+            for notification in await self.take_unread_notifications():
+                await self.send_notification(notification)
         else:
             await self.close()
-    
+
     async def disconnect(self, close_code):
-        if hasattr(self, 'notification_task'):
-            self.notification_task.cancel()
-    
-    async def send_notifications(self):
-        """Отправка уведомлений пользователю"""
-        while True:
-            try:
-                notifications = await self.get_user_notifications()
-                for notification in notifications:
-                    await self.send(text_data=json.dumps({
-                        'type': 'notification',
-                        'data': notification
-                    }))
-                await asyncio.sleep(5)
-            except Exception as e:
-                print(f"Notification error: {e}")
-                await asyncio.sleep(30)
-    
+        if hasattr(self, 'user_group_name'):
+            await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
+        await self.leave_presence()
+
+    async def notification_push(self, message):
+        """Новое уведомление из группы пользователя"""
+        notification = message['data']
+        await self.send_notification(notification)
+        await self.mark_read([notification['id']])
+
+    async def send_notification(self, notification):
+        await self.send(text_data=json.dumps({
+            'type': 'notification',
+            'data': notification
+        }))
+
     @database_sync_to_async
-    def get_user_notifications(self):
-        """Получение непрочитанных уведомлений"""
+    def take_unread_notifications(self):
+        """Непрочитанные уведомления; отправленные помечаются прочитанными одним UPDATE"""
         from .models import Notification
-        notifications = Notification.objects.filter(
-            user=self.user,
-            read=False
-        )[:5]
-        
-        result = []
-        for notification in notifications:
-            result.append({
-                'id': notification.id,
-                'message': notification.message,
-                'type': notification.notification_type,
-                'timestamp': notification.sent_at.isoformat()
-            })
-            notification.read = True
-            notification.save()
-        
-        return result
-
-class EventConsumer(AsyncWebsocketConsumer):
+        notifications = list(
+            Notification.objects.filter(user=self.user, read=False).order_by('sent_at')[:self.UNREAD_LIMIT]
+        )
+        Notification.objects.filter(pk__in=[n.pk for n in notifications]).update(read=True)
+        return [notification_payload(notification) for notification in notifications]
+
+    @database_sync_to_async
+    def mark_read(self, ids):
+        from .models import Notification
+        Notification.objects.filter(user=self.user, pk__in=ids).update(read=True)
+
+class EventConsumer(PresenceMixin, AsyncWebsocketConsumer):
     """WebSocket для real-time обновлений по конкретному мероприятию"""
-    
+
     async def connect(self):
         self.event_id = self.scope['url_route']['kwargs']['event_id']
-        self.event_group_name = f'event_{self.event_id}'
-        
+        self.event_group_name = event_group(self.event_id)
+
         await self.channel_layer.group_add(
             self.event_group_name,
             self.channel_name
         )
         await self.accept()
-        
+        await self.join_presence()
+
         # Отправляем текущую статистику
         event_data = await self.get_event_data()
         await self.send(text_data=json.dumps({
             'type': 'event_data',
             'data': event_data
         }))
-    
+
     async def disconnect(self, close_code):
         await self.channel_layer.group_discard(
             self.event_group_name,
             self.channel_name
         )
-    
+        await self.leave_presence()
+
     async def receive(self, text_data):
         data = json.loads(text_data)
         action = data.get('action')
-        
+
         if action == 'get_updates':
             event_data = await self.get_event_data()
             await self.send(text_data=json.dumps({
                 'type': 'event_update',
                 'data': event_data
             }))
-    
+
     async def event_update(self, event):
         """Обработчик обновлений мероприятия"""
         await self.send(text_data=json.dumps({
             'type': 'event_update',
             'data': event
         }))
-    
+
+    async def event_delta(self, message):
+        """Сдвиг счетчиков мероприятия ({'registrations_count': 1, ...})"""
+        await self.send(text_data=json.dumps({
+            'type': 'event_delta',
+            'data': message['data']
+        }))
+
     @database_sync_to_async
     def get_event_data(self):
-        """Получение данных мероприятия"""
-        from .models import Event, Registration
+        """Получение данных мероприятия по денормализованным счетчикам"""
+        from .models import Event, EventStatistic
         try:
             event = Event.objects.get(id=self.event_id)
-            registrations_count = event.registrations.count()
-            
-            return {
-                'id': event.id,
-                'title': event.title,
-                'registrations_count': registrations_count,
-                'available_spots': event.capacity - registrations_count,
-                'views_count': getattr(event.eventstatistic, 'views_count', 0),
-                'favorites_count': event.favorited_by.count(),
-                'live_registrations': self.get_recent_registrations()
-            }
-        except Event.DoesNotExist:
+        except (Event.DoesNotExist, ValueError):
             return {}
-    
-    def get_recent_registrations(self):
-        """Недавние регистрации"""
-        from .models import Registration
-        recent = Registration.objects.filter(
-            event_id=self.event_id,
-            registration_date__gte=timezone.now() - timedelta(hours=1)
-        ).select_related('user')[:10]
-        
-        return [
-            {
-                'user': reg.user.username,
-                'timestamp': reg.registration_date.isoformat()
-            }
-            for reg in recent
-        ]
\ No newline at end of file
+        statistic = EventStatistic.objects.filter(event=event).first() or EventStatistic(event=event)
+
+        return {
+            'id': event.id,
+            'title': event.title,
+            'registrations_count': statistic.registrations_count,
+            'available_spots': event.capacity - statistic.registrations_count,
+            'views_count': statistic.views_count,
+            'favorites_count': statistic.favorites_count,
+        }
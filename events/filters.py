@@ -1,5 +1,23 @@
 import django_filters
 from .models import Event, Category
+from .geo import events_within_radius
+
+NEARBY_DEFAULT_RADIUS_KM = 10
+
+
+def filter_nearby(queryset, value):
+    """Фильтр "lat,lon[,radius_km]": bbox в SQL, точное расстояние haversine в Python"""
+    if not value:
+        return queryset
+    try:
+        parts = [float(part) for part in value.split(',')]
+        lat, lon = parts[:2]
+        radius = parts[2] if len(parts) > 2 else NEARBY_DEFAULT_RADIUS_KM
+    except ValueError:
+        return queryset.none()
+    queryset, _ = events_within_radius(queryset, lat, lon, radius)
+    return queryset
+
 
 class EventFilter(django_filters.FilterSet):
     title = django_filters.CharFilter(lookup_expr='icontains')
@@ -7,20 +25,10 @@ class EventFilter(django_filters.FilterSet):
     max_price = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
     category = django_filters.ModelChoiceFilter(queryset=Category.objects.all())
 
-    nearby = django_filters.MethodFilter()
+    nearby = django_filters.CharFilter(method='filter_nearby', label='lat,lon[,радиус км]')
 
     def filter_nearby(self, queryset, name, value):
-        if not value:
-            return queryset
-        lat, lon = map(float, value.split(','))
-        from geopy.distance import distance
-        ids = []
-        for event in queryset:
-            if event.latitude and event.longitude:
-                d = distance((lat, lon), (event.latitude, event.longitude)).km
-                if d <= 10:  # 10 км
-                    ids.append(event.id)
-        return queryset.filter(id__in=ids)
+        return filter_nearby(queryset, value)
 
     class Meta:
         model = Event
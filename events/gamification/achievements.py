@@ -0,0 +1,157 @@
+"""
+Проверка достижений по индексу правил.
+
+Требования активных достижений индексируются по ключам статистики, от
+которых они зависят ({'reviews_written': 5} -> 'reviews_written').
+Действие проверяет только правила, затронутые ключами его типа
+(ACTION_STAT_KEYS); неизвестный тип действия проверяет все правила.
+Уже полученные пользователем достижения загружаются одним запросом и не
+проверяются, новые записываются одним bulk_create.
+
+Индекс живет в памяти процесса и перестраивается при изменении
+достижений в этом процессе или не реже раза в ACHIEVEMENT_INDEX_TTL.
+"""
+import time
+from collections import defaultdict
+from threading import Lock
+
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Achievement, UserAchievement, UserProfile
+
+ACHIEVEMENT_INDEX_TTL = 300  # секунд
+
+# Ключи статистики, которые может изменить действие; серия дней меняется от любой активности
+ACTION_STAT_KEYS = {
+    'event_created': {'events_created', 'streak_days'},
+    'event_registration': {'events_attended', 'days_active', 'categories_explored', 'streak_days'},
+    'review_created': {'reviews_written', 'streak_days'},
+    'add_favorite': {'favorites_added', 'streak_days'},
+    'user_registered': {'streak_days'},
+}
+
+
+class AchievementIndex:
+    def __init__(self, achievements):
+        self.by_key = defaultdict(list)
+        # Достижения без требований выдаются при первой же проверке
+        self.unconditional = []
+        self.all = list(achievements)
+        for achievement in self.all:
+            keys = list(achievement.requirement or {})
+            for key in keys:
+                self.by_key[key].append(achievement)
+            if not keys:
+                self.unconditional.append(achievement)
+
+    @classmethod
+    def load(cls):
+        return cls(Achievement.objects.filter(is_active=True))
+
+    def rules_for(self, stat_keys=None):
+        """Достижения, зависящие от stat_keys; None - все"""
+        if stat_keys is None:
+            return self.all
+        affected = {achievement.pk: achievement for achievement in self.unconditional}
+        for key in stat_keys:
+            for achievement in self.by_key.get(key, ()):
+                affected[achievement.pk] = achievement
+        return list(affected.values())
+
+
+_index = {'index': None, 'loaded': 0.0}
+_index_lock = Lock()
+
+
+def get_achievement_index():
+    with _index_lock:
+        if _index['index'] is None or time.monotonic() - _index['loaded'] > ACHIEVEMENT_INDEX_TTL:
+            _index.update(index=AchievementIndex.load(), loaded=time.monotonic())
+        return _index['index']
+
+
+@receiver(post_save, sender=Achievement)
+@receiver(post_delete, sender=Achievement)
+def reset_achievement_index(sender=None, **kwargs):
+    with _index_lock:
+        _index.update(index=None, loaded=0.0)
+
+
+def stat_keys_for(action_types):
+    """Объединение ключей статистики для типов действий; None - проверить все правила"""
+    keys = set()
+    for action_type in action_types:
+        if action_type not in ACTION_STAT_KEYS:
+            return None
+        keys |= ACTION_STAT_KEYS[action_type]
+    return keys
+
+
+def requirement_met(profile, requirement):
+    """Проверка требования по счетчикам профиля в памяти"""
+    for key, required_value in requirement.items():
+        if key == 'streak_days' or key in UserProfile.COUNTER_FIELDS:
+            current_value = getattr(profile, key)
+        else:
+            current_value = 0
+        if current_value < required_value:
+            return False
+    return True
+
+
+def add_points(profile, points):
+    """
+    Атомарно добавляет очки профилю (F() в UPDATE, без перезаписи параллельных
+    начислений) и повторяет изменение в экземпляре.
+    """
+    UserProfile.objects.filter(pk=profile.pk).update(
+        total_points=F('total_points') + points, last_activity=timezone.now(),
+    )
+    profile.total_points += points
+
+
+def evaluate_achievements(profile, action_types=None):
+    """
+    Выдает достижения, ставшие доступными после действий action_types
+    (None - проверить все). Очки добавляются к profile.total_points одним
+    UPDATE (add_points). Возвращает описания новых достижений.
+    """
+    candidates = get_achievement_index().rules_for(
+        None if action_types is None else stat_keys_for(action_types)
+    )
+    if not candidates:
+        return []
+    unlocked_ids = set(
+        UserAchievement.objects.filter(user_id=profile.user_id, is_unlocked=True)
+        .order_by().values_list('achievement_id', flat=True)
+    )
+    earned = [
+        achievement for achievement in candidates
+        if achievement.pk not in unlocked_ids and requirement_met(profile, achievement.requirement or {})
+    ]
+    if not earned:
+        return []
+
+    # Строка с прогрессом могла быть создана раньше - обновляем ее
+    UserAchievement.objects.bulk_create(
+        [
+            UserAchievement(user_id=profile.user_id, achievement=achievement, is_unlocked=True, progress=1.0)
+            for achievement in earned
+        ],
+        update_conflicts=True,
+        unique_fields=['user', 'achievement'],
+        update_fields=['is_unlocked', 'progress', 'unlocked_at'],
+    )
+    add_points(profile, sum(achievement.points for achievement in earned))
+    return [
+        {
+            'name': achievement.name,
+            'icon': achievement.icon,
+            'points': achievement.points,
+            'description': achievement.description,
+        }
+        for achievement in earned
+    ]
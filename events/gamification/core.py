@@ -10,19 +10,15 @@ class GamificationEngine:
     """Движок геймификации для EventHub"""
     
     def __init__(self):
-        self.achievements = {}
         self.levels = {}
-        self.quests = {}
         self._load_data()
     
     def _load_data(self):
         """Загрузка данных геймификации из базы"""
         try:
-            from .models import Achievement, LevelSystem, Quest
+            from .models import LevelSystem
             
-            self.achievements = {ach.name: ach for ach in Achievement.objects.filter(is_active=True)}
             self.levels = {level.level: level for level in LevelSystem.objects.all()}
-            self.quests = {quest.name: quest for quest in Quest.objects.filter(is_active=True)}
             
         except Exception as e:
             logger.error(f"Error loading gamification data: {e}")
@@ -30,50 +26,6 @@ class GamificationEngine:
     
     def _create_default_data(self):
         """Создание дефолтных данных геймификации"""
-        # Дефолтные достижения
-        self.achievements = {
-            'first_event': {
-                'name': 'Первое мероприятие',
-                'description': 'Создайте ваше первое мероприятие',
-                'type': 'event',
-                'icon': '🎪',
-                'points': 10,
-                'requirement': {'events_created': 1}
-            },
-            'social_butterfly': {
-                'name': 'Социальная бабочка',
-                'description': 'Зарегистрируйтесь на 10 мероприятий',
-                'type': 'social',
-                'icon': '🦋',
-                'points': 25,
-                'requirement': {'events_attended': 10}
-            },
-            'explorer': {
-                'name': 'Исследователь',
-                'description': 'Посетите мероприятия 5 разных категорий',
-                'type': 'exploration',
-                'icon': '🧭',
-                'points': 30,
-                'requirement': {'categories_explored': 5}
-            },
-            'reviewer': {
-                'name': 'Критик',
-                'description': 'Напишите 5 отзывов о мероприятиях',
-                'type': 'mastery',
-                'icon': '📝',
-                'points': 20,
-                'requirement': {'reviews_written': 5}
-            },
-            'streak_master': {
-                'name': 'Мастер серии',
-                'description': 'Будьте активны 7 дней подряд',
-                'type': 'special',
-                'icon': '🔥',
-                'points': 50,
-                'requirement': {'streak_days': 7}
-            }
-        }
-        
         # Дефолтные уровни
         self.levels = {
             1: {'name': 'Новичок', 'min_points': 0, 'max_points': 50, 'icon': '🌱', 'color': '#95a5a6'},
@@ -87,15 +39,14 @@ class GamificationEngine:
     def handle_user_action(self, user, action_type: str, **kwargs):
         """Обработка действий пользователя"""
         try:
-            # Обновляем профиль пользователя
-            profile = self._get_or_create_user_profile(user)
-            profile.update_stats()
+            # Счетчики статистики в профиле уже актуальны: их сдвигают сигналы
+            profile = self._lock_user_profile(user)
             
             # Обновляем streak
             self._update_streak(profile)
             
-            # Проверяем достижения
-            unlocked_achievements = self._check_achievements(profile)
+            # Проверяем только достижения, затронутые действием
+            unlocked_achievements = self._check_achievements(profile, [action_type])
             
             # Проверяем задания
             completed_quests = self._check_quests(profile, action_type, kwargs)
@@ -118,6 +69,42 @@ class GamificationEngine:
             logger.error(f"Error handling user action: {e}")
             return {}
     
+    @transaction.atomic
+    def handle_user_actions(self, user, actions):
+        """
+        Обработка пачки действий одного пользователя (GamificationEvent):
+        очки суммируются, достижения и уровень проверяются один раз по
+        счетчикам профиля, задания получают число действий каждого типа.
+        """
+        profile = self._lock_user_profile(user)
+        points = sum(action.points for action in actions)
+        profile.total_points = max(profile.total_points + points, 0)
+        profile.save()
+        
+        by_type = {}
+        for action in actions:
+            by_type.setdefault(action.action, []).append(action)
+        
+        self._update_streak(profile)
+        unlocked_achievements = self._check_achievements(profile, list(by_type))
+        
+        completed_quests = []
+        for action_type, same_type in by_type.items():
+            action_data = {**same_type[-1].payload, 'count': len(same_type)}
+            completed_quests += self._check_quests(profile, action_type, action_data)
+        
+        new_level = self._update_level(profile)
+        self._update_leaderboard(user, profile.total_points)
+        
+        logger.info(f"Awarded {points} points to {user.username} for {len(actions)} actions")
+        return {
+            'unlocked_achievements': unlocked_achievements,
+            'completed_quests': completed_quests,
+            'level_up': new_level is not None,
+            'new_level': new_level,
+            'points_added': points
+        }
+    
     def _get_or_create_user_profile(self, user):
         """Получение или создание игрового профиля"""
         from .models import UserProfile, LevelSystem
@@ -133,6 +120,17 @@ class GamificationEngine:
         
         return profile
     
+    def _lock_user_profile(self, user):
+        """
+        Игровой профиль, заблокированный до конца транзакции: обработчики
+        разных пачек действий одного пользователя (задача с задержкой и
+        задача по расписанию) не перезаписывают очки друг друга.
+        """
+        from .models import UserProfile
+        
+        profile = self._get_or_create_user_profile(user)
+        return UserProfile.objects.select_for_update().get(pk=profile.pk)
+    
     def _update_streak(self, profile):
         """Обновление серии активных дней"""
         from datetime import timedelta
@@ -154,122 +152,23 @@ class GamificationEngine:
         profile.last_activity = now
         profile.save()
     
-    def _check_achievements(self, profile):
-        """Проверка достижений пользователя"""
-        from .models import Achievement, UserAchievement
-        
-        unlocked = []
+    def _check_achievements(self, profile, action_types=None):
+        """Проверка достижений, зависящих от статистики, которую меняют action_types"""
+        from .achievements import evaluate_achievements
         
-        for achievement_name, achievement_data in self.achievements.items():
-            if isinstance(achievement_data, dict):
-                # Используем дефолтные данные
-                requirement = achievement_data['requirement']
-                points = achievement_data['points']
-            else:
-                # Используем данные из базы
-                requirement = achievement_data.requirement
-                points = achievement_data.points
-            
-            # Проверяем выполнение требований
-            if self._check_requirement(profile, requirement):
-                # Создаем или обновляем достижение
-                user_achievement, created = UserAchievement.objects.get_or_create(
-                    user=profile.user,
-                    achievement=achievement_data if not isinstance(achievement_data, dict) else None,
-                    defaults={
-                        'is_unlocked': True,
-                        'progress': 1.0
-                    }
-                )
-                
-                if created or not user_achievement.is_unlocked:
-                    user_achievement.is_unlocked = True
-                    user_achievement.progress = 1.0
-                    user_achievement.save()
-                    
-                    # Добавляем очки
-                    profile.total_points += points
-                    profile.save()
-                    
-                    unlocked.append({
-                        'name': achievement_data['name'] if isinstance(achievement_data, dict) else achievement_data.name,
-                        'icon': achievement_data['icon'] if isinstance(achievement_data, dict) else achievement_data.icon,
-                        'points': points,
-                        'description': achievement_data['description'] if isinstance(achievement_data, dict) else achievement_data.description
-                    })
-        
-        return unlocked
+        return evaluate_achievements(profile, action_types)
     
     def _check_requirement(self, profile, requirement: Dict) -> bool:
-        """Проверка выполнения требования"""
-        stats = profile.stats
+        """Проверка выполнения требования по счетчикам профиля в памяти"""
+        from .achievements import requirement_met
         
-        for key, required_value in requirement.items():
-            current_value = stats.get(key, 0)
-            
-            if key == 'streak_days':
-                current_value = profile.streak_days
-            
-            if current_value < required_value:
-                return False
-        
-        return True
+        return requirement_met(profile, requirement)
     
     def _check_quests(self, profile, action_type: str, action_data: Dict):
-        """Проверка выполнения заданий"""
-        from .models import UserQuest, Quest
-        
-        completed = []
+        """Продвижение заданий, засчитывающих действие action_type"""
+        from .quests import advance_quests
         
-        # Получаем активные задания пользователя
-        user_quests = UserQuest.objects.filter(
-            user=profile.user,
-            quest__is_active=True,
-            is_completed=False
-        )
-        
-        for user_quest in user_quests:
-            quest = user_quest.quest
-            requirement = quest.requirement
-            
-            # Проверяем соответствует ли действие типу задания
-            if requirement.get('action_type') != action_type:
-                continue
-            
-            # Обновляем прогресс
-            progress = self._calculate_quest_progress(user_quest, action_data)
-            user_quest.progress = progress
-            
-            if progress >= 1.0 and not user_quest.is_completed:
-                user_quest.is_completed = True
-                user_quest.completed_at = timezone.now()
-                user_quest.save()
-                
-                # Награждаем пользователя
-                profile.total_points += quest.points_reward
-                profile.save()
-                
-                completed.append({
-                    'name': quest.name,
-                    'points': quest.points_reward,
-                    'description': quest.description
-                })
-            else:
-                user_quest.save()
-        
-        return completed
-    
-    def _calculate_quest_progress(self, user_quest, action_data: Dict) -> float:
-        """Расчет прогресса выполнения задания"""
-        quest = user_quest.quest
-        requirement = quest.requirement
-        
-        if 'target_count' in requirement:
-            current_count = user_quest.progress * requirement['target_count']
-            current_count += action_data.get('count', 1)
-            return min(current_count / requirement['target_count'], 1.0)
-        
-        return 1.0  # По умолчанию считаем выполненным
+        return advance_quests(profile, action_type, action_data.get('count', 1))
     
     def _update_level(self, profile):
         """Обновление уровня пользователя"""
@@ -292,44 +191,24 @@ class GamificationEngine:
         return None
     
     def _update_leaderboard(self, user, points):
-        """Обновление таблицы лидеров"""
-        from .models import Leaderboard
-        
-        try:
-            # Получаем или создаем позицию пользователя
-            leaderboard_entry, created = Leaderboard.objects.get_or_create(
-                user=user,
-                defaults={'points': points, 'position': 0}
-            )
-            
-            if not created:
-                leaderboard_entry.points = points
-                leaderboard_entry.save()
-            
-            # Пересчитываем позиции всех пользователей
-            self._recalculate_leaderboard_positions()
-            
-        except Exception as e:
-            logger.error(f"Error updating leaderboard: {e}")
-    
-    def _recalculate_leaderboard_positions(self):
-        """Пересчет позиций в таблице лидеров"""
-        from .models import Leaderboard
+        """Обновление таблицы лидеров (сортированное множество, O(log n))"""
+        from .leaderboard import get_leaderboard
         
-        # Получаем все записи отсортированные по очкам
-        entries = Leaderboard.objects.all().order_by('-points')
+        def update():
+            try:
+                get_leaderboard().update(user.pk, points)
+            except Exception as e:
+                logger.error(f"Error updating leaderboard: {e}")
         
-        with transaction.atomic():
-            for position, entry in enumerate(entries, start=1):
-                entry.position = position
-                entry.save()
+        # Очки в множестве не должны опережать откатившуюся транзакцию
+        transaction.on_commit(update)
     
     def get_user_progress(self, user):
         """Получение прогресса пользователя"""
-        from .models import UserProfile, UserAchievement, UserQuest
+        from .models import UserProfile, UserAchievement, UserQuest, LevelSystem
+        from .leaderboard import get_leaderboard
         
         profile = self._get_or_create_user_profile(user)
-        profile.update_stats()
         
         achievements = UserAchievement.objects.filter(user=user)
         quests = UserQuest.objects.filter(user=user, quest__is_active=True)
@@ -357,25 +236,22 @@ class GamificationEngine:
             'active_quests': quests.filter(is_completed=False),
             'completed_quests': quests.filter(is_completed=True),
             'leaderboard_position': self._get_leaderboard_position(user),
+            'total_players': get_leaderboard().count(),
             'stats': profile.stats
         }
     
     def _get_leaderboard_position(self, user):
         """Получение позиции пользователя в таблице лидеров"""
-        from .models import Leaderboard
+        from .leaderboard import get_leaderboard
         
-        try:
-            entry = Leaderboard.objects.get(user=user)
-            return entry.position
-        except Leaderboard.DoesNotExist:
-            return None
+        return get_leaderboard().rank(user.pk)
     
     def award_points(self, user, points: int, reason: str):
         """Начисление очков пользователю"""
         try:
-            profile = self._get_or_create_user_profile(user)
-            profile.total_points += points
-            profile.save()
+            from .achievements import add_points
+            
+            add_points(self._get_or_create_user_profile(user), points)
             
             # Логируем начисление очков
             logger.info(f"Awarded {points} points to {user.username} for: {reason}")
@@ -390,56 +266,10 @@ class GamificationEngine:
             return False
     
     def create_daily_quests(self):
-        """Создание ежедневных заданий"""
-        from .models import Quest
-        from datetime import datetime, timedelta
-        
-        daily_quests = [
-            {
-                'name': 'Первое мероприятие дня',
-                'description': 'Зарегистрируйтесь на одно мероприятие сегодня',
-                'quest_type': 'daily',
-                'points_reward': 5,
-                'requirement': {
-                    'action_type': 'event_registration',
-                    'target_count': 1
-                }
-            },
-            {
-                'name': 'Активный исследователь',
-                'description': 'Посетите мероприятия из 2 разных категорий',
-                'quest_type': 'daily',
-                'points_reward': 10,
-                'requirement': {
-                    'action_type': 'category_exploration',
-                    'target_count': 2
-                }
-            },
-            {
-                'name': 'Социальная активность',
-                'description': 'Добавьте 3 мероприятия в избранное',
-                'quest_type': 'daily',
-                'points_reward': 8,
-                'requirement': {
-                    'action_type': 'add_favorite',
-                    'target_count': 3
-                }
-            }
-        ]
-        
-        tomorrow = timezone.now() + timedelta(days=1)
+        """Создание ежедневных заданий текущего поколения"""
+        from .quests import rotate_daily_quests
         
-        for quest_data in daily_quests:
-            Quest.objects.get_or_create(
-                name=quest_data['name'],
-                defaults={
-                    'description': quest_data['description'],
-                    'quest_type': quest_data['quest_type'],
-                    'points_reward': quest_data['points_reward'],
-                    'requirement': quest_data['requirement'],
-                    'expires_at': tomorrow.replace(hour=0, minute=0, second=0, microsecond=0)
-                }
-            )
+        return rotate_daily_quests()
 
 # Глобальный экземпляр движка геймификации
 gamification_engine = GamificationEngine()
\ No newline at end of file
@@ -0,0 +1,257 @@
+"""
+Таблица лидеров на сортированном множестве.
+
+Очки пользователей хранятся в сортированном множестве (Redis ZSET в
+продакшене, InMemorySortedSet в тестах и локальной разработке): обновление,
+место, очки и топ-N - O(log n) без перенумерации всей таблицы.
+Хранилище выбирается настройкой LEADERBOARD_STORE.
+
+Модель Leaderboard - постоянная копия: задача update_leaderboard (каждые
+10 минут) записывает в нее множество bulk-запросами (sync_leaderboard).
+Пустое множество (Redis очищен) сначала восстанавливается из
+UserProfile.total_points; если хранилище недоступно, чтение идет из Leaderboard.
+
+Порядок при равных очках как в Redis: по убыванию ID пользователя как строки.
+"""
+import bisect
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Leaderboard, UserProfile
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_KEY = 'gamification:leaderboard'
+PERSIST_BATCH_SIZE = 1000
+
+
+class InMemorySortedSet:
+    """Сортированное множество в памяти процесса с интерфейсом Redis ZSET"""
+
+    def __init__(self, key=LEADERBOARD_KEY):
+        self.key = key
+        self.scores = {}
+        # (очки, участник) по возрастанию, как хранит Redis
+        self.entries = []
+
+    def zadd(self, mapping):
+        for member, score in mapping.items():
+            member = str(member)
+            self.zrem(member)
+            self.scores[member] = score
+            bisect.insort(self.entries, (score, member))
+
+    def zrem(self, member):
+        member = str(member)
+        score = self.scores.pop(member, None)
+        if score is not None:
+            del self.entries[bisect.bisect_left(self.entries, (score, member))]
+
+    def zscore(self, member):
+        return self.scores.get(str(member))
+
+    def zrevrank(self, member):
+        member = str(member)
+        score = self.scores.get(member)
+        if score is None:
+            return None
+        return len(self.entries) - 1 - bisect.bisect_left(self.entries, (score, member))
+
+    def zrevrange(self, start, end):
+        """Участники с очками по убыванию; end включительно, -1 - до конца"""
+        size = len(self.entries)
+        stop = size if end == -1 else min(end + 1, size)
+        if start >= stop:
+            return []
+        ordered = self.entries[size - stop:size - start]
+        return [(member, score) for score, member in reversed(ordered)]
+
+    def zcard(self):
+        return len(self.entries)
+
+    def zremrangebyscore(self, min_score, max_score):
+        """Удаляет участников с очками в [min_score, max_score]"""
+        start = bisect.bisect_left(self.entries, (min_score, ''))
+        stop = start
+        while stop < len(self.entries) and self.entries[stop][0] <= max_score:
+            del self.scores[self.entries[stop][1]]
+            stop += 1
+        del self.entries[start:stop]
+        return stop - start
+
+    def clear(self):
+        self.scores, self.entries = {}, []
+
+
+class RedisSortedSet:
+    """ZSET в Redis (LEADERBOARD_REDIS_URL)"""
+
+    def __init__(self, key=LEADERBOARD_KEY):
+        import redis
+        self.key = key
+        self.client = redis.Redis.from_url(
+            getattr(settings, 'LEADERBOARD_REDIS_URL', 'redis://127.0.0.1:6379/2'),
+            decode_responses=True,
+        )
+
+    def zadd(self, mapping):
+        if mapping:
+            self.client.zadd(self.key, {str(member): score for member, score in mapping.items()})
+
+    def zrem(self, member):
+        self.client.zrem(self.key, str(member))
+
+    def zscore(self, member):
+        return self.client.zscore(self.key, str(member))
+
+    def zrevrank(self, member):
+        return self.client.zrevrank(self.key, str(member))
+
+    def zrevrange(self, start, end):
+        return self.client.zrevrange(self.key, start, end, withscores=True)
+
+    def zcard(self):
+        return self.client.zcard(self.key)
+
+    def zremrangebyscore(self, min_score, max_score):
+        return self.client.zremrangebyscore(self.key, min_score, max_score)
+
+    def clear(self):
+        self.client.delete(self.key)
+
+
+class LeaderboardService:
+    def __init__(self, store):
+        self.store = store
+
+    def update(self, user_id, points):
+        self.store.zadd({user_id: points})
+
+    def remove(self, user_id):
+        self.store.zrem(user_id)
+
+    def rank(self, user_id):
+        """Место пользователя, начиная с 1; None - нет в таблице"""
+        try:
+            rank = self.store.zrevrank(user_id)
+        except Exception as e:
+            logger.warning(f"Leaderboard store unavailable, reading rank from database: {e}")
+            return Leaderboard.objects.filter(user_id=user_id).values_list('position', flat=True).first()
+        return None if rank is None else rank + 1
+
+    def score(self, user_id):
+        score = self.store.zscore(user_id)
+        return None if score is None else int(score)
+
+    def top(self, limit=10, offset=0):
+        """[(место, ID пользователя, очки)]; limit=None - вся таблица"""
+        try:
+            entries = self.store.zrevrange(offset, -1 if limit is None else offset + limit - 1)
+        except Exception as e:
+            logger.warning(f"Leaderboard store unavailable, reading top from database: {e}")
+            rows = Leaderboard.objects.order_by('position').values_list('position', 'user_id', 'points')
+            return list(rows[offset:None if limit is None else offset + limit])
+        return [
+            (offset + index, int(member), int(score))
+            for index, (member, score) in enumerate(entries, start=1)
+        ]
+
+    def count(self):
+        try:
+            return self.store.zcard()
+        except Exception as e:
+            logger.warning(f"Leaderboard store unavailable, counting in database: {e}")
+            return Leaderboard.objects.count()
+
+    def rebuild(self):
+        """Заполняет множество из UserProfile.total_points; возвращает число участников"""
+        self.store.clear()
+        total = 0
+        batch = {}
+        for user_id, points in UserProfile.objects.values_list('user_id', 'total_points').iterator():
+            batch[user_id] = points
+            if len(batch) >= PERSIST_BATCH_SIZE:
+                self.store.zadd(batch)
+                total += len(batch)
+                batch = {}
+        self.store.zadd(batch)
+        return total + len(batch)
+
+    def persist(self):
+        """Записывает множество в Leaderboard; возвращает число строк"""
+        started = timezone.now()
+        existing = set(get_user_model().objects.values_list('pk', flat=True))
+        rows = [
+            Leaderboard(user_id=int(member), position=position, points=int(score))
+            for position, (member, score) in enumerate(self.store.zrevrange(0, -1), start=1)
+            if int(member) in existing
+        ]
+        with transaction.atomic():
+            Leaderboard.objects.bulk_create(
+                rows,
+                batch_size=PERSIST_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=['position', 'points', 'last_updated'],
+            )
+            # Пользователи, которых больше нет во множестве, не обновились
+            Leaderboard.objects.filter(last_updated__lt=started).delete()
+        return len(rows)
+
+
+_leaderboard = None
+
+
+def get_leaderboard():
+    global _leaderboard
+    if _leaderboard is None:
+        store_class = import_string(
+            getattr(settings, 'LEADERBOARD_STORE', 'events.gamification.leaderboard.RedisSortedSet')
+        )
+        _leaderboard = LeaderboardService(store_class())
+    return _leaderboard
+
+
+@receiver(setting_changed)
+def reset_leaderboard(setting, **kwargs):
+    global _leaderboard
+    if setting in ('LEADERBOARD_STORE', 'LEADERBOARD_REDIS_URL'):
+        _leaderboard = None
+
+
+def sync_leaderboard():
+    """Восстанавливает пустое множество из профилей и сохраняет его в Leaderboard"""
+    service = get_leaderboard()
+    if not service.store.zcard() and UserProfile.objects.exists():
+        service.rebuild()
+    return service.persist()
+
+
+def leaderboard_entries(limit=10, offset=0):
+    """Строки таблицы лидеров для страниц и API: место, пользователь, очки, уровень"""
+    top = get_leaderboard().top(limit, offset)
+    users = get_user_model().objects.select_related('game_profile__current_level').in_bulk(
+        [user_id for _, user_id, _ in top]
+    )
+    entries = []
+    for position, user_id, points in top:
+        user = users.get(user_id)
+        if user is None:
+            continue
+        profile = getattr(user, 'game_profile', None)
+        entries.append({
+            'rank': position,
+            'user_id': user_id,
+            'username': user.username,
+            'points': points,
+            'level': profile.current_level.level if profile and profile.current_level else 1,
+            'avatar': user.avatar.url if user.avatar else None,
+        })
+    return entries
@@ -2,10 +2,10 @@
 # Оставляем пустым или импортируем из основного models.py
 from ..models import (
     Achievement, UserAchievement, LevelSystem, 
-    UserProfile, Leaderboard, Quest, UserQuest
+    UserProfile, Leaderboard, Quest, UserQuest, GamificationEvent
 )
 
 __all__ = [
     'Achievement', 'UserAchievement', 'LevelSystem',
-    'UserProfile', 'Leaderboard', 'Quest', 'UserQuest'
+    'UserProfile', 'Leaderboard', 'Quest', 'UserQuest', 'GamificationEvent'
 ]
\ No newline at end of file
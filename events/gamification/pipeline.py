@@ -0,0 +1,126 @@
+"""
+Асинхронная обработка игровых действий.
+
+Сигналы (events.signals_gamification) только добавляют строку
+GamificationEvent через record_action() и после коммита планируют
+задачу process_gamification_events. Задача ставится с задержкой
+GAMIFICATION_BATCH_DELAY и не чаще одного раза за это время, поэтому
+действия, пришедшие за окно, попадают в одну пачку.
+
+Обработка берет необработанные строки пачками по GAMIFICATION_BATCH_SIZE,
+группирует их по пользователю и для каждого один раз пересчитывает
+статистику, достижения, задания и уровень (handle_user_actions);
+очки в таблице лидеров обновляются после коммита (events.gamification.leaderboard).
+Задача по расписанию (config/celery.py) подбирает строки, если
+запланированная задача потерялась, и удаляет обработанные строки старше
+PROCESSED_RETENTION.
+
+Если обработка пользователя падает, его изменения откатываются, а строки
+остаются необработанными с увеличенным счетчиком attempts: их подберет
+следующий запуск. После MAX_ATTEMPTS неудач строки больше не берутся и
+остаются в журнале для разбора.
+"""
+import logging
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import GamificationEvent
+
+logger = logging.getLogger(__name__)
+
+GAMIFICATION_BATCH_SIZE = 500
+GAMIFICATION_BATCH_DELAY = 10  # секунд
+SCHEDULED_KEY = 'gamification:processing-scheduled'
+# Обработанные строки нужны только для разбора инцидентов
+PROCESSED_RETENTION = timedelta(days=30)
+MAX_ATTEMPTS = 5
+
+# taken - строк взято, processed - обработано успешно, last_id - ID последней взятой строки
+BatchResult = namedtuple('BatchResult', ['taken', 'processed', 'last_id'])
+
+
+def record_action(user_id, action, points=0, **payload):
+    """Добавляет действие в журнал; обработка - после коммита, пачкой"""
+    GamificationEvent.objects.create(user_id=user_id, action=action, points=points, payload=payload)
+    transaction.on_commit(schedule_gamification_processing)
+
+
+def schedule_gamification_processing():
+    from ..processing import _enqueue
+    # Пока задача ждет в очереди, новые действия попадут в ту же пачку
+    try:
+        if not cache.add(SCHEDULED_KEY, True, GAMIFICATION_BATCH_DELAY):
+            return
+    except Exception as e:
+        logger.warning(f"Gamification scheduling lock failed: {e}")
+    _enqueue(
+        'process_gamification_events', (), process_gamification_events,
+        countdown=GAMIFICATION_BATCH_DELAY,
+    )
+
+
+def process_gamification_events(batch_size=GAMIFICATION_BATCH_SIZE):
+    """Обрабатывает все накопившиеся действия; возвращает число обработанных"""
+    try:
+        # Действия, записанные во время обработки, должны запланировать новый запуск
+        cache.delete(SCHEDULED_KEY)
+    except Exception as e:
+        logger.warning(f"Gamification scheduling lock release failed: {e}")
+    total, last_id = 0, 0
+    while True:
+        # Неудачные строки остаются в очереди, поэтому следующая пачка начинается после них
+        result = process_batch(batch_size, after_id=last_id)
+        total += result.processed
+        last_id = result.last_id
+        if result.taken < batch_size:
+            return total
+
+
+def process_batch(batch_size=GAMIFICATION_BATCH_SIZE, after_id=0):
+    from .core import gamification_engine
+
+    with transaction.atomic():
+        # Параллельные обработчики берут разные строки
+        batch = list(
+            GamificationEvent.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS, id__gt=after_id)
+            .order_by('id')[:batch_size]
+        )
+        if not batch:
+            return BatchResult(0, 0, after_id)
+
+        by_user = defaultdict(list)
+        for action in batch:
+            by_user[action.user_id].append(action)
+        users = get_user_model().objects.in_bulk(list(by_user))
+        done, failed = [], []
+        for user_id, actions in by_user.items():
+            ids = [action.pk for action in actions]
+            if user_id not in users:
+                done += ids
+                continue
+            try:
+                with transaction.atomic():
+                    gamification_engine.handle_user_actions(users[user_id], actions)
+            except Exception as e:
+                # Ошибка одного пользователя не должна блокировать очередь
+                logger.error(f"Error processing gamification events for user {user_id}: {e}")
+                failed += ids
+            else:
+                done += ids
+
+        GamificationEvent.objects.filter(pk__in=done).update(processed_at=timezone.now())
+        if failed:
+            GamificationEvent.objects.filter(pk__in=failed).update(attempts=F('attempts') + 1)
+    return BatchResult(len(batch), len(done), batch[-1].pk)
+
+
+def purge_processed_events(retention=PROCESSED_RETENTION):
+    deleted, _ = GamificationEvent.objects.filter(processed_at__lt=timezone.now() - retention).delete()
+    return deleted
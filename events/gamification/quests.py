@@ -0,0 +1,190 @@
+"""
+Прогресс заданий по индексу action_type.
+
+Активные задания индексируются по requirement['action_type']; действие
+трогает только совпавшие задания. Пользователь записывается в задание при
+первом подходящем действии (bulk_create с ignore_conflicts), счетчик
+увеличивается атомарным UPDATE с F(), без чтения и сохранения строк.
+
+Ежедневные задания ротируются по поколению (Quest.generation - дата):
+истекшие задания деактивируются, прогресс по ним архивируется одним
+UPDATE (UserQuest.archived_at), новое поколение создается bulk_create.
+История заданий и прогресса не удаляется каскадом.
+
+Индекс живет в памяти процесса и перестраивается при изменении заданий
+в этом процессе или не реже раза в QUEST_INDEX_TTL.
+"""
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+from threading import Lock
+
+from django.db import transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast, Least
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .achievements import add_points
+from .models import Quest, UserQuest
+
+QUEST_INDEX_TTL = 60  # секунд; после ротации другие процессы увидят новые задания не позже
+
+DAILY_QUESTS = [
+    {
+        'name': 'Первое мероприятие дня',
+        'description': 'Зарегистрируйтесь на одно мероприятие сегодня',
+        'points_reward': 5,
+        'requirement': {'action_type': 'event_registration', 'target_count': 1},
+    },
+    {
+        'name': 'Активный исследователь',
+        'description': 'Посетите мероприятия из 2 разных категорий',
+        'points_reward': 10,
+        'requirement': {'action_type': 'category_exploration', 'target_count': 2},
+    },
+    {
+        'name': 'Социальная активность',
+        'description': 'Добавьте 3 мероприятия в избранное',
+        'points_reward': 8,
+        'requirement': {'action_type': 'add_favorite', 'target_count': 3},
+    },
+]
+
+QuestRotation = namedtuple('QuestRotation', ['generation', 'created', 'expired', 'archived'])
+
+
+def target_count(quest):
+    return max(int(quest.requirement.get('target_count', 1)), 1)
+
+
+class QuestIndex:
+    def __init__(self, quests):
+        self.by_action = defaultdict(list)
+        for quest in quests:
+            action_type = (quest.requirement or {}).get('action_type')
+            if action_type:
+                self.by_action[action_type].append(quest)
+
+    @classmethod
+    def load(cls):
+        return cls(Quest.objects.filter(is_active=True))
+
+    def quests_for(self, action_type, now=None):
+        """Неистекшие задания, засчитывающие действие action_type"""
+        now = now or timezone.now()
+        return [
+            quest for quest in self.by_action.get(action_type, ())
+            if quest.expires_at is None or quest.expires_at > now
+        ]
+
+
+_index = {'index': None, 'loaded': 0.0}
+_index_lock = Lock()
+
+
+def get_quest_index():
+    with _index_lock:
+        if _index['index'] is None or time.monotonic() - _index['loaded'] > QUEST_INDEX_TTL:
+            _index.update(index=QuestIndex.load(), loaded=time.monotonic())
+        return _index['index']
+
+
+@receiver(post_save, sender=Quest)
+@receiver(post_delete, sender=Quest)
+def reset_quest_index(sender=None, **kwargs):
+    with _index_lock:
+        _index.update(index=None, loaded=0.0)
+
+
+def advance_quests(profile, action_type, count=1):
+    """
+    Засчитывает count действий action_type в совпавших заданиях.
+    Награды за выполненные задания добавляются к profile.total_points
+    одним UPDATE (add_points). Возвращает описания выполненных заданий.
+    """
+    quests = get_quest_index().quests_for(action_type)
+    if not quests:
+        return []
+    user_id = profile.user_id
+
+    UserQuest.objects.bulk_create(
+        [UserQuest(user_id=user_id, quest=quest) for quest in quests],
+        ignore_conflicts=True,
+    )
+
+    by_target = defaultdict(list)
+    for quest in quests:
+        by_target[target_count(quest)].append(quest.pk)
+    for target, quest_ids in by_target.items():
+        UserQuest.objects.filter(
+            user_id=user_id, quest_id__in=quest_ids, is_completed=False, archived_at__isnull=True,
+        ).update(
+            current_count=F('current_count') + count,
+            progress=Least(Cast(F('current_count') + count, FloatField()) / target, Value(1.0)),
+        )
+
+    with transaction.atomic():
+        completed_ids = set(
+            UserQuest.objects.select_for_update()
+            .filter(user_id=user_id, quest__in=quests, is_completed=False, progress__gte=1.0)
+            .values_list('quest_id', flat=True)
+        )
+        if not completed_ids:
+            return []
+        UserQuest.objects.filter(user_id=user_id, quest_id__in=completed_ids).update(
+            is_completed=True, completed_at=timezone.now(),
+        )
+
+    completed = [quest for quest in quests if quest.pk in completed_ids]
+    add_points(profile, sum(quest.points_reward for quest in completed))
+    return [
+        {'name': quest.name, 'points': quest.points_reward, 'description': quest.description}
+        for quest in completed
+    ]
+
+
+def archive_expired_quests(now=None):
+    """Деактивирует истекшие задания и архивирует прогресс по ним. Возвращает (заданий, записей)."""
+    now = now or timezone.now()
+    expired = Quest.objects.filter(is_active=True, expires_at__lte=now)
+    with transaction.atomic():
+        expired_ids = list(expired.values_list('pk', flat=True))
+        if not expired_ids:
+            return 0, 0
+        archived = UserQuest.objects.filter(
+            quest_id__in=expired_ids, archived_at__isnull=True,
+        ).update(archived_at=now)
+        Quest.objects.filter(pk__in=expired_ids).update(is_active=False)
+    reset_quest_index()
+    return len(expired_ids), archived
+
+
+def rotate_daily_quests(now=None):
+    """
+    Переход на поколение ежедневных заданий текущего дня: истекшие задания
+    архивируются, задания нового поколения создаются, если их еще нет.
+    Повторный вызов в тот же день ничего не меняет.
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    generation = today.isoformat()
+    expires_at = timezone.make_aware(datetime.combine(today + timedelta(days=1), datetime.min.time()))
+
+    expired, archived = archive_expired_quests(now)
+    created = 0
+    with transaction.atomic():
+        existing = set(
+            Quest.objects.filter(quest_type='daily', generation=generation).values_list('name', flat=True)
+        )
+        new_quests = [
+            Quest(quest_type='daily', generation=generation, expires_at=expires_at, **quest_data)
+            for quest_data in DAILY_QUESTS
+            if quest_data['name'] not in existing
+        ]
+        if new_quests:
+            Quest.objects.bulk_create(new_quests)
+            created = len(new_quests)
+    reset_quest_index()
+    return QuestRotation(generation, created, expired, archived)
@@ -0,0 +1,160 @@
+"""
+Гео-функции для карты мероприятий.
+
+- Event.geohash - geohash координат (индексируемая колонка). Общий префикс
+  означает общую ячейку сетки, поэтому кластеризация маркеров на мелких
+  масштабах - это GROUP BY по префиксу в SQL.
+- Поиск в радиусе: грубый отбор по bounding box (индекс latitude/longitude),
+  затем точное расстояние haversine для оставшихся, векторно через NumPy.
+"""
+import math
+
+from django.db.models import Avg, Count, Min, Q
+from django.db.models.functions import Substr
+
+# NumPy опционален: без него расстояния считаются в цикле
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Ширина ячейки geohash (по долготе, в градусах) для длины префикса 1..9
+GEOHASH_CELL_WIDTH = [360.0 / 2 ** math.ceil(5 * length / 2) for length in range(1, GEOHASH_PRECISION + 1)]
+# С этого масштаба карта показывает отдельные маркеры
+CLUSTER_MAX_ZOOM = 15
+# Максимум отдельных маркеров в ответе API карты
+MAP_MARKERS_LIMIT = 500
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, value = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def parse_bbox(value):
+    """'min_lon,min_lat,max_lon,max_lat' -> кортеж float; ValueError при ошибке"""
+    min_lon, min_lat, max_lon, max_lat = (float(part) for part in value.split(','))
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        raise ValueError(value)
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def filter_bbox(queryset, bbox):
+    """Мероприятия внутри прямоугольника (с переходом через 180-й меридиан)"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    queryset = queryset.filter(latitude__gte=min_lat, latitude__lte=max_lat)
+    if min_lon <= max_lon:
+        return queryset.filter(longitude__gte=min_lon, longitude__lte=max_lon)
+    return queryset.filter(Q(longitude__gte=min_lon) | Q(longitude__lte=max_lon))
+
+
+def radius_bbox(latitude, longitude, radius_km):
+    """Прямоугольник, гарантированно содержащий круг радиуса radius_km"""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(latitude))
+    if cos_lat < 1e-6 or abs(latitude) + lat_delta >= 90:
+        lon_delta = 180.0
+    else:
+        lon_delta = min(180.0, lat_delta / cos_lat)
+    min_lon, max_lon = longitude - lon_delta, longitude + lon_delta
+    if lon_delta >= 180.0:
+        min_lon, max_lon = -180.0, 180.0
+    else:
+        min_lon = (min_lon + 540) % 360 - 180
+        max_lon = (max_lon + 540) % 360 - 180
+    return min_lon, max(-90.0, latitude - lat_delta), max_lon, min(90.0, latitude + lat_delta)
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Расстояния от точки до массива точек (км)"""
+    if NUMPY_AVAILABLE:
+        lat1, lon1 = np.radians(latitude), np.radians(longitude)
+        lat2, lon2 = np.radians(np.asarray(latitudes, dtype=float)), np.radians(np.asarray(longitudes, dtype=float))
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        return (2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))).tolist()
+
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    distances = []
+    for lat, lon in zip(latitudes, longitudes):
+        lat2, lon2 = math.radians(lat), math.radians(lon)
+        a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        distances.append(2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a)))
+    return distances
+
+
+def events_within_radius(queryset, latitude, longitude, radius_km):
+    """
+    Мероприятия не дальше radius_km от точки. Возвращает (queryset, {id: км}).
+    В Python попадают только кандидаты из bounding box, и только 3 колонки.
+    """
+    candidates = filter_bbox(queryset, radius_bbox(latitude, longitude, radius_km))
+    rows = list(candidates.values_list('pk', 'latitude', 'longitude'))
+    if not rows:
+        return queryset.none(), {}
+    ids, latitudes, longitudes = zip(*rows)
+    distances = {
+        pk: distance
+        for pk, distance in zip(ids, haversine_km(latitude, longitude, latitudes, longitudes))
+        if distance <= radius_km
+    }
+    return queryset.filter(pk__in=list(distances)), distances
+
+
+def geohash_precision_for_zoom(zoom):
+    """Длина префикса geohash, при которой ячейка ~ четверти тайла на масштабе zoom"""
+    target = 360.0 / 2 ** zoom / 4
+    for length, width in enumerate(GEOHASH_CELL_WIDTH, start=1):
+        if width <= target:
+            return length
+    return GEOHASH_PRECISION
+
+
+def cluster_events(queryset, zoom):
+    """
+    Кластеры мероприятий: GROUP BY по префиксу geohash.
+    Возвращает список {'geohash', 'count', 'latitude', 'longitude', 'event_id'};
+    event_id заполнен для кластеров из одного мероприятия.
+    """
+    precision = geohash_precision_for_zoom(zoom)
+    rows = (
+        queryset.exclude(geohash='')
+        .order_by()
+        .annotate(cell=Substr('geohash', 1, precision))
+        .values('cell')
+        .annotate(
+            count=Count('pk'),
+            center_latitude=Avg('latitude'),
+            center_longitude=Avg('longitude'),
+            event_id=Min('pk'),
+        )
+    )
+    return [
+        {
+            'geohash': row['cell'],
+            'count': row['count'],
+            'latitude': row['center_latitude'],
+            'longitude': row['center_longitude'],
+            'event_id': row['event_id'] if row['count'] == 1 else None,
+        }
+        for row in rows
+    ]
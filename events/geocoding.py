@@ -0,0 +1,287 @@
+"""
+Общий геокодер для мероприятий, прогноза погоды и update_event_coordinates.
+
+Порядок поиска координат:
+1. таблица крупных городов (CITY_COORDINATES), без запроса к базе;
+2. GeocodeCache - результаты прошлых запросов по нормализованному адресу
+   (ненайденные адреса тоже кешируются и перепроверяются через NEGATIVE_TTL);
+3. внешний провайдер из settings.GEOCODING_PROVIDER с общим ограничением
+   частоты запросов вместо time.sleep(1) перед каждым вызовом.
+
+geocode_many() убирает дубликаты адресов, читает кеш одним запросом и
+опрашивает провайдера из нескольких потоков.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import GeocodeCache
+
+logger = logging.getLogger(__name__)
+
+# geopy опционален: без него работают только кеш и таблица городов
+try:
+    from geopy.geocoders import Nominatim
+    from geopy.exc import GeocoderServiceError, GeocoderTimedOut
+    GEOPY_AVAILABLE = True
+except ImportError:
+    GEOPY_AVAILABLE = False
+
+# Ненайденный адрес запрашивается у провайдера повторно не чаще раза в неделю
+NEGATIVE_TTL = timedelta(days=7)
+
+CITY_COORDINATES = {
+    'москва': (55.7558, 37.6173),
+    'санкт-петербург': (59.9311, 30.3609),
+    'новосибирск': (55.0084, 82.9357),
+    'екатеринбург': (56.8389, 60.6057),
+    'казань': (55.7961, 49.1064),
+    'нижний новгород': (56.3269, 44.0059),
+    'челябинск': (55.1644, 61.4368),
+    'самара': (53.1959, 50.1002),
+    'омск': (54.9924, 73.3686),
+    'ростов-на-дону': (47.2224, 39.7186),
+    'уфа': (54.7351, 55.9587),
+    'красноярск': (56.0153, 92.8932),
+    'пермь': (58.0105, 56.2502),
+    'воронеж': (51.6615, 39.2003),
+    'волгоград': (48.7080, 44.5133),
+}
+
+GeocodeResult = namedtuple('GeocodeResult', ['latitude', 'longitude', 'display_name', 'source'])
+
+
+def normalize_address(address):
+    """'  Москва,  ул. Ленина 1, Россия ' -> 'москва, ул. ленина 1'"""
+    address = re.sub(r'\s+', ' ', str(address or '')).strip().lower().replace('ё', 'е')
+    address = re.sub(r'\s*,\s*', ', ', address).strip(' ,')
+    return re.sub(r'(, )?(россия|russia)$', '', address).strip(' ,')
+
+
+def address_key(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def city_coordinates(address, exact=False):
+    """
+    Координаты города из таблицы. exact=True - только если адрес и есть
+    название города: центр города не подходит как точка мероприятия.
+    """
+    normalized = normalize_address(address)
+    if exact:
+        coords = CITY_COORDINATES.get(normalized)
+        return GeocodeResult(*coords, normalized, 'cities') if coords else None
+    for city, coords in CITY_COORDINATES.items():
+        if city in normalized:
+            return GeocodeResult(*coords, city, 'cities')
+    return None
+
+
+class RateLimiter:
+    """Не чаще одного вызова в min_interval секунд для всех потоков процесса"""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_call = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_call - now
+            self._next_call = max(now, self._next_call) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class GeocodingError(Exception):
+    pass
+
+
+class BaseGeocodingProvider:
+    name = 'base'
+    # Минимальный интервал между запросами, секунды
+    min_interval = 0
+
+    def geocode(self, address):
+        """GeocodeResult или None; сетевые ошибки - исключение"""
+        raise NotImplementedError
+
+
+class NominatimProvider(BaseGeocodingProvider):
+    """OpenStreetMap Nominatim: по правилам сервиса не больше 1 запроса в секунду"""
+    name = 'nominatim'
+    min_interval = 1.0
+
+    def __init__(self):
+        self.geolocator = Nominatim(user_agent="eventhub_app") if GEOPY_AVAILABLE else None
+
+    def geocode(self, address):
+        if self.geolocator is None:
+            logger.warning("Geopy not available. Cannot geocode location.")
+            return None
+        try:
+            location = self.geolocator.geocode(
+                f"{address}, Россия", country_codes='ru', language='ru', timeout=10,
+            )
+        except (GeocoderTimedOut, GeocoderServiceError) as e:
+            raise GeocodingError(str(e)) from e
+        if not location:
+            return None
+        return GeocodeResult(location.latitude, location.longitude, location.address, self.name)
+
+
+class StubGeocodingProvider(BaseGeocodingProvider):
+    """Локальный провайдер для тестов и разработки без сети"""
+    name = 'stub'
+    # Нормализованный адрес -> (широта, долгота)
+    addresses = {}
+
+    def __init__(self):
+        self.calls = []
+
+    def geocode(self, address):
+        self.calls.append(address)
+        coords = self.addresses.get(normalize_address(address))
+        return GeocodeResult(*coords, address, self.name) if coords else None
+
+
+class Geocoder:
+    def __init__(self, provider):
+        self.provider = provider
+        self.rate_limiter = RateLimiter(provider.min_interval)
+
+    def _lookup_provider(self, address):
+        """Запрос к провайдеру; None при ошибке (результат не кешируется)"""
+        self.rate_limiter.wait()
+        try:
+            return self.provider.geocode(address), True
+        except Exception as e:
+            logger.error(f"Ошибка геокодирования для {address}: {e}")
+            return None, False
+
+    @staticmethod
+    def _from_cache(entry):
+        if entry.is_found:
+            return GeocodeResult(entry.latitude, entry.longitude, entry.display_name, 'cache')
+        if entry.updated_at >= timezone.now() - NEGATIVE_TTL:
+            return None
+        return False  # устаревший "не найдено" - спросить провайдера снова
+
+    @staticmethod
+    def _store(results):
+        """Сохраняет {нормализованный адрес: результат} одним INSERT ... ON CONFLICT"""
+        GeocodeCache.objects.bulk_create(
+            [
+                GeocodeCache(
+                    key=address_key(normalized),
+                    address=normalized,
+                    latitude=result.latitude if result else None,
+                    longitude=result.longitude if result else None,
+                    display_name=result.display_name if result else '',
+                    source=result.source if result else '',
+                )
+                for normalized, result in results.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['key'],
+            update_fields=['latitude', 'longitude', 'display_name', 'source', 'updated_at'],
+        )
+
+    def geocode(self, address, precision='address'):
+        """
+        Координаты адреса. precision='city' (прогноз погоды) разрешает
+        ответ по названию города внутри адреса.
+        """
+        normalized = normalize_address(address)
+        if not normalized:
+            return None
+
+        city = city_coordinates(normalized, exact=precision != 'city')
+        if city:
+            return city
+
+        entry = GeocodeCache.objects.filter(key=address_key(normalized)).first()
+        if entry is not None:
+            cached = self._from_cache(entry)
+            if cached is not False:
+                return cached
+
+        result, ok = self._lookup_provider(normalized)
+        if ok:
+            self._store({normalized: result})
+        return result
+
+    def geocode_many(self, addresses, workers=4):
+        """
+        {исходный адрес: GeocodeResult | None}. Одинаковые адреса запрашиваются
+        один раз; кеш читается одним запросом; провайдер - в workers потоков.
+        """
+        by_normalized = {}
+        for address in addresses:
+            normalized = normalize_address(address)
+            if normalized:
+                by_normalized.setdefault(normalized, []).append(address)
+
+        # Таблица городов раньше кеша, как в geocode()
+        results = {}
+        for normalized in by_normalized:
+            city = city_coordinates(normalized, exact=True)
+            if city:
+                results[normalized] = city
+
+        keys = {address_key(normalized): normalized for normalized in by_normalized if normalized not in results}
+        if keys:
+            for entry in GeocodeCache.objects.filter(key__in=list(keys)):
+                cached = self._from_cache(entry)
+                if cached is not False:
+                    results[keys[entry.key]] = cached
+
+        pending = [normalized for normalized in by_normalized if normalized not in results]
+
+        if pending:
+            # В потоках только сетевые запросы; запись в базу - в текущем потоке
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                lookups = list(executor.map(self._lookup_provider, pending))
+            found = {}
+            for normalized, (result, ok) in zip(pending, lookups):
+                results[normalized] = result
+                if ok:
+                    found[normalized] = result
+            if found:
+                self._store(found)
+
+        return {
+            address: results.get(normalized)
+            for normalized, originals in by_normalized.items()
+            for address in originals
+        }
+
+
+_geocoder = None
+
+
+def get_geocoder():
+    global _geocoder
+    if _geocoder is None:
+        provider_class = import_string(getattr(settings, 'GEOCODING_PROVIDER', 'events.geocoding.NominatimProvider'))
+        _geocoder = Geocoder(provider_class())
+    return _geocoder
+
+
+@receiver(setting_changed)
+def reset_geocoder(setting, **kwargs):
+    global _geocoder
+    if setting == 'GEOCODING_PROVIDER':
+        _geocoder = None
@@ -0,0 +1,67 @@
+import os
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from events.models import ExternalEventSource
+from events.parsers import PARSER_MAPPING
+
+# BeautifulSoup опционален: нужен только для сравнения с прежним разбором
+try:
+    from bs4 import BeautifulSoup
+    BS4_AVAILABLE = True
+except ImportError:
+    BS4_AVAILABLE = False
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'fixtures', 'parsers')
+
+
+def measure(func, repeat):
+    """(среднее время, пиковая память) вызова func"""
+    tracemalloc.start()
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return result, (time.perf_counter() - started) / repeat, peak
+
+
+class Command(BaseCommand):
+    help = 'Замеряет скорость и память парсеров на сохраненных страницах events/fixtures/parsers/<домен>.html'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Число повторов для усреднения')
+
+    def handle(self, *args, **options):
+        repeat = max(1, options['repeat'])
+        for domain, parser_class in PARSER_MAPPING.items():
+            path = os.path.join(FIXTURES_DIR, f'{domain}.html')
+            if not os.path.exists(path):
+                self.stdout.write(self.style.WARNING(f"{domain}: нет страницы {path}"))
+                continue
+            with open(path, 'rb') as f:
+                content = f.read()
+
+            parser = parser_class(ExternalEventSource(name=domain, url=f'https://{domain}/'))
+            items, seconds, peak = measure(lambda: parser.parse_content(content), repeat)
+            ids_are_stable = [item['external_id'] for item in items] == [
+                item['external_id'] for item in parser.parse_content(content)
+            ]
+            line = (
+                f"{domain}: {len(items)} мероприятий, {seconds * 1000:.1f} мс, "
+                f"пик памяти {peak / 1024:.0f} КБ, ID стабильны: {'да' if ids_are_stable else 'нет'}"
+            )
+
+            if BS4_AVAILABLE:
+                classes = parser_class.card_classes
+                _, bs4_seconds, bs4_peak = measure(
+                    lambda: BeautifulSoup(content, 'html.parser').find_all(
+                        'div', class_=lambda x: x and any(cls in x for cls in classes)
+                    ),
+                    repeat,
+                )
+                line += f" (BeautifulSoup: {bs4_seconds * 1000:.1f} мс, {bs4_peak / 1024:.0f} КБ)"
+
+            self.stdout.write(self.style.SUCCESS(f"✅ {line}"))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from events.realtime_benchmark import run_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Открывает N WebSocket-соединений к потребителям events/consumers.py, проводит раунды регистраций, '
+        'уведомлений и тиков аналитики и выводит задержку доставки, сообщения в секунду, SQL и память'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=300, help='Число соединений (делятся на три маршрута)')
+        parser.add_argument('--rounds', type=int, default=5, help='Число раундов')
+        parser.add_argument(
+            '--configured-layer', action='store_true',
+            help='Использовать слой каналов, кеш и хранилища из настроек вместо памяти процесса',
+        )
+
+    def handle(self, *args, **options):
+        report = run_benchmark(
+            connections=options['connections'], rounds=options['rounds'],
+            configured_layer=options['configured_layer'],
+        )
+        self.stdout.write(
+            f"Задержка доставки: p50 {report.latency_p50 * 1000:.1f} мс, "
+            f"p95 {report.latency_p95 * 1000:.1f} мс, max {report.latency_max * 1000:.1f} мс"
+        )
+        self.stdout.write(
+            f"SQL: {report.queries_per_tick:.1f} на тик аналитики, {report.queries_per_round:.1f} на раунд"
+        )
+        self.stdout.write(f"Память: {report.memory_per_connection / 1024:.1f} КБ на соединение")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {report.connections} соединений, {report.rounds} раундов: "
+            f"{report.messages} сообщений, {report.messages_per_second:.0f} сообщ./с"
+        ))
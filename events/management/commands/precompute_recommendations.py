@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from events.recommendation_cache import ACTIVE_USER_DAYS, precompute_recommendations, recommendation_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Заполняет кеш рекомендаций для недавно заходивших пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=ACTIVE_USER_DAYS, help='Пользователи, заходившие за N дней')
+
+    def handle(self, *args, **options):
+        users = precompute_recommendations(days=options['days'])
+        stats = recommendation_cache_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Рекомендации рассчитаны для {users} пользователей "
+            f"(кеш: {stats['hits']} попаданий, {stats['misses']} промахов, {stats['hit_rate']:.0%})"
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from events.gamification.pipeline import (
+    GAMIFICATION_BATCH_SIZE, process_gamification_events, purge_processed_events,
+)
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает накопившиеся игровые действия (GamificationEvent)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=GAMIFICATION_BATCH_SIZE)
+        parser.add_argument('--purge', action='store_true', help='Удалить старые обработанные действия')
+
+    def handle(self, *args, **options):
+        processed = process_gamification_events(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"✅ Обработано игровых действий: {processed}"))
+        if options['purge']:
+            deleted = purge_processed_events()
+            self.stdout.write(self.style.SUCCESS(f"✅ Удалено старых действий: {deleted}"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from events.models import Event, EventStatistic
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики EventStatistic (регистрации, избранное, отзывы) по данным в базе'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event',
+            type=int,
+            action='append',
+            dest='event_ids',
+            help='ID мероприятия (можно указать несколько раз)',
+        )
+
+    def handle(self, *args, **options):
+        events = Event.objects.all()
+        if options['event_ids']:
+            events = events.filter(pk__in=options['event_ids'])
+
+        self.stdout.write(f"Пересчет счетчиков для {events.count()} мероприятий...")
+        rebuilt = EventStatistic.rebuild(events)
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Счетчики пересчитаны: {rebuilt} мероприятий")
+        )
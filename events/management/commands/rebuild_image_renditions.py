@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from events.renditions import RENDITION_FIELDS, generate_renditions
+
+
+class Command(BaseCommand):
+    help = 'Создает недостающие копии изображений (WebP/JPEG) для мероприятий, рекламы и превью видео'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Пересоздать все копии')
+
+    def handle(self, *args, **options):
+        created = failed = 0
+        for model, field_name in RENDITION_FIELDS.items():
+            queryset = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            for instance in queryset.iterator():
+                try:
+                    if generate_renditions(instance, field_name, force=options['force']):
+                        created += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"{model.__name__} {instance.pk}: {e}")
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Копии изображений созданы для {created} объектов, ошибок: {failed}")
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from events.gamification.leaderboard import get_leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Заполняет таблицу лидеров из игровых профилей и сохраняет ее в Leaderboard'
+
+    def handle(self, *args, **options):
+        leaderboard = get_leaderboard()
+        players = leaderboard.rebuild()
+        leaderboard.persist()
+        self.stdout.write(self.style.SUCCESS(f"✅ Таблица лидеров перестроена: {players} участников"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from events.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс мероприятий'
+
+    def handle(self, *args, **options):
+        indexed = get_search_backend().rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Индекс поиска перестроен: {indexed} мероприятий")
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from events.similarity import SIMILARITY_TOP_K, rebuild_similarity_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает индекс похожих мероприятий (top-K соседей по TF-IDF)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=SIMILARITY_TOP_K, help='Число соседей у мероприятия')
+
+    def handle(self, *args, **options):
+        indexed = rebuild_similarity_index(top_k=max(1, options['top_k']))
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Индекс похожих мероприятий перестроен: {indexed} мероприятий")
+        )
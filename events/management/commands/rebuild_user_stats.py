@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from events.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики статистики игровых профилей по данным в базе'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='ID пользователя (можно указать несколько раз)',
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.all()
+        if options['user_ids']:
+            users = users.filter(pk__in=options['user_ids'])
+
+        self.stdout.write(f"Пересчет статистики для {users.count()} пользователей...")
+        rebuilt = UserProfile.rebuild(users)
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Статистика пересчитана: {rebuilt} профилей")
+        )
@@ -1,18 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from events.models import ExternalEventSource, ExternalEvent
-from events.parsers import get_parser
-import sys
-import os
-
-sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-
-try:
-    from events.parsers import get_parser
-except ImportError as e:
-    print(f"Import error: {e}")
-    print("Current Python path:", sys.path)
-    raise
+from events.sync import SYNC_WORKERS, sync_sources
 
 import logging
 
@@ -25,6 +14,8 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('--source', type=str, help='ID источника для синхронизации')
         parser.add_argument('--archive-old', action='store_true', help='Архивировать старые мероприятия')
+        parser.add_argument('--workers', type=int, default=SYNC_WORKERS, help='Число параллельных загрузок')
+        parser.add_argument('--force', action='store_true', help='Загрузить и разобрать страницы без проверки ETag и хеша')
     
     def handle(self, *args, **options):
         # Архивация старых мероприятий
@@ -36,58 +27,34 @@ class Command(BaseCommand):
         if options['source']:
             sources = sources.filter(id=options['source'])
         
-        for source in sources:
-            self.sync_source(source)
-    
-    def sync_source(self, source):
-        """Синхронизирует мероприятия из одного источника"""
-        self.stdout.write(f"Синхронизация {source.name}...")
+        results = sync_sources(sources, workers=options['workers'], force=options['force'])
+        for result in results:
+            self.report(result)
         
-        try:
-            parser = get_parser(source)
-            events_data = parser.parse_events()
-            
-            created_count = 0
-            updated_count = 0
-            
-            for event_data in events_data:
-                if not event_data:
-                    continue
-
-
-                external_id = event_data['external_id']
-                
-                # Проверяем, существует ли уже такое мероприятие
-                event, created = ExternalEvent.objects.get_or_create(
-                    source=source,
-                    external_id=external_id,
-                    defaults=event_data
-                )
-                
-                if not created:
-                    # Обновляем существующее мероприятие
-                    for key, value in event_data.items():
-                        if key != 'external_id':
-                            setattr(event, key, value)
-                    event.save()
-                    updated_count += 1
-                else:
-                    created_count += 1
-            
-            source.last_sync = timezone.now()
-            source.save()
-            
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Источников: {len(results)}, создано {sum(r.created for r in results)}, "
+                f"обновлено {sum(r.updated for r in results)}"
+            )
+        )
+    
+    def report(self, result):
+        timing = f"загрузка {result.fetch_time:.2f}с, всего {result.total_time:.2f}с"
+        name = result.source.name
+        if result.status == 'error':
+            self.stdout.write(self.style.ERROR(f"Ошибка синхронизации {name}: {result.error} ({timing})"))
+        elif result.status == 'not_modified':
+            self.stdout.write(f"{name}: не изменился (304), {timing}")
+        elif result.status == 'unchanged':
+            self.stdout.write(f"{name}: содержимое не изменилось, {timing}")
+        elif result.status == 'unsupported':
+            self.stdout.write(self.style.WARNING(f"{name}: нет парсера для {result.source.url}"))
+        else:
             self.stdout.write(
                 self.style.SUCCESS(
-                    f"{source.name}: создано {created_count}, обновлено {updated_count}"
+                    f"{name}: создано {result.created}, обновлено {result.updated}, {timing}"
                 )
             )
-            
-        except Exception as e:
-            logger.error(f"Error syncing {source.name}: {e}")
-            self.stdout.write(
-                self.style.ERROR(f"Ошибка синхронизации {source.name}: {e}")
-            )
     
     def archive_old_events(self):
         """Архивирует мероприятия, которые уже прошли"""
@@ -101,4 +68,4 @@ class Command(BaseCommand):
         
         self.stdout.write(
             self.style.SUCCESS(f"Заархивировано {count} старых мероприятий")
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from events.collaborative import FACTORS, ITERATIONS, model_path, train_collaborative_model
+
+
+class Command(BaseCommand):
+    help = 'Обучает факторы коллаборативной фильтрации по избранному, регистрациям и отзывам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--factors', type=int, default=FACTORS, help='Размерность факторов')
+        parser.add_argument('--iterations', type=int, default=ITERATIONS, help='Число итераций ALS')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        model = train_collaborative_model(
+            factors=max(1, options['factors']),
+            iterations=max(1, options['iterations']),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Модель обучена за {time.monotonic() - started:.1f} с: "
+            f"{len(model.user_ids)} пользователей, {len(model.item_ids)} мероприятий, "
+            f"{model.seen.nnz} взаимодействий → {model_path()}"
+        ))
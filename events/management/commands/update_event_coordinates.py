@@ -1,4 +1,6 @@
 from django.core.management.base import BaseCommand
+from events.geo import geohash_encode
+from events.geocoding import get_geocoder
 from events.models import Event
 from django.db.models import Q
 
@@ -17,18 +19,14 @@ class Command(BaseCommand):
             default=50,
             help='Размер батча для обработки',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Число параллельных запросов к геокодеру',
+        )
     
     def handle(self, *args, **options):
-        # Проверяем доступность geopy
-        try:
-            from geopy.geocoders import Nominatim
-            geopy_available = True
-        except ImportError:
-            self.stdout.write(
-                self.style.ERROR('Geopy не установлен. Установите: pip install geopy')
-            )
-            return
-        
         if options['force']:
             events = Event.objects.filter(is_active=True)
             self.stdout.write(f"Обновление координат для всех {events.count()} мероприятий...")
@@ -39,37 +37,42 @@ class Command(BaseCommand):
             )
             self.stdout.write(f"Обновление координат для {events.count()} мероприятий без координат...")
         
+        events = list(events.exclude(location='').only('id', 'title', 'location', 'latitude', 'longitude'))
+        geocoder = get_geocoder()
         updated_count = 0
         batch_size = options['batch_size']
         
-        for i in range(0, events.count(), batch_size):
+        for i in range(0, len(events), batch_size):
             batch = events[i:i + batch_size]
+            # Одинаковые адреса батча геокодируются один раз
+            results = geocoder.geocode_many([event.location for event in batch], workers=options['workers'])
             
+            changed = []
             for event in batch:
-                old_lat = event.latitude
-                old_lon = event.longitude
-                
-                event.geocode_location()
-                
-                if event.latitude != old_lat or event.longitude != old_lon:
-                    event.save()
-                    updated_count += 1
+                result = results.get(event.location)
+                if result and (result.latitude, result.longitude) != (event.latitude, event.longitude):
+                    event.latitude, event.longitude = result.latitude, result.longitude
+                    event.geohash = geohash_encode(event.latitude, event.longitude)
+                    changed.append(event)
                     self.stdout.write(
                         self.style.SUCCESS(
                             f"✅ {event.title}: {event.latitude}, {event.longitude}"
                         )
                     )
-                else:
+                elif not result:
                     self.stdout.write(
                         self.style.WARNING(
-                            f"⚠️  {event.title}: координаты не изменились"
+                            f"⚠️  {event.title}: не удалось определить координаты"
                         )
                     )
             
-            self.stdout.write(f"Обработано {min(i + batch_size, events.count())} из {events.count()}")
+            # update без save(): повторная фоновая обработка не нужна
+            Event.objects.bulk_update(changed, ['latitude', 'longitude', 'geohash'])
+            updated_count += len(changed)
+            self.stdout.write(f"Обработано {min(i + batch_size, len(events))} из {len(events)}")
         
         self.stdout.write(
             self.style.SUCCESS(
-                f"✅ Обновлено {updated_count} мероприятий из {events.count()}"
+                f"✅ Обновлено {updated_count} мероприятий из {len(events)}"
             )
-        )
\ No newline at end of file
+        )
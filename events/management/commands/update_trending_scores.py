@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from events.trending import compute_trending_scores
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинг мероприятий «в тренде» (TrendingScore)'
+
+    def handle(self, *args, **options):
+        trending = compute_trending_scores()
+        self.stdout.write(self.style.SUCCESS(f"✅ Рейтинг «в тренде» пересчитан: {trending} мероприятий с активностью"))
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:13
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_counters(apps, schema_editor):
+    """Первичное заполнение счетчиков по существующим данным"""
+    Event = apps.get_model('events', 'Event')
+    EventStatistic = apps.get_model('events', 'EventStatistic')
+    Registration = apps.get_model('events', 'Registration')
+    Favorite = apps.get_model('events', 'Favorite')
+    Review = apps.get_model('events', 'Review')
+
+    def grouped(queryset, **aggregates):
+        rows = queryset.order_by().values('event_id').annotate(**aggregates)
+        return {row.pop('event_id'): row for row in rows}
+
+    sources = [
+        grouped(Registration.objects.filter(status='confirmed'), registrations_count=Count('pk')),
+        grouped(Favorite.objects.all(), favorites_count=Count('pk')),
+        grouped(Review.objects.all(), reviews_count=Count('pk'), rating_sum=Sum('rating')),
+    ]
+    fields = ['registrations_count', 'favorites_count', 'reviews_count', 'rating_sum']
+    existing = {stat.event_id: stat for stat in EventStatistic.objects.all()}
+    to_create, to_update = [], []
+    for event_id in Event.objects.values_list('pk', flat=True):
+        stat = existing.get(event_id) or EventStatistic(event_id=event_id)
+        values = dict.fromkeys(fields, 0)
+        for source in sources:
+            values.update(source.get(event_id, {}))
+        for field, value in values.items():
+            setattr(stat, field, value or 0)
+        (to_update if stat.pk else to_create).append(stat)
+    EventStatistic.objects.bulk_create(to_create, batch_size=500)
+    EventStatistic.objects.bulk_update(to_update, fields, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0014_projectpromovideo_alter_event_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventstatistic',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='eventstatistic',
+            name='reviews_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def install_search_index(apps, schema_editor):
+    from events.search import get_search_backend
+
+    backend = get_search_backend(schema_editor.connection.vendor)
+    backend.install(schema_editor)
+    Event = apps.get_model('events', 'Event')
+    backend.rebuild(Event.objects.using(schema_editor.connection.alias))
+
+
+def uninstall_search_index(apps, schema_editor):
+    from events.search import get_search_backend
+
+    get_search_backend(schema_editor.connection.vendor).uninstall(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0015_eventstatistic_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
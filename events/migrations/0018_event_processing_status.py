@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0017_event_geohash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Ожидает обработки'), ('processing', 'Обрабатывается'), ('ready', 'Готово'), ('failed', 'Ошибка обработки')], default='ready', editable=False, max_length=20, verbose_name='Статус обработки'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:35
+
+import django.db.models.deletion
+import events.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('events', '0018_event_processing_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('field_name', models.CharField(max_length=50, verbose_name='Поле изображения')),
+                ('source', models.CharField(max_length=255, verbose_name='Оригинал')),
+                ('preset', models.CharField(choices=[('map', 'Всплывающее окно карты'), ('card', 'Карточка'), ('detail', 'Страница мероприятия')], max_length=10, verbose_name='Размер')),
+                ('format', models.CharField(choices=[('avif', 'AVIF'), ('webp', 'WebP'), ('jpeg', 'JPEG')], max_length=10, verbose_name='Формат')),
+                ('file', models.ImageField(max_length=255, upload_to=events.models.rendition_upload_to, verbose_name='Файл')),
+                ('width', models.PositiveIntegerField(verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(verbose_name='Высота')),
+                ('size_bytes', models.PositiveIntegerField(verbose_name='Размер файла, байт')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Копия изображения',
+                'verbose_name_plural': 'Копии изображений',
+                'indexes': [models.Index(fields=['content_type', 'object_id'], name='rendition_object_idx')],
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'object_id', 'field_name', 'preset', 'format'), name='unique_image_rendition')],
+            },
+        ),
+    ]
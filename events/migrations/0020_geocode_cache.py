@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0019_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=40, unique=True, verbose_name='Ключ адреса')),
+                ('address', models.TextField(verbose_name='Адрес')),
+                ('latitude', models.FloatField(blank=True, null=True, verbose_name='Широта')),
+                ('longitude', models.FloatField(blank=True, null=True, verbose_name='Долгота')),
+                ('display_name', models.TextField(blank=True, verbose_name='Найденный адрес')),
+                ('source', models.CharField(max_length=50, verbose_name='Источник')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Кеш геокодирования',
+                'verbose_name_plural': 'Кеш геокодирования',
+            },
+        ),
+    ]
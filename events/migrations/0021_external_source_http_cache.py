@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0020_geocode_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='externaleventsource',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Хеш содержимого'),
+        ),
+        migrations.AddField(
+            model_name='externaleventsource',
+            name='etag',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='ETag'),
+        ),
+        migrations.AddField(
+            model_name='externaleventsource',
+            name='last_modified',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Last-Modified'),
+        ),
+    ]
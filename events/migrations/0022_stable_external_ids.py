@@ -0,0 +1,65 @@
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.db import migrations
+
+# Старые ID: '<префикс>_<hash()>', hash() отличался в каждом процессе
+LEGACY_ID = re.compile(r'^(?P<prefix>[a-z]+)_-?\d+$')
+
+
+# canonical_url и stable_external_id скопированы из events.parsers на момент
+# миграции: изменения парсеров не должны менять уже выданные ID
+def canonical_url(url):
+    """Схема и хост в нижнем регистре, без фрагмента, utm-меток и завершающего '/'"""
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.startswith('utm_')
+    ))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/') or '/', query, ''))
+
+
+def stable_external_id(prefix, url=None, *fields):
+    """'<prefix>_<sha1>' от URL мероприятия или, без URL, от нормализованных полей"""
+    if url:
+        key = canonical_url(url)
+    else:
+        key = '|'.join(re.sub(r'\s+', ' ', str(field or '')).strip().lower() for field in fields)
+    return f"{prefix}_{hashlib.sha1(key.encode()).hexdigest()}"
+
+
+def stabilize_external_ids(apps, schema_editor):
+    """Пересчитывает ID и удаляет дубликаты, оставляя последнюю версию мероприятия"""
+    ExternalEvent = apps.get_model('events', 'ExternalEvent')
+    rows = ExternalEvent.objects.select_related('source').order_by('-updated_at', '-pk')
+    keep, duplicates = {}, []
+    for row in rows.iterator():
+        match = LEGACY_ID.match(row.external_id)
+        if not match:
+            continue
+        url = row.external_url
+        if url and canonical_url(url) != canonical_url(row.source.url):
+            new_id = stable_external_id(match['prefix'], url)
+        else:
+            new_id = stable_external_id(match['prefix'], None, row.title)
+        key = (row.source_id, new_id)
+        if key in keep:
+            duplicates.append(row.pk)
+        else:
+            keep[key] = row
+
+    ExternalEvent.objects.filter(pk__in=duplicates).delete()
+    for (source_id, new_id), row in keep.items():
+        ExternalEvent.objects.filter(pk=row.pk).update(external_id=new_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0021_external_source_http_cache'),
+    ]
+
+    operations = [
+        migrations.RunPython(stabilize_external_ids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0022_stable_external_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Косинусное сходство')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='events.event')),
+                ('similar_event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='events.event')),
+            ],
+            options={
+                'verbose_name': 'Похожее мероприятие',
+                'verbose_name_plural': 'Похожие мероприятия',
+                'indexes': [models.Index(fields=['event', '-score'], name='event_similarity_rank_idx')],
+                'constraints': [models.UniqueConstraint(fields=('event', 'similar_event'), name='unique_event_similarity')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0023_event_similarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='events.event')),
+                ('score', models.FloatField(db_index=True, default=0, verbose_name='Оценка')),
+                ('registrations', models.PositiveIntegerField(default=0, verbose_name='Регистрации за окно')),
+                ('favorites', models.PositiveIntegerField(default=0, verbose_name='Избранное за окно')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Просмотры с прошлого пересчета')),
+                ('views_total', models.PositiveIntegerField(default=0, verbose_name='Просмотры на момент пересчета')),
+                ('computed_at', models.DateTimeField(verbose_name='Пересчитано')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг популярности',
+                'verbose_name_plural': 'Рейтинги популярности',
+            },
+        ),
+    ]
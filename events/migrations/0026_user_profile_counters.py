@@ -0,0 +1,94 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:21
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def fill_counters(apps, schema_editor):
+    """Первичное заполнение счетчиков профилей вместо удаленного поля stats (как UserProfile.rebuild)"""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserProfile = apps.get_model('events', 'UserProfile')
+    Event = apps.get_model('events', 'Event')
+    Registration = apps.get_model('events', 'Registration')
+    Review = apps.get_model('events', 'Review')
+    Favorite = apps.get_model('events', 'Favorite')
+
+    def grouped(queryset, user_field='user_id', **aggregate):
+        rows = queryset.order_by().values(user_field).annotate(**aggregate)
+        (field, _), = aggregate.items()
+        return {row[user_field]: row[field] for row in rows}
+
+    since = timezone.now() - timedelta(days=30)
+    values = {
+        'events_created': grouped(Event.objects.all(), 'organizer_id', events_created=Count('pk')),
+        'events_attended': grouped(Registration.objects.all(), events_attended=Count('pk')),
+        'reviews_written': grouped(Review.objects.all(), reviews_written=Count('pk')),
+        'favorites_added': grouped(Favorite.objects.all(), favorites_added=Count('pk')),
+        'days_active': grouped(
+            Registration.objects.filter(registration_date__gte=since),
+            days_active=Count(TruncDate('registration_date'), distinct=True),
+        ),
+        'categories_explored': grouped(
+            Registration.objects.filter(event__category__isnull=False),
+            categories_explored=Count('event__category', distinct=True),
+        ),
+    }
+    existing = {profile.user_id: profile for profile in UserProfile.objects.all()}
+    to_create, to_update = [], []
+    for user_id in User.objects.values_list('pk', flat=True):
+        profile = existing.get(user_id) or UserProfile(user_id=user_id)
+        for field, counts in values.items():
+            setattr(profile, field, counts.get(user_id, 0))
+        (to_update if profile.pk else to_create).append(profile)
+    UserProfile.objects.bulk_create(to_create, batch_size=500)
+    UserProfile.objects.bulk_update(to_update, list(values), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0025_gamification_event'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='stats',
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='categories_explored',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='days_active',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='events_attended',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='events_created',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='favorites_added',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='reviews_written',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:36
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Round
+
+
+def fill_current_count(apps, schema_editor):
+    """Счетчик выполненных действий по уже накопленной доле progress"""
+    Quest = apps.get_model('events', 'Quest')
+    UserQuest = apps.get_model('events', 'UserQuest')
+    by_target = defaultdict(list)
+    for quest in Quest.objects.only('pk', 'requirement'):
+        by_target[max(int(quest.requirement.get('target_count', 1)), 1)].append(quest.pk)
+    for target, quest_ids in by_target.items():
+        UserQuest.objects.filter(quest_id__in=quest_ids, progress__gt=0).update(
+            current_count=Round(F('progress') * target),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0026_user_profile_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quest',
+            name='generation',
+            field=models.CharField(blank=True, db_index=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='userquest',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userquest',
+            name='current_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_current_count, migrations.RunPython.noop),
+    ]
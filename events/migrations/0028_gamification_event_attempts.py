@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 23:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0027_quest_generations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamificationevent',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
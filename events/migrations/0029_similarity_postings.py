@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-17 23:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0028_gamification_event_attempts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityTerm',
+            fields=[
+                ('term', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('df', models.PositiveIntegerField(default=0, verbose_name='Мероприятий с термом')),
+            ],
+            options={
+                'verbose_name': 'Терм индекса похожих',
+                'verbose_name_plural': 'Термы индекса похожих',
+            },
+        ),
+        migrations.CreateModel(
+            name='EventTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.FloatField(default=0)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='events.event')),
+            ],
+            options={
+                'verbose_name': 'Терм мероприятия',
+                'verbose_name_plural': 'Термы мероприятий',
+                'indexes': [models.Index(fields=['term'], name='event_term_postings_idx')],
+                'constraints': [models.UniqueConstraint(fields=('event', 'term'), name='unique_event_term')],
+            },
+        ),
+    ]
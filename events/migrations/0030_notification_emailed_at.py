@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-17 23:27
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_emailed(apps, schema_editor):
+    """Уже созданные уведомления не должны получить письмо повторно при перезапуске рассылки"""
+    Notification = apps.get_model('events', 'Notification')
+    Notification.objects.update(emailed_at=F('sent_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0029_similarity_postings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='emailed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_existing_emailed, migrations.RunPython.noop),
+    ]
@@ -12,7 +12,9 @@ import os
 import io
 from PIL import Image
 from django.core.files.base import ContentFile
-from django.db import models
+from django.db import models, transaction
+from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
+from django.contrib.contenttypes.models import ContentType
 from django.urls import reverse
 from django.conf import settings
 from django.core.exceptions import ValidationError
@@ -20,8 +22,10 @@ from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 import time
 import logging
-from django.db.models import Sum, Count, Avg, Q
+from django.db.models import Sum, Count, Avg, Q, F, OuterRef, Subquery, Case, When
+from django.db.models.functions import Coalesce, Greatest, Cast
 import re  # Для работы с регулярными выражениямиeve
+from .geo import geohash_encode
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -36,6 +40,151 @@ except ImportError:
     GEOPY_AVAILABLE = False
     logger.warning("Geopy not available. Geocoding will be disabled.")
 
+def rendition_upload_to(instance, filename):
+    return f"renditions/{instance.content_type.model}/{instance.object_id}/{filename}"
+
+
+class ImageRendition(models.Model):
+    """Уменьшенная копия изображения (см. events/renditions.py)"""
+    PRESETS = [
+        ('map', _('Всплывающее окно карты')),
+        ('card', _('Карточка')),
+        ('detail', _('Страница мероприятия')),
+    ]
+    FORMATS = [
+        ('avif', 'AVIF'),
+        ('webp', 'WebP'),
+        ('jpeg', 'JPEG'),
+    ]
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+    field_name = models.CharField(max_length=50, verbose_name=_("Поле изображения"))
+    source = models.CharField(max_length=255, verbose_name=_("Оригинал"))
+    preset = models.CharField(max_length=10, choices=PRESETS, verbose_name=_("Размер"))
+    format = models.CharField(max_length=10, choices=FORMATS, verbose_name=_("Формат"))
+    file = models.ImageField(upload_to=rendition_upload_to, max_length=255, verbose_name=_("Файл"))
+    width = models.PositiveIntegerField(verbose_name=_("Ширина"))
+    height = models.PositiveIntegerField(verbose_name=_("Высота"))
+    size_bytes = models.PositiveIntegerField(verbose_name=_("Размер файла, байт"))
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Копия изображения")
+        verbose_name_plural = _("Копии изображений")
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_type', 'object_id', 'field_name', 'preset', 'format'],
+                name='unique_image_rendition',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['content_type', 'object_id'], name='rendition_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} [{self.preset}, {self.format}, {self.width}x{self.height}]"
+
+    @property
+    def url(self):
+        return self.file.url
+
+
+class GeocodeCache(models.Model):
+    """Результат геокодирования по нормализованному адресу (см. events/geocoding.py)"""
+    key = models.CharField(max_length=40, unique=True, verbose_name=_("Ключ адреса"))
+    address = models.TextField(verbose_name=_("Адрес"))
+    latitude = models.FloatField(_('Широта'), null=True, blank=True)
+    longitude = models.FloatField(_('Долгота'), null=True, blank=True)
+    display_name = models.TextField(blank=True, verbose_name=_("Найденный адрес"))
+    source = models.CharField(max_length=50, verbose_name=_("Источник"))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Кеш геокодирования")
+        verbose_name_plural = _("Кеш геокодирования")
+
+    def __str__(self):
+        return f"{self.address} → {self.latitude}, {self.longitude}"
+
+    @property
+    def is_found(self):
+        return self.latitude is not None and self.longitude is not None
+
+
+class EventSimilarity(models.Model):
+    """Похожее по тексту мероприятие из top-K соседей (см. events/similarity.py)"""
+    event = models.ForeignKey('Event', on_delete=models.CASCADE, related_name='similarities')
+    similar_event = models.ForeignKey('Event', on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField(verbose_name=_("Косинусное сходство"))
+
+    class Meta:
+        verbose_name = _("Похожее мероприятие")
+        verbose_name_plural = _("Похожие мероприятия")
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'similar_event'], name='unique_event_similarity'),
+        ]
+        indexes = [
+            models.Index(fields=['event', '-score'], name='event_similarity_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} → {self.similar_event_id}: {self.score:.3f}"
+
+
+class SimilarityTerm(models.Model):
+    """Документная частота терма в индексе похожих мероприятий (см. events/similarity.py)"""
+    term = models.CharField(max_length=64, primary_key=True)
+    df = models.PositiveIntegerField(default=0, verbose_name=_("Мероприятий с термом"))
+
+    class Meta:
+        verbose_name = _("Терм индекса похожих")
+        verbose_name_plural = _("Термы индекса похожих")
+
+    def __str__(self):
+        return f"{self.term}: {self.df}"
+
+
+class EventTerm(models.Model):
+    """Вес терма в нормированном TF-IDF векторе мероприятия - строка обратного индекса"""
+    event = models.ForeignKey('Event', on_delete=models.CASCADE, related_name='+')
+    term = models.CharField(max_length=64)
+    # 0 - терм слишком частый (MAX_DF) и в сходстве не участвует
+    weight = models.FloatField(default=0)
+
+    class Meta:
+        verbose_name = _("Терм мероприятия")
+        verbose_name_plural = _("Термы мероприятий")
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'term'], name='unique_event_term'),
+        ]
+        indexes = [
+            models.Index(fields=['term'], name='event_term_postings_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id}: {self.term} ({self.weight:.3f})"
+
+
+class TrendingScore(models.Model):
+    """Рейтинг «в тренде», пересчитывается задачей update_trending_scores (см. events/trending.py)"""
+    event = models.OneToOneField('Event', on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    score = models.FloatField(default=0, db_index=True, verbose_name=_("Оценка"))
+    registrations = models.PositiveIntegerField(default=0, verbose_name=_("Регистрации за окно"))
+    favorites = models.PositiveIntegerField(default=0, verbose_name=_("Избранное за окно"))
+    views = models.PositiveIntegerField(default=0, verbose_name=_("Просмотры с прошлого пересчета"))
+    views_total = models.PositiveIntegerField(default=0, verbose_name=_("Просмотры на момент пересчета"))
+    computed_at = models.DateTimeField(verbose_name=_("Пересчитано"))
+
+    class Meta:
+        verbose_name = _("Рейтинг популярности")
+        verbose_name_plural = _("Рейтинги популярности")
+
+    def __str__(self):
+        return f"{self.event_id}: {self.score:.3f}"
+
+
 class Advertisement(models.Model):
     AD_TYPES = [
         ('banner', _('Баннер')),
@@ -63,6 +212,7 @@ class Advertisement(models.Model):
     end_date = models.DateTimeField(verbose_name=_("Дата окончания"))
     click_count = models.IntegerField(default=0, verbose_name=_("Клики"))
     impression_count = models.IntegerField(default=0, verbose_name=_("Показы"))
+    renditions = GenericRelation(ImageRendition)
     
     class Meta:
         verbose_name = _("Рекламный баннер")
@@ -111,6 +261,53 @@ def validate_image(image):
     if not image.name.lower().endswith(('.png', '.jpg', '.jpeg')):
         raise ValidationError("Только JPG/PNG")
 
+
+class EventQuerySet(models.QuerySet):
+    """QuerySet мероприятий с готовыми аннотациями статистики"""
+
+    def with_stats(self):
+        """
+        Аннотирует подтвержденные регистрации, количество отзывов, избранного
+        и средний рейтинг из денормализованных счетчиков EventStatistic
+        (один LEFT JOIN). Свойства Event.registrations_count, average_rating
+        и т.д. берут значения из этих аннотаций вместо запросов на каждую строку.
+        """
+        return self.annotate(
+            _registrations_count=Coalesce(F('eventstatistic__registrations_count'), 0),
+            _reviews_count=Coalesce(F('eventstatistic__reviews_count'), 0),
+            _favorites_count=Coalesce(F('eventstatistic__favorites_count'), 0),
+            _average_rating=Case(
+                When(
+                    eventstatistic__reviews_count__gt=0,
+                    then=Cast('eventstatistic__rating_sum', models.FloatField())
+                    / F('eventstatistic__reviews_count'),
+                ),
+                default=0.0,
+                output_field=models.FloatField(),
+            ),
+        )
+
+    def with_live_stats(self):
+        """
+        То же, что with_stats(), но считает значения по дочерним таблицам
+        коррелированными подзапросами. Нужен для сверки счетчиков.
+        """
+        def child_stat(model, aggregate, **filters):
+            rows = model.objects.filter(event=OuterRef('pk'), **filters).order_by()
+            return Subquery(rows.values('event').annotate(value=aggregate).values('value')[:1])
+
+        return self.annotate(
+            _registrations_count=Coalesce(
+                child_stat(Registration, Count('pk'), status='confirmed'), 0
+            ),
+            _reviews_count=Coalesce(child_stat(Review, Count('pk')), 0),
+            _favorites_count=Coalesce(child_stat(Favorite, Count('pk')), 0),
+            _average_rating=Coalesce(
+                child_stat(Review, Avg('rating')), 0.0, output_field=models.FloatField()
+            ),
+        )
+
+
 class Event(models.Model):
     # Группировка по категориям
     EVENT_CATEGORIES = [
@@ -182,6 +379,14 @@ class Event(models.Model):
         ('advanced', _('Для продвинутых')),
         ('all', _('Для всех уровней')),
     ]
+
+    # Статус фоновой обработки изображения и геокодирования
+    PROCESSING_STATUSES = [
+        ('pending', _('Ожидает обработки')),
+        ('processing', _('Обрабатывается')),
+        ('ready', _('Готово')),
+        ('failed', _('Ошибка обработки')),
+    ]
   
     title = models.CharField(max_length=200, verbose_name=_("Название мероприятия"))
     description = models.TextField(verbose_name=_("Описание"))
@@ -217,12 +422,20 @@ class Event(models.Model):
     # новые поля для карты
     latitude = models.FloatField(_('Широта'), null=True, blank=True)
     longitude = models.FloatField(_('Долгота'), null=True, blank=True)
+    geohash = models.CharField(_('Geohash'), max_length=12, blank=True, default='', db_index=True, editable=False)
+    processing_status = models.CharField(
+        max_length=20, choices=PROCESSING_STATUSES, default='ready', editable=False,
+        verbose_name=_("Статус обработки")
+    )
+    renditions = GenericRelation(ImageRendition)
     
     # Теги
     tags = models.ManyToManyField('Tag', blank=True, verbose_name=_("Теги"))
 
     badges = models.JSONField(default=list, blank=True, verbose_name="Бейджи")
 
+    objects = EventQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Мероприятие")
         verbose_name_plural = _("Мероприятия")
@@ -245,72 +458,100 @@ class Event(models.Model):
     def get_absolute_url(self):
         return reverse('event_detail', kwargs={'pk': self.pk})
 
-    def get_image_url(self):
-        if self.image and hasattr(self.image, 'url'):
-            try:
-                if os.path.exists(self.image.path):
-                    return self.image.url
-            except:
-                pass
+    def get_image_url(self, preset=None):
+        """URL изображения; с preset - JPEG копия нужного размера, если она готова"""
+        if preset:
+            from .renditions import rendition_url
+            url = rendition_url(self, preset)
+            if url:
+                return url
+        if self.image:
+            return self.image.url
         return f"{settings.STATIC_URL}images/default-event.jpg"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем исходные изображение и адрес, чтобы save() знал, что изменилось
+        instance._remember_media_state()
+        return instance
+
+    def _remember_media_state(self):
+        self._media_state = {
+            field: str(self.__dict__[field] or '')
+            for field in ('image', 'location') if field in self.__dict__
+        }
+        self._media_state.update(
+            (field, self.__dict__[field]) for field in ('latitude', 'longitude') if field in self.__dict__
+        )
+
+    def has_stale_coordinates(self):
+        """Адрес изменили, а координаты остались от прежнего адреса"""
+        original = getattr(self, '_media_state', {})
+        fields = ('location', 'latitude', 'longitude')
+        if not all(field in original and field in self.__dict__ for field in fields):
+            return False
+        return (
+            self.location != original['location'] and self.has_coordinates
+            and (self.latitude, self.longitude) == (original['latitude'], original['longitude'])
+        )
+
+    def needs_processing(self):
+        """
+        Новое изображение или новый адрес. Адрес, который не удалось
+        геокодировать, повторно не обрабатывается, пока его не изменят.
+        """
+        original = getattr(self, '_media_state', {})
+        if 'image' in self.__dict__ and self.image and self.image.name != original.get('image'):
+            return True
+        return 'location' in self.__dict__ and bool(self.location) and self.location != original.get('location')
+
     def save(self, *args, **kwargs):
-        # Создание default изображения если нет
-        if not self.image:
-            try:
-                img = Image.new('RGB', (300, 200), color='#f0f0f0')
-                img_io = io.BytesIO()
-                img.save(img_io, format='JPEG')
-                self.image.save('default_event.jpg', ContentFile(img_io.getvalue()), save=False)
-            except:
-                pass
-    
-       # Ресайз изображения
-        super().save(*args, **kwargs)
-        if self.image:
-            try:
-                img = Image.open(self.image.path)
-                if img.height > 600 or img.width > 800:
-                    output_size = (800, 600)
-                    img.thumbnail(output_size)
-                    img.save(self.image.path)
-            except:
-                pass
-        # Автоматическое геокодирование при сохранении (только если geopy доступен)
-        if GEOPY_AVAILABLE and self.location and (not self.latitude or not self.longitude):
-            self.geocode_location()
+        """
+        Сохраняет сразу; ресайз изображения и геокодирование выполняются
+        после коммита задачей process_event_media (events/processing.py).
+        """
+        update_fields = kwargs.get('update_fields')
+        needs_processing = self.needs_processing() and (
+            update_fields is None or bool({'image', 'location'} & set(update_fields))
+        )
+        if needs_processing:
+            self.processing_status = 'pending'
+            if update_fields is not None:
+                kwargs['update_fields'] = update_fields = set(update_fields) | {'processing_status'}
+
+        # Старые координаты не подходят новому адресу: их заново определит process_event
+        if self.has_stale_coordinates() and (update_fields is None or 'location' in update_fields):
+            self.latitude = self.longitude = None
+            if update_fields is not None:
+                kwargs['update_fields'] = update_fields = set(update_fields) | {'latitude', 'longitude'}
+
+        # Geohash для выборки по карте и кластеризации маркеров
+        self.geohash = geohash_encode(self.latitude, self.longitude) if self.has_coordinates else ''
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
         super().save(*args, **kwargs)
 
+        self._remember_media_state()
+        if needs_processing:
+            from .processing import schedule_event_processing
+            transaction.on_commit(lambda: schedule_event_processing(self.pk))
+
+    @property
+    def is_processing(self):
+        return self.processing_status in ('pending', 'processing')
+
     def geocode_location(self):
-        """Автоматическое определение координат по адресу"""
-        if not GEOPY_AVAILABLE:
-            logger.warning("Geopy not available. Cannot geocode location.")
-            return
-            
-        try:
-            import time
-            geolocator = Nominatim(user_agent="eventhub_app")
-            time.sleep(1)  # Задержка чтобы не превысить лимиты API
-            
-            location = geolocator.geocode(
-                f"{self.location}, Россия", 
-                country_codes='ru',
-                language='ru',
-                timeout=10
-            )
-            
-            if location:
-                self.latitude = location.latitude
-                self.longitude = location.longitude
-                logger.info(f"Геокодирование успешно: {self.location} → {self.latitude}, {self.longitude}")
-            else:
-                logger.warning(f"Не удалось геокодировать: {self.location}")
-                
-        except (GeocoderTimedOut, GeocoderServiceError) as e:
-            logger.error(f"Ошибка геокодирования для {self.location}: {e}")
-        except Exception as e:
-            logger.error(f"Непредвиденная ошибка геокодирования: {e}")
-    
+        """Координаты по адресу через общий геокодер (кеш, таблица городов, провайдер)"""
+        from .geocoding import get_geocoder
+        result = get_geocoder().geocode(self.location)
+        if result:
+            self.latitude = result.latitude
+            self.longitude = result.longitude
+            logger.info(f"Геокодирование успешно: {self.location} → {self.latitude}, {self.longitude}")
+        else:
+            logger.warning(f"Не удалось геокодировать: {self.location}")
+
     def update_coordinates(self):
         """Принудительное обновление координат"""
         if self.location:
@@ -324,30 +565,47 @@ class Event(models.Model):
         ordering = ['-created_at']
         verbose_name = _('Мероприятие')
         verbose_name_plural = _('Мероприятия')
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='event_lat_lon_idx'),
+        ]
     
     def __str__(self):
         return self.title
     
     # Рейтинг (вычисляемое поле)
     def get_average_rating(self):
-        """Вычисляет средний рейтинг"""        
-        reviews = self.reviews.all()
-        if reviews:
-            return sum(review.rating for review in reviews) / reviews.count()
-        return 0
-    
+        """Вычисляет средний рейтинг (аннотация with_stats() или счетчики EventStatistic)"""
+        if '_average_rating' in self.__dict__:
+            return self._average_rating or 0
+        statistic = self._get_statistic()
+        if statistic is not None:
+            return statistic.average_rating
+        return self.reviews.aggregate(avg=Avg('rating'))['avg'] or 0
+
     # Количество участников
     def get_registrations_count(self):
         """Вычисляет количество подтвержденных регистраций - используем status вместо is_confirmed"""
-        return self.registrations.filter(status='confirmed').count()
-    
-    def get_average_rating(self):
-        """Вычисляет средний рейтинг"""
-        reviews = self.reviews.all()
-        if reviews:
-            return sum(review.rating for review in reviews) / reviews.count()
-        return 0
-    
+        return self._get_counter(
+            'registrations_count', lambda: self.registrations.filter(status='confirmed').count()
+        )
+
+    def _get_statistic(self):
+        """Строка счетчиков EventStatistic (кешируется Django) или None"""
+        try:
+            return self.eventstatistic
+        except EventStatistic.DoesNotExist:
+            return None
+
+    def _get_counter(self, name, fallback):
+        """Значение счетчика: аннотация -> EventStatistic -> прямой запрос"""
+        annotated = f'_{name}'
+        if annotated in self.__dict__:
+            return self.__dict__[annotated] or 0
+        statistic = self._get_statistic()
+        if statistic is not None:
+            return getattr(statistic, name)
+        return fallback()
+
     @property
     def average_rating(self):
         """Property для среднего рейтинга"""
@@ -355,24 +613,33 @@ class Event(models.Model):
             return self.get_average_rating()
         except (TypeError, AttributeError):
             return 0
-    
-    @property 
+
+    @average_rating.setter
+    def average_rating(self, value):
+        # Позволяет .annotate(average_rating=...) и update_average_rating()
+        self._average_rating = value
+
+    @property
     def registrations_count(self):
         """Property для количества регистраций"""
         try:
             return self.get_registrations_count()
         except (TypeError, AttributeError):
             return 0
-    
-    # # Добавляем методы для аннотации
-    # @classmethod
-    # def with_counts(cls):
-    #     """Возвращает QuerySet с аннотированными счетчиками"""
-    #     from django.db.models import Count, Avg
-    #     return cls.objects.annotate(
-    #         _registrations_count=Count('registrations', filter=models.Q(registrations__is_confirmed=True)),
-    #         _average_rating=Avg('reviews__rating')
-    #     )
+
+    @registrations_count.setter
+    def registrations_count(self, value):
+        self._registrations_count = value
+
+    @property
+    def reviews_count(self):
+        """Количество отзывов"""
+        return self._get_counter('reviews_count', lambda: self.reviews.count())
+
+    @property
+    def favorites_count(self):
+        """Сколько раз мероприятие добавили в избранное"""
+        return self._get_counter('favorites_count', lambda: self.favorited_by.count())
 
     @property
     def is_free_event(self):
@@ -416,9 +683,10 @@ class Event(models.Model):
     def get_active_badges(self):
         """Динамическое определение активных бейджей"""
         active_badges = []
-        
+        registrations_count = self.registrations_count
+
         # Проверяем условия для каждого бейджа
-        if self.registrations.count() > self.capacity * 0.8:
+        if registrations_count > self.capacity * 0.8:
             active_badges.append('trending')
         
         if self.created_at and (timezone.now() - self.created_at).days < 7:
@@ -430,7 +698,7 @@ class Event(models.Model):
         if self.date and (self.date - timezone.now()).days <= 3:
             active_badges.append('last_chance')
         
-        if self.registrations.count() >= self.capacity:
+        if registrations_count >= self.capacity:
             active_badges.append('sold_out')
         
         if self.price == 0:
@@ -731,6 +999,8 @@ class Notification(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE)
     sent_at = models.DateTimeField(auto_now_add=True)
     read = models.BooleanField(default=False)
+    # Письмо о мероприятии отправлено (рассылка подписчикам, events/notification_fanout.py)
+    emailed_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         unique_together = ['user', 'event']
@@ -738,12 +1008,84 @@ class Notification(models.Model):
 
 # Статистика
 class EventStatistic(models.Model):
+    """
+    Денормализованные счетчики мероприятия. Обновляются инкрементально
+    сигналами (events/signals_statistics.py), команда rebuild_event_statistics
+    пересчитывает их целиком при расхождении.
+    """
+    COUNTER_FIELDS = ['registrations_count', 'favorites_count', 'reviews_count', 'rating_sum']
+
     event = models.OneToOneField(Event, on_delete=models.CASCADE)
     views_count = models.PositiveIntegerField(default=0)
-    registrations_count = models.PositiveIntegerField(default=0)
+    registrations_count = models.PositiveIntegerField(default=0)  # только подтвержденные
     favorites_count = models.PositiveIntegerField(default=0)
+    reviews_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
     last_updated = models.DateTimeField(auto_now=True)
 
+    @property
+    def average_rating(self):
+        if not self.reviews_count:
+            return 0
+        return self.rating_sum / self.reviews_count
+
+    @classmethod
+    def bump(cls, event_id, **deltas):
+        """
+        Атомарно изменяет счетчики на deltas через F()-выражения.
+        Строка создается только при увеличении счетчиков: уменьшение без строки
+        бывает при каскадном удалении мероприятия, там создавать нечего.
+        """
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        updates = {
+            field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()
+        }
+        updates['last_updated'] = timezone.now()
+        if cls.objects.filter(event_id=event_id).update(**updates):
+            return
+        if all(delta > 0 for delta in deltas.values()):
+            cls.objects.get_or_create(event_id=event_id)
+            cls.objects.filter(event_id=event_id).update(**updates)
+
+    @classmethod
+    def rebuild(cls, events=None):
+        """
+        Полный пересчет счетчиков: по одному GROUP BY запросу на каждую
+        дочернюю таблицу и bulk-запись результатов. Возвращает число строк.
+        """
+        events = events if events is not None else Event.objects.all()
+        event_ids = list(events.values_list('pk', flat=True))
+        scope = events.values('pk')
+
+        def grouped(queryset, **aggregates):
+            rows = queryset.filter(event__in=scope).order_by().values('event_id').annotate(**aggregates)
+            return {row.pop('event_id'): row for row in rows}
+
+        registrations = grouped(
+            Registration.objects.filter(status='confirmed'), registrations_count=Count('pk')
+        )
+        favorites = grouped(Favorite.objects.all(), favorites_count=Count('pk'))
+        reviews = grouped(Review.objects.all(), reviews_count=Count('pk'), rating_sum=Sum('rating'))
+
+        existing = {stat.event_id: stat for stat in cls.objects.filter(event__in=scope)}
+        to_create, to_update = [], []
+        now = timezone.now()
+        for event_id in event_ids:
+            stat = existing.get(event_id) or cls(event_id=event_id)
+            values = {field: 0 for field in cls.COUNTER_FIELDS}
+            for source in (registrations, favorites, reviews):
+                values.update(source.get(event_id, {}))
+            for field, value in values.items():
+                setattr(stat, field, value or 0)
+            stat.last_updated = now
+            (to_update if stat.pk else to_create).append(stat)
+
+        cls.objects.bulk_create(to_create, batch_size=500)
+        cls.objects.bulk_update(to_update, cls.COUNTER_FIELDS + ['last_updated'], batch_size=500)
+        return len(event_ids)
+
 
 class PlatformStatistic(models.Model):
     date = models.DateField(unique=True)
@@ -760,6 +1102,10 @@ class ExternalEventSource(models.Model):
     parser_config = models.JSONField(default=dict, verbose_name=_("Конфигурация парсера"))
     is_active = models.BooleanField(default=True, verbose_name=_("Активен"))
     last_sync = models.DateTimeField(null=True, blank=True, verbose_name=_("Последняя синхронизация"))
+    # Валидаторы HTTP-кеша и хеш последней загруженной страницы (см. events/sync.py)
+    etag = models.CharField(max_length=255, blank=True, editable=False, verbose_name="ETag")
+    last_modified = models.CharField(max_length=100, blank=True, editable=False, verbose_name="Last-Modified")
+    content_hash = models.CharField(max_length=64, blank=True, editable=False, verbose_name=_("Хеш содержимого"))
     
     class Meta:
         verbose_name = _("Источник мероприятий")
@@ -1042,14 +1388,31 @@ class LevelSystem(models.Model):
         return f"Уровень {self.level}: {self.level_name}"
 
 class UserProfile(models.Model):
-    """Расширенный профиль пользователя с игровыми метриками"""
+    """
+    Расширенный профиль пользователя с игровыми метриками.
+
+    Счетчики статистики обновляются инкрементально сигналами
+    (events/signals_gamification.py), ночная задача reconcile_user_stats
+    пересчитывает их для всех пользователей сразу (rebuild()).
+    """
+    COUNTER_FIELDS = [
+        'events_created', 'events_attended', 'reviews_written',
+        'favorites_added', 'days_active', 'categories_explored',
+    ]
+    ACTIVE_DAYS_WINDOW = timedelta(days=30)
+
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='game_profile')
     total_points = models.PositiveIntegerField(default=0)
     current_level = models.ForeignKey(LevelSystem, on_delete=models.SET_NULL, null=True, blank=True)
     streak_days = models.PositiveIntegerField(default=0)  # Дней подряд активности
     last_activity = models.DateTimeField(auto_now=True)
     badges = models.JSONField(default=list)  # Список бейджей
-    stats = models.JSONField(default=dict)  # Статистика пользователя
+    events_created = models.PositiveIntegerField(default=0)
+    events_attended = models.PositiveIntegerField(default=0)  # все регистрации
+    reviews_written = models.PositiveIntegerField(default=0)
+    favorites_added = models.PositiveIntegerField(default=0)
+    days_active = models.PositiveIntegerField(default=0)  # дни с регистрациями за ACTIVE_DAYS_WINDOW
+    categories_explored = models.PositiveIntegerField(default=0)
     
     class Meta:
         verbose_name = 'Игровой профиль'
@@ -1058,37 +1421,85 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"Профиль {self.user.username} (Уровень {self.current_level.level if self.current_level else 0})"
     
+    def save(self, *args, **kwargs):
+        # Счетчики меняются только через bump()/rebuild(): сохранение устаревшего
+        # экземпляра не должно затирать параллельные F()-обновления
+        if self.pk and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+    
+    @property
+    def stats(self):
+        """Статистика пользователя"""
+        return {field: getattr(self, field) for field in self.COUNTER_FIELDS}
+    
     def update_stats(self):
-        """Обновление статистики пользователя"""
-        from .models import Event, Registration, Review, Favorite
+        """Перечитывает счетчики статистики из базы (один запрос)"""
+        self.refresh_from_db(fields=self.COUNTER_FIELDS)
+    
+    @classmethod
+    def bump(cls, user_id, **deltas):
+        """
+        Атомарно изменяет счетчики на deltas через F()-выражения.
+        Профиль создается только при увеличении счетчиков.
+        """
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas or user_id is None:
+            return
+        updates = {field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()}
+        if cls.objects.filter(user_id=user_id).update(**updates):
+            return
+        if all(delta > 0 for delta in deltas.values()):
+            cls.objects.get_or_create(user_id=user_id)
+            cls.objects.filter(user_id=user_id).update(**updates)
+    
+    @classmethod
+    def rebuild(cls, users=None):
+        """
+        Пересчет счетчиков: по одному GROUP BY запросу на каждую метрику для
+        всех пользователей сразу и bulk-запись. Возвращает число профилей.
+        """
+        from django.db.models.functions import TruncDate
+        
+        users = users if users is not None else User.objects.all()
+        user_ids = list(users.values_list('pk', flat=True))
+        scope = users.values('pk')
         
-        self.stats = {
-            'events_created': self.user.organized_events.count(),
-            'events_attended': Registration.objects.filter(user=self.user).count(),
-            'reviews_written': Review.objects.filter(user=self.user).count(),
-            'favorites_added': Favorite.objects.filter(user=self.user).count(),
-            'days_active': self._calculate_active_days(),
-            'categories_explored': self._calculate_categories_explored(),
+        def grouped(queryset, user_field='user_id', **aggregate):
+            rows = queryset.filter(**{f'{user_field}__in': scope}).order_by().values(user_field).annotate(**aggregate)
+            (field, _), = aggregate.items()
+            return {row[user_field]: row[field] for row in rows}
+        
+        since = timezone.now() - cls.ACTIVE_DAYS_WINDOW
+        values = {
+            'events_created': grouped(Event.objects.all(), 'organizer_id', events_created=Count('pk')),
+            'events_attended': grouped(Registration.objects.all(), events_attended=Count('pk')),
+            'reviews_written': grouped(Review.objects.all(), reviews_written=Count('pk')),
+            'favorites_added': grouped(Favorite.objects.all(), favorites_added=Count('pk')),
+            'days_active': grouped(
+                Registration.objects.filter(registration_date__gte=since),
+                days_active=Count(TruncDate('registration_date'), distinct=True),
+            ),
+            'categories_explored': grouped(
+                Registration.objects.filter(event__category__isnull=False),
+                categories_explored=Count('event__category', distinct=True),
+            ),
         }
-        self.save()
-    
-    def _calculate_active_days(self):
-        """Расчет количества активных дней"""
-        from datetime import timedelta
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        activities = Registration.objects.filter(
-            user=self.user,
-            registration_date__gte=thirty_days_ago
-        ).dates('registration_date', 'day').distinct()
-        return len(activities)
-    
-    def _calculate_categories_explored(self):
-        """Расчет количества исследованных категорий"""
-        from .models import Registration
-        categories = Registration.objects.filter(
-            user=self.user
-        ).values_list('event__category__name', flat=True).distinct()
-        return len([cat for cat in categories if cat])
+        
+        existing = {profile.user_id: profile for profile in cls.objects.filter(user__in=scope)}
+        to_create, to_update = [], []
+        for user_id in user_ids:
+            profile = existing.get(user_id) or cls(user_id=user_id)
+            for field in cls.COUNTER_FIELDS:
+                setattr(profile, field, values[field].get(user_id, 0))
+            (to_update if profile.pk else to_create).append(profile)
+        
+        cls.objects.bulk_create(to_create, batch_size=500)
+        cls.objects.bulk_update(to_update, cls.COUNTER_FIELDS, batch_size=500)
+        return len(user_ids)
 
 class Leaderboard(models.Model):
     """Таблица лидеров"""
@@ -1121,6 +1532,8 @@ class Quest(models.Model):
     requirement = models.JSONField(default=dict)  # Требования для выполнения
     is_active = models.BooleanField(default=True)
     expires_at = models.DateTimeField(null=True, blank=True)
+    # Поколение ротации (дата для ежедневных); старые поколения деактивируются, а не удаляются
+    generation = models.CharField(max_length=32, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -1135,10 +1548,12 @@ class UserQuest(models.Model):
     """Прогресс пользователя по заданиям"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quests')
     quest = models.ForeignKey(Quest, on_delete=models.CASCADE)
+    current_count = models.PositiveIntegerField(default=0)
     progress = models.FloatField(default=0.0)
     is_completed = models.BooleanField(default=False)
     completed_at = models.DateTimeField(null=True, blank=True)
     started_at = models.DateTimeField(auto_now_add=True)
+    archived_at = models.DateTimeField(null=True, blank=True)  # Задание истекло, прогресс сохранен в архиве
     
     class Meta:
         verbose_name = 'Задание пользователя'
@@ -1149,6 +1564,27 @@ class UserQuest(models.Model):
         status = "Выполнено" if self.is_completed else f"Прогресс: {self.progress*100}%"
         return f"{self.user.username} - {self.quest.name} ({status})"
 
+class GamificationEvent(models.Model):
+    """Журнал игровых действий; обрабатывается пачками (events.gamification.pipeline)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='gamification_events')
+    action = models.CharField(max_length=50)
+    points = models.IntegerField(default=0)
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    # Неудачные попытки обработки; после MAX_ATTEMPTS строка остается для разбора
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Игровое действие'
+        verbose_name_plural = 'Игровые действия'
+        indexes = [
+            models.Index(fields=['processed_at', 'id'], name='gamification_event_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.action} (+{self.points})"
+
 
 class PromoVideo(models.Model):
     """Модель для хранения промо-роликов мероприятий"""
@@ -1196,6 +1632,7 @@ class PromoVideo(models.Model):
         null=True,
         verbose_name="Превью видео"
     )
+    renditions = GenericRelation(ImageRendition)
     duration = models.DurationField(blank=True, null=True, verbose_name="Длительность")
     is_main_promo = models.BooleanField(default=False, verbose_name="Главное промо")
     display_order = models.PositiveIntegerField(default=0, verbose_name="Порядок отображения")
@@ -1290,6 +1727,7 @@ class ProjectPromoVideo(models.Model):
         null=True,
         verbose_name="Превью"
     )
+    renditions = GenericRelation(ImageRendition)
     
     # Настройки отображения
     is_active = models.BooleanField(default=True, verbose_name="Активный")
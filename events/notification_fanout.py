@@ -0,0 +1,121 @@
+"""
+Рассылка уведомлений подписчикам категории о новом мероприятии.
+
+Сохранение мероприятия только ставит после коммита одну задачу
+fan_out_event_notifications - запрос организатора не ждет ни вставок, ни
+SMTP. Задача перебирает ID подписчиков порциями по FANOUT_CHUNK_SIZE (по
+возрастанию ID, без OFFSET) и для каждой порции:
+- создает уведомления одним bulk_create; уже уведомленные пропускаются;
+- публикует уведомления в WebSocket (bulk_create не вызывает post_save);
+- передает задаче send_event_notification_emails всех, кому письмо еще не
+  отправлено (Notification.emailed_at), - она отправляет порцию через одно
+  SMTP-соединение и отмечает отправленные.
+Повтор задачи не дублирует уведомления и письма, но досылает письма,
+потерянные между вставкой и постановкой задачи отправки.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import Event, Notification, Subscription
+from .processing import _enqueue
+from .realtime import publish_notifications
+
+logger = logging.getLogger(__name__)
+
+FANOUT_CHUNK_SIZE = 500
+EMAIL_TEMPLATE = 'events/emails/new_event_notification.html'
+
+
+@receiver(post_save, sender=Event)
+def schedule_subscriber_notifications(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.is_active:
+        event_id = instance.pk
+        transaction.on_commit(lambda: _enqueue(
+            'fan_out_event_notifications', (event_id,), fan_out_event_notifications
+        ))
+
+
+def subscriber_id_chunks(event, chunk_size=FANOUT_CHUNK_SIZE):
+    """ID активных подписчиков категории мероприятия порциями по chunk_size"""
+    subscribers = (
+        Subscription.objects.filter(categories=event.category_id, is_active=True)
+        .values_list('user_id', flat=True).distinct().order_by('user_id')
+    )
+    last_id = 0
+    while True:
+        user_ids = list(subscribers.filter(user_id__gt=last_id)[:chunk_size])
+        if not user_ids:
+            return
+        yield user_ids
+        last_id = user_ids[-1]
+
+
+def fan_out_event_notifications(event_id, chunk_size=FANOUT_CHUNK_SIZE):
+    """Уведомления подписчикам о мероприятии; возвращает число новых уведомлений"""
+    event = Event.objects.filter(pk=event_id, is_active=True).first()
+    if event is None or not event.category_id:
+        return 0
+
+    message = f'Новое мероприятие: {event.title}'
+    created = 0
+    for user_ids in subscriber_id_chunks(event, chunk_size):
+        emailed = dict(
+            Notification.objects.filter(event=event, user_id__in=user_ids).values_list('user_id', 'emailed_at')
+        )
+        new_ids = [user_id for user_id in user_ids if user_id not in emailed]
+        if new_ids:
+            Notification.objects.bulk_create(
+                [Notification(user_id=user_id, event=event, message=message) for user_id in new_ids],
+                ignore_conflicts=True,
+            )
+            publish_notifications(Notification.objects.filter(event=event, user_id__in=new_ids))
+            created += len(new_ids)
+        unsent = [user_id for user_id in user_ids if emailed.get(user_id) is None]
+        if unsent:
+            _enqueue('send_event_notification_emails', (event.pk, unsent), send_event_notification_emails)
+
+    logger.info(f"Event {event_id}: {created} subscriber notifications created")
+    return created
+
+
+def send_event_notification_emails(event_id, user_ids):
+    """
+    Письма о новом мероприятии порции подписчиков через одно SMTP-соединение;
+    получившие письмо отмечаются в Notification.emailed_at
+    """
+    event = Event.objects.filter(pk=event_id).first()
+    if event is None:
+        return 0
+    pending = Notification.objects.filter(event=event, user_id__in=user_ids, emailed_at__isnull=True)
+    pending_ids = list(pending.values_list('user_id', flat=True))
+    if not pending_ids:
+        return 0
+
+    subject = f'Новое мероприятие: {event.title}'
+    site_url = getattr(settings, 'SITE_URL', 'http://127.0.0.1:8000')
+    messages = []
+    for user in get_user_model().objects.filter(pk__in=pending_ids).exclude(email=''):
+        html_message = render_to_string(EMAIL_TEMPLATE, {'user': user, 'event': event, 'site_url': site_url})
+        email = EmailMultiAlternatives(subject, strip_tags(html_message), None, [user.email])
+        email.attach_alternative(html_message, 'text/html')
+        messages.append(email)
+
+    sent = 0
+    if messages:
+        try:
+            sent = get_connection().send_messages(messages) or 0
+        except Exception as e:
+            # Письма остаются неотмеченными: их дошлет повтор рассылки
+            logger.error(f"Error sending event notifications for event {event_id}: {e}")
+            return 0
+    Notification.objects.filter(event=event, user_id__in=pending_ids).update(emailed_at=timezone.now())
+    return sent
@@ -1,4 +1,5 @@
-from django.db.models import Count, Avg, Q, Sum
+from django.db.models import Count, Avg, Q, Sum, F
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import timedelta, datetime
 import matplotlib.pyplot as plt
@@ -15,6 +16,21 @@ class OrganizerDashboard:
         self.organizer = organizer
         self.colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7']
     
+    def get_counter_totals(self, events):
+        """Суммы денормализованных счетчиков EventStatistic одним запросом"""
+        totals = events.aggregate(
+            views=Sum('eventstatistic__views_count'),
+            registrations=Sum('eventstatistic__registrations_count'),
+            favorites=Sum('eventstatistic__favorites_count'),
+            reviews=Sum('eventstatistic__reviews_count'),
+            rating_sum=Sum('eventstatistic__rating_sum'),
+        )
+        totals = {key: value or 0 for key, value in totals.items()}
+        totals['avg_rating'] = (
+            totals['rating_sum'] / totals['reviews'] if totals['reviews'] else 0
+        )
+        return totals
+
     def get_dashboard_stats(self, days=30):
         """Основная статистика организатора"""
         start_date = timezone.now() - timedelta(days=days)
@@ -24,9 +40,8 @@ class OrganizerDashboard:
         )
         
         total_events = events.count()
-        total_registrations = events.aggregate(
-            total=Count('registrations')
-        )['total'] or 0
+        totals = self.get_counter_totals(events)
+        total_registrations = totals['registrations']
         
         # Доходы (если мероприятия платные)
         total_revenue = events.aggregate(
@@ -34,9 +49,7 @@ class OrganizerDashboard:
         )['revenue'] or 0
         
         # Средний рейтинг
-        avg_rating = events.aggregate(
-            rating=Avg('reviews__rating')
-        )['rating'] or 0
+        avg_rating = totals['avg_rating']
         
         # Активные мероприятия
         active_events = events.filter(
@@ -62,24 +75,21 @@ class OrganizerDashboard:
         
         popular_events = self.organizer.organized_events.filter(
             created_at__gte=start_date
-        ).annotate(
-            reg_count=Count('registrations'),
-            fav_count=Count('favorited_by'),
-            avg_rating=Avg('reviews__rating'),
-            view_count=Count('eventstatistic__views_count')
-        ).order_by('-reg_count')[:5]
+        ).with_stats().annotate(
+            view_count=Coalesce(F('eventstatistic__views_count'), 0)
+        ).order_by('-_registrations_count')[:5]
         
         return [
             {
                 'id': event.id,
                 'title': event.title,
-                'registrations': event.reg_count,
-                'favorites': event.fav_count,
+                'registrations': event.registrations_count,
+                'favorites': event.favorites_count,
                 'views': event.view_count,
-                'rating': event.avg_rating or 0,
+                'rating': event.average_rating,
                 'date': event.date.strftime('%d.%m.%Y'),
-                'revenue': event.reg_count * event.price,
-                'conversion_rate': round((event.reg_count / event.view_count * 100), 2) if event.view_count > 0 else 0
+                'revenue': event.registrations_count * event.price,
+                'conversion_rate': round((event.registrations_count / event.view_count * 100), 2) if event.view_count > 0 else 0
             }
             for event in popular_events
         ]
@@ -158,21 +168,11 @@ class OrganizerDashboard:
             created_at__gte=start_date
         )
         
-        total_views = events.aggregate(
-            views=Sum('eventstatistic__views_count')
-        )['views'] or 0
-        
-        total_favorites = events.aggregate(
-            favorites=Count('favorited_by')
-        )['favorites'] or 0
-        
-        total_reviews = events.aggregate(
-            reviews=Count('reviews')
-        )['reviews'] or 0
-        
-        total_registrations = events.aggregate(
-            registrations=Count('registrations')
-        )['registrations'] or 0
+        totals = self.get_counter_totals(events)
+        total_views = totals['views']
+        total_favorites = totals['favorites']
+        total_reviews = totals['reviews']
+        total_registrations = totals['registrations']
         
         conversion_rate = self.calculate_conversion_rate(days)
         
@@ -193,13 +193,9 @@ class OrganizerDashboard:
             created_at__gte=start_date
         )
         
-        total_views = events.aggregate(
-            views=Sum('eventstatistic__views_count')
-        )['views'] or 0
-        
-        total_registrations = events.aggregate(
-            registrations=Count('registrations')
-        )['registrations'] or 0
+        totals = self.get_counter_totals(events)
+        total_views = totals['views']
+        total_registrations = totals['registrations']
         
         if total_views > 0:
             return round((total_registrations / total_views) * 100, 2)
@@ -214,19 +210,14 @@ class OrganizerDashboard:
         )
         
         # Собираем различные метрики вовлеченности
-        metrics = events.aggregate(
-            avg_rating=Avg('reviews__rating'),
-            review_count=Count('reviews'),
-            favorite_count=Count('favorited_by'),
-            registration_count=Count('registrations')
-        )
+        metrics = self.get_counter_totals(events)
         
         # Взвешенная формула для engagement score
         engagement_score = (
-            (metrics['avg_rating'] or 0) * 20 +  # Рейтинг (0-100)
-            min(metrics['review_count'] * 2, 20) +  # Отзывы
-            min(metrics['favorite_count'] * 3, 30) +  # Избранное
-            min(metrics['registration_count'], 50)  # Регистрации
+            metrics['avg_rating'] * 20 +  # Рейтинг (0-100)
+            min(metrics['reviews'] * 2, 20) +  # Отзывы
+            min(metrics['favorites'] * 3, 30) +  # Избранное
+            min(metrics['registrations'], 50)  # Регистрации
         )
         
         return min(engagement_score, 100)  # Ограничиваем 100
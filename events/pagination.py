@@ -0,0 +1,278 @@
+"""
+Keyset (cursor) пагинация.
+
+Вместо OFFSET + COUNT(*) следующая страница выбирается условием по ключу
+сортировки последней строки: для ('-date', '-id') это
+`date < d OR (date = d AND id < i)`. Стоимость не зависит от номера страницы,
+а вставка новых мероприятий не сдвигает уже показанные строки.
+
+Курсор - непрозрачный base64-токен с позицией, направлением и сортировкой.
+
+NULL в ключе (nullable поля вроде Event.created_at, связи, аннотации)
+считается больше любого значения, как в PostgreSQL: сортировка задается
+явно (nulls_last по возрастанию, nulls_first по убыванию), а условие
+дополняется ветками __isnull.
+"""
+import base64
+import binascii
+import datetime
+import json
+from collections import namedtuple
+from operator import attrgetter
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+from django.http import Http404
+from django.utils.translation import gettext as _
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Даты с микросекундами: DjangoJSONEncoder обрезает их до миллисекунд"""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.date, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CountEstimate(namedtuple('CountEstimate', ['value', 'is_exact', 'is_lower_bound'], defaults=[False])):
+    """Оценка числа строк: точное значение, '1000+' или '~N' по статистике СУБД"""
+
+    def __str__(self):
+        if self.is_exact:
+            return str(self.value)
+        return f'{self.value}+' if self.is_lower_bound else f'~{self.value}'
+
+
+def estimate_count(queryset, cap=1000):
+    """
+    PostgreSQL: оценка планировщика (EXPLAIN), без чтения строк.
+    Остальные СУБД: COUNT, ограниченный cap строками.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return CountEstimate(int(plan[0]['Plan']['Plan Rows']), False)
+
+    count = queryset.order_by().values('pk')[:cap + 1].count()
+    if count > cap:
+        return CountEstimate(cap, False, is_lower_bound=True)
+    return CountEstimate(count, True)
+
+
+def get_keyset_ordering(queryset):
+    """Сортировка queryset с уникальным pk в конце (нужен для однозначного ключа)"""
+    ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+    if not all(isinstance(field, str) for field in ordering):
+        raise ValueError(_('Keyset пагинация поддерживает только сортировку по именам полей'))
+    names = [field.lstrip('-') for field in ordering]
+    if 'pk' not in names and 'id' not in names:
+        descending = bool(ordering) and ordering[-1].startswith('-')
+        ordering.append('-pk' if descending else 'pk')
+    return ordering
+
+
+def reverse_ordering(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+def nullable_fields(model, ordering):
+    """Поля ключа, которые могут быть NULL: nullable поля модели, связи и аннотации"""
+    nullable = set()
+    for field in ordering:
+        name = field.lstrip('-')
+        if name == 'pk':
+            continue
+        try:
+            if not model._meta.get_field(name).null:
+                continue
+        except FieldDoesNotExist:
+            pass
+        nullable.add(name)
+    return nullable
+
+
+def keyset_order_by(ordering, nullable=()):
+    """Выражения сортировки: NULL nullable полей - после значений по возрастанию и до них по убыванию"""
+    expressions = []
+    for field in ordering:
+        name = field.lstrip('-')
+        if name not in nullable:
+            expressions.append(field)
+        elif field.startswith('-'):
+            expressions.append(F(name).desc(nulls_first=True))
+        else:
+            expressions.append(F(name).asc(nulls_last=True))
+    return expressions
+
+
+def _equals(name, value):
+    return Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+
+
+def _after(field, value, nullable):
+    """Условие "строго после value" по одному полю; None - таких строк нет"""
+    name = field.lstrip('-')
+    lookup = 'lt' if field.startswith('-') else 'gt'
+    if name not in nullable and value is not None:
+        return Q(**{f'{name}__{lookup}': value})
+    # NULL больше любого значения
+    if lookup == 'gt':
+        return None if value is None else Q(**{f'{name}__gt': value}) | Q(**{f'{name}__isnull': True})
+    return Q(**{f'{name}__isnull': False}) if value is None else Q(**{f'{name}__lt': value})
+
+
+def keyset_filter(ordering, position, nullable=()):
+    """Условие "строго после position" для смешанных направлений сортировки"""
+    condition = Q()
+    for index, field in enumerate(ordering):
+        step = _after(field, position[index], nullable)
+        if step is None:
+            continue
+        for previous, value in zip(ordering[:index], position):
+            step &= _equals(previous.lstrip('-'), value)
+        condition |= step
+    return condition
+
+
+def encode_cursor(ordering, position, reverse=False):
+    payload = json.dumps(
+        {'o': ordering, 'p': position, 'r': int(reverse)},
+        cls=CursorEncoder, separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, ordering, model):
+    """Возвращает (position, reverse); курсор от другой сортировки недействителен"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        position, reverse = payload['p'], bool(payload['r'])
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise InvalidCursor(token)
+    if payload.get('o') != ordering or len(position) != len(ordering):
+        raise InvalidCursor(token)
+    return [_to_python(model, field, value) for field, value in zip(ordering, position)], reverse
+
+
+def _to_python(model, field, value):
+    """Восстанавливает тип значения из JSON (даты, Decimal) по полю модели"""
+    name = field.lstrip('-')
+    if value is None or '__' in name:
+        return value
+    try:
+        model_field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return value  # аннотация
+    try:
+        return model_field.to_python(value)
+    except Exception:
+        raise InvalidCursor(value)
+
+
+class KeysetPage:
+    """Страница keyset пагинации (совместима с шаблонами по has_next/has_previous)"""
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Пагинатор по ключу сортировки queryset; count - оценка (см. estimate_count)"""
+
+    def __init__(self, queryset, per_page, ordering=None, with_estimate=True):
+        self.ordering = list(ordering) if ordering else get_keyset_ordering(queryset)
+        self.nullable = nullable_fields(queryset.model, self.ordering)
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.with_estimate = with_estimate
+        self._count = None
+        self._get_position = attrgetter(
+            *[field.lstrip('-').replace('__', '.') for field in self.ordering]
+        )
+
+    @property
+    def count(self):
+        if not self.with_estimate:
+            return None
+        if self._count is None:
+            self._count = estimate_count(self.queryset)
+        return self._count
+
+    def position(self, obj):
+        values = self._get_position(obj)
+        return list(values) if len(self.ordering) > 1 else [values]
+
+    def page(self, cursor=None):
+        position, reverse = (None, False)
+        if cursor:
+            position, reverse = decode_cursor(cursor, self.ordering, self.queryset.model)
+
+        ordering = reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = self.queryset.order_by(*keyset_order_by(ordering, self.nullable))
+        if position is not None:
+            queryset = queryset.filter(keyset_filter(ordering, position, self.nullable))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        has_next = has_more if not reverse else True
+        has_previous = position is not None if not reverse else has_more
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(self.ordering, self.position(rows[-1]))
+        if rows and has_previous:
+            previous_cursor = encode_cursor(self.ordering, self.position(rows[0]), reverse=True)
+        return KeysetPage(rows, self, next_cursor, previous_cursor)
+
+
+class KeysetPaginationMixin:
+    """
+    ListView с keyset пагинацией по ?cursor=. Ссылки ?page=N продолжают
+    работать через обычную OFFSET пагинацию.
+    """
+    cursor_kwarg = 'cursor'
+    keyset_ordering = None
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.page_kwarg in self.request.GET or self.page_kwarg in self.kwargs:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size, ordering=self.keyset_ordering)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404(_('Неверный курсор страницы'))
+        return paginator, page, page.object_list, page.has_other_pages()
@@ -1,15 +1,169 @@
+"""
+Парсеры внешних источников мероприятий.
+
+- external_id детерминирован: SHA-1 канонического URL мероприятия, а если
+  ссылки нет - SHA-1 нормализованных полей (stable_external_id). Встроенный
+  hash() для этого не подходит: он солится заново в каждом процессе, и
+  каждая синхронизация создавала дубликаты.
+- HTML разбирается потоково (CardStreamParser на html.parser): карточки
+  выдаются по мере чтения ответа, полное дерево документа не строится.
+- Страницы листинга перебираются лениво (iter_pages), следующая страница
+  загружается только если предыдущая дала новые мероприятия. Ошибка
+  загрузки второй и следующих страниц завершает обход, мероприятия уже
+  прочитанных страниц сохраняются.
+- Для домена без парсера get_parser возвращает None.
+"""
+import codecs
+import hashlib
 import requests
-from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
+from html.parser import HTMLParser
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
 import re
 from django.utils import timezone
 import logging
 
 logger = logging.getLogger(__name__)
 
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4'}
+CHUNK_SIZE = 16 * 1024
+
+
+def canonical_url(url):
+    """Схема и хост в нижнем регистре, без фрагмента, utm-меток и завершающего '/'"""
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.startswith('utm_')
+    ))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/') or '/', query, ''))
+
+
+def stable_external_id(prefix, url=None, *fields):
+    """'<prefix>_<sha1>' от URL мероприятия или, без URL, от нормализованных полей"""
+    if url:
+        key = canonical_url(url)
+    else:
+        key = '|'.join(re.sub(r'\s+', ' ', str(field or '')).strip().lower() for field in fields)
+    return f"{prefix}_{hashlib.sha1(key.encode()).hexdigest()}"
+
+
+class Card:
+    """Карточка мероприятия из листинга: заголовок, ссылка, изображение"""
+    __slots__ = ('title', 'href', 'image', '_title_parts')
+
+    def __init__(self):
+        self.title = ''
+        self.href = ''
+        self.image = ''
+        self._title_parts = None
+
+
+class _OpenDiv:
+    __slots__ = ('card', 'headings', 'pending')
+
+    def __init__(self, card):
+        self.card = card
+        self.headings = 0
+        self.pending = []
+
+
+class CardStreamParser(HTMLParser):
+    """
+    Потоковый поиск карточек: <div>, в классе которого есть одно из
+    card_classes. Карточка - самый внешний такой div ровно с одним
+    заголовком h1-h4 (div с несколькими заголовками - это контейнер списка,
+    вложенные div с тем же заголовком - части карточки).
+    Карточки попадают в ready, как только это становится известно.
+    """
+
+    def __init__(self, card_classes):
+        super().__init__(convert_charrefs=True)
+        self.card_classes = tuple(card_classes)
+        self.ready = []
+        self._divs = []
+        self._heading = None
+
+    def _open_cards(self):
+        return [entry for entry in self._divs if entry.card is not None]
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'div':
+            classes = dict(attrs).get('class') or ''
+            matched = any(name in classes for name in self.card_classes)
+            self._divs.append(_OpenDiv(Card() if matched else None))
+            return
+        open_cards = self._open_cards()
+        if not open_cards:
+            return
+        attrs = dict(attrs)
+        if tag in HEADING_TAGS and self._heading is None:
+            self._heading = tag
+            for entry in open_cards:
+                entry.headings += 1
+                if entry.headings == 2:
+                    # Второй заголовок: это список, его карточки уже окончательные
+                    self.ready.extend(entry.pending)
+                    entry.pending.clear()
+                if not entry.card.title:
+                    entry.card._title_parts = []
+        elif tag == 'a' and attrs.get('href'):
+            for entry in open_cards:
+                entry.card.href = entry.card.href or attrs['href']
+        elif tag == 'img' and attrs.get('src'):
+            for entry in open_cards:
+                entry.card.image = entry.card.image or attrs['src']
+
+    def handle_data(self, data):
+        if self._heading is None:
+            return
+        for entry in self._open_cards():
+            if entry.card._title_parts is not None:
+                entry.card._title_parts.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == self._heading:
+            self._heading = None
+            for entry in self._open_cards():
+                card = entry.card
+                if card._title_parts is not None:
+                    card.title = re.sub(r'\s+', ' ', ''.join(card._title_parts)).strip()
+                    card._title_parts = None
+            return
+        if tag != 'div' or not self._divs:
+            return
+        entry = self._divs.pop()
+        if entry.card is None or entry.headings != 1 or not entry.card.title:
+            return
+        # Внешний div с тем же единственным заголовком заменит эту карточку
+        parent = next((item for item in reversed(self._divs) if item.card is not None), None)
+        if parent is None or parent.headings > 1:
+            self.ready.append(entry.card)
+        else:
+            parent.pending = [entry.card]
+
+
+def iter_cards(chunks, card_classes, encoding='utf-8'):
+    """Генератор карточек из потока HTML (bytes или str)"""
+    parser = CardStreamParser(card_classes)
+    # Инкрементальный декодер: многобайтный символ может попасть на границу чанков
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        parser.feed(chunk)
+        yield from parser.ready
+        parser.ready.clear()
+    parser.close()
+    yield from parser.ready
+
+
 class BaseParser:
     """Базовый класс парсера"""
-    
+    # Префикс external_id и подстроки класса div-карточки
+    id_prefix = 'external'
+    card_classes = ('event', 'card', 'item')
+
     def __init__(self, source):
         self.source = source
         self.config = source.parser_config
@@ -17,17 +171,104 @@ class BaseParser:
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
-    
+
+    def fetch(self, headers=None, url=None, stream=False):
+        """HTTP-запрос к источнику (условные заголовки передает events.sync)"""
+        return self.session.get(url or self.source.url, headers=headers, timeout=10, stream=stream)
+
+    def page_url(self, number):
+        """
+        URL страницы листинга. Пагинация включается в parser_config:
+        {"page_param": "page", "max_pages": 10}.
+        """
+        parts = urlsplit(self.source.url)
+        query = dict(parse_qsl(parts.query))
+        query[self.config['page_param']] = str(number)
+        return urlunsplit(parts._replace(query=urlencode(query)))
+
+    def iter_pages(self, first_page=None):
+        """Лениво выдает потоки HTML страниц листинга"""
+        if first_page is not None:
+            yield [first_page]
+        else:
+            with self.fetch(stream=True) as response:
+                response.raise_for_status()
+                yield response.iter_content(chunk_size=CHUNK_SIZE)
+
+        if not self.config.get('page_param'):
+            return
+        for number in range(2, int(self.config.get('max_pages', 10)) + 1):
+            failed = []
+            try:
+                response = self.fetch(url=self.page_url(number), stream=True)
+            except requests.RequestException as e:
+                logger.warning(f"Stopped paging {self.source.url} at page {number}: {e}")
+                return
+            with response:
+                if response.status_code != 200:
+                    return
+                yield self.read_page(response, number, failed)
+            if failed:
+                return
+
+    def read_page(self, response, number, failed):
+        """Чанки страницы; обрыв соединения завершает страницу и отмечается в failed"""
+        try:
+            yield from response.iter_content(chunk_size=CHUNK_SIZE)
+        except requests.RequestException as e:
+            logger.warning(f"Stopped paging {self.source.url} at page {number}: {e}")
+            failed.append(number)
+
+    def iter_events(self, first_page=None):
+        """Генератор мероприятий по всем страницам; пустая страница завершает обход"""
+        seen = set()
+        for chunks in self.iter_pages(first_page):
+            new_items = 0
+            for card in iter_cards(chunks, self.card_classes):
+                try:
+                    event_data = self.build_event(card)
+                except Exception as e:
+                    logger.error(f"Error parsing event card from {self.source.url}: {e}")
+                    continue
+                if event_data and event_data['external_id'] not in seen:
+                    seen.add(event_data['external_id'])
+                    new_items += 1
+                    yield event_data
+            if not new_items:
+                return
+
     def parse_events(self):
         """Основной метод парсинга событий"""
+        try:
+            return list(self.iter_events())
+        except Exception as e:
+            logger.error(f"Error fetching {self.source.url}: {e}")
+            return []
+
+    def parse_content(self, content):
+        """Разбор уже загруженной первой страницы (остальные страницы загружаются лениво)"""
+        return list(self.iter_events(first_page=content))
+
+    def build_event(self, card):
+        """Карточка -> словарь полей ExternalEvent"""
         raise NotImplementedError
-    
+
+    def event_url(self, card):
+        return urljoin(self.source.url, card.href) if card.href else ''
+
+    def external_id(self, card):
+        """ID по ссылке на мероприятие; ссылка на сам листинг не уникальна"""
+        url = self.event_url(card)
+        if url and canonical_url(url) != canonical_url(self.source.url):
+            return stable_external_id(self.id_prefix, url)
+        return stable_external_id(self.id_prefix, None, card.title)
+
     def normalize_date(self, date_str):
         """Нормализация даты"""
         try:
             # Удаляем лишние пробелы и приводим к нижнему регистру
             date_str = re.sub(r'\s+', ' ', date_str).strip().lower()
-            
+
             # Парсим различные форматы дат
             formats = [
                 '%d.%m.%Y %H:%M',
@@ -35,13 +276,13 @@ class BaseParser:
                 '%d %B %Y %H:%M',
                 '%B %d, %Y %H:%M',
             ]
-            
+
             for fmt in formats:
                 try:
                     return datetime.strptime(date_str, fmt)
                 except ValueError:
                     continue
-            
+
             # Если не удалось распарсить, возвращаем текущую дату
             return timezone.now()
         except Exception as e:
@@ -50,210 +291,85 @@ class BaseParser:
 
 class BezkassiraParser(BaseParser):
     """Парсер для bezkassira.by"""
-    
-    def parse_events(self):
-        try:
-            response = self.session.get(self.source.url, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            events = []
-            
-            # Поиск карточек мероприятий - адаптируйте под актуальную структуру
-            event_cards = soup.find_all('div', class_=lambda x: x and any(cls in x for cls in ['event', 'card', 'ticket', 'item']))
-            
-            for card in event_cards[:10]:  # Ограничим первыми 10 для теста
-                try:
-                    event_data = self.parse_event_card(card)
-                    if event_data:
-                        events.append(event_data)
-                except Exception as e:
-                    logger.error(f"Error parsing event card: {e}")
-                    continue
-            
-            return events
-        except Exception as e:
-            logger.error(f"Error parsing bezkassira: {e}")
-            return []
-    
-    def parse_event_card(self, card):
-        """Парсит отдельную карточку мероприятия"""
-        try:
-            # Поиск заголовка
-            title_elem = card.find(['h1', 'h2', 'h3', 'h4', '.title', '.event-title'])
-            title = title_elem.get_text().strip() if title_elem else "Неизвестное мероприятие"
-            
-            # Поиск ссылки
-            link_elem = card.find('a')
-            event_url = link_elem.get('href') if link_elem else self.source.url
-            if event_url and not event_url.startswith('http'):
-                event_url = self.source.url.rstrip('/') + event_url
-            
-            return {
-                'external_id': f"bezkassira_{hash(title)}",
-                'title': title,
-                'description': f"Мероприятие с Bezkassira.by: {title}",
-                'short_description': title[:200],
-                'date': timezone.now() + timedelta(days=1),  # Завтрашняя дата для примера
-                'location': 'Минск, Беларусь',
-                'price': 0,
-                'is_free': True,
-                'image_url': '',
-                'external_url': event_url,
-                'category': 'Развлечения',
-                'raw_data': {'title': title, 'source': 'bezkassira'}
-            }
-        except Exception as e:
-            logger.error(f"Error in parse_event_card: {e}")
-            return None
+    id_prefix = 'bezkassira'
+    card_classes = ('event', 'card', 'ticket', 'item')
+
+    def build_event(self, card):
+        return {
+            'external_id': self.external_id(card),
+            'title': card.title,
+            'description': f"Мероприятие с Bezkassira.by: {card.title}",
+            'short_description': card.title[:200],
+            'date': timezone.now() + timedelta(days=1),  # Завтрашняя дата для примера
+            'location': 'Минск, Беларусь',
+            'price': 0,
+            'is_free': True,
+            'image_url': urljoin(self.source.url, card.image) if card.image else '',
+            'external_url': self.event_url(card) or self.source.url,
+            'category': 'Развлечения',
+            'raw_data': {'title': card.title, 'source': 'bezkassira'}
+        }
 
 class RelaxAfishaParser(BaseParser):
     """Парсер для afisha.relax.by"""
-    
-    def parse_events(self):
-        try:
-            response = self.session.get(self.source.url, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            events = []
-            
-            # Базовый парсинг для теста
-            event_elements = soup.find_all('div', class_=lambda x: x and any(cls in x for cls in ['event', 'afisha', 'item']))
-            
-            for element in event_elements[:10]:
-                try:
-                    event_data = self.parse_event_element(element)
-                    if event_data:
-                        events.append(event_data)
-                except Exception as e:
-                    logger.error(f"Error parsing relax event: {e}")
-                    continue
-            
-            return events
-        except Exception as e:
-            logger.error(f"Error parsing relax.by: {e}")
-            return []
-    
-    def parse_event_element(self, element):
-        """Парсит элемент мероприятия с relax.by"""
-        try:
-            title_elem = element.find(['h1', 'h2', 'h3', 'h4', '.title'])
-            title = title_elem.get_text().strip() if title_elem else "Событие с Relax.by"
-            
-            return {
-                'external_id': f"relax_{hash(str(element))}",
-                'title': title,
-                'description': f"Мероприятие с Relax.by: {title}",
-                'short_description': title[:200],
-                'date': timezone.now() + timedelta(days=2),
-                'location': 'Минск, Беларусь',
-                'price': 0,
-                'is_free': True,
-                'image_url': '',
-                'external_url': self.source.url,
-                'category': 'Культура',
-                'raw_data': {'title': title, 'source': 'relax'}
-            }
-        except Exception as e:
-            logger.error(f"Error in parse_event_element: {e}")
-            return None
+    id_prefix = 'relax'
+    card_classes = ('event', 'afisha', 'item')
+
+    def build_event(self, card):
+        return {
+            'external_id': self.external_id(card),
+            'title': card.title,
+            'description': f"Мероприятие с Relax.by: {card.title}",
+            'short_description': card.title[:200],
+            'date': timezone.now() + timedelta(days=2),
+            'location': 'Минск, Беларусь',
+            'price': 0,
+            'is_free': True,
+            'image_url': urljoin(self.source.url, card.image) if card.image else '',
+            'external_url': self.event_url(card) or self.source.url,
+            'category': 'Культура',
+            'raw_data': {'title': card.title, 'source': 'relax'}
+        }
 
 class CultureRuParser(BaseParser):
     """Парсер для culture.ru"""
-    
-    def parse_events(self):
-        try:
-            response = self.session.get(self.source.url, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            events = []
-            
-            # Базовый парсинг
-            event_elements = soup.find_all('div', class_=lambda x: x and any(cls in x for cls in ['event', 'card', 'item']))
-            
-            for element in event_elements[:10]:
-                try:
-                    event_data = self.parse_culture_event(element)
-                    if event_data:
-                        events.append(event_data)
-                except Exception as e:
-                    logger.error(f"Error parsing culture.ru event: {e}")
-                    continue
-            
-            return events
-        except Exception as e:
-            logger.error(f"Error parsing culture.ru: {e}")
-            return []
-    
-    def parse_culture_event(self, element):
-        """Парсит мероприятие с culture.ru"""
-        try:
-            title_elem = element.find(['h1', 'h2', 'h3', 'h4', '.title'])
-            title = title_elem.get_text().strip() if title_elem else "Культурное событие"
-            
-            return {
-                'external_id': f"culture_{hash(str(element))}",
-                'title': title,
-                'description': f"Культурное мероприятие с Culture.ru: {title}",
-                'short_description': title[:200],
-                'date': timezone.now() + timedelta(days=3),
-                'location': 'Москва, Россия',
-                'price': 0,
-                'is_free': True,
-                'image_url': '',
-                'external_url': self.source.url,
-                'category': 'Культура',
-                'raw_data': {'title': title, 'source': 'culture'}
-            }
-        except Exception as e:
-            logger.error(f"Error in parse_culture_event: {e}")
-            return None
+    id_prefix = 'culture'
+
+    def build_event(self, card):
+        return {
+            'external_id': self.external_id(card),
+            'title': card.title,
+            'description': f"Культурное мероприятие с Culture.ru: {card.title}",
+            'short_description': card.title[:200],
+            'date': timezone.now() + timedelta(days=3),
+            'location': 'Москва, Россия',
+            'price': 0,
+            'is_free': True,
+            'image_url': urljoin(self.source.url, card.image) if card.image else '',
+            'external_url': self.event_url(card) or self.source.url,
+            'category': 'Культура',
+            'raw_data': {'title': card.title, 'source': 'culture'}
+        }
 
 class EventsInRussiaParser(BaseParser):
     """Парсер для eventsinrussia.com"""
-    
-    def parse_events(self):
-        try:
-            response = self.session.get(self.source.url, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            events = []
-            
-            # Базовый парсинг
-            event_elements = soup.find_all('div', class_=lambda x: x and any(cls in x for cls in ['event', 'card', 'item']))
-            
-            for element in event_elements[:10]:
-                try:
-                    event_data = self.parse_russia_event(element)
-                    if event_data:
-                        events.append(event_data)
-                except Exception as e:
-                    logger.error(f"Error parsing eventsinrussia event: {e}")
-                    continue
-            
-            return events
-        except Exception as e:
-            logger.error(f"Error parsing eventsinrussia.com: {e}")
-            return []
-    
-    def parse_russia_event(self, element):
-        """Парсит мероприятие с eventsinrussia.com"""
-        try:
-            title_elem = element.find(['h1', 'h2', 'h3', 'h4', '.title'])
-            title = title_elem.get_text().strip() if title_elem else "Событие в России"
-            
-            return {
-                'external_id': f"russia_{hash(str(element))}",
-                'title': title,
-                'description': f"Мероприятие в России: {title}",
-                'short_description': title[:200],
-                'date': timezone.now() + timedelta(days=4),
-                'location': 'Россия',
-                'price': 0,
-                'is_free': True,
-                'image_url': '',
-                'external_url': self.source.url,
-                'category': 'Развлечения',
-                'raw_data': {'title': title, 'source': 'russia'}
-            }
-        except Exception as e:
-            logger.error(f"Error in parse_russia_event: {e}")
-            return None
+    id_prefix = 'russia'
+
+    def build_event(self, card):
+        return {
+            'external_id': self.external_id(card),
+            'title': card.title,
+            'description': f"Мероприятие в России: {card.title}",
+            'short_description': card.title[:200],
+            'date': timezone.now() + timedelta(days=4),
+            'location': 'Россия',
+            'price': 0,
+            'is_free': True,
+            'image_url': urljoin(self.source.url, card.image) if card.image else '',
+            'external_url': self.event_url(card) or self.source.url,
+            'category': 'Развлечения',
+            'raw_data': {'title': card.title, 'source': 'russia'}
+        }
 
 PARSER_MAPPING = {
     'bezkassira.by': BezkassiraParser,
@@ -263,8 +379,8 @@ PARSER_MAPPING = {
 }
 
 def get_parser(source):
-    """Фабрика парсеров"""
+    """Фабрика парсеров; None, если для домена источника парсера нет"""
     for domain, parser_class in PARSER_MAPPING.items():
         if domain in source.url:
             return parser_class(source)
-    return BaseParser(source)
\ No newline at end of file
+    return None
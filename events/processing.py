@@ -0,0 +1,97 @@
+"""
+Фоновая обработка мероприятия после сохранения: копии изображения
+нужных размеров, геокодирование адреса и сброс связанных кешей.
+
+Event.save() только ставит processing_status='pending' и после коммита
+вызывает schedule_event_processing(). Если EVENT_PROCESSING_ASYNC выключен
+(тесты, локальная разработка без брокера) или брокер недоступен, обработка
+выполняется в том же процессе.
+"""
+import logging
+from importlib import import_module
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+
+from .geo import geohash_encode
+from .models import Event
+from .renditions import generate_renditions
+
+logger = logging.getLogger(__name__)
+
+
+def _enqueue(task_name, args, fallback, countdown=None):
+    """Ставит задачу Celery в очередь; без брокера вызывает fallback(*args) в процессе"""
+    if getattr(settings, 'EVENT_PROCESSING_ASYNC', True):
+        try:
+            task = getattr(import_module('.tasks', __package__), task_name)
+            options = {'countdown': countdown} if countdown else {}
+            task.apply_async(args, retry=False, **options)
+            return
+        except Exception as e:
+            logger.warning(f"Celery недоступен, {task_name}{args} выполняется синхронно: {e}")
+    fallback(*args)
+
+
+def schedule_event_processing(event_id):
+    _enqueue('process_event_media', (event_id,), process_event)
+
+
+def schedule_renditions(instance):
+    _enqueue('generate_image_renditions', (instance._meta.label, instance.pk), process_renditions)
+
+
+def geocode(event):
+    """Координаты по адресу; возвращает поля для обновления"""
+    if not event.location or event.has_coordinates:
+        return {}
+    event.geocode_location()
+    if not event.has_coordinates:
+        return {}
+    return {
+        'latitude': event.latitude,
+        'longitude': event.longitude,
+        'geohash': geohash_encode(event.latitude, event.longitude),
+    }
+
+
+def invalidate_event_caches(event):
+    """Прогноз погоды кешируется по мероприятию и дате и зависит от адреса"""
+    try:
+        cache.delete(f"weather_{event.id}_{event.date.strftime('%Y%m%d')}")
+    except Exception as e:
+        logger.warning(f"Не удалось сбросить кеш мероприятия {event.id}: {e}")
+
+
+def process_event(event_id):
+    """Обрабатывает мероприятие; статус ready/failed записывается через update()"""
+    events = Event.objects.filter(pk=event_id)
+    if not events.update(processing_status='processing'):
+        return
+    event = events.get()
+
+    updates = {'processing_status': 'ready'}
+    try:
+        generate_renditions(event, 'image')
+        updates.update(geocode(event))
+        invalidate_event_caches(event)
+    except Exception as e:
+        logger.error(f"Ошибка обработки мероприятия {event_id}: {e}")
+        updates['processing_status'] = 'failed'
+
+    # update() не вызывает Event.save(), поэтому обработка не запускается повторно.
+    # Если за время обработки мероприятие сохранили снова (статус 'pending'),
+    # результат устарел: статус и координаты запишет следующая обработка
+    events.filter(processing_status='processing').update(**updates)
+
+
+def process_renditions(model_label, object_id):
+    """Копии изображения рекламы или превью видео"""
+    instance = apps.get_model(model_label).objects.filter(pk=object_id).first()
+    if instance is None:
+        return
+    try:
+        generate_renditions(instance)
+    except Exception as e:
+        logger.error(f"Ошибка создания копий изображения {model_label} {object_id}: {e}")
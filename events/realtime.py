@@ -0,0 +1,256 @@
+"""
+Push обновлений в WebSocket через группы слоя каналов.
+
+Изменения моделей публикуются после коммита компактными дельтами:
+- счетчики EventStatistic (регистрации, избранное, отзывы) -> event_<id>;
+- новая регистрация -> analytics (лента активности);
+- новое уведомление (в том числе из bulk_create рассылки подписчикам,
+  publish_notifications) -> user_<id>.
+Потребители (events/consumers.py) только пересылают сообщения своих
+групп и не опрашивают базу. Глобальный снимок аналитики считает один
+тикер (задача broadcast_analytics каждые 10 секунд) для всех подписчиков
+группы analytics; последний снимок с номером версии лежит в кеше для
+только что подключившихся клиентов. Число пользователей онлайн берется
+из множества присутствия WebSocket-соединений (PRESENCE_STORE).
+
+Без channels или без CHANNEL_LAYERS публикация пропускается.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Event, Notification, Registration
+
+try:
+    from channels.layers import get_channel_layer
+except ImportError:  # channels не установлен
+    get_channel_layer = None
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_GROUP = 'analytics'
+ANALYTICS_SNAPSHOT_KEY = 'realtime:analytics_snapshot'
+ANALYTICS_SNAPSHOT_TTL = 60  # секунд; тикер обновляет снимок чаще
+PRESENCE_GROUP = 'presence'
+PRESENCE_KEY = 'realtime:presence'
+PRESENCE_TTL = 30  # секунд; три пропущенных пульса тикера
+
+
+def event_group(event_id):
+    return f'event_{event_id}'
+
+
+def user_group(user_id):
+    return f'user_{user_id}'
+
+
+def channel_layer():
+    """Слой каналов или None, если channels не установлен или бэкенд слоя не загружается"""
+    if get_channel_layer is None:
+        return None
+    try:
+        return get_channel_layer()
+    except Exception as e:
+        logger.warning(f"Channel layer is unavailable: {e}")
+        return None
+
+
+def group_send(group, message_type, data):
+    """
+    Отправка сообщения группе; недоступный слой каналов не должен ломать запись.
+    data может быть функцией - она вызывается, только если слой настроен.
+    """
+    layer = channel_layer()
+    if layer is None:
+        return False
+    try:
+        if callable(data):
+            data = data()
+        async_to_sync(layer.group_send)(group, {'type': message_type, 'data': data})
+    except Exception as e:
+        logger.warning(f"Channel layer publish to {group} failed: {e}")
+        return False
+    return True
+
+
+def publish(group, message_type, data):
+    """Отправка после коммита: подписчики не увидят откатившихся изменений"""
+    transaction.on_commit(lambda: group_send(group, message_type, data))
+
+
+def publish_event_delta(event_id, **deltas):
+    """Сдвиг счетчиков мероприятия для подписчиков event_<id>"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if deltas:
+        publish(event_group(event_id), 'event.delta', {'event_id': event_id, 'changes': deltas})
+
+
+def notification_payload(notification):
+    return {
+        'id': notification.id,
+        'message': notification.message,
+        'event_id': notification.event_id,
+        'timestamp': notification.sent_at.isoformat(),
+    }
+
+
+def registration_payload(registration):
+    return {
+        'type': 'registration',
+        'user': registration.user.username,
+        'event': registration.event.title,
+        'timestamp': registration.registration_date.isoformat(),
+    }
+
+
+@receiver(post_save, sender=Registration)
+def publish_registration(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        publish(ANALYTICS_GROUP, 'analytics.live', lambda: registration_payload(instance))
+
+
+@receiver(post_save, sender=Notification)
+def publish_notification(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        publish(user_group(instance.user_id), 'notification.push', notification_payload(instance))
+
+
+def publish_notifications(notifications):
+    """Уведомления, созданные bulk_create (без post_save), - в группы получателей"""
+    if channel_layer() is None:
+        return
+    for notification in notifications:
+        publish(user_group(notification.user_id), 'notification.push', notification_payload(notification))
+
+
+# Присутствие: соединения в сортированном множестве с временем истечения
+# в качестве очков. Соединение добавляется при подключении, удаляется при
+# отключении и продлевается пульсом тикера; оборванные без disconnect
+# соединения истекают через PRESENCE_TTL.
+
+_presence = {'store': None}
+
+
+def get_presence_store():
+    if _presence['store'] is None:
+        store_class = import_string(
+            getattr(settings, 'PRESENCE_STORE', 'events.gamification.leaderboard.RedisSortedSet')
+        )
+        _presence['store'] = store_class(key=PRESENCE_KEY)
+    return _presence['store']
+
+
+@receiver(setting_changed)
+def reset_presence_store(setting, **kwargs):
+    if setting in ('PRESENCE_STORE', 'LEADERBOARD_REDIS_URL'):
+        _presence['store'] = None
+
+
+def presence_member(user, channel_name):
+    """Участник множества: ID пользователя (anon для гостей) и канал соединения"""
+    user_id = user.pk if user is not None and user.is_authenticated else 'anon'
+    return f'{user_id}:{channel_name}'
+
+
+def mark_online(member):
+    try:
+        get_presence_store().zadd({member: time.time() + PRESENCE_TTL})
+    except Exception as e:
+        logger.warning(f"Presence store unavailable: {e}")
+
+
+def mark_offline(member):
+    try:
+        get_presence_store().zrem(member)
+    except Exception as e:
+        logger.warning(f"Presence store unavailable: {e}")
+
+
+def online_counts():
+    """(пользователей онлайн, соединений); гость - одно соединение"""
+    store = get_presence_store()
+    store.zremrangebyscore(float('-inf'), time.time())
+    members = [member for member, _ in store.zrevrange(0, -1)]
+    users = {member.split(':', 1)[0] for member in members}
+    guests = sum(1 for member in members if member.startswith('anon:'))
+    return len(users - {'anon'}) + guests, len(members)
+
+
+# Глобальный снимок аналитики. Единственный производитель (задача
+# broadcast_analytics) хранит в кеше {'version', 'generated_at', 'data'};
+# версия растет, только если данные изменились, и только тогда снимок
+# рассылается. Потребители отправляют клиенту лишь изменившиеся ключи.
+
+def compute_analytics_snapshot():
+    now = timezone.now()
+    recent_registrations = Registration.objects.filter(
+        registration_date__gte=now - timedelta(minutes=5)
+    ).select_related('user', 'event')[:10]
+    try:
+        online_users, connections = online_counts()
+    except Exception as e:
+        logger.warning(f"Presence store unavailable: {e}")
+        online_users, connections = None, None
+    return {
+        'online_users': online_users,
+        'connections': connections,
+        'active_events': Event.objects.filter(is_active=True, date__gte=now).count(),
+        'registrations_last_hour': Registration.objects.filter(
+            registration_date__gte=now - timedelta(hours=1)
+        ).count(),
+        'popular_categories': list(
+            Event.objects.filter(is_active=True)
+            .values('category__name').annotate(count=Count('id')).order_by('-count')[:5]
+        ),
+        'live_updates': [registration_payload(registration) for registration in recent_registrations],
+    }
+
+
+def snapshot_entry(data, version):
+    return {'version': version, 'generated_at': timezone.now().isoformat(), 'data': data}
+
+
+def get_analytics_snapshot():
+    """Последний снимок тикера; считается на месте, только если тикер еще не работал"""
+    entry = cache.get(ANALYTICS_SNAPSHOT_KEY)
+    if entry is None:
+        entry = snapshot_entry(compute_analytics_snapshot(), 1)
+        if not cache.add(ANALYTICS_SNAPSHOT_KEY, entry, ANALYTICS_SNAPSHOT_TTL):
+            entry = cache.get(ANALYTICS_SNAPSHOT_KEY, entry)
+    return entry
+
+
+def broadcast_analytics():
+    """
+    Один расчет снимка на тик для всех подписчиков группы analytics.
+    Заодно рассылает пульс присутствия всем соединениям.
+    """
+    group_send(PRESENCE_GROUP, 'presence.heartbeat', {})
+    data = compute_analytics_snapshot()
+    previous = cache.get(ANALYTICS_SNAPSHOT_KEY)
+    if previous is not None and previous['data'] == data:
+        cache.touch(ANALYTICS_SNAPSHOT_KEY, ANALYTICS_SNAPSHOT_TTL)
+        return previous
+    entry = snapshot_entry(data, previous['version'] + 1 if previous else 1)
+    cache.set(ANALYTICS_SNAPSHOT_KEY, entry, ANALYTICS_SNAPSHOT_TTL)
+    group_send(ANALYTICS_GROUP, 'analytics.snapshot', entry)
+    return entry
+
+
+def snapshot_diff(data, sent):
+    """Ключи снимка, отличающиеся от уже отправленных клиенту; лента идет через analytics.live"""
+    return {
+        key: value for key, value in data.items()
+        if key != 'live_updates' and sent.get(key) != value
+    }
@@ -0,0 +1,194 @@
+"""
+Нагрузочный тест WebSocket-потребителей (команда benchmark_websockets).
+
+N соединений открываются через channels.testing.WebsocketCommunicator прямо
+к маршрутам events/routing.py, без сети и ASGI-сервера, поровну на
+ws/analytics/, ws/event/<id>/ и ws/notifications/. Каждый раунд:
+подтвержденная регистрация на мероприятие, по уведомлению каждому
+подключенному пользователю и тик аналитики (broadcast_analytics).
+
+Считаются задержка от начала раунда до получения сообщения клиентом
+(p50/p95/max), сообщений в секунду, SQL-запросы на тик аналитики и на
+раунд целиком (вместе с обработчиками потребителей) и прирост памяти на
+соединение (tracemalloc).
+
+По умолчанию слой каналов, кеш и хранилища множеств подменяются на
+хранилища в памяти процесса; с configured_layer=True используются
+настройки проекта (Redis). Созданные пользователи и мероприятия удаляются
+после прогона: потребители работают с базой из своих обработчиков, поэтому
+откат общей транзакции здесь не подходит.
+"""
+import asyncio
+import time
+import tracemalloc
+import uuid
+from collections import namedtuple
+from contextlib import nullcontext
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from .models import Category, Event, Notification, Registration
+from .realtime import broadcast_analytics
+from .recommendation_eval import percentile
+from .routing import websocket_urlpatterns
+
+BenchmarkReport = namedtuple(
+    'BenchmarkReport',
+    ['connections', 'rounds', 'messages', 'messages_per_second', 'latency_p50', 'latency_p95', 'latency_max',
+     'queries_per_tick', 'queries_per_round', 'memory_per_connection'],
+)
+Fixtures = namedtuple('Fixtures', ['category', 'users', 'watched', 'events'])
+
+IN_MEMORY_STORE = 'events.gamification.leaderboard.InMemorySortedSet'
+SELF_CONTAINED_SETTINGS = {
+    'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'PRESENCE_STORE': IN_MEMORY_STORE,
+    'LEADERBOARD_STORE': IN_MEMORY_STORE,
+}
+# Клиент считается получившим все сообщения раунда, если столько секунд ничего не приходит
+QUIET_PERIOD = 0.05
+
+
+def create_fixtures(users, rounds):
+    """Пользователи без пароля, наблюдаемое мероприятие и по мероприятию на раунд для уведомлений"""
+    User = get_user_model()
+    prefix = f'ws-bench-{uuid.uuid4().hex[:8]}'
+    accounts = [User(username=f'{prefix}-{i}') for i in range(max(users, rounds) + 1)]
+    for account in accounts:
+        account.set_unusable_password()
+    User.objects.bulk_create(accounts)
+    accounts = list(User.objects.filter(username__startswith=prefix).order_by('pk'))
+
+    category = Category.objects.create(name=prefix, slug=prefix)
+    organizer = accounts.pop(0)
+    date = timezone.now() + timedelta(days=7)
+    events = [
+        Event.objects.create(
+            title=f'Нагрузочный тест {i}', description='', location='', organizer=organizer,
+            category=category, date=date, capacity=len(accounts) + 1,
+        )
+        for i in range(rounds + 1)
+    ]
+    return Fixtures(category, [organizer] + accounts, events[0], events[1:])
+
+
+def delete_fixtures(fixtures):
+    Event.objects.filter(pk__in=[fixtures.watched.pk] + [event.pk for event in fixtures.events]).delete()
+    get_user_model().objects.filter(pk__in=[user.pk for user in fixtures.users]).delete()
+    fixtures.category.delete()
+
+
+def drive_round(fixtures, listeners, round_number):
+    """Действия раунда: регистрация на наблюдаемое мероприятие и уведомления слушателям"""
+    Registration.objects.create(
+        user=fixtures.users[round_number + 1], event=fixtures.watched, status='confirmed',
+    )
+    event = fixtures.events[round_number]
+    for user in listeners:
+        Notification.objects.create(user=user, event=event, message=f'Раунд {round_number + 1}')
+
+
+def analytics_tick():
+    """Тик общего тикера; возвращает число SQL-запросов"""
+    with CaptureQueriesContext(connection) as queries:
+        broadcast_analytics()
+    return len(queries)
+
+
+def stop_capture(queries):
+    queries.__exit__(None, None, None)
+    return len(queries)
+
+
+async def open_connections(application, paths):
+    communicators = []
+    for path, user in paths:
+        communicator = WebsocketCommunicator(application, path)
+        if user is not None:
+            communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        if not connected:
+            raise RuntimeError(f'Соединение {path} отклонено')
+        communicators.append(communicator)
+    return communicators
+
+
+async def collect(communicator, started):
+    """Задержки всех сообщений, полученных клиентом до паузы QUIET_PERIOD"""
+    latencies = []
+    while not await communicator.receive_nothing(timeout=QUIET_PERIOD):
+        await communicator.receive_output()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def run_rounds(fixtures, connections, rounds):
+    application = URLRouter(websocket_urlpatterns)
+    listeners = fixtures.users[1:connections - 2 * (connections // 3) + 1]
+    paths = (
+        [('ws/analytics/', None)] * (connections // 3)
+        + [(f'ws/event/{fixtures.watched.pk}/', None)] * (connections // 3)
+        + [('ws/notifications/', user) for user in listeners]
+    )
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    communicators = await open_connections(application, paths)
+    memory_per_connection = (tracemalloc.get_traced_memory()[0] - before) / max(len(communicators), 1)
+    tracemalloc.stop()
+
+    try:
+        # Начальные снимки после подключения в замеры не входят
+        await asyncio.gather(*(collect(communicator, time.perf_counter()) for communicator in communicators))
+
+        latencies, spans, tick_queries, round_queries = [], [], [], []
+        for round_number in range(rounds):
+            # Синхронный код потребителей и раунда выполняется в одном (главном) потоке,
+            # поэтому перехват запросов на его соединении видит и запросы обработчиков
+            queries = CaptureQueriesContext(connection)
+            await sync_to_async(queries.__enter__)()
+            started = time.perf_counter()
+            await sync_to_async(drive_round)(fixtures, listeners, round_number)
+            tick_queries.append(await sync_to_async(analytics_tick)())
+            received = await asyncio.gather(*(collect(communicator, started) for communicator in communicators))
+            round_queries.append(await sync_to_async(stop_capture)(queries))
+
+            round_latencies = [latency for client in received for latency in client]
+            latencies += round_latencies
+            spans.append(max(round_latencies, default=0.0))
+    finally:
+        for communicator in communicators:
+            await communicator.disconnect()
+
+    total_span = sum(spans)
+    return BenchmarkReport(
+        connections=len(communicators),
+        rounds=rounds,
+        messages=len(latencies),
+        messages_per_second=len(latencies) / total_span if total_span else 0.0,
+        latency_p50=percentile(latencies, 50),
+        latency_p95=percentile(latencies, 95),
+        latency_max=max(latencies, default=0.0),
+        queries_per_tick=sum(tick_queries) / rounds,
+        queries_per_round=sum(round_queries) / rounds,
+        memory_per_connection=memory_per_connection,
+    )
+
+
+def run_benchmark(connections=300, rounds=5, configured_layer=False):
+    """Прогон нагрузочного теста; возвращает BenchmarkReport"""
+    connections, rounds = max(connections, 3), max(rounds, 1)
+    with nullcontext() if configured_layer else override_settings(**SELF_CONTAINED_SETTINGS):
+        fixtures = create_fixtures(connections - 2 * (connections // 3), rounds)
+        try:
+            return async_to_sync(run_rounds)(fixtures, connections, rounds)
+        finally:
+            delete_fixtures(fixtures)
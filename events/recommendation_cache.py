@@ -0,0 +1,164 @@
+"""
+Кеш рекомендаций.
+
+- Для пользователя хранится ранжированный список ID мероприятий
+  (recommendations:user:<id>) на RECOMMENDATION_CACHE_TTL секунд.
+- Задача precompute_recommendations заполняет кеш заранее для
+  пользователей, заходивших за последние ACTIVE_USER_DAYS дней; остальные
+  получают рекомендации при первом обращении.
+- Регистрация, избранное или отзыв сбрасывают кеш пользователя после коммита.
+- Анонимные пользователи получают общий список популярных мероприятий по
+  счетчикам EventStatistic, он тоже кешируется.
+- Попадания и промахи считаются счетчиками в том же кеше
+  (recommendation_cache_stats()).
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .ai_recommendations import AIRecommendationEngine
+from .models import Event, Favorite, Registration, Review
+
+logger = logging.getLogger(__name__)
+
+# Сколько ID хранить: запас на мероприятия, ставшие неактивными
+CACHED_RECOMMENDATIONS = 24
+POPULAR_CACHE_KEY = 'recommendations:popular'
+POPULAR_CACHE_TTL = 10 * 60
+ACTIVE_USER_DAYS = 7
+PRECOMPUTE_BATCH_SIZE = 100
+METRIC_KEYS = {'hit': 'recommendations:metrics:hits', 'miss': 'recommendations:metrics:misses'}
+
+
+def cache_ttl():
+    return getattr(settings, 'RECOMMENDATION_CACHE_TTL', 2 * 60 * 60)
+
+
+def user_cache_key(user_id):
+    return f'recommendations:user:{user_id}'
+
+
+def _count(metric):
+    key = METRIC_KEYS[metric]
+    # Счетчик не должен ломать выдачу, если кеш недоступен
+    try:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+    except Exception as e:
+        logger.warning(f"Recommendation cache metric {metric} failed: {e}")
+
+
+def _cache_get(key):
+    # Недоступный кеш - промах: ID посчитаются напрямую
+    try:
+        return cache.get(key)
+    except Exception as e:
+        logger.warning(f"Recommendation cache read {key} failed: {e}")
+        return None
+
+
+def _cache_set(key, value, timeout):
+    try:
+        cache.set(key, value, timeout)
+    except Exception as e:
+        logger.warning(f"Recommendation cache write {key} failed: {e}")
+
+
+def recommendation_cache_stats():
+    values = cache.get_many(METRIC_KEYS.values())
+    hits = values.get(METRIC_KEYS['hit'], 0)
+    misses = values.get(METRIC_KEYS['miss'], 0)
+    return {'hits': hits, 'misses': misses, 'hit_rate': hits / (hits + misses) if hits + misses else 0.0}
+
+
+def compute_recommendation_ids(user, engine=None):
+    events = (engine or AIRecommendationEngine()).get_hybrid_recommendations(user, CACHED_RECOMMENDATIONS)
+    return [event.id for event in events]
+
+
+def popular_event_ids():
+    """Общий для анонимных пользователей список: по подтвержденным регистрациям и избранному"""
+    ids = _cache_get(POPULAR_CACHE_KEY)
+    if ids is None:
+        ids = list(
+            Event.objects.filter(is_active=True).order_by(
+                F('eventstatistic__registrations_count').desc(nulls_last=True),
+                F('eventstatistic__favorites_count').desc(nulls_last=True),
+                '-created_at',
+            ).values_list('id', flat=True)[:CACHED_RECOMMENDATIONS]
+        )
+        _cache_set(POPULAR_CACHE_KEY, ids, POPULAR_CACHE_TTL)
+    return ids
+
+
+def recommended_event_ids(user):
+    if not user.is_authenticated:
+        return popular_event_ids()
+    key = user_cache_key(user.pk)
+    ids = _cache_get(key)
+    if ids is not None:
+        _count('hit')
+        return ids
+    _count('miss')
+    ids = compute_recommendation_ids(user)
+    _cache_set(key, ids, cache_ttl())
+    return ids
+
+
+def get_recommended_events(user, limit=6):
+    """Мероприятия в порядке рекомендации; ставшие неактивными пропускаются"""
+    ids = recommended_event_ids(user)
+    events = Event.objects.filter(is_active=True).in_bulk(ids)
+    return [events[event_id] for event_id in ids if event_id in events][:limit]
+
+
+def invalidate_user_recommendations(user_id):
+    # Вызывается после коммита регистрации/отзыва: недоступный кеш не должен ронять запрос
+    try:
+        cache.delete(user_cache_key(user_id))
+    except Exception as e:
+        logger.warning(f"Recommendation cache invalidation failed for user {user_id}: {e}")
+
+
+def precompute_recommendations(days=ACTIVE_USER_DAYS):
+    """Заполняет кеш для недавно заходивших пользователей; возвращает их число"""
+    users = get_user_model().objects.filter(
+        is_active=True, last_login__gte=timezone.now() - timedelta(days=days),
+    )
+    engine = AIRecommendationEngine()
+    batch, total = {}, 0
+    for user in users.iterator(chunk_size=PRECOMPUTE_BATCH_SIZE):
+        try:
+            batch[user_cache_key(user.pk)] = compute_recommendation_ids(user, engine)
+        except Exception as e:
+            logger.error(f"Recommendation precompute failed for user {user.pk}: {e}")
+            continue
+        if len(batch) >= PRECOMPUTE_BATCH_SIZE:
+            cache.set_many(batch, cache_ttl())
+            total += len(batch)
+            batch = {}
+    if batch:
+        cache.set_many(batch, cache_ttl())
+        total += len(batch)
+    return total
+
+
+@receiver(post_save, sender=Registration)
+@receiver(post_delete, sender=Registration)
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_on_interaction(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_user_recommendations(user_id))
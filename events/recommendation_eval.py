@@ -0,0 +1,243 @@
+"""
+Офлайн-оценка движков рекомендаций (команда evaluate_recommendations).
+
+1. Данные - синтетический набор (generate_synthetic_dataset) или текущие
+   взаимодействия из базы.
+2. Разбиение по времени: последняя доля взаимодействий (избранное,
+   регистрации, положительные отзывы) откладывается как тестовая и
+   удаляется, индекс похожих и коллаборативная модель строятся по остальным.
+3. Каждый движок выдает K мероприятий каждому пользователю с тестовыми
+   взаимодействиями; считаются precision@K, recall@K, покрытие каталога,
+   p50/p95 задержки и числа SQL-запросов на вызов.
+
+Команда выполняет все изменения в транзакции и откатывает ее. Пока она
+идет, удаленные и перестроенные строки заблокированы, поэтому оценка на
+текущих данных требует явного флага --live-data и должна запускаться на
+копии базы.
+"""
+import math
+import random
+import tempfile
+import time
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from .models import Category, Event, EventStatistic, Favorite, Registration, Review
+
+Interaction = namedtuple('Interaction', ['model', 'pk', 'user_id', 'event_id', 'timestamp'])
+EngineReport = namedtuple(
+    'EngineReport',
+    ['name', 'users', 'precision', 'recall', 'coverage', 'latency_p50', 'latency_p95', 'queries_avg', 'queries_p95', 'error'],
+    defaults=[0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, ''],
+)
+
+SYNTHETIC_TOPICS = {
+    'Музыка': ['джаз', 'рок', 'концерт', 'оркестр', 'вокал', 'гитара', 'фестиваль', 'блюз'],
+    'Технологии': ['python', 'django', 'программирование', 'данные', 'хакатон', 'разработка', 'нейросети', 'стартап'],
+    'Спорт': ['йога', 'бег', 'марафон', 'фитнес', 'велосипед', 'плавание', 'тренировка', 'турнир'],
+    'Искусство': ['выставка', 'живопись', 'театр', 'скульптура', 'фотография', 'галерея', 'спектакль', 'графика'],
+}
+# Доля взаимодействий пользователя с мероприятиями его любимой темы
+TOPIC_AFFINITY = 0.8
+
+
+def generate_synthetic_dataset(users=200, events=120, interactions_per_user=8, days=60, seed=0):
+    """
+    Пользователи с любимой темой, мероприятия по темам и взаимодействия с
+    популярностью по закону Ципфа внутри темы. Возвращает число взаимодействий.
+    """
+    rng = random.Random(seed)
+    User = get_user_model()
+    now = timezone.now()
+
+    organizer = User.objects.create(username=f'eval-organizer-{seed}')
+    categories = {
+        topic: Category.objects.get_or_create(slug=f'eval-{index}', defaults={'name': topic})[0]
+        for index, topic in enumerate(SYNTHETIC_TOPICS)
+    }
+    topics = list(SYNTHETIC_TOPICS)
+    created = Event.objects.bulk_create([
+        Event(
+            title=' '.join(rng.sample(SYNTHETIC_TOPICS[topics[i % len(topics)]], 2)).capitalize(),
+            description=' '.join(rng.sample(SYNTHETIC_TOPICS[topics[i % len(topics)]], 5)),
+            short_description='',
+            location='Москва',
+            date=now + timedelta(days=rng.randint(1, 90)),
+            organizer=organizer,
+            category=categories[topics[i % len(topics)]],
+        )
+        for i in range(events)
+    ])
+    by_topic = defaultdict(list)
+    for event in created:
+        by_topic[event.category.name].append(event)
+    all_events = list(created)
+
+    members = User.objects.bulk_create([User(username=f'eval-user-{seed}-{i}') for i in range(users)])
+    rows = {Favorite: [], Registration: [], Review: []}
+    timestamps = {Favorite: [], Registration: [], Review: []}
+    for user in members:
+        pool = by_topic[rng.choice(topics)]
+        weights = [1 / (rank + 1) for rank in range(len(pool))]
+        chosen = {}
+        while len(chosen) < min(interactions_per_user, len(all_events)):
+            if rng.random() < TOPIC_AFFINITY:
+                event = rng.choices(pool, weights)[0]
+            else:
+                event = rng.choice(all_events)
+            chosen.setdefault(event.pk, event)
+        for event in chosen.values():
+            model = rng.choice([Favorite, Registration, Review])
+            if model is Favorite:
+                rows[model].append(Favorite(user=user, event=event))
+            elif model is Registration:
+                rows[model].append(Registration(user=user, event=event, status='confirmed'))
+            else:
+                rows[model].append(Review(user=user, event=event, rating=rng.choice([4, 5])))
+            timestamps[model].append(now - timedelta(days=days * rng.random()))
+
+    # auto_now_add перезаписывает дату при создании - выставляем ее отдельными UPDATE по дням
+    total = 0
+    for model, objects in rows.items():
+        field = 'created_at' if model is Favorite else 'registration_date'
+        by_day = defaultdict(list)
+        for obj, timestamp in zip(model.objects.bulk_create(objects), timestamps[model]):
+            by_day[timestamp.replace(hour=12, minute=0, second=0, microsecond=0)].append(obj.pk)
+        for day, pks in by_day.items():
+            model.objects.filter(pk__in=pks).update(**{field: day})
+        total += len(objects)
+    EventStatistic.rebuild()
+    return total
+
+
+def load_interactions():
+    """Положительные взаимодействия, упорядоченные по времени"""
+    sources = [
+        (Favorite, Favorite.objects.all(), 'created_at'),
+        (Registration, Registration.objects.exclude(status='cancelled'), 'registration_date'),
+        (Review, Review.objects.filter(rating__gte=3), 'registration_date'),
+    ]
+    interactions = [
+        Interaction(model, *row)
+        for model, queryset, field in sources
+        for row in queryset.order_by().values_list('pk', 'user_id', 'event_id', field).iterator()
+    ]
+    return sorted(interactions, key=lambda item: item.timestamp)
+
+
+def time_split(interactions, holdout=0.2):
+    """
+    (обучающие, тестовые): тестовые - последние holdout взаимодействий.
+    Мероприятия, с которыми пользователь уже взаимодействовал до отсечки, в тест не попадают.
+    """
+    cutoff = int(len(interactions) * (1 - holdout))
+    train, test = interactions[:cutoff], interactions[cutoff:]
+    known = {(item.user_id, item.event_id) for item in train}
+    return train, [item for item in test if (item.user_id, item.event_id) not in known]
+
+
+def remove_interactions(interactions):
+    by_model = defaultdict(list)
+    for item in interactions:
+        by_model[item.model].append(item.pk)
+    for model, pks in by_model.items():
+        model.objects.filter(pk__in=pks).delete()
+
+
+def percentile(values, q):
+    """Перцентиль по ближайшему рангу"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def evaluate_engine(name, recommend, relevant_by_user, k, catalog_size):
+    """recommend(user, k) -> мероприятия; relevant_by_user: {user: множество ID тестовых мероприятий}"""
+    precisions, recalls, latencies, queries = [], [], [], []
+    recommended = set()
+    for user, relevant in relevant_by_user.items():
+        try:
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                ids = [event.id for event in list(recommend(user, k))[:k]]
+                latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            return EngineReport(name, error=f'{type(e).__name__}: {e}')
+        queries.append(len(captured.captured_queries))
+        hits = len(set(ids) & relevant)
+        precisions.append(hits / k)
+        recalls.append(hits / len(relevant))
+        recommended.update(ids)
+
+    users = len(precisions)
+    if not users:
+        return EngineReport(name, error='нет пользователей с тестовыми взаимодействиями')
+    return EngineReport(
+        name,
+        users=users,
+        precision=sum(precisions) / users,
+        recall=sum(recalls) / users,
+        coverage=len(recommended) / catalog_size if catalog_size else 0.0,
+        latency_p50=percentile(latencies, 50),
+        latency_p95=percentile(latencies, 95),
+        queries_avg=sum(queries) / users,
+        queries_p95=percentile(queries, 95),
+    )
+
+
+def default_engines():
+    """{имя: recommend(user, k)} для всех реализаций рекомендаций"""
+    from .ai_recommendations import AIRecommendationEngine
+    from .recommendations import get_recommended_events
+
+    engine = AIRecommendationEngine()
+    engines = {
+        'recommendations': get_recommended_events,
+        'hybrid': engine.get_hybrid_recommendations,
+        'content': engine.get_content_based_recommendations,
+        'collaborative': engine.get_collaborative_recommendations,
+    }
+    try:
+        from .ai_recommendations_enhanced import EnhancedAIRecommendationEngine
+        enhanced = EnhancedAIRecommendationEngine()
+        engines['enhanced'] = lambda user, k: enhanced.get_context_aware_recommendations(user)
+    except Exception as e:
+        # sklearn/pandas/GeoDjango могут быть не установлены - движок попадет в отчет с ошибкой
+        def unavailable(user, k, error=e):
+            raise error
+        engines['enhanced'] = unavailable
+    return engines
+
+
+def run_evaluation(k=10, holdout=0.2, engines=None, max_users=None):
+    """
+    Разбивает взаимодействия, удаляет тестовые, перестраивает индексы и
+    оценивает движки. Изменяет базу - вызывать внутри откатываемой транзакции.
+    """
+    from .collaborative import train_collaborative_model
+    from .similarity import rebuild_similarity_index
+
+    train, test = time_split(load_interactions(), holdout)
+    remove_interactions(test)
+
+    relevant_ids = defaultdict(set)
+    for item in test:
+        relevant_ids[item.user_id].add(item.event_id)
+    users = get_user_model().objects.in_bulk(list(relevant_ids)[:max_users] if max_users else list(relevant_ids))
+    relevant_by_user = {users[user_id]: ids for user_id, ids in relevant_ids.items() if user_id in users}
+    catalog_size = Event.objects.filter(is_active=True).count()
+
+    with tempfile.TemporaryDirectory() as model_dir, override_settings(RECOMMENDATION_MODEL_DIR=model_dir):
+        rebuild_similarity_index()
+        train_collaborative_model()
+        reports = [
+            evaluate_engine(name, recommend, relevant_by_user, k, catalog_size)
+            for name, recommend in (engines or default_engines()).items()
+        ]
+    return len(train), len(test), reports
@@ -0,0 +1,226 @@
+"""
+Уменьшенные копии изображений для карточек, страницы мероприятия и карты.
+
+Копии создаются в фоне после загрузки оригинала (для Event - в
+processing.process_event, для остальных моделей - по post_save) в WebP
+и JPEG для старых браузеров, плюс AVIF, если установлен pillow-avif-plugin.
+Размеры и вес файлов хранятся в ImageRendition, поэтому шаблонный тег
+{% event_image %} строит srcset без обращений к файловой системе.
+"""
+import io
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from PIL import Image, ImageOps
+
+from .models import Advertisement, Event, ImageRendition, ProjectPromoVideo, PromoVideo
+
+# AVIF опционален: Pillow поддерживает его только через плагин
+try:
+    import pillow_avif  # noqa: F401
+    AVIF_AVAILABLE = True
+except ImportError:
+    AVIF_AVAILABLE = False
+
+# Вписываем в (ширина, высота) без увеличения
+RENDITION_PRESETS = {
+    'map': (240, 160),
+    'card': (480, 320),
+    'detail': (1200, 800),
+}
+# Значение атрибута sizes для каждого размера
+RENDITION_SIZES = {
+    'map': '240px',
+    'card': '(max-width: 576px) 100vw, 480px',
+    'detail': '(max-width: 1200px) 100vw, 1200px',
+}
+# Формат -> (формат Pillow, расширение, MIME, параметры сохранения)
+RENDITION_FORMATS = {
+    'avif': ('AVIF', 'avif', 'image/avif', {'quality': 60}),
+    'webp': ('WEBP', 'webp', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Поле изображения каждой модели с копиями
+RENDITION_FIELDS = {
+    Event: 'image',
+    Advertisement: 'image',
+    PromoVideo: 'thumbnail',
+    ProjectPromoVideo: 'thumbnail',
+}
+
+
+def get_formats():
+    """Современные форматы первыми: браузер берет первый поддерживаемый <source>"""
+    formats = ['webp', 'jpeg']
+    if AVIF_AVAILABLE:
+        formats.insert(0, 'avif')
+    return formats
+
+
+def render(image, size, fmt):
+    """Копия изображения PIL, вписанная в size -> (bytes, width, height)"""
+    pil_format, _, _, options = RENDITION_FORMATS[fmt]
+    copy = image.copy()
+    copy.thumbnail(size, Image.LANCZOS)
+    if fmt == 'jpeg' and copy.mode != 'RGB':
+        background = Image.new('RGB', copy.size, '#ffffff')
+        copy = copy.convert('RGBA')
+        background.paste(copy, mask=copy.getchannel('A'))
+        copy = background
+    elif copy.mode not in ('RGB', 'RGBA'):
+        copy = copy.convert('RGBA')
+    output = io.BytesIO()
+    copy.save(output, format=pil_format, **options)
+    return output.getvalue(), copy.width, copy.height
+
+
+def _current_renditions(instance, field_name):
+    """Копии текущего оригинала; .all() использует prefetch_related('renditions')"""
+    source = getattr(instance, field_name).name
+    if not source:
+        return []
+    return [
+        rendition for rendition in instance.renditions.all()
+        if rendition.field_name == field_name and rendition.source == source
+    ]
+
+
+def renditions_are_current(instance, field_name):
+    expected = len(RENDITION_PRESETS) * len(get_formats()) if getattr(instance, field_name) else 0
+    existing = list(instance.renditions.filter(field_name=field_name).values_list('source', flat=True))
+    source = getattr(instance, field_name).name
+    return len(existing) == expected and all(name == source for name in existing)
+
+
+def delete_renditions(instance, field_name=None):
+    renditions = ImageRendition.objects.filter(
+        content_type=ContentType.objects.get_for_model(instance), object_id=instance.pk,
+    )
+    if field_name:
+        renditions = renditions.filter(field_name=field_name)
+    # delete() по queryset отправляет post_delete, файлы удаляются ниже
+    renditions.delete()
+
+
+def generate_renditions(instance, field_name=None, force=False):
+    """Пересоздает копии изображения; без force ничего не делает, если копии актуальны"""
+    field_name = field_name or RENDITION_FIELDS[type(instance)]
+    if not force and renditions_are_current(instance, field_name):
+        return []
+
+    delete_renditions(instance, field_name)
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return []
+
+    with field_file.open('rb'):
+        with Image.open(field_file) as original:
+            image = ImageOps.exif_transpose(original)
+            image.load()
+
+    content_type = ContentType.objects.get_for_model(instance)
+    base_name = field_file.name.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+    renditions = []
+    try:
+        for preset, size in RENDITION_PRESETS.items():
+            for fmt in get_formats():
+                data, width, height = render(image, size, fmt)
+                extension = RENDITION_FORMATS[fmt][1]
+                rendition = ImageRendition(
+                    content_type=content_type,
+                    object_id=instance.pk,
+                    field_name=field_name,
+                    source=field_file.name,
+                    preset=preset,
+                    format=fmt,
+                    width=width,
+                    height=height,
+                    size_bytes=len(data),
+                )
+                rendition.file.save(f"{base_name}_{preset}.{extension}", ContentFile(data), save=False)
+                renditions.append(rendition)
+        ImageRendition.objects.bulk_create(renditions)
+    except Exception:
+        # Без строк в базе файлы никто не найдет и не удалит
+        for rendition in renditions:
+            rendition.file.delete(save=False)
+        raise
+    return renditions
+
+
+def rendition_url(instance, preset, fmt='jpeg', field_name=None):
+    """URL готовой копии или None"""
+    field_name = field_name or RENDITION_FIELDS[type(instance)]
+    for rendition in _current_renditions(instance, field_name):
+        if rendition.preset == preset and rendition.format == fmt:
+            return rendition.url
+    return None
+
+
+def build_sources(instance, preset, field_name=None):
+    """
+    Данные для <picture>: {'sources': [(mime, srcset)], 'src', 'srcset',
+    'width', 'height'}; None, если копии еще не готовы.
+    """
+    field_name = field_name or RENDITION_FIELDS[type(instance)]
+    by_format = {}
+    for rendition in _current_renditions(instance, field_name):
+        by_format.setdefault(rendition.format, []).append(rendition)
+    fallback = next((r for r in by_format.get('jpeg', []) if r.preset == preset), None)
+    if fallback is None:
+        return None
+
+    def srcset(renditions):
+        widths = {}
+        for rendition in sorted(renditions, key=lambda r: r.width):
+            widths.setdefault(rendition.width, rendition.url)
+        return ', '.join(f'{url} {width}w' for width, url in widths.items())
+
+    return {
+        'sources': [
+            (RENDITION_FORMATS[fmt][2], srcset(by_format[fmt]))
+            for fmt in get_formats() if fmt != 'jpeg' and fmt in by_format
+        ],
+        'src': fallback.url,
+        'srcset': srcset(by_format['jpeg']),
+        'sizes': RENDITION_SIZES[preset],
+        'width': fallback.width,
+        'height': fallback.height,
+    }
+
+
+@receiver(post_delete, sender=ImageRendition)
+def delete_rendition_file(sender, instance, **kwargs):
+    """Срабатывает и при каскадном удалении через GenericRelation"""
+    if instance.file:
+        instance.file.delete(save=False)
+
+
+# Event обрабатывается в processing.process_event вместе с геокодированием,
+# для остальных моделей копии создаются по изменению поля изображения
+
+def remember_image_name(sender, instance, **kwargs):
+    field_name = RENDITION_FIELDS[sender]
+    if field_name in instance.__dict__:
+        instance._initial_image_name = getattr(instance, field_name).name or ''
+
+
+def schedule_renditions_on_change(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    field_name = RENDITION_FIELDS[sender]
+    if field_name not in instance.__dict__:
+        return
+    current = getattr(instance, field_name).name or ''
+    if current != getattr(instance, '_initial_image_name', ''):
+        from .processing import schedule_renditions
+        transaction.on_commit(lambda: schedule_renditions(instance))
+    instance._initial_image_name = current
+
+
+for model in (Advertisement, PromoVideo, ProjectPromoVideo):
+    post_init.connect(remember_image_name, sender=model, dispatch_uid=f'renditions_init_{model.__name__}')
+    post_save.connect(schedule_renditions_on_change, sender=model, dispatch_uid=f'renditions_save_{model.__name__}')
@@ -0,0 +1,258 @@
+"""
+Полнотекстовый поиск мероприятий.
+
+Все пути поиска (список мероприятий, EventFilter, API) вызывают search_events().
+Бэкенд выбирается по СУБД или настройкой EVENT_SEARCH_BACKEND (dotted path):
+
+- SQLite: виртуальная таблица FTS5 events_event_fts, обновляется сигналами Event;
+- PostgreSQL: генерируемая колонка tsvector search_vector с GIN индексом;
+- остальные СУБД: icontains как раньше.
+
+Результаты аннотируются полем search_rank (больше - релевантнее).
+"""
+import logging
+import re
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Q, Value, FloatField
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import Event
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = ['title', 'short_description', 'description', 'location']
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+CYRILLIC_RE = re.compile(r'[а-я]')
+
+# Окончания для упрощенного стемминга русских слов (от длинных к коротким)
+RUSSIAN_ENDINGS = sorted([
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ией',
+    'ать', 'ять', 'ить', 'еть', 'ешь', 'ете', 'ют', 'ут', 'ия', 'ий', 'ый',
+    'ой', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ых', 'их', 'ую', 'юю', 'ом',
+    'ем', 'ам', 'ям', 'ях', 'ах', 'ов', 'ев', 'ей', 'ью', 'а', 'я', 'о', 'е',
+    'ы', 'и', 'у', 'ю', 'ь', 'й',
+], key=len, reverse=True)
+
+
+def stem_word(word):
+    """Отрезает типичное русское окончание; английские слова стеммит FTS/PostgreSQL"""
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC_RE.search(word) or len(word) <= 4:
+        return word
+    for ending in RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+def normalize_text(text):
+    """Текст -> последовательность стемов через пробел"""
+    return ' '.join(stem_word(word) for word in WORD_RE.findall(str(text or '')))
+
+
+class BaseSearchBackend:
+    """Интерфейс бэкенда поиска"""
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def install(self, schema_editor):
+        """Создает индекс (вызывается из миграции)"""
+
+    def uninstall(self, schema_editor):
+        """Удаляет индекс"""
+
+    def index(self, event):
+        """Обновляет мероприятие в индексе"""
+
+    def remove(self, event_id):
+        """Удаляет мероприятие из индекса"""
+
+    def rebuild(self, events=None):
+        """Полностью перестраивает индекс, возвращает число мероприятий"""
+        return 0
+
+
+class IcontainsSearchBackend(BaseSearchBackend):
+    """Запасной вариант без индекса: сканирование icontains"""
+
+    def search(self, queryset, query):
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{f'{field}__icontains': query})
+        return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    """SQLite FTS5: английский стемминг porter, русский - normalize_text()"""
+
+    table = 'events_event_fts'
+    # Веса bm25 в порядке SEARCH_FIELDS
+    weights = (10.0, 4.0, 1.0, 2.0)
+
+    def install(self, schema_editor):
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+            f"{', '.join(SEARCH_FIELDS)}, "
+            f"tokenize = 'porter unicode61 remove_diacritics 2')"
+        )
+
+    def uninstall(self, schema_editor):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def build_match(self, query):
+        terms = [stem_word(word) for word in WORD_RE.findall(query)]
+        # Каждый терм в кавычках с префиксным поиском: "конц" находит "концерт"
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def search(self, queryset, query):
+        match = self.build_match(query)
+        if not match:
+            return queryset.none()
+        weights = ', '.join(str(weight) for weight in self.weights)
+        table = queryset.model._meta.db_table
+        return queryset.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s", (match,))
+        ).annotate(
+            search_rank=RawSQL(
+                f"SELECT -bm25({self.table}, {weights}) FROM {self.table} "
+                f"WHERE {self.table} MATCH %s AND rowid = \"{table}\".\"id\"",
+                (match,),
+            )
+        )
+
+    def _rows(self, values):
+        for row in values:
+            yield (row[0], *(normalize_text(value) for value in row[1:]))
+
+    def index(self, event):
+        placeholders = ', '.join(['%s'] * (len(SEARCH_FIELDS) + 1))
+        values = [getattr(event, field) for field in SEARCH_FIELDS]
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [event.pk])
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, {', '.join(SEARCH_FIELDS)}) VALUES ({placeholders})",
+                next(self._rows([(event.pk, *values)])),
+            )
+
+    def remove(self, event_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [event_id])
+
+    def rebuild(self, events=None):
+        events = events if events is not None else Event.objects.all()
+        placeholders = ', '.join(['%s'] * (len(SEARCH_FIELDS) + 1))
+        rows = list(self._rows(events.values_list('pk', *SEARCH_FIELDS).iterator()))
+        with connections[events.db].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, {', '.join(SEARCH_FIELDS)}) VALUES ({placeholders})",
+                rows,
+            )
+        return len(rows)
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    PostgreSQL: генерируемая колонка search_vector (russian + english
+    конфигурации, веса A-D) с GIN индексом. Колонка пересчитывается самой СУБД,
+    поэтому index()/remove() не нужны.
+    """
+
+    column = 'search_vector'
+    field_weights = {'title': 'A', 'short_description': 'B', 'location': 'C', 'description': 'D'}
+    configs = ('russian', 'english')
+
+    def vector_sql(self):
+        parts = [
+            f"setweight(to_tsvector('{config}', coalesce({field}, '')), '{weight}')"
+            for config in self.configs
+            for field, weight in self.field_weights.items()
+        ]
+        return ' || '.join(parts)
+
+    def query_sql(self):
+        return ' || '.join(f"websearch_to_tsquery('{config}', %s)" for config in self.configs)
+
+    def install(self, schema_editor):
+        schema_editor.execute(
+            f"ALTER TABLE events_event ADD COLUMN IF NOT EXISTS {self.column} tsvector "
+            f"GENERATED ALWAYS AS ({self.vector_sql()}) STORED"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS events_event_search_gin "
+            f"ON events_event USING GIN ({self.column})"
+        )
+
+    def uninstall(self, schema_editor):
+        schema_editor.execute("DROP INDEX IF EXISTS events_event_search_gin")
+        schema_editor.execute(f"ALTER TABLE events_event DROP COLUMN IF EXISTS {self.column}")
+
+    def search(self, queryset, query):
+        params = (query,) * len(self.configs)
+        table = queryset.model._meta.db_table
+        return queryset.annotate(
+            search_rank=RawSQL(
+                f"ts_rank(\"{table}\".{self.column}, {self.query_sql()})", params
+            )
+        ).filter(
+            pk__in=RawSQL(
+                f"SELECT id FROM {table} WHERE {self.column} @@ ({self.query_sql()})", params
+            )
+        )
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTSSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+_backends = {}
+
+
+def get_search_backend(vendor=None):
+    """Бэкенд из настройки EVENT_SEARCH_BACKEND или по типу СУБД"""
+    vendor = vendor or connection.vendor
+    if vendor not in _backends:
+        path = getattr(settings, 'EVENT_SEARCH_BACKEND', None)
+        backend_class = import_string(path) if path else VENDOR_BACKENDS.get(vendor, IcontainsSearchBackend)
+        _backends[vendor] = backend_class()
+    return _backends[vendor]
+
+
+def search_events(query, queryset=None):
+    """
+    Ищет мероприятия по названию, описаниям и месту проведения.
+    Возвращает queryset с аннотацией search_rank, отсортированный по релевантности.
+    """
+    if queryset is None:
+        queryset = Event.objects.all()
+    query = (query or '').strip()
+    if not query:
+        return queryset
+    return get_search_backend().search(queryset, query).order_by('-search_rank')
+
+
+@receiver(post_save, sender=Event)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    try:
+        get_search_backend().index(instance)
+    except Exception as e:
+        # Индекс восстанавливается командой rebuild_search_index
+        logger.error(f"Search index update failed for event {instance.pk}: {e}")
+
+
+@receiver(post_delete, sender=Event)
+def remove_from_search_index(sender, instance, **kwargs):
+    try:
+        get_search_backend().remove(instance.pk)
+    except Exception as e:
+        logger.error(f"Search index removal failed for event {instance.pk}: {e}")
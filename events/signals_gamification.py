@@ -1,80 +1,57 @@
+"""
+Сигналы геймификации только записывают действие в журнал GamificationEvent;
+очки, достижения, задания и уровень считаются пачками
+(events.gamification.pipeline).
+
+Счетчики статистики UserProfile сдвигаются на +-1 одним UPDATE с
+F()-выражением. Смена организатора или мероприятия у регистрации не
+отслеживается - такие расхождения исправляет ночной пересчет
+(UserProfile.rebuild()).
+"""
+import logging
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
+from django.utils import timezone
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from .models import Event, Registration, Review, Favorite, UserProfile
-from .gamification.core import gamification_engine
+from .gamification.achievements import reset_achievement_index  # noqa: F401 - сброс индекса при изменении достижений
+from .gamification.leaderboard import get_leaderboard
+from .gamification.quests import reset_quest_index  # noqa: F401 - сброс индекса при изменении заданий
+from .gamification.pipeline import record_action
+
+logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
 @receiver(post_save, sender=Event)
-def handle_event_creation(sender, instance, created, **kwargs):
+def handle_event_creation(sender, instance, created, raw=False, **kwargs):
     """Обработка создания мероприятия"""
-    if created and instance.organizer:
-        gamification_engine.handle_user_action(
-            instance.organizer,
-            'event_created',
-            event_id=instance.id
-        )
-        
-        # Награждаем организатора за создание мероприятия
-        gamification_engine.award_points(
-            instance.organizer,
-            points=15,
-            reason=f"Создание мероприятия: {instance.title}"
-        )
+    # Награждаем организатора за создание мероприятия
+    if created and not raw and instance.organizer_id:
+        record_action(instance.organizer_id, 'event_created', points=15, event_id=instance.id)
 
 @receiver(post_save, sender=Registration)
-def handle_event_registration(sender, instance, created, **kwargs):
+def handle_event_registration(sender, instance, created, raw=False, **kwargs):
     """Обработка регистрации на мероприятие"""
-    if created:
-        gamification_engine.handle_user_action(
-            instance.user,
-            'event_registration',
-            event_id=instance.event.id,
-            category=instance.event.category.name if instance.event.category else None
-        )
-        
-        # Награждаем пользователя за регистрацию
-        gamification_engine.award_points(
-            instance.user,
-            points=5,
-            reason=f"Регистрация на мероприятие: {instance.event.title}"
-        )
+    if created and not raw:
+        record_action(instance.user_id, 'event_registration', points=5, event_id=instance.event_id)
 
 @receiver(post_save, sender=Review)
-def handle_review_creation(sender, instance, created, **kwargs):
+def handle_review_creation(sender, instance, created, raw=False, **kwargs):
     """Обработка создания отзыва"""
-    if created:
-        gamification_engine.handle_user_action(
-            instance.user,
-            'review_created',
-            event_id=instance.event.id,
-            rating=instance.rating
-        )
-        
-        # Награждаем за отзыв
+    if created and not raw:
         points = 3 + (instance.rating - 3)  # Больше очков за хорошие отзывы
-        gamification_engine.award_points(
-            instance.user,
-            points=max(points, 1),
-            reason=f"Написание отзыва для: {instance.event.title}"
+        record_action(
+            instance.user_id, 'review_created', points=max(points, 1),
+            event_id=instance.event_id, rating=instance.rating,
         )
 
 @receiver(post_save, sender=Favorite)
-def handle_favorite_added(sender, instance, created, **kwargs):
+def handle_favorite_added(sender, instance, created, raw=False, **kwargs):
     """Обработка добавления в избранное"""
-    if created:
-        gamification_engine.handle_user_action(
-            instance.user,
-            'add_favorite',
-            event_id=instance.event.id
-        )
-        
-        gamification_engine.award_points(
-            instance.user,
-            points=2,
-            reason=f"Добавление в избранное: {instance.event.title}"
-        )
+    if created and not raw:
+        record_action(instance.user_id, 'add_favorite', points=2, event_id=instance.event_id)
 
 @receiver(post_delete, sender=Favorite)
 def handle_favorite_removed(sender, instance, **kwargs):
@@ -83,14 +60,79 @@ def handle_favorite_removed(sender, instance, **kwargs):
     pass
 
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
     """Создание игрового профиля для нового пользователя"""
-    if created:
+    if created and not raw:
         UserProfile.objects.get_or_create(user=instance)
-        
+
         # Награждаем за регистрацию
-        gamification_engine.award_points(
-            instance,
-            points=10,
-            reason="Регистрация на платформе"
-        )
\ No newline at end of file
+        record_action(instance.pk, 'user_registered', points=10)
+
+@receiver(post_delete, sender=User)
+def remove_from_leaderboard(sender, instance, **kwargs):
+    """Удаленный пользователь не должен занимать место в таблице лидеров"""
+    user_id = instance.pk
+
+    def remove():
+        try:
+            get_leaderboard().remove(user_id)
+        except Exception as e:
+            logger.error(f"Error removing user {user_id} from leaderboard: {e}")
+
+    transaction.on_commit(remove)
+
+
+# Счетчики статистики игрового профиля
+
+@receiver(post_save, sender=Event)
+def increment_events_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserProfile.bump(instance.organizer_id, events_created=1)
+
+@receiver(post_delete, sender=Event)
+def decrement_events_created(sender, instance, **kwargs):
+    UserProfile.bump(instance.organizer_id, events_created=-1)
+
+def _registration_deltas(instance, sign):
+    """
+    Изменение счетчиков от одной регистрации: она меняет число дней активности
+    и исследованных категорий, только если у пользователя нет других
+    регистраций в тот же день или в той же категории
+    """
+    others = Registration.objects.filter(user_id=instance.user_id).exclude(pk=instance.pk)
+    deltas = {'events_attended': sign}
+    registered = instance.registration_date or timezone.now()
+    if registered >= timezone.now() - UserProfile.ACTIVE_DAYS_WINDOW:
+        if not others.filter(registration_date__date=timezone.localdate(registered)).exists():
+            deltas['days_active'] = sign
+    category_id = Event.objects.filter(pk=instance.event_id).values_list('category_id', flat=True).first()
+    if category_id and not others.filter(event__category_id=category_id).exists():
+        deltas['categories_explored'] = sign
+    return deltas
+
+@receiver(post_save, sender=Registration)
+def increment_registration_counters(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserProfile.bump(instance.user_id, **_registration_deltas(instance, 1))
+
+@receiver(post_delete, sender=Registration)
+def decrement_registration_counters(sender, instance, **kwargs):
+    UserProfile.bump(instance.user_id, **_registration_deltas(instance, -1))
+
+@receiver(post_save, sender=Review)
+def increment_reviews_written(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserProfile.bump(instance.user_id, reviews_written=1)
+
+@receiver(post_delete, sender=Review)
+def decrement_reviews_written(sender, instance, **kwargs):
+    UserProfile.bump(instance.user_id, reviews_written=-1)
+
+@receiver(post_save, sender=Favorite)
+def increment_favorites_added(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserProfile.bump(instance.user_id, favorites_added=1)
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorites_added(sender, instance, **kwargs):
+    UserProfile.bump(instance.user_id, favorites_added=-1)
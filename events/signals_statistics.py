@@ -0,0 +1,110 @@
+"""
+Инкрементальное обновление счетчиков EventStatistic.
+
+Каждое изменение регистрации, избранного или отзыва сдвигает счетчик
+на +-1 одним UPDATE с F()-выражением, без пересчета по всей таблице.
+Та же дельта публикуется подписчикам мероприятия (events/realtime.py).
+Полный пересчет - команда rebuild_event_statistics.
+"""
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Event, EventStatistic, Registration, Favorite, Review
+from .realtime import publish_event_delta
+
+CONFIRMED = 'confirmed'
+
+
+def bump(event_id, **deltas):
+    EventStatistic.bump(event_id, **deltas)
+    publish_event_delta(event_id, **deltas)
+
+
+@receiver(post_save, sender=Event)
+def create_event_statistic(sender, instance, created, raw=False, **kwargs):
+    """Строка счетчиков создается вместе с мероприятием"""
+    if created and not raw:
+        EventStatistic.objects.get_or_create(event=instance)
+
+
+# Регистрации: учитываются только подтвержденные
+
+@receiver(post_init, sender=Registration)
+def remember_registration_state(sender, instance, **kwargs):
+    instance._initial_status = instance.__dict__.get('status')
+    instance._initial_event_id = instance.__dict__.get('event_id')
+
+
+@receiver(post_save, sender=Registration)
+def update_registrations_counter(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    was_confirmed = not created and instance._initial_status == CONFIRMED
+    is_confirmed = instance.status == CONFIRMED
+    if was_confirmed and instance._initial_event_id != instance.event_id:
+        bump(instance._initial_event_id, registrations_count=-1)
+        was_confirmed = False
+    bump(instance.event_id, registrations_count=int(is_confirmed) - int(was_confirmed))
+    remember_registration_state(sender, instance)
+
+
+@receiver(post_delete, sender=Registration)
+def decrement_registrations_counter(sender, instance, **kwargs):
+    if instance._initial_status == CONFIRMED:
+        bump(instance.event_id, registrations_count=-1)
+
+
+# Избранное
+
+@receiver(post_init, sender=Favorite)
+def remember_favorite_event(sender, instance, **kwargs):
+    instance._initial_event_id = instance.__dict__.get('event_id')
+
+
+@receiver(post_save, sender=Favorite)
+def increment_favorites_counter(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        bump(instance.event_id, favorites_count=1)
+    elif instance._initial_event_id not in (None, instance.event_id):
+        bump(instance._initial_event_id, favorites_count=-1)
+        bump(instance.event_id, favorites_count=1)
+    remember_favorite_event(sender, instance)
+
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorites_counter(sender, instance, **kwargs):
+    bump(instance.event_id, favorites_count=-1)
+
+
+# Отзывы: количество и сумма оценок (средний рейтинг = rating_sum / reviews_count)
+
+@receiver(post_init, sender=Review)
+def remember_review_rating(sender, instance, **kwargs):
+    instance._initial_rating = instance.__dict__.get('rating')
+    instance._initial_event_id = instance.__dict__.get('event_id')
+
+
+@receiver(post_save, sender=Review)
+def update_reviews_counter(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        bump(instance.event_id, reviews_count=1, rating_sum=instance.rating)
+    elif instance._initial_event_id not in (None, instance.event_id):
+        # Отзыв перенесли на другое мероприятие
+        bump(instance._initial_event_id, reviews_count=-1, rating_sum=-(instance._initial_rating or 0))
+        bump(instance.event_id, reviews_count=1, rating_sum=instance.rating)
+    else:
+        bump(
+            instance.event_id, rating_sum=instance.rating - (instance._initial_rating or 0)
+        )
+    remember_review_rating(sender, instance)
+
+
+@receiver(post_delete, sender=Review)
+def decrement_reviews_counter(sender, instance, **kwargs):
+    bump(
+        instance.event_id, reviews_count=-1, rating_sum=-(instance._initial_rating or 0)
+    )
@@ -0,0 +1,352 @@
+"""
+Индекс похожих мероприятий для контентных рекомендаций.
+
+Вместо обучения TfidfVectorizer и полной матрицы N×N cosine_similarity на
+каждый запрос тексты активных мероприятий векторизуются заранее (TF-IDF,
+стемы из events/search.py), а для каждого мероприятия в EventSimilarity
+хранятся top-K соседей. Онлайн рекомендация - выборка соседей мероприятий
+из истории пользователя и суммирование их сходства.
+
+- Полная перестройка: задача rebuild_event_similarity (ночью по расписанию)
+  и команда rebuild_similarity_index. Векторы собираются в разреженную
+  матрицу scipy.sparse.csr_matrix, сходство считается произведением блока
+  строк на транспонированную матрицу.
+- Перестройка сохраняет и сам индекс: документные частоты термов
+  (SimilarityTerm) и веса термов каждого мероприятия (EventTerm, обратный
+  индекс терм -> мероприятия).
+- После сохранения мероприятия с измененным текстом задача
+  update_event_similarity токенизирует только его: частоты его старых и
+  новых термов сдвигаются, вектор взвешивается по сохраненным частотам, а
+  скалярные произведения считаются одним запросом к EventTerm по его термам,
+  то есть только с мероприятиями, у которых есть общие термы. Векторы
+  остальных мероприятий не пересчитываются (их веса уточнит ночная
+  перестройка); их соседи дополняются новым, если оно ближе самого дальнего.
+"""
+import heapq
+import logging
+import math
+from array import array
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+import numpy as np
+from scipy.sparse import csr_matrix, diags
+
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Window
+from django.db.models.functions import RowNumber
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+
+from .models import Event, EventSimilarity, EventTerm, Favorite, Registration, SimilarityTerm
+from .search import WORD_RE, stem_word
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_TOP_K = 20
+# Термы, которые встречаются больше чем в такой доле мероприятий, не различают их
+MAX_DF = 0.8
+MIN_SCORE = 0.01
+TERM_MAX_LENGTH = 64
+
+# Поля, от которых зависит текст мероприятия
+SIMILARITY_FIELDS = {
+    'title', 'short_description', 'description', 'location', 'category', 'event_type', 'is_active',
+}
+
+STOP_WORDS = frozenset({
+    'и', 'в', 'во', 'на', 'с', 'со', 'по', 'для', 'из', 'от', 'до', 'за', 'не', 'как', 'что',
+    'это', 'к', 'о', 'об', 'а', 'но', 'the', 'and', 'of', 'in', 'on', 'for', 'to', 'a',
+})
+
+
+def event_text(event):
+    parts = [
+        event.title,
+        event.short_description,
+        event.description,
+        event.category.name if event.category_id else '',
+        event.get_event_type_display(),
+        event.location,
+    ]
+    return ' '.join(str(part) for part in parts if part)
+
+
+def term_counts(text):
+    return Counter(
+        stem_word(word)[:TERM_MAX_LENGTH] for word in WORD_RE.findall(text)
+        if len(word) > 1 and word.lower() not in STOP_WORDS
+    )
+
+
+def smoothed_idf(df, total):
+    """IDF термов {терм: частота}; слишком частые термы (MAX_DF) отбрасываются"""
+    max_df = max(2, MAX_DF * total)
+    # Сглаженный IDF, как у TfidfVectorizer(smooth_idf=True)
+    return {
+        term: math.log((1 + total) / (1 + count)) + 1
+        for term, count in df.items() if count <= max_df
+    }
+
+
+def tfidf_vector(counts, idf):
+    """Нормированный вектор {терм: вес}; пустой, если общих с idf термов нет"""
+    vector = {term: (1 + math.log(count)) * idf[term] for term, count in counts.items() if term in idf}
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    if not norm:
+        return {}
+    return {term: weight / norm for term, weight in vector.items()}
+
+
+class SimilarityIndex:
+    """
+    Нормированная TF-IDF матрица мероприятия × термы (scipy.sparse.csr_matrix).
+    Сходство строк - произведение блока строк на транспонированную матрицу.
+    """
+    # Строк матрицы в одном произведении при полной перестройке
+    BLOCK_SIZE = 500
+
+    def __init__(self, documents):
+        """documents: {event_id: Counter термов}"""
+        self.documents = documents
+        self.df = Counter(term for counts in documents.values() for term in counts)
+        idf = smoothed_idf(self.df, len(documents))
+        self.terms = sorted(idf)
+        columns = {term: column for column, term in enumerate(self.terms)}
+
+        rows, cols, values = array('l'), array('l'), array('d')
+        for row, counts in enumerate(documents.values()):
+            for term, count in counts.items():
+                if term in columns:
+                    rows.append(row)
+                    cols.append(columns[term])
+                    values.append(1 + math.log(count))
+        matrix = csr_matrix(
+            (np.frombuffer(values), (np.frombuffer(rows, dtype='l'), np.frombuffer(cols, dtype='l'))),
+            shape=(len(documents), len(self.terms)),
+        )
+        matrix = matrix @ diags(np.array([idf[term] for term in self.terms]))
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        self.matrix = (diags(np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)) @ matrix).tocsr()
+        self.event_ids = np.array(list(documents), dtype=np.int64)
+        # Мероприятия с непустым вектором -> строка матрицы
+        self.rows = {int(self.event_ids[row]): row for row in np.flatnonzero(norms)}
+
+    @classmethod
+    def build(cls, queryset=None):
+        """Индекс по активным мероприятиям"""
+        if queryset is None:
+            queryset = Event.objects.filter(is_active=True)
+        events = queryset.select_related('category').only(
+            'id', 'title', 'short_description', 'description', 'location', 'event_type', 'category__name',
+        )
+        return cls({event.id: term_counts(event_text(event)) for event in events.iterator(chunk_size=500)})
+
+    def vector(self, event_id):
+        """Вектор мероприятия {терм: вес}; пустой, если общих с idf термов нет"""
+        row = self.rows.get(event_id)
+        if row is None:
+            return {}
+        start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        return {
+            self.terms[column]: weight
+            for column, weight in zip(self.matrix.indices[start:end].tolist(), self.matrix.data[start:end].tolist())
+        }
+
+    def block_scores(self, start, stop):
+        """(event_id, {другое мероприятие: сходство}) для строк start..stop одним произведением"""
+        block = (self.matrix[start:stop] @ self.matrix.T).tocsr()
+        for offset, row in enumerate(range(start, stop)):
+            begin, end = block.indptr[offset], block.indptr[offset + 1]
+            columns, values = block.indices[begin:end], block.data[begin:end]
+            keep = (values >= MIN_SCORE) & (columns != row)
+            yield int(self.event_ids[row]), dict(zip(self.event_ids[columns[keep]].tolist(), values[keep].tolist()))
+
+    def scores(self, event_id):
+        """Косинусное сходство с мероприятиями, у которых есть общие термы"""
+        row = self.rows.get(event_id)
+        if row is None:
+            return {}
+        return next(self.block_scores(row, row + 1))[1]
+
+    def neighbors(self, event_id, top_k=SIMILARITY_TOP_K):
+        return heapq.nlargest(top_k, self.scores(event_id).items(), key=itemgetter(1))
+
+    def all_neighbors(self, top_k=SIMILARITY_TOP_K):
+        """(event_id, соседи) для всех мероприятий с непустым вектором, блоками по BLOCK_SIZE строк"""
+        for start in range(0, len(self.event_ids), self.BLOCK_SIZE):
+            stop = min(start + self.BLOCK_SIZE, len(self.event_ids))
+            for event_id, scores in self.block_scores(start, stop):
+                if event_id in self.rows:
+                    yield event_id, heapq.nlargest(top_k, scores.items(), key=itemgetter(1))
+
+
+def event_terms(event_id, counts, vector):
+    """Строки EventTerm: все термы мероприятия, чтобы частоты можно было сдвигать при изменении"""
+    return [EventTerm(event_id=event_id, term=term, weight=vector.get(term, 0)) for term in counts]
+
+
+def rebuild_similarity_index(top_k=SIMILARITY_TOP_K):
+    """Полная перестройка; возвращает число проиндексированных мероприятий"""
+    index = SimilarityIndex.build()
+    rows = [
+        EventSimilarity(event_id=event_id, similar_event_id=other_id, score=score)
+        for event_id, neighbors in index.all_neighbors(top_k)
+        for other_id, score in neighbors
+    ]
+    with transaction.atomic():
+        EventSimilarity.objects.all().delete()
+        EventSimilarity.objects.bulk_create(rows, batch_size=1000)
+        SimilarityTerm.objects.all().delete()
+        SimilarityTerm.objects.bulk_create(
+            [SimilarityTerm(term=term, df=df) for term, df in index.df.items()], batch_size=1000,
+        )
+        EventTerm.objects.all().delete()
+        EventTerm.objects.bulk_create(
+            [
+                row for event_id, counts in index.documents.items()
+                for row in event_terms(event_id, counts, index.vector(event_id))
+            ],
+            batch_size=1000,
+        )
+    return len(index.rows)
+
+
+def shift_document_frequencies(added, removed):
+    """Частоты термов после изменения текста одного мероприятия"""
+    if added:
+        SimilarityTerm.objects.bulk_create([SimilarityTerm(term=term) for term in added], ignore_conflicts=True)
+        SimilarityTerm.objects.filter(term__in=added).update(df=F('df') + 1)
+    if removed:
+        SimilarityTerm.objects.filter(term__in=removed, df__gt=0).update(df=F('df') - 1)
+
+
+def trim_neighbors(event_ids, top_k=SIMILARITY_TOP_K):
+    """Удаляет у мероприятий event_ids соседей дальше top_k одним DELETE"""
+    if not event_ids:
+        return
+    extra = (
+        EventSimilarity.objects.filter(event_id__in=event_ids)
+        .annotate(rank=Window(RowNumber(), partition_by=[F('event_id')], order_by=F('score').desc()))
+        .filter(rank__gt=top_k).values_list('pk', flat=True)
+    )
+    EventSimilarity.objects.filter(pk__in=list(extra)).delete()
+
+
+def update_event_similarity(event_id, top_k=SIMILARITY_TOP_K):
+    """Пересчитывает вектор и соседей одного мероприятия; возвращает число его соседей"""
+    event = (
+        Event.objects.filter(pk=event_id, is_active=True).select_related('category')
+        .only('id', 'title', 'short_description', 'description', 'location', 'event_type', 'category__name')
+        .first()
+    )
+    # Неактивное или удаленное мероприятие просто выпадает из индекса
+    counts = term_counts(event_text(event)) if event else Counter()
+
+    with transaction.atomic():
+        old_terms = set(EventTerm.objects.filter(event_id=event_id).values_list('term', flat=True))
+        shift_document_frequencies(added=set(counts) - old_terms, removed=old_terms - set(counts))
+        EventTerm.objects.filter(event_id=event_id).delete()
+        EventSimilarity.objects.filter(Q(event_id=event_id) | Q(similar_event_id=event_id)).delete()
+        if not counts:
+            return 0
+
+        df = dict(SimilarityTerm.objects.filter(term__in=list(counts)).values_list('term', 'df'))
+        vector = tfidf_vector(counts, smoothed_idf(df, Event.objects.filter(is_active=True).count()))
+        EventTerm.objects.bulk_create(event_terms(event_id, counts, vector))
+        if not vector:
+            return 0
+
+        # Скалярные произведения только с мероприятиями, у которых есть общие термы
+        scores = defaultdict(float)
+        postings = EventTerm.objects.filter(term__in=list(vector), weight__gt=0).exclude(event_id=event_id)
+        for other_id, term, weight in postings.values_list('event_id', 'term', 'weight'):
+            scores[other_id] += vector[term] * weight
+        scores = {other_id: score for other_id, score in scores.items() if score >= MIN_SCORE}
+        own = heapq.nlargest(top_k, scores.items(), key=itemgetter(1))
+
+        # У другого мероприятия новое попадает в соседи, если их меньше top_k или оно ближе самого дальнего
+        stats = {
+            row['event_id']: row for row in EventSimilarity.objects.filter(event_id__in=list(scores))
+            .values('event_id').annotate(count=Count('pk'), lowest=Min('score'))
+        }
+        reverse = [
+            (other_id, score) for other_id, score in scores.items()
+            if other_id not in stats or stats[other_id]['count'] < top_k or score > stats[other_id]['lowest']
+        ]
+
+        EventSimilarity.objects.bulk_create(
+            [EventSimilarity(event_id=event_id, similar_event_id=other_id, score=score) for other_id, score in own]
+            + [EventSimilarity(event_id=other_id, similar_event_id=event_id, score=score) for other_id, score in reverse]
+        )
+        trim_neighbors(
+            [other_id for other_id, _ in reverse if other_id in stats and stats[other_id]['count'] >= top_k], top_k,
+        )
+    return len(own)
+
+
+def similar_events(event, limit=6):
+    """Похожие мероприятия из индекса, ближайшие первыми"""
+    return [
+        row.similar_event for row in EventSimilarity.objects.filter(event=event, similar_event__is_active=True)
+        .select_related('similar_event').order_by('-score')[:limit]
+    ]
+
+
+def recommend_for_user(user, limit=6):
+    """
+    Сумма сходства с мероприятиями из избранного и регистраций пользователя;
+    сами эти мероприятия не рекомендуются.
+    """
+    history = set(Favorite.objects.filter(user=user).values_list('event_id', flat=True))
+    history.update(Registration.objects.filter(user=user).values_list('event_id', flat=True))
+    if not history:
+        return []
+
+    scores = defaultdict(float)
+    neighbors = EventSimilarity.objects.filter(
+        event_id__in=history, similar_event__is_active=True,
+    ).exclude(similar_event_id__in=history).values_list('similar_event_id', 'score')
+    for similar_id, score in neighbors:
+        scores[similar_id] += score
+
+    ranked = [event_id for event_id, _ in heapq.nlargest(limit, scores.items(), key=itemgetter(1))]
+    events = Event.objects.in_bulk(ranked)
+    return [events[event_id] for event_id in ranked if event_id in events]
+
+
+def schedule_similarity_update(event_id):
+    from .processing import _enqueue
+    _enqueue('update_event_similarity', (event_id,), update_event_similarity)
+
+
+def similarity_state(instance, attnames):
+    """Загруженные значения полей текста (отложенные поля пропускаются)"""
+    return {attname: instance.__dict__[attname] for attname in attnames if attname in instance.__dict__}
+
+
+def similarity_attnames(field_names=SIMILARITY_FIELDS):
+    return {Event._meta.get_field(name).attname for name in field_names}
+
+
+@receiver(post_init, sender=Event)
+def remember_similarity_state(sender, instance, **kwargs):
+    # Исходный текст, чтобы post_save знал, изменился ли он
+    instance._similarity_state = similarity_state(instance, similarity_attnames())
+
+
+@receiver(post_save, sender=Event)
+def reindex_event_similarity(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    # Счетчики просмотров, координаты, статус обработки и сохранение без
+    # изменений текста индекс не трогают
+    if raw:
+        return
+    attnames = similarity_attnames()
+    if update_fields is not None:
+        attnames &= {Event._meta.get_field(name).attname for name in update_fields}
+    previous = getattr(instance, '_similarity_state', {})
+    current = similarity_state(instance, attnames)
+    instance._similarity_state = {**previous, **current}
+    missing = object()
+    if created or any(previous.get(attname, missing) != value for attname, value in current.items()):
+        transaction.on_commit(lambda: schedule_similarity_update(instance.pk))
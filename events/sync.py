@@ -0,0 +1,150 @@
+"""
+Синхронизация внешних источников мероприятий.
+
+- Источники загружаются параллельно (ThreadPoolExecutor), не больше
+  PER_DOMAIN_LIMIT одновременных запросов к одному домену.
+- Условные запросы: сохраненные ETag/Last-Modified уходят в
+  If-None-Match/If-Modified-Since, ответ 304 не разбирается.
+- Если сервер не поддерживает валидаторы, страница с тем же SHA-256,
+  что и в прошлый раз, тоже не разбирается.
+- Результат записывается одним bulk_create(update_conflicts=True) по
+  (source, external_id) вместо get_or_create + save() на каждое мероприятие.
+
+В потоках выполняются только HTTP и разбор HTML; запись в базу - в
+вызывающем потоке.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+from django.utils import timezone
+
+from .models import ExternalEvent, ExternalEventSource
+from .parsers import get_parser
+
+logger = logging.getLogger(__name__)
+
+SYNC_WORKERS = 8
+PER_DOMAIN_LIMIT = 2
+
+# Поля, которые обновляются у существующего мероприятия
+UPSERT_FIELDS = [
+    'title', 'description', 'short_description', 'date', 'location', 'price',
+    'is_free', 'image_url', 'external_url', 'category', 'raw_data', 'updated_at',
+]
+
+# status: 'synced', 'not_modified' (304), 'unchanged' (тот же хеш), 'unsupported' (нет парсера), 'error'
+SyncResult = namedtuple(
+    'SyncResult',
+    ['source', 'status', 'created', 'updated', 'fetch_time', 'total_time', 'error'],
+    defaults=[0, 0, 0.0, 0.0, ''],
+)
+FetchResult = namedtuple('FetchResult', ['status', 'items', 'etag', 'last_modified', 'content_hash', 'fetch_time'])
+
+
+class DomainLimiter:
+    """Семафор на домен: не перегружаем один сайт параллельными запросами"""
+
+    def __init__(self, limit=PER_DOMAIN_LIMIT):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def __call__(self, url):
+        domain = urlparse(url).netloc
+        with self._lock:
+            if domain not in self._semaphores:
+                self._semaphores[domain] = threading.BoundedSemaphore(self.limit)
+            return self._semaphores[domain]
+
+
+def conditional_headers(source):
+    headers = {}
+    if source.etag:
+        headers['If-None-Match'] = source.etag
+    if source.last_modified:
+        headers['If-Modified-Since'] = source.last_modified
+    return headers
+
+
+def fetch_source(source, domain_limiter, force=False):
+    """Загрузка и разбор одного источника (выполняется в потоке, без запросов к базе)"""
+    parser = get_parser(source)
+    if parser is None:
+        logger.warning(f"No parser for {source.url}")
+        return FetchResult('unsupported', [], source.etag, source.last_modified, source.content_hash, 0.0)
+    started = time.monotonic()
+    # Семафор держится и на время разбора: parse_content() лениво загружает
+    # страницы 2..max_pages с того же домена
+    with domain_limiter(source.url):
+        response = parser.fetch(headers=None if force else conditional_headers(source))
+        fetch_time = time.monotonic() - started
+
+        if response.status_code == 304:
+            return FetchResult('not_modified', [], source.etag, source.last_modified, source.content_hash, fetch_time)
+        response.raise_for_status()
+
+        etag = response.headers.get('ETag', '')
+        last_modified = response.headers.get('Last-Modified', '')
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        if not force and content_hash == source.content_hash:
+            return FetchResult('unchanged', [], etag, last_modified, content_hash, fetch_time)
+        items = parser.parse_content(response.content)
+    return FetchResult('synced', items, etag, last_modified, content_hash, fetch_time)
+
+def upsert_events(source, items):
+    """INSERT ... ON CONFLICT (source, external_id) DO UPDATE; возвращает (создано, обновлено)"""
+    # Повтор external_id в одном INSERT ... ON CONFLICT недопустим - оставляем последний
+    by_id = {item['external_id']: item for item in items if item}
+    if not by_id:
+        return 0, 0
+    existing = set(
+        ExternalEvent.objects.filter(source=source, external_id__in=list(by_id))
+        .values_list('external_id', flat=True)
+    )
+    ExternalEvent.objects.bulk_create(
+        [ExternalEvent(source=source, **item) for item in by_id.values()],
+        update_conflicts=True,
+        unique_fields=['source', 'external_id'],
+        update_fields=UPSERT_FIELDS,
+    )
+    return len(by_id) - len(existing), len(existing)
+
+
+def save_sync_state(source, fetched):
+    ExternalEventSource.objects.filter(pk=source.pk).update(
+        etag=fetched.etag,
+        last_modified=fetched.last_modified,
+        content_hash=fetched.content_hash,
+        last_sync=timezone.now(),
+    )
+
+
+def sync_sources(sources, workers=SYNC_WORKERS, force=False):
+    """Синхронизирует источники параллельно; результаты в порядке завершения"""
+    sources = list(sources)
+    domain_limiter = DomainLimiter()
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(sources) or 1))) as executor:
+        futures = {
+            executor.submit(fetch_source, source, domain_limiter, force): (source, time.monotonic())
+            for source in sources
+        }
+        for future in as_completed(futures):
+            source, started = futures[future]
+            try:
+                fetched = future.result()
+                created, updated = upsert_events(source, fetched.items)
+                save_sync_state(source, fetched)
+            except Exception as e:
+                logger.error(f"Error syncing {source.name}: {e}")
+                results.append(SyncResult(source, 'error', total_time=time.monotonic() - started, error=str(e)))
+                continue
+            results.append(SyncResult(
+                source, fetched.status, created, updated, fetched.fetch_time, time.monotonic() - started,
+            ))
+    return results
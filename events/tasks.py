@@ -34,6 +34,71 @@ def send_event_reminders():
             )
 
 
+@shared_task
+def fan_out_event_notifications(event_id):
+    """Уведомления подписчикам о новом мероприятии порциями"""
+    from .notification_fanout import fan_out_event_notifications
+
+    return fan_out_event_notifications(event_id)
+
+
+@shared_task
+def send_event_notification_emails(event_id, user_ids):
+    """Письма порции подписчиков через одно SMTP-соединение"""
+    from .notification_fanout import send_event_notification_emails
+
+    return send_event_notification_emails(event_id, user_ids)
+
+
+@shared_task
+def process_event_media(event_id):
+    """Копии изображения, геокодирование и сброс кешей после сохранения мероприятия"""
+    from .processing import process_event
+    process_event(event_id)
+
+
+@shared_task
+def generate_image_renditions(model_label, object_id):
+    """Копии изображения рекламы или превью видео (WebP/JPEG нужных размеров)"""
+    from .processing import process_renditions
+    process_renditions(model_label, object_id)
+
+
+@shared_task
+def update_event_similarity(event_id):
+    """Соседи мероприятия в индексе похожих после изменения его текста"""
+    from .similarity import update_event_similarity
+    update_event_similarity(event_id)
+
+
+@shared_task
+def rebuild_event_similarity():
+    """Полная перестройка индекса похожих мероприятий"""
+    from .similarity import rebuild_similarity_index
+    rebuild_similarity_index()
+
+
+@shared_task
+def train_recommendation_models():
+    """Обучение факторов коллаборативной фильтрации (events/collaborative.py)"""
+    from .collaborative import train_collaborative_model
+    train_collaborative_model()
+
+
+@shared_task
+def precompute_recommendations():
+    """Кеш рекомендаций для пользователей, заходивших за последнюю неделю"""
+    from .recommendation_cache import precompute_recommendations
+    precompute_recommendations()
+
+
+@shared_task
+def update_trending_scores():
+    """Пересчет рейтинга «в тренде»"""
+    from .trending import compute_trending_scores
+    compute_trending_scores()
+
+
 @shared_task
 def sync_external_events():
     """Синхронизация внешних мероприятий"""    
@@ -47,30 +112,45 @@ def archive_old_events():
 
 @shared_task
 def reset_daily_quests():
-    """Сброс и создание ежедневных заданий"""
-    from .gamification.core import gamification_engine
-    from .models import Quest, UserQuest
-    
-    # Удаляем старые ежедневные задания
-    Quest.objects.filter(quest_type='daily').delete()
+    """Ротация ежедневных заданий: архив истекших, новое поколение"""
+    from .gamification.quests import rotate_daily_quests
     
-    # Создаем новые ежедневные задания
-    gamification_engine.create_daily_quests()
-    
-    print("Daily quests reset successfully")
+    rotation = rotate_daily_quests()
+    print(
+        f"Daily quests rotated to {rotation.generation}: {rotation.created} created, "
+        f"{rotation.expired} expired, {rotation.archived} progress rows archived"
+    )
+    return rotation.created
+
+@shared_task
+def broadcast_analytics():
+    """Общий тикер real-time аналитики: один снимок для всех подписчиков"""
+    from .realtime import broadcast_analytics
+
+    broadcast_analytics()
+
+@shared_task
+def process_gamification_events():
+    """Пачечная обработка журнала игровых действий"""
+    from .gamification.pipeline import process_gamification_events, purge_processed_events
+
+    processed = process_gamification_events()
+    purge_processed_events()
+    return processed
 
 @shared_task
 def update_leaderboard():
-    """Обновление таблицы лидеров"""
-    from .gamification.core import gamification_engine
-    from .models import UserProfile
+    """Сохранение таблицы лидеров из сортированного множества в Leaderboard"""
+    from .gamification.leaderboard import sync_leaderboard
     
-    # Обновляем статистику всех пользователей
-    profiles = UserProfile.objects.all()
-    for profile in profiles:
-        profile.update_stats()
+    return sync_leaderboard()
+
+@shared_task
+def reconcile_user_stats():
+    """Ночной пересчет счетчиков статистики игровых профилей"""
+    from .models import UserProfile
     
-    print("Leaderboard updated successfully")
+    return UserProfile.rebuild()
 
 @shared_task
 def award_streak_bonus():
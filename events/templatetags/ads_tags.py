@@ -12,7 +12,7 @@ def show_banner(position, limit=1):
         is_active=True,
         start_date__lte=now,
         end_date__gte=now
-    )[:limit]
+    ).prefetch_related('renditions')[:limit]
 
     print(f"DEBUG: show_banner('{position}') найдено: {banners.count()}")
     
@@ -0,0 +1,56 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from ..renditions import RENDITION_FIELDS, build_sources, rendition_url as get_rendition_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def event_image(obj, preset='card', css_class='', alt='', style='', lazy=True):
+    """
+    <picture> с WebP/AVIF и JPEG копиями изображения obj (Event, реклама,
+    превью видео). Пока копии не готовы - обычный <img> с оригиналом.
+    Для списков используйте prefetch_related('renditions').
+
+    {% event_image event "card" css_class="card-img-top" alt=event.title %}
+    """
+    loading = 'lazy' if lazy else 'eager'
+    sources = build_sources(obj, preset)
+    if sources is None:
+        field_file = getattr(obj, RENDITION_FIELDS[type(obj)])
+        if field_file:
+            src = field_file.url
+        elif hasattr(obj, 'get_image_url'):
+            src = obj.get_image_url()
+        else:
+            return ''
+        return format_html(
+            '<img src="{}" class="{}" alt="{}" style="{}" loading="{}">',
+            src, css_class, alt, style, loading,
+        )
+
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" '
+        'class="{}" alt="{}" style="{}" loading="{}" decoding="async"></picture>',
+        format_html_join(
+            '', '<source type="{}" srcset="{}" sizes="{}">',
+            ((mime, srcset, sources['sizes']) for mime, srcset in sources['sources']),
+        ),
+        sources['src'], sources['srcset'], sources['sizes'], sources['width'], sources['height'],
+        css_class, alt, style, loading,
+    )
+
+
+@register.simple_tag
+def rendition_url(obj, preset='card', fmt='jpeg'):
+    """URL одной копии (poster видео, og:image); оригинал, пока копии не готовы"""
+    url = get_rendition_url(obj, preset, fmt)
+    if url:
+        return url
+    field_file = getattr(obj, RENDITION_FIELDS[type(obj)])
+    if field_file:
+        return field_file.url
+    if hasattr(obj, 'get_image_url'):
+        return obj.get_image_url()
+    return ''
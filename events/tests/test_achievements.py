@@ -0,0 +1,90 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from ..gamification.achievements import (
+    AchievementIndex, evaluate_achievements, get_achievement_index, reset_achievement_index, stat_keys_for,
+)
+from ..models import Achievement, UserAchievement, UserProfile
+
+User = get_user_model()
+
+
+class AchievementIndexTest(TestCase):
+    def setUp(self):
+        # Индекс живет между тестами, а созданные достижения откатываются
+        reset_achievement_index()
+        self.addCleanup(reset_achievement_index)
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        UserProfile.objects.filter(user=self.user).update(
+            reviews_written=5, favorites_added=3, events_attended=1, categories_explored=1,
+        )
+        self.critic = self.create('Критик', reviews_written=5)
+        self.collector = self.create('Коллекционер', favorites_added=3)
+        self.explorer = self.create('Исследователь', events_attended=1, categories_explored=1)
+        self.veteran = self.create('Ветеран', events_attended=25)
+        self.create('Архив', is_active=False, favorites_added=1)
+
+    def create(self, name, is_active=True, points=10, **requirement):
+        return Achievement.objects.create(
+            name=name, description='', achievement_type='special', points=points,
+            requirement=requirement, is_active=is_active,
+        )
+
+    def profile(self):
+        return UserProfile.objects.get(user=self.user)
+
+    def unlocked(self):
+        return set(
+            UserAchievement.objects.filter(user=self.user, is_unlocked=True).values_list('achievement__name', flat=True)
+        )
+
+    def test_index_groups_rules_by_stat_key(self):
+        index = AchievementIndex.load()
+        self.assertEqual(index.rules_for({'favorites_added'}), [self.collector])
+        self.assertEqual(
+            {achievement.name for achievement in index.rules_for({'events_attended', 'reviews_written'})},
+            {'Критик', 'Исследователь', 'Ветеран'},
+        )
+        self.assertEqual(len(index.rules_for()), 4)
+        self.assertEqual(stat_keys_for(['add_favorite']), {'favorites_added', 'streak_days'})
+        self.assertIsNone(stat_keys_for(['add_favorite', 'points_awarded']))
+
+    def test_only_affected_rules_are_evaluated(self):
+        unlocked = evaluate_achievements(self.profile(), ['add_favorite'])
+
+        self.assertEqual([achievement['name'] for achievement in unlocked], ['Коллекционер'])
+        self.assertEqual(self.unlocked(), {'Коллекционер'})
+        self.assertEqual(self.profile().total_points, 10)
+
+    def test_unlocks_are_bulk_created_and_not_repeated(self):
+        UserAchievement.objects.create(user=self.user, achievement=self.critic, progress=0.6)
+        profile = self.profile()
+        get_achievement_index()
+
+        # Полученные достижения, одна вставка, сохранение очков
+        with self.assertNumQueries(3):
+            unlocked = evaluate_achievements(profile)
+        self.assertEqual(len(unlocked), 3)
+        self.assertEqual(self.unlocked(), {'Критик', 'Коллекционер', 'Исследователь'})
+        self.assertEqual(UserAchievement.objects.get(user=self.user, achievement=self.critic).progress, 1.0)
+        self.assertEqual(self.profile().total_points, 30)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(evaluate_achievements(profile), [])
+        self.assertEqual(self.profile().total_points, 30)
+
+    def test_points_do_not_overwrite_concurrent_awards(self):
+        stale = self.profile()
+        # Очки, начисленные другим обработчиком после чтения профиля
+        UserProfile.objects.filter(user=self.user).update(total_points=7)
+
+        evaluate_achievements(stale, ['review_created'])
+        self.assertEqual(self.profile().total_points, 7 + 10)
+
+    def test_index_is_reset_when_achievements_change(self):
+        index = get_achievement_index()
+        self.assertIs(get_achievement_index(), index)
+
+        self.create('Новичок')
+        self.assertEqual(len(get_achievement_index().rules_for()), 5)
+        unlocked = evaluate_achievements(self.profile(), ['user_registered'])
+        self.assertEqual([achievement['name'] for achievement in unlocked], ['Новичок'])
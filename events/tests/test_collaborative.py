@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+from io import StringIO
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+from ..ai_recommendations import AIRecommendationEngine
+from ..collaborative import (
+    CollaborativeModel, als_step, get_collaborative_model, load_interactions,
+    model_path, train_collaborative_model,
+)
+from ..models import Category, Event, Favorite, Registration, Review
+
+User = get_user_model()
+
+
+@override_settings(EVENT_PROCESSING_ASYNC=False)
+@mock.patch.object(Event, 'geocode_location', autospec=True)
+class CollaborativeFilteringTest(TestCase):
+    def setUp(self):
+        self.model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.model_dir, ignore_errors=True)
+        settings_override = override_settings(RECOMMENDATION_MODEL_DIR=self.model_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        organizer = User.objects.create_user(username='organizer', password='testpass123')
+        category = Category.objects.create(name='Разное', slug='misc')
+        self.events = [
+            Event.objects.create(
+                title=f'Мероприятие {i}', description='Описание', location='',
+                date=timezone.now() + timedelta(days=7), organizer=organizer, category=category,
+            )
+            for i in range(6)
+        ]
+        # Две группы пользователей: любители мероприятий 0-2 и любители 3-5
+        self.users = [User.objects.create_user(username=f'user{i}', password='x') for i in range(6)]
+        for i, user in enumerate(self.users):
+            group = self.events[:3] if i < 3 else self.events[3:]
+            for event in group:
+                if user is self.users[0] and event is self.events[2]:
+                    continue
+                Favorite.objects.create(user=user, event=event)
+
+    def test_interactions_loaded_in_one_query(self, geocode_location):
+        Registration.objects.create(user=self.users[0], event=self.events[0], status='confirmed')
+        Registration.objects.create(user=self.users[0], event=self.events[4], status='cancelled')
+        Review.objects.create(user=self.users[0], event=self.events[5], rating=2)
+        Review.objects.create(user=self.users[1], event=self.events[0], rating=5)
+
+        with self.assertNumQueries(1):
+            matrix, user_ids, item_ids = load_interactions()
+
+        self.assertEqual(matrix.shape, (6, 6))
+        self.assertEqual(matrix.nnz, 17)
+        row = matrix.getrow(user_ids.index(self.users[0].pk))
+        # Избранное + регистрация складываются, отмененная регистрация и плохой отзыв не учитываются
+        self.assertEqual(
+            dict(zip(row.indices.tolist(), row.data.tolist())),
+            {item_ids.index(self.events[0].pk): 5.0, item_ids.index(self.events[1].pk): 3.0},
+        )
+        self.assertEqual(matrix[user_ids.index(self.users[1].pk), item_ids.index(self.events[0].pk)], 6.0)
+
+    def test_als_step_solves_normal_equations(self, geocode_location):
+        matrix, _, _ = load_interactions()
+        fixed = np.random.default_rng(1).uniform(0, 1, (matrix.shape[1], 3))
+        factors = als_step(matrix, fixed, regularization=0.1, alpha=10.0)
+        # Плотная формула для первой строки: (YᵀC_uY + λI) x = YᵀC_u p_u
+        confidence = 1.0 + 10.0 * matrix.getrow(0).toarray().ravel()
+        preference = (confidence > 1.0).astype(float)
+        system = fixed.T @ (confidence[:, None] * fixed) + 0.1 * np.eye(3)
+        np.testing.assert_allclose(system @ factors[0], fixed.T @ (confidence * preference))
+
+    def test_recommends_unseen_item_from_own_group(self, geocode_location):
+        model = CollaborativeModel.train(*load_interactions(), factors=4, iterations=10)
+        recommended = [event_id for event_id, _ in model.recommend(self.users[0].pk, limit=6)]
+
+        self.assertEqual(recommended[0], self.events[2].pk)
+        # Уже знакомые мероприятия замаскированы
+        self.assertNotIn(self.events[0].pk, recommended)
+        self.assertNotIn(self.events[1].pk, recommended)
+        self.assertEqual(model.recommend(-1), [])
+
+    def test_model_persisted_and_reloaded(self, geocode_location):
+        trained = train_collaborative_model(factors=4, iterations=5)
+        self.assertTrue(os.path.exists(model_path()))
+
+        loaded = get_collaborative_model()
+        self.assertIs(get_collaborative_model(), loaded)
+        self.assertEqual(loaded.item_ids, trained.item_ids)
+        self.assertEqual(
+            [event_id for event_id, _ in loaded.recommend(self.users[0].pk)],
+            [event_id for event_id, _ in trained.recommend(self.users[0].pk)],
+        )
+
+    def test_engine_serves_from_model(self, geocode_location):
+        engine = AIRecommendationEngine()
+        self.assertEqual(engine.get_collaborative_recommendations(self.users[0]), [])
+
+        train_collaborative_model(factors=4, iterations=10)
+        Event.objects.filter(pk=self.events[3].pk).update(is_active=False)
+        with self.assertNumQueries(1):
+            recommended = engine.get_collaborative_recommendations(self.users[0], limit=2)
+        self.assertEqual(recommended[0].pk, self.events[2].pk)
+        self.assertNotIn(self.events[3].pk, [event.pk for event in recommended])
+
+    def test_command(self, geocode_location):
+        out = StringIO()
+        call_command('train_recommendations', factors=4, iterations=2, stdout=out)
+        self.assertIn('6 пользователей, 6 мероприятий, 17 взаимодействий', out.getvalue())
@@ -0,0 +1,164 @@
+import sys
+from io import StringIO
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from ..gamification.core import gamification_engine
+from ..gamification.leaderboard import get_leaderboard, reset_leaderboard
+from ..gamification.pipeline import MAX_ATTEMPTS, process_gamification_events, purge_processed_events
+from ..gamification.quests import reset_quest_index
+from ..models import (
+    Category, Event, Favorite, GamificationEvent, Quest, Registration, UserProfile, UserQuest,
+)
+
+User = get_user_model()
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+IN_MEMORY_LEADERBOARD = 'events.gamification.leaderboard.InMemorySortedSet'
+
+
+@override_settings(CACHES=LOCMEM_CACHE, EVENT_PROCESSING_ASYNC=False, LEADERBOARD_STORE=IN_MEMORY_LEADERBOARD)
+@mock.patch.object(Event, 'geocode_location', autospec=True)
+class GamificationPipelineTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_leaderboard('LEADERBOARD_STORE')
+        # Индекс заданий живет между тестами, а созданные задания откатываются
+        reset_quest_index()
+        self.addCleanup(reset_quest_index)
+        self.organizer = User.objects.create_user(username='organizer', password='testpass123')
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.category = Category.objects.create(name='Музыка', slug='music')
+        self.events = [
+            Event.objects.create(
+                title=f'Концерт {i}', description='Описание', location='', organizer=self.organizer,
+                category=self.category, date=timezone.now() + timedelta(days=7),
+            )
+            for i in range(3)
+        ]
+
+    def profile(self, user):
+        return UserProfile.objects.get(user=user)
+
+    def test_signals_only_record_actions(self, geocode_location):
+        Favorite.objects.create(user=self.user, event=self.events[0])
+
+        self.assertEqual(self.profile(self.user).total_points, 0)
+        self.assertEqual(
+            list(GamificationEvent.objects.filter(user=self.user).values_list('action', 'points')),
+            [('user_registered', 10), ('add_favorite', 2)],
+        )
+        self.assertEqual(GamificationEvent.objects.filter(user=self.organizer, action='event_created').count(), 3)
+
+    def test_actions_are_coalesced_per_user(self, geocode_location):
+        for event in self.events:
+            Favorite.objects.create(user=self.user, event=event)
+        Registration.objects.create(user=self.user, event=self.events[0])
+
+        with mock.patch.object(gamification_engine, 'handle_user_actions',
+                               wraps=gamification_engine.handle_user_actions) as handle_user_actions, \
+                self.captureOnCommitCallbacks(execute=True):
+            processed = process_gamification_events()
+
+        self.assertEqual(processed, 9)
+        self.assertEqual(handle_user_actions.call_count, 2)
+        profile = self.profile(self.user)
+        self.assertEqual(profile.total_points, 10 + 3 * 2 + 5)
+        self.assertEqual(profile.stats['favorites_added'], 3)
+        self.assertEqual(self.profile(self.organizer).total_points, 10 + 3 * 15)
+        self.assertEqual(
+            get_leaderboard().top(),
+            [(1, self.organizer.pk, 10 + 3 * 15), (2, self.user.pk, 10 + 3 * 2 + 5)],
+        )
+        self.assertFalse(GamificationEvent.objects.filter(processed_at__isnull=True).exists())
+        self.assertEqual(process_gamification_events(), 0)
+
+    def test_quest_progress_counts_batched_actions(self, geocode_location):
+        quest = Quest.objects.create(
+            name='Социальная активность', description='', quest_type='daily', points_reward=8,
+            requirement={'action_type': 'add_favorite', 'target_count': 3},
+        )
+        UserQuest.objects.create(user=self.user, quest=quest)
+        for event in self.events:
+            Favorite.objects.create(user=self.user, event=event)
+
+        process_gamification_events()
+
+        self.assertTrue(UserQuest.objects.get(user=self.user, quest=quest).is_completed)
+        self.assertEqual(self.profile(self.user).total_points, 10 + 3 * 2 + 8)
+
+    def test_batches_are_bounded(self, geocode_location):
+        for event in self.events:
+            Favorite.objects.create(user=self.user, event=event)
+
+        self.assertEqual(process_gamification_events(batch_size=2), 8)
+        self.assertEqual(self.profile(self.user).total_points, 10 + 3 * 2)
+
+    def test_processing_runs_after_commit(self, geocode_location):
+        with self.captureOnCommitCallbacks(execute=True):
+            Favorite.objects.create(user=self.user, event=self.events[0])
+        self.assertFalse(GamificationEvent.objects.filter(processed_at__isnull=True).exists())
+        self.assertEqual(self.profile(self.user).total_points, 10 + 2)
+
+    @override_settings(EVENT_PROCESSING_ASYNC=True)
+    def test_async_processing_is_scheduled_once_per_window(self, geocode_location):
+        tasks = mock.Mock()
+        with mock.patch.dict(sys.modules, {'events.tasks': tasks}):
+            with self.captureOnCommitCallbacks(execute=True):
+                Favorite.objects.create(user=self.user, event=self.events[0])
+            with self.captureOnCommitCallbacks(execute=True):
+                Favorite.objects.create(user=self.user, event=self.events[1])
+        tasks.process_gamification_events.apply_async.assert_called_once_with((), retry=False, countdown=10)
+        self.assertEqual(self.profile(self.user).total_points, 0)
+
+    def test_failed_user_is_retried(self, geocode_location):
+        Favorite.objects.create(user=self.user, event=self.events[0])
+        handle_user_actions = gamification_engine.handle_user_actions
+
+        def fail_for_player(user, actions):
+            if user.pk == self.user.pk:
+                raise RuntimeError('boom')
+            return handle_user_actions(user, actions)
+
+        with mock.patch.object(gamification_engine, 'handle_user_actions', side_effect=fail_for_player):
+            self.assertEqual(process_gamification_events(batch_size=2), 4)
+
+        self.assertEqual(self.profile(self.user).total_points, 0)
+        self.assertEqual(self.profile(self.organizer).total_points, 10 + 3 * 15)
+        pending = GamificationEvent.objects.filter(processed_at__isnull=True)
+        self.assertEqual(list(pending.values_list('user_id', 'attempts')), [(self.user.pk, 1)] * 2)
+
+        # Следующий запуск (задача по расписанию) досчитывает строки
+        self.assertEqual(process_gamification_events(), 2)
+        self.assertEqual(self.profile(self.user).total_points, 10 + 2)
+        self.assertFalse(pending.exists())
+
+    def test_failing_rows_stop_after_max_attempts(self, geocode_location):
+        with mock.patch.object(gamification_engine, 'handle_user_actions', side_effect=RuntimeError('boom')):
+            for _ in range(MAX_ATTEMPTS + 1):
+                self.assertEqual(process_gamification_events(), 0)
+
+        self.assertEqual(
+            set(GamificationEvent.objects.filter(processed_at__isnull=True).values_list('attempts', flat=True)),
+            {MAX_ATTEMPTS},
+        )
+        self.assertEqual(process_gamification_events(), 0)
+
+    def test_purge_keeps_recent_and_pending_actions(self, geocode_location):
+        process_gamification_events()
+        GamificationEvent.objects.filter(user=self.organizer).update(
+            processed_at=timezone.now() - timedelta(days=31),
+        )
+        Favorite.objects.create(user=self.user, event=self.events[0])
+
+        self.assertEqual(purge_processed_events(), 4)
+        self.assertEqual(GamificationEvent.objects.filter(user=self.user).count(), 2)
+
+    def test_command(self, geocode_location):
+        out = StringIO()
+        call_command('process_gamification_events', stdout=out)
+        self.assertIn('Обработано игровых действий: 5', out.getvalue())
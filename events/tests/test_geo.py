@@ -0,0 +1,85 @@
+from unittest import mock
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from model_bakery import baker
+from .. import geo
+from ..models import Event, Category
+from ..filters import filter_nearby
+
+User = get_user_model()
+
+MOSCOW = (55.7558, 37.6173)
+ZELENOGRAD = (55.9825, 37.1814)  # ~35 км
+PETERSBURG = (59.9343, 30.3351)  # ~635 км
+
+
+class GeohashTest(TestCase):
+    def test_known_geohash(self):
+        self.assertEqual(geo.geohash_encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_precision_grows_with_zoom(self):
+        precisions = [geo.geohash_precision_for_zoom(zoom) for zoom in range(0, 15)]
+        self.assertEqual(precisions, sorted(precisions))
+        self.assertLessEqual(precisions[-1], geo.GEOHASH_PRECISION)
+
+    def test_haversine_with_and_without_numpy(self):
+        expected = [0.0, 634.0]
+        for numpy_available in ({geo.NUMPY_AVAILABLE, False}):
+            with mock.patch.object(geo, 'NUMPY_AVAILABLE', numpy_available):
+                distances = geo.haversine_km(*MOSCOW, [MOSCOW[0], PETERSBURG[0]], [MOSCOW[1], PETERSBURG[1]])
+            for distance, value in zip(distances, expected):
+                self.assertAlmostEqual(distance, value, delta=5)
+
+
+class GeoQueriesTest(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', password='testpass123')
+        self.category = Category.objects.create(name='Музыка', slug='music')
+        self.moscow = [self.make_event(MOSCOW[0] + i * 0.001, MOSCOW[1]) for i in range(3)]
+        self.zelenograd = self.make_event(*ZELENOGRAD)
+        self.petersburg = self.make_event(*PETERSBURG)
+
+    def make_event(self, latitude, longitude):
+        return baker.make(
+            Event, organizer=self.organizer, category=self.category,
+            latitude=latitude, longitude=longitude, is_active=True,
+        )
+
+    def test_geohash_saved(self):
+        self.assertEqual(self.petersburg.geohash, geo.geohash_encode(*PETERSBURG))
+        self.petersburg.latitude, self.petersburg.longitude = MOSCOW
+        self.petersburg.save(update_fields=['latitude', 'longitude'])
+        self.petersburg.refresh_from_db()
+        self.assertEqual(self.petersburg.geohash, geo.geohash_encode(*MOSCOW))
+
+    def test_radius_filter(self):
+        queryset, distances = geo.events_within_radius(Event.objects.all(), *MOSCOW, 10)
+        self.assertEqual(set(queryset), set(self.moscow))
+        self.assertTrue(all(distance < 1 for distance in distances.values()))
+        nearby = filter_nearby(Event.objects.all(), f'{MOSCOW[0]},{MOSCOW[1]},50')
+        self.assertEqual(set(nearby), set(self.moscow) | {self.zelenograd})
+        self.assertFalse(filter_nearby(Event.objects.all(), 'abc').exists())
+
+    def test_map_api_bbox_individual_markers(self):
+        response = self.client.get(reverse('events_map_api'), {'bbox': '37,55,38,56.5', 'zoom': 16})
+        data = response.json()
+        self.assertEqual(data['clusters'], [])
+        self.assertEqual(
+            {event['id'] for event in data['events']},
+            {event.pk for event in self.moscow + [self.zelenograd]},
+        )
+
+    def test_map_api_clusters_at_low_zoom(self):
+        response = self.client.get(reverse('events_map_api'), {'bbox': '29,54,39,61', 'zoom': 8})
+        data = response.json()
+        self.assertEqual([cluster['count'] for cluster in data['clusters']], [3])
+        self.assertEqual(
+            {event['id'] for event in data['events']}, {self.zelenograd.pk, self.petersburg.pk}
+        )
+
+    def test_map_api_legacy_list_and_errors(self):
+        response = self.client.get(reverse('events_map_api'), {'limit': 2})
+        self.assertEqual(len(response.json()), 2)
+        response = self.client.get(reverse('events_map_api'), {'bbox': '1,2,3'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,108 @@
+from io import StringIO
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+from datetime import timedelta
+from .. import geocoding
+from ..geocoding import StubGeocodingProvider, get_geocoder, normalize_address
+from ..models import Event, Category, GeocodeCache
+from ..weather_integration import WeatherService
+
+User = get_user_model()
+
+STUB = 'events.geocoding.StubGeocodingProvider'
+ADDRESSES = {
+    'москва, красная площадь, 1': (55.7539, 37.6208),
+    'казань, ул. баумана, 10': (55.7887, 49.1221),
+}
+
+
+@override_settings(GEOCODING_PROVIDER=STUB)
+@mock.patch.dict(StubGeocodingProvider.addresses, ADDRESSES)
+class GeocoderTest(TestCase):
+    def setUp(self):
+        # Свежий провайдер (и его список вызовов) для каждого теста
+        geocoding.reset_geocoder('GEOCODING_PROVIDER')
+
+    def test_normalize_address(self):
+        self.assertEqual(
+            normalize_address('  Москва,Красная   площадь, 1 , Россия '),
+            'москва, красная площадь, 1',
+        )
+
+    def test_provider_result_is_cached(self):
+        geocoder = get_geocoder()
+        result = geocoder.geocode('Москва, Красная площадь, 1')
+        self.assertEqual((result.latitude, result.longitude), ADDRESSES['москва, красная площадь, 1'])
+
+        again = geocoder.geocode('москва,  красная площадь, 1, Россия')
+        self.assertEqual(again.source, 'cache')
+        self.assertEqual(len(geocoder.provider.calls), 1)
+
+    def test_not_found_is_cached_until_ttl(self):
+        geocoder = get_geocoder()
+        self.assertIsNone(geocoder.geocode('Нигде, ул. Несуществующая'))
+        self.assertIsNone(geocoder.geocode('Нигде, ул. Несуществующая'))
+        self.assertEqual(len(geocoder.provider.calls), 1)
+
+        GeocodeCache.objects.update(updated_at=timezone.now() - geocoding.NEGATIVE_TTL - timedelta(days=1))
+        geocoder.geocode('Нигде, ул. Несуществующая')
+        self.assertEqual(len(geocoder.provider.calls), 2)
+
+    def test_city_table(self):
+        geocoder = get_geocoder()
+        # Адрес - только название города: точка берется из таблицы
+        self.assertEqual(geocoder.geocode('Казань').source, 'cities')
+        # Прогнозу погоды хватает города внутри адреса
+        weather = WeatherService().geocode_location('Екатеринбург, ул. Ленина, 5')
+        self.assertEqual((weather['lat'], weather['lon']), geocoding.CITY_COORDINATES['екатеринбург'])
+        self.assertEqual(geocoder.provider.calls, [])
+
+    def test_geocode_many_matches_single_lookup(self):
+        geocoder = get_geocoder()
+        # Старая запись кеша для названия города не перекрывает таблицу городов
+        geocoder._store({'казань': geocoding.GeocodeResult(55.0, 49.0, 'Казань', 'stub')})
+        single = geocoder.geocode('Казань')
+        self.assertEqual(single.source, 'cities')
+        self.assertEqual(geocoder.geocode_many(['Казань'])['Казань'], single)
+
+    def test_provider_error_is_not_cached(self):
+        geocoder = get_geocoder()
+        with mock.patch.object(geocoder.provider, 'geocode', side_effect=geocoding.GeocodingError('timeout')):
+            self.assertIsNone(geocoder.geocode('Москва, Красная площадь, 1'))
+        self.assertFalse(GeocodeCache.objects.exists())
+
+    def test_geocode_many_deduplicates(self):
+        geocoder = get_geocoder()
+        geocoder.geocode('Казань, ул. Баумана, 10')
+        addresses = [
+            'Москва, Красная площадь, 1',
+            'москва, красная площадь, 1',
+            'Казань, ул. Баумана, 10',
+            'Москва',
+        ]
+        with self.assertNumQueries(2):  # чтение кеша + запись одного нового адреса
+            results = geocoder.geocode_many(addresses, workers=2)
+
+        self.assertEqual(set(results), set(addresses))
+        self.assertEqual(results['Москва, Красная площадь, 1'], results['москва, красная площадь, 1'])
+        self.assertEqual(results['Казань, ул. Баумана, 10'].source, 'cache')
+        self.assertEqual(results['Москва'].source, 'cities')
+        self.assertEqual(sorted(geocoder.provider.calls), ['казань, ул. баумана, 10', 'москва, красная площадь, 1'])
+
+    def test_update_event_coordinates_command(self):
+        organizer = User.objects.create_user(username='organizer', password='testpass123')
+        category = Category.objects.create(name='Музыка', slug='music')
+        for i in range(3):
+            Event.objects.create(
+                title=f'Событие {i}', description='Описание', date=timezone.now() + timedelta(days=7),
+                location='Москва, Красная площадь, 1', organizer=organizer, category=category,
+            )
+
+        call_command('update_event_coordinates', workers=2, stdout=StringIO())
+
+        self.assertEqual(get_geocoder().provider.calls, ['москва, красная площадь, 1'])
+        self.assertFalse(Event.objects.filter(latitude__isnull=True).exists())
+        self.assertEqual(Event.objects.filter(geohash__startswith='ucfv').count(), 3)
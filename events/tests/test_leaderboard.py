@@ -0,0 +1,126 @@
+from io import StringIO
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from ..gamification.core import gamification_engine
+from ..gamification.leaderboard import (
+    InMemorySortedSet, LeaderboardService, get_leaderboard, reset_leaderboard, sync_leaderboard,
+)
+from ..models import Leaderboard, UserProfile
+
+User = get_user_model()
+
+IN_MEMORY_LEADERBOARD = 'events.gamification.leaderboard.InMemorySortedSet'
+
+
+class InMemorySortedSetTest(TestCase):
+    def setUp(self):
+        self.store = InMemorySortedSet()
+        self.store.zadd({1: 50, 2: 80, 3: 50, 10: 20})
+
+    def test_order_matches_redis(self):
+        # Равные очки - по убыванию участника как строки, как ZREVRANGE
+        self.assertEqual(self.store.zrevrange(0, -1), [('2', 80), ('3', 50), ('1', 50), ('10', 20)])
+        self.assertEqual(self.store.zrevrange(1, 2), [('3', 50), ('1', 50)])
+        self.assertEqual(self.store.zrevrange(3, 10), [('10', 20)])
+        self.assertEqual(self.store.zrevrange(5, 10), [])
+        self.assertEqual([self.store.zrevrank(member) for member in (2, 3, 1, 10)], [0, 1, 2, 3])
+        self.assertIsNone(self.store.zrevrank(99))
+
+    def test_update_and_remove(self):
+        self.store.zadd({10: 100})
+        self.store.zrem(2)
+        self.assertEqual(self.store.zrevrange(0, 1), [('10', 100), ('3', 50)])
+        self.assertEqual(self.store.zscore(10), 100)
+        self.assertIsNone(self.store.zscore(2))
+        self.assertEqual(self.store.zcard(), 3)
+
+
+class BrokenStore:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError('redis is down')
+        return fail
+
+
+@override_settings(EVENT_PROCESSING_ASYNC=False, LEADERBOARD_STORE=IN_MEMORY_LEADERBOARD)
+class LeaderboardServiceTest(TestCase):
+    def setUp(self):
+        reset_leaderboard('LEADERBOARD_STORE')
+        self.leaderboard = get_leaderboard()
+        self.users = [User.objects.create_user(username=f'player{i}', password='testpass123') for i in range(3)]
+        for user, points in zip(self.users, [30, 90, 60]):
+            UserProfile.objects.filter(user=user).update(total_points=points)
+            self.leaderboard.update(user.pk, points)
+
+    def test_rank_score_and_top(self):
+        self.assertEqual(self.leaderboard.rank(self.users[1].pk), 1)
+        self.assertEqual(self.leaderboard.rank(self.users[0].pk), 3)
+        self.assertEqual(self.leaderboard.score(self.users[2].pk), 60)
+        self.assertEqual(
+            self.leaderboard.top(2, offset=1),
+            [(2, self.users[2].pk, 60), (3, self.users[0].pk, 30)],
+        )
+        self.assertEqual(self.leaderboard.count(), 3)
+
+    def test_engine_updates_set_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            gamification_engine.award_points(self.users[0], points=100, reason='Test')
+        self.assertEqual(self.leaderboard.rank(self.users[0].pk), 1)
+        self.assertEqual(self.leaderboard.score(self.users[0].pk), 130)
+        self.assertEqual(gamification_engine.get_user_progress(self.users[0])['leaderboard_position'], 1)
+
+    def test_persist_writes_positions_in_bulk(self):
+        stale = User.objects.create_user(username='stale', password='testpass123')
+        Leaderboard.objects.create(user=stale, position=1, points=500)
+
+        with self.assertNumQueries(5):
+            self.assertEqual(self.leaderboard.persist(), 3)
+
+        self.assertEqual(
+            list(Leaderboard.objects.values_list('user__username', 'position', 'points')),
+            [('player1', 1, 90), ('player2', 2, 60), ('player0', 3, 30)],
+        )
+
+    def test_sync_rebuilds_empty_store_from_profiles(self):
+        self.leaderboard.store.clear()
+        self.assertEqual(sync_leaderboard(), 3)
+        self.assertEqual(self.leaderboard.rank(self.users[1].pk), 1)
+        self.assertEqual(Leaderboard.objects.get(user=self.users[0]).position, 3)
+
+    def test_deleted_user_leaves_leaderboard(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.users[1].delete()
+        self.assertIsNone(self.leaderboard.rank(self.users[1].pk))
+        self.assertEqual(self.leaderboard.rank(self.users[2].pk), 1)
+
+    def test_unavailable_store_falls_back_to_table(self):
+        self.leaderboard.persist()
+        broken = LeaderboardService(BrokenStore())
+        self.assertEqual(broken.rank(self.users[2].pk), 2)
+        self.assertEqual(broken.top(1), [(1, self.users[1].pk, 90)])
+        self.assertEqual(broken.count(), 3)
+
+    def test_leaderboard_page_and_api(self):
+        self.client.force_login(self.users[0])
+        response = self.client.get(reverse('leaderboard_page'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry['username'] for entry in response.context['leaderboard']],
+                         ['player1', 'player2', 'player0'])
+        self.assertEqual(response.context['user_rank'], 3)
+        self.assertEqual(response.context['total_players'], 3)
+
+        data = self.client.get(reverse('leaderboard'), {'limit': 1, 'offset': 1}).json()
+        self.assertEqual(data['total_players'], 3)
+        self.assertEqual(
+            [(entry['rank'], entry['username'], entry['points']) for entry in data['leaderboard']],
+            [(2, 'player2', 60)],
+        )
+
+    def test_command(self):
+        self.leaderboard.store.clear()
+        out = StringIO()
+        call_command('rebuild_leaderboard', stdout=out)
+        self.assertIn('3 участников', out.getvalue())
+        self.assertEqual(Leaderboard.objects.count(), 3)
@@ -2,7 +2,7 @@ from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from datetime import timedelta
-from ..models import Event, Category, Registration, Favorite, Review, UserProfile
+from ..models import Event, Category, Registration, Favorite, Review, UserProfile, EventStatistic
 from django.core.exceptions import ValidationError
 from model_bakery import baker
 
@@ -136,4 +136,137 @@ class UserProfileModelTest(TestCase):
     def test_profile_auto_creation(self, test_user):
         # Профиль должен быть создан автоматически через сигнал
         assert hasattr(test_user, 'userprofile')
-        assert test_user.userprofile is not None
\ No newline at end of file
+        assert test_user.userprofile is not None
+
+class EventWithStatsTest(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', password='testpass123')
+        self.category = Category.objects.create(name='Музыка', slug='music')
+        self.event = baker.make(
+            Event,
+            title='Stats Event',
+            organizer=self.organizer,
+            category=self.category,
+            date=timezone.now() + timedelta(days=7),
+            latitude=55.75,
+            longitude=37.61,
+            capacity=10,
+        )
+        for i, rating in enumerate([5, 4, 3]):
+            user = User.objects.create_user(username=f'user{i}', password='testpass123')
+            Registration.objects.create(user=user, event=self.event, status='confirmed')
+            Review.objects.create(user=user, event=self.event, rating=rating)
+            Favorite.objects.create(user=user, event=self.event)
+        pending = User.objects.create_user(username='pending', password='testpass123')
+        Registration.objects.create(user=pending, event=self.event, status='pending')
+
+    def test_with_stats_annotations(self):
+        """Аннотации with_stats() совпадают с вычислением по связанным таблицам"""
+        event = Event.objects.with_stats().get(pk=self.event.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(event.registrations_count, 3)
+            self.assertEqual(event.reviews_count, 3)
+            self.assertEqual(event.favorites_count, 3)
+            self.assertAlmostEqual(event.average_rating, 4.0)
+            event.get_active_badges()
+
+    def test_properties_without_annotation(self):
+        """Без with_stats() свойства берут значения из EventStatistic"""
+        event = Event.objects.get(pk=self.event.pk)
+        self.assertEqual(event.registrations_count, 3)
+        self.assertAlmostEqual(event.average_rating, 4.0)
+
+    def test_with_stats_empty_event(self):
+        """Мероприятие без отзывов и регистраций получает нули, а не None"""
+        empty = baker.make(
+            Event, organizer=self.organizer, category=self.category, latitude=55.75, longitude=37.61
+        )
+        event = Event.objects.with_stats().get(pk=empty.pk)
+        self.assertEqual(event.registrations_count, 0)
+        self.assertEqual(event.average_rating, 0)
+
+
+class EventStatisticCountersTest(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', password='testpass123')
+        self.category = Category.objects.create(name='Музыка', slug='music')
+        self.event = baker.make(
+            Event, organizer=self.organizer, category=self.category, latitude=55.75, longitude=37.61
+        )
+        self.user = User.objects.create_user(username='visitor', password='testpass123')
+
+    def stat(self):
+        return EventStatistic.objects.get(event=self.event)
+
+    def test_statistic_created_with_event(self):
+        self.assertEqual(self.stat().registrations_count, 0)
+
+    def test_registration_status_transitions(self):
+        """Считаются только подтвержденные регистрации"""
+        registration = Registration.objects.create(user=self.user, event=self.event, status='pending')
+        self.assertEqual(self.stat().registrations_count, 0)
+
+        registration.status = 'confirmed'
+        registration.save()
+        registration.save()
+        self.assertEqual(self.stat().registrations_count, 1)
+
+        registration.status = 'cancelled'
+        registration.save()
+        self.assertEqual(self.stat().registrations_count, 0)
+
+        registration.status = 'confirmed'
+        registration.save()
+        Registration.objects.get(pk=registration.pk).delete()
+        self.assertEqual(self.stat().registrations_count, 0)
+
+    def test_review_and_favorite_counters(self):
+        review = Review.objects.create(user=self.user, event=self.event, rating=4)
+        Favorite.objects.create(user=self.user, event=self.event)
+        stat = self.stat()
+        self.assertEqual((stat.reviews_count, stat.rating_sum, stat.favorites_count), (1, 4, 1))
+
+        review.rating = 2
+        review.save()
+        self.assertAlmostEqual(self.stat().average_rating, 2.0)
+
+        review.delete()
+        Favorite.objects.filter(user=self.user).delete()
+        stat = self.stat()
+        self.assertEqual((stat.reviews_count, stat.rating_sum, stat.favorites_count), (0, 0, 0))
+
+    def test_moved_review_and_favorite_move_counters(self):
+        other = baker.make(
+            Event, organizer=self.organizer, category=self.category, latitude=55.75, longitude=37.61
+        )
+        review = Review.objects.create(user=self.user, event=self.event, rating=4)
+        favorite = Favorite.objects.create(user=self.user, event=self.event)
+
+        review.event, review.rating = other, 5
+        review.save()
+        favorite.event = other
+        favorite.save()
+        favorite.save()
+
+        stat = self.stat()
+        self.assertEqual((stat.reviews_count, stat.rating_sum, stat.favorites_count), (0, 0, 0))
+        stat = EventStatistic.objects.get(event=other)
+        self.assertEqual((stat.reviews_count, stat.rating_sum, stat.favorites_count), (1, 5, 1))
+
+    def test_event_delete_does_not_recreate_statistic(self):
+        Review.objects.create(user=self.user, event=self.event, rating=5)
+        self.event.delete()
+        self.assertFalse(EventStatistic.objects.exists())
+
+    def test_rebuild_repairs_drift(self):
+        Registration.objects.create(user=self.user, event=self.event, status='confirmed')
+        Review.objects.create(user=self.user, event=self.event, rating=5)
+        EventStatistic.objects.all().delete()
+
+        self.assertEqual(EventStatistic.rebuild(), 1)
+        stat = self.stat()
+        self.assertEqual((stat.registrations_count, stat.reviews_count, stat.rating_sum), (1, 1, 5))
+
+        EventStatistic.objects.update(registrations_count=42)
+        EventStatistic.rebuild(Event.objects.filter(pk=self.event.pk))
+        self.assertEqual(self.stat().registrations_count, 1)
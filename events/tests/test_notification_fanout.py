@@ -0,0 +1,112 @@
+from datetime import timedelta
+from unittest import mock
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from ..models import Category, Event, Notification, Subscription
+from .. import notification_fanout
+from ..notification_fanout import fan_out_event_notifications
+
+User = get_user_model()
+
+
+@override_settings(EVENT_PROCESSING_ASYNC=False, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+@mock.patch.object(Event, 'geocode_location', autospec=True)
+class NotificationFanOutTest(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', password='testpass123')
+        self.music = Category.objects.create(name='Музыка', slug='music')
+        self.sport = Category.objects.create(name='Спорт', slug='sport')
+        self.subscribers = [self.subscribe(f'fan{i}', self.music) for i in range(5)]
+        # Вторая подписка того же пользователя не дает второго уведомления
+        self.subscribe('fan0', self.music, user=self.subscribers[0])
+        self.subscribe('sleeper', self.music, is_active=False)
+        self.subscribe('runner', self.sport)
+
+    def subscribe(self, username, category, user=None, is_active=True):
+        user = user or User.objects.create_user(
+            username=username, email=f'{username}@example.com', password='testpass123'
+        )
+        subscription = Subscription.objects.create(user=user, is_active=is_active)
+        subscription.categories.add(category)
+        return user
+
+    def create_event(self, title='Концерт'):
+        return Event.objects.create(
+            title=title, description='Описание', location='', organizer=self.organizer,
+            category=self.music, date=timezone.now() + timedelta(days=7),
+        )
+
+    def test_event_save_enqueues_single_job_after_commit(self, geocode_location):
+        with mock.patch('events.notification_fanout._enqueue') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                event = self.create_event()
+                self.assertFalse(enqueue.called)
+
+        enqueue.assert_called_once_with(
+            'fan_out_event_notifications', (event.pk,), fan_out_event_notifications
+        )
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(mail.outbox, [])
+
+    def test_fan_out_in_chunks(self, geocode_location):
+        with self.captureOnCommitCallbacks(execute=True):
+            event = self.create_event()
+
+        self.assertEqual(
+            set(Notification.objects.filter(event=event).values_list('user__username', flat=True)),
+            {f'fan{i}' for i in range(5)},
+        )
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(mail.outbox[0].subject, 'Новое мероприятие: Концерт')
+        self.assertIn('fan0', mail.outbox[0].alternatives[0][0])
+
+        # Повтор задачи ничего не дублирует
+        self.assertEqual(fan_out_event_notifications(event.pk, chunk_size=2), 0)
+        self.assertEqual(Notification.objects.filter(event=event).count(), 5)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_retry_sends_emails_lost_after_insert(self, geocode_location):
+        event = self.create_event()
+        enqueue = notification_fanout._enqueue
+
+        def lose_email_jobs(task_name, args, fallback, countdown=None):
+            if task_name != 'send_event_notification_emails':
+                enqueue(task_name, args, fallback, countdown)
+
+        # Воркер упал после вставки уведомлений, задача отправки не поставлена
+        with mock.patch.object(notification_fanout, '_enqueue', side_effect=lose_email_jobs):
+            self.assertEqual(fan_out_event_notifications(event.pk, chunk_size=2), 5)
+        self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(fan_out_event_notifications(event.pk, chunk_size=2), 0)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(Notification.objects.filter(event=event, emailed_at__isnull=True).exists())
+
+    def test_smtp_failure_leaves_emails_for_retry(self, geocode_location):
+        event = self.create_event()
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError):
+            fan_out_event_notifications(event.pk)
+        self.assertEqual(Notification.objects.filter(event=event, emailed_at__isnull=True).count(), 5)
+
+        fan_out_event_notifications(event.pk)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_queries_grow_with_chunks_not_subscribers(self, geocode_location):
+        event = self.create_event()
+        with CaptureQueriesContext(connection) as one_chunk:
+            self.assertEqual(fan_out_event_notifications(event.pk), 5)
+
+        for i in range(5, 15):
+            self.subscribe(f'fan{i}', self.music)
+        other = self.create_event('Джаз')
+        with CaptureQueriesContext(connection) as still_one_chunk:
+            self.assertEqual(fan_out_event_notifications(other.pk), 15)
+        self.assertEqual(len(still_one_chunk), len(one_chunk))
+
+        with CaptureQueriesContext(connection) as two_chunks:
+            self.assertEqual(fan_out_event_notifications(self.create_event('Рок').pk, chunk_size=10), 15)
+        self.assertGreater(len(two_chunks), len(one_chunk))
@@ -0,0 +1,142 @@
+from datetime import timedelta
+from urllib.parse import urlparse, parse_qs
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from model_bakery import baker
+from ..models import Event, Category
+from ..pagination import KeysetPaginator, InvalidCursor, encode_cursor
+from ..search import search_events
+
+User = get_user_model()
+
+
+class KeysetPaginatorTest(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', password='testpass123')
+        self.category = Category.objects.create(name='Музыка', slug='music')
+        base = timezone.now() + timedelta(days=1)
+        # Пары с одинаковой датой проверяют разрешение ничьих по id
+        self.events = [
+            self.make_event(date=base + timedelta(days=i // 2), price=i % 3)
+            for i in range(7)
+        ]
+
+    def make_event(self, **kwargs):
+        return baker.make(
+            Event, organizer=self.organizer, category=self.category,
+            latitude=55.75, longitude=37.61, **kwargs
+        )
+
+    def walk(self, paginator):
+        pages, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            pages.append(page)
+            if not page.has_next():
+                return pages
+            cursor = page.next_cursor
+
+    def test_pages_cover_queryset_in_order(self):
+        for ordering in (['-date'], ['price', '-created_at'], ['-_average_rating']):
+            paginator = KeysetPaginator(Event.objects.with_stats().order_by(*ordering), 3)
+            pages = self.walk(paginator)
+            walked = [event.pk for page in pages for event in page]
+            expected = Event.objects.with_stats().order_by(*paginator.ordering)
+            self.assertEqual(walked, list(expected.values_list('pk', flat=True)))
+            self.assertEqual([len(page) for page in pages], [3, 3, 1])
+
+    def test_search_results_ranked_pages(self):
+        for event in self.events[:5]:
+            event.title = 'Концерт'
+            event.save()
+        paginator = KeysetPaginator(search_events('концерт'), 2)
+        self.assertEqual(paginator.ordering, ['-search_rank', '-pk'])
+        walked = [event.pk for page in self.walk(paginator) for event in page]
+        self.assertEqual(sorted(walked), sorted(event.pk for event in self.events[:5]))
+        self.assertEqual(len(walked), 5)
+
+    def test_previous_cursor_returns_previous_page(self):
+        paginator = KeysetPaginator(Event.objects.order_by('-date'), 3)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        self.assertFalse(first.has_previous())
+        back = paginator.page(second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertEqual(back.next_cursor, first.next_cursor)
+
+    def test_nullable_key_pages_cover_queryset(self):
+        Event.objects.filter(pk__in=[self.events[1].pk, self.events[4].pk]).update(created_at=None)
+        for ordering in (['-created_at'], ['created_at']):
+            paginator = KeysetPaginator(Event.objects.order_by(*ordering), 2)
+            pages = self.walk(paginator)
+            walked = [event.pk for page in pages for event in page]
+            self.assertEqual(sorted(walked), sorted(event.pk for event in self.events))
+            # NULL больше любой даты: в начале по убыванию, в конце по возрастанию
+            nulls = walked[:2] if ordering[0].startswith('-') else walked[-2:]
+            self.assertCountEqual(nulls, [self.events[1].pk, self.events[4].pk])
+            back = paginator.page(pages[-1].previous_cursor)
+            self.assertEqual(list(back), list(pages[-2]))
+
+    def test_stable_while_inserting(self):
+        paginator = KeysetPaginator(Event.objects.order_by('-created_at'), 3)
+        first = paginator.page()
+        self.make_event(date=timezone.now())
+        second = paginator.page(first.next_cursor)
+        self.assertFalse(set(first.object_list) & set(second.object_list))
+
+    def test_count_is_estimate(self):
+        paginator = KeysetPaginator(Event.objects.all(), 3)
+        self.assertEqual(str(paginator.count), '7')
+        with self.assertNumQueries(0):
+            KeysetPaginator(Event.objects.all(), 3, with_estimate=False).count
+
+    def test_invalid_cursor(self):
+        paginator = KeysetPaginator(Event.objects.order_by('-date'), 3)
+        for token in ('garbage', encode_cursor(['price', 'pk'], [1, 1])):
+            with self.assertRaises(InvalidCursor):
+                paginator.page(token)
+
+    def test_list_view_cursor_links(self):
+        for _ in range(6):
+            self.make_event(date=timezone.now() + timedelta(days=30))
+        url = reverse('event_list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        page = response.context['page_obj']
+        self.assertTrue(page.is_keyset)
+        self.assertContains(response, f'cursor={page.next_cursor}')
+        response = self.client.get(url, {'cursor': page.next_cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url, {'cursor': 'garbage'}).status_code, 404)
+        # Старые ссылки ?page=N работают
+        self.assertEqual(self.client.get(url, {'page': 1}).status_code, 200)
+
+    def test_search_view_follows_next_cursor(self):
+        for i in range(13):
+            self.make_event(title=f'Концерт {i}', date=timezone.now() + timedelta(days=30 + i), is_active=True)
+        url = reverse('event_search')
+        response = self.client.get(url, {'sort': 'date'})
+        page = response.context['page_obj']
+        self.assertTrue(page.is_keyset)
+        self.assertEqual(len(page), 12)
+        self.assertContains(response, f'cursor={page.next_cursor}')
+
+        response = self.client.get(url, {'sort': 'date', 'cursor': page.next_cursor})
+        self.assertEqual(response.status_code, 200)
+        expected = Event.objects.filter(is_active=True, date__gte=timezone.now()).count()
+        self.assertEqual(len(response.context['events']), expected - 12)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    def test_api_cursor_pagination(self):
+        url = reverse('events-list')
+        data = self.client.get(url, {'with_count': 1}).json()
+        self.assertEqual(data['estimated_count'], 7)
+        seen = [item['id'] for item in data['results']]
+        while data['next']:
+            cursor = parse_qs(urlparse(data['next']).query)['cursor'][0]
+            data = self.client.get(url, {'cursor': cursor}).json()
+            seen += [item['id'] for item in data['results']]
+        self.assertEqual(sorted(seen), sorted(event.pk for event in self.events))
+        self.assertEqual(self.client.get(url, {'cursor': 'garbage'}).status_code, 404)
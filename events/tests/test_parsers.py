@@ -0,0 +1,119 @@
+import hashlib
+import os
+import requests
+from io import StringIO
+from unittest import mock
+from django.test import SimpleTestCase, TestCase
+from django.core.management import call_command
+from ..models import ExternalEventSource
+from ..parsers import PARSER_MAPPING, CultureRuParser, canonical_url, get_parser, iter_cards, stable_external_id
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'fixtures', 'parsers')
+
+
+def fixture(domain):
+    with open(os.path.join(FIXTURES_DIR, f'{domain}.html'), 'rb') as f:
+        return f.read()
+
+
+def page(*titles):
+    cards = ''.join(
+        f'<div class="event-card"><a href="/events/{title}">x</a><div class="event-card__body"><h3>{title}</h3></div></div>'
+        for title in titles
+    )
+    return f'<div class="events-list">{cards}</div>'.encode()
+
+
+class StableIdTest(SimpleTestCase):
+    def test_id_from_canonical_url(self):
+        expected = 'culture_' + hashlib.sha1(b'https://culture.ru/events/1?a=1&b=2').hexdigest()
+        self.assertEqual(stable_external_id('culture', 'https://Culture.RU/events/1/?b=2&a=1&utm_source=x#top'), expected)
+        self.assertEqual(canonical_url('https://culture.ru/events/1/'), canonical_url('https://culture.ru/events/1'))
+
+    def test_id_from_fields_without_url(self):
+        self.assertEqual(
+            stable_external_id('relax', None, '  Джазовый   вечер '),
+            stable_external_id('relax', None, 'джазовый вечер'),
+        )
+
+
+class StreamingParserTest(SimpleTestCase):
+    def make_parser(self, parser_class=CultureRuParser, url='https://www.culture.ru/afisha', config=None):
+        return parser_class(ExternalEventSource(name='Test', url=url, parser_config=config or {}))
+
+    def test_fixture_pages(self):
+        for domain, parser_class in PARSER_MAPPING.items():
+            with self.subTest(domain=domain):
+                parser = self.make_parser(parser_class, f'https://{domain}/')
+                items = parser.parse_content(fixture(domain))
+                self.assertEqual(len(items), 60)
+                self.assertEqual(len({item['external_id'] for item in items}), 60)
+                # Ссылка берется из карточки, а не из вложенного блока с заголовком
+                self.assertNotEqual(items[0]['external_url'], f'https://{domain}/')
+                self.assertTrue(items[0]['title'].endswith('#1'))
+
+    def test_chunked_input_gives_same_cards(self):
+        content = fixture('culture.ru')
+        whole = [(card.title, card.href) for card in iter_cards([content], ('event', 'card', 'item'))]
+        chunks = (content[i:i + 7] for i in range(0, len(content), 7))
+        self.assertEqual([(card.title, card.href) for card in iter_cards(chunks, ('event', 'card', 'item'))], whole)
+
+    def test_cards_are_yielded_before_document_ends(self):
+        cards = iter_cards(iter([page('first', 'second'), b'<div class="event-card">']), ('event',))
+        self.assertEqual(next(cards).title, 'first')
+
+    def test_lazy_pagination(self):
+        parser = self.make_parser(config={'page_param': 'page', 'max_pages': 5})
+        pages = {2: page('b', 'c'), 3: page('c')}
+
+        def get(url, **kwargs):
+            number = int(url.rsplit('page=', 1)[1])
+            response = mock.MagicMock(status_code=200)
+            response.__enter__.return_value = response
+            response.iter_content.return_value = [pages.get(number, b'')]
+            return response
+
+        with mock.patch.object(parser.session, 'get', side_effect=get) as session_get:
+            events = parser.iter_events(first_page=page('a', 'b'))
+            self.assertEqual(next(events)['title'], 'a')
+            session_get.assert_not_called()
+            titles = [event['title'] for event in events]
+
+        self.assertEqual(titles, ['b', 'c'])
+        # Третья страница не дала новых мероприятий - четвертая не запрашивается
+        self.assertEqual(session_get.call_count, 2)
+
+    def test_page_fetch_error_keeps_read_pages(self):
+        def broken_stream():
+            yield page('c')
+            raise requests.ConnectionError('reset')
+
+        for failing_page, expected in ((3, ['a', 'b']), (2, ['a', 'c'])):
+            parser = self.make_parser(config={'page_param': 'page', 'max_pages': 5})
+
+            def get(url, **kwargs):
+                number = int(url.rsplit('page=', 1)[1])
+                if number == 3:
+                    raise requests.ConnectionError('timeout')
+                response = mock.MagicMock(status_code=200)
+                response.__enter__.return_value = response
+                response.iter_content.return_value = broken_stream() if number == failing_page else [page('b')]
+                return response
+
+            with self.subTest(failing_page=failing_page), \
+                    mock.patch.object(parser.session, 'get', side_effect=get) as session_get:
+                # Ошибка на второй и следующих страницах: прочитанное сохраняется, обход завершается
+                titles = [item['title'] for item in parser.parse_content(page('a'))]
+                self.assertEqual(titles, expected)
+                self.assertEqual(session_get.call_count, failing_page - 1)
+
+    def test_unknown_domain_has_no_parser(self):
+        self.assertIsNone(get_parser(ExternalEventSource(name='Test', url='https://example.com/afisha')))
+
+
+class BenchmarkCommandTest(TestCase):
+    def test_benchmark_runs_for_each_parser(self):
+        out = StringIO()
+        call_command('benchmark_parsers', repeat=1, stdout=out)
+        for domain in PARSER_MAPPING:
+            self.assertIn(f'{domain}: 60 мероприятий', out.getvalue())
@@ -0,0 +1,153 @@
+import sys
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.db.models.signals import post_save
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from datetime import timedelta
+from .. import processing, signals_gamification, similarity
+from ..models import Event, Category
+
+User = get_user_model()
+
+
+def fake_tasks_module(**apply_async):
+    """events.tasks тянет тяжелые зависимости; подменяем модуль целиком"""
+    tasks = mock.Mock()
+    tasks.process_event_media.apply_async = mock.Mock(**apply_async)
+    return mock.patch.dict(sys.modules, {'events.tasks': tasks})
+
+
+def fake_geocode(event):
+    event.latitude, event.longitude = 55.7558, 37.6173
+
+
+@override_settings(EVENT_PROCESSING_ASYNC=False)
+@mock.patch.object(Event, 'geocode_location', autospec=True, side_effect=fake_geocode)
+class EventProcessingTest(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', password='testpass123')
+        self.category = Category.objects.create(name='Музыка', slug='music')
+        # Обновление индекса похожих и обработка игровых действий тоже ставятся после коммита;
+        # они проверяются в test_similarity и test_gamification_pipeline
+        post_save.disconnect(similarity.reindex_event_similarity, sender=Event)
+        self.addCleanup(post_save.connect, similarity.reindex_event_similarity, sender=Event)
+        post_save.disconnect(signals_gamification.handle_event_creation, sender=Event)
+        self.addCleanup(post_save.connect, signals_gamification.handle_event_creation, sender=Event)
+
+    def create_event(self, **kwargs):
+        data = {
+            'title': 'Концерт',
+            'description': 'Описание',
+            'date': timezone.now() + timedelta(days=7),
+            'location': 'Москва, Красная площадь',
+            'organizer': self.organizer,
+            'category': self.category,
+        }
+        data.update(kwargs)
+        return Event.objects.create(**data)
+
+    def test_save_does_not_geocode_inline(self, geocode_location):
+        event = self.create_event()
+        geocode_location.assert_not_called()
+        self.assertEqual(event.processing_status, 'pending')
+        self.assertTrue(event.is_processing)
+
+    def test_processing_runs_after_commit(self, geocode_location):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            event = self.create_event()
+        # Обработка медиа и рассылка подписчикам (notification_fanout)
+        self.assertEqual(len(callbacks), 2)
+
+        event.refresh_from_db()
+        self.assertEqual(event.processing_status, 'ready')
+        self.assertAlmostEqual(event.latitude, 55.7558)
+        self.assertTrue(event.geohash.startswith('ucfv'))
+
+    def test_unrelated_update_is_not_processed(self, geocode_location):
+        with self.captureOnCommitCallbacks(execute=True):
+            event = self.create_event()
+        event = Event.objects.get(pk=event.pk)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            event.title = 'Новое название'
+            event.save()
+            event.save(update_fields=['title'])
+        self.assertEqual(callbacks, [])
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            event.location = 'Санкт-Петербург'
+            event.save(update_fields=['location'])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(Event.objects.get(pk=event.pk).processing_status, 'pending')
+
+    def test_new_location_replaces_coordinates(self, geocode_location):
+        with self.captureOnCommitCallbacks(execute=True):
+            event = self.create_event()
+        event = Event.objects.get(pk=event.pk)
+        self.assertTrue(event.geohash.startswith('ucfv'))
+
+        def geocode_petersburg(instance):
+            instance.latitude, instance.longitude = 59.9386, 30.3141
+
+        geocode_location.side_effect = geocode_petersburg
+        with self.captureOnCommitCallbacks(execute=True):
+            event.location = 'Санкт-Петербург, Дворцовая площадь'
+            event.save(update_fields=['location'])
+
+        event.refresh_from_db()
+        self.assertEqual(event.processing_status, 'ready')
+        self.assertAlmostEqual(event.latitude, 59.9386)
+        self.assertAlmostEqual(event.longitude, 30.3141)
+        self.assertTrue(event.geohash.startswith('udt'))
+
+    def test_ungeocodable_address_is_not_requeued(self, geocode_location):
+        geocode_location.side_effect = None
+        with self.captureOnCommitCallbacks(execute=True):
+            event = self.create_event(location='Нигде')
+        event = Event.objects.get(pk=event.pk)
+        self.assertFalse(event.has_coordinates)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            event.title = 'Новое название'
+            event.save()
+        self.assertEqual(callbacks, [])
+
+    def test_newer_save_keeps_pending_status(self, geocode_location):
+        event = self.create_event()
+
+        def resave(instance):
+            # Мероприятие изменили, пока шла обработка
+            Event.objects.filter(pk=instance.pk).update(processing_status='pending')
+            fake_geocode(instance)
+
+        geocode_location.side_effect = resave
+        processing.process_event(event.pk)
+        event.refresh_from_db()
+        self.assertEqual(event.processing_status, 'pending')
+        self.assertFalse(event.has_coordinates)
+
+    @override_settings(EVENT_PROCESSING_ASYNC=True)
+    def test_async_mode_enqueues_task(self, geocode_location):
+        with fake_tasks_module() as modules:
+            tasks = modules['events.tasks']
+            with self.captureOnCommitCallbacks(execute=True):
+                event = self.create_event()
+        tasks.process_event_media.apply_async.assert_called_once_with((event.pk,), retry=False)
+        geocode_location.assert_not_called()
+
+    @override_settings(EVENT_PROCESSING_ASYNC=True)
+    def test_broker_failure_falls_back_to_inline(self, geocode_location):
+        with fake_tasks_module(side_effect=ConnectionError):
+            with self.captureOnCommitCallbacks(execute=True):
+                event = self.create_event()
+        event.refresh_from_db()
+        self.assertEqual(event.processing_status, 'ready')
+        self.assertTrue(event.has_coordinates)
+
+    def test_failure_marks_event_failed(self, geocode_location):
+        event = self.create_event()
+        with mock.patch.object(processing, 'invalidate_event_caches', side_effect=RuntimeError):
+            processing.process_event(event.pk)
+        event.refresh_from_db()
+        self.assertEqual(event.processing_status, 'failed')
@@ -0,0 +1,97 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from ..gamification.achievements import reset_achievement_index
+from ..gamification.core import gamification_engine
+from ..gamification.quests import (
+    DAILY_QUESTS, QuestIndex, advance_quests, get_quest_index, reset_quest_index, rotate_daily_quests,
+)
+from ..models import Quest, UserProfile, UserQuest
+
+User = get_user_model()
+
+
+class QuestEngineTest(TestCase):
+    def setUp(self):
+        # Индексы живут между тестами, а созданные задания откатываются
+        reset_quest_index()
+        self.addCleanup(reset_quest_index)
+        reset_achievement_index()
+        self.addCleanup(reset_achievement_index)
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.favorites = self.create('Социальная активность', 'add_favorite', 3, points=8)
+        self.registration = self.create('Первое мероприятие дня', 'event_registration', 1)
+
+    def create(self, name, action_type, target, points=5, **kwargs):
+        return Quest.objects.create(
+            name=name, description='', quest_type='daily', points_reward=points,
+            requirement={'action_type': action_type, 'target_count': target}, **kwargs
+        )
+
+    def profile(self):
+        return UserProfile.objects.get(user=self.user)
+
+    def test_index_groups_active_quests_by_action_type(self):
+        self.create('Вчерашнее', 'add_favorite', 1, expires_at=timezone.now() - timedelta(minutes=1))
+        self.create('Выключенное', 'add_favorite', 1, is_active=False)
+
+        index = QuestIndex.load()
+        self.assertEqual(index.quests_for('add_favorite'), [self.favorites])
+        self.assertEqual(index.quests_for('review_created'), [])
+
+    def test_progress_is_incremented_only_for_matching_quests(self):
+        profile = self.profile()
+        get_quest_index()
+
+        # Запись в задание, прибавление счетчика, проверка выполнения в точке сохранения
+        with self.assertNumQueries(5):
+            self.assertEqual(advance_quests(profile, 'add_favorite', 2), [])
+        user_quest = UserQuest.objects.get(user=self.user, quest=self.favorites)
+        self.assertEqual((user_quest.current_count, user_quest.progress), (2, 2 / 3))
+        self.assertFalse(UserQuest.objects.filter(quest=self.registration).exists())
+
+        completed = advance_quests(profile, 'add_favorite', 2)
+        self.assertEqual([quest['name'] for quest in completed], ['Социальная активность'])
+        user_quest.refresh_from_db()
+        self.assertEqual((user_quest.current_count, user_quest.progress), (4, 1.0))
+        self.assertTrue(user_quest.is_completed)
+        self.assertEqual(self.profile().total_points, 8)
+
+        self.assertEqual(advance_quests(profile, 'add_favorite'), [])
+        self.assertEqual(UserQuest.objects.get(pk=user_quest.pk).current_count, 4)
+        self.assertEqual(self.profile().total_points, 8)
+
+    def test_engine_completes_quest(self):
+        result = gamification_engine.handle_user_action(self.user, 'event_registration')
+
+        self.assertEqual([quest['name'] for quest in result['completed_quests']], ['Первое мероприятие дня'])
+        self.assertEqual(self.profile().total_points, 5)
+
+    def test_daily_rotation_archives_previous_generation(self):
+        Quest.objects.all().delete()
+        previous = rotate_daily_quests()
+        self.assertEqual(previous.created, len(DAILY_QUESTS))
+        self.assertEqual(rotate_daily_quests().created, 0)
+        advance_quests(self.profile(), 'add_favorite', 2)
+        old_progress = UserQuest.objects.get(user=self.user)
+
+        tomorrow = timezone.now() + timedelta(days=1)
+        rotation = rotate_daily_quests(tomorrow)
+        self.assertEqual(rotation.generation, timezone.localdate(tomorrow).isoformat())
+        self.assertEqual((rotation.created, rotation.expired, rotation.archived), (len(DAILY_QUESTS), 3, 1))
+
+        # Прошлое поколение и прогресс по нему сохранены в архиве
+        old_progress.refresh_from_db()
+        self.assertIsNotNone(old_progress.archived_at)
+        self.assertEqual(old_progress.current_count, 2)
+        self.assertFalse(Quest.objects.filter(generation=previous.generation, is_active=True).exists())
+        self.assertEqual(Quest.objects.filter(generation=previous.generation).count(), len(DAILY_QUESTS))
+
+        self.assertEqual(
+            [quest.generation for quest in get_quest_index().quests_for('add_favorite', tomorrow)],
+            [rotation.generation],
+        )
+        advance_quests(self.profile(), 'add_favorite')
+        current = UserQuest.objects.get(user=self.user, archived_at__isnull=True)
+        self.assertEqual((current.quest.generation, current.current_count), (rotation.generation, 1))
@@ -0,0 +1,159 @@
+from io import StringIO
+from datetime import timedelta
+from unittest import mock
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from ..gamification.achievements import reset_achievement_index
+from ..gamification.leaderboard import reset_leaderboard
+from ..gamification.quests import reset_quest_index
+from ..models import Category, Event, Favorite, Notification, Registration
+from ..realtime import broadcast_analytics, get_analytics_snapshot, get_presence_store, online_counts
+from ..routing import websocket_urlpatterns
+
+User = get_user_model()
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+IN_MEMORY_LAYER = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+IN_MEMORY_LEADERBOARD = 'events.gamification.leaderboard.InMemorySortedSet'
+
+
+# Потребители ходят в базу из отдельного потока, поэтому TransactionTestCase
+@override_settings(
+    CACHES=LOCMEM_CACHE, CHANNEL_LAYERS=IN_MEMORY_LAYER,
+    EVENT_PROCESSING_ASYNC=False, LEADERBOARD_STORE=IN_MEMORY_LEADERBOARD, PRESENCE_STORE=IN_MEMORY_LEADERBOARD,
+)
+@mock.patch.object(Event, 'geocode_location', autospec=True)
+class RealtimePushTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        reset_leaderboard('LEADERBOARD_STORE')
+        get_presence_store().clear()
+        for reset in (reset_achievement_index, reset_quest_index):
+            reset()
+            self.addCleanup(reset)
+        self.organizer = User.objects.create_user(username='organizer', password='testpass123')
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        category = Category.objects.create(name='Музыка', slug='music')
+        self.event = Event.objects.create(
+            title='Концерт', description='Описание', location='', organizer=self.organizer,
+            category=category, date=timezone.now() + timedelta(days=7), capacity=10,
+        )
+
+    async def connect(self, path, user=None):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+        if user is not None:
+            communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def drain(self, communicator):
+        while not await communicator.receive_nothing():
+            await communicator.receive_output()
+
+    async def test_event_counters_are_pushed_as_deltas(self, geocode_location):
+        communicator = await self.connect(f'ws/event/{self.event.pk}/')
+        initial = await communicator.receive_json_from()
+        self.assertEqual(initial['type'], 'event_data')
+        self.assertEqual((initial['data']['registrations_count'], initial['data']['available_spots']), (0, 10))
+
+        await sync_to_async(Registration.objects.create)(user=self.user, event=self.event, status='confirmed')
+        await sync_to_async(Favorite.objects.create)(user=self.user, event=self.event)
+
+        self.assertEqual(await communicator.receive_json_from(), {
+            'type': 'event_delta', 'data': {'event_id': self.event.pk, 'changes': {'registrations_count': 1}},
+        })
+        self.assertEqual(
+            (await communicator.receive_json_from())['data']['changes'], {'favorites_count': 1}
+        )
+        await communicator.disconnect()
+
+    async def test_notifications_are_pushed_to_user_group(self, geocode_location):
+        backlog = await sync_to_async(Notification.objects.create)(user=self.user, event=self.event, message='Старое')
+        communicator = await self.connect('ws/notifications/', user=self.user)
+        self.assertEqual((await communicator.receive_json_from())['data']['id'], backlog.pk)
+
+        other = await sync_to_async(User.objects.create_user)(username='other', password='testpass123')
+        await sync_to_async(Notification.objects.create)(user=other, event=self.event, message='Чужое')
+        concert = await sync_to_async(Event.objects.create)(
+            title='Концерт 2', description='Описание', location='', organizer=self.organizer,
+            category_id=self.event.category_id, date=timezone.now() + timedelta(days=8),
+        )
+        fresh = await sync_to_async(Notification.objects.create)(user=self.user, event=concert, message='Новое')
+
+        message = await communicator.receive_json_from()
+        self.assertEqual((message['type'], message['data']['message']), ('notification', 'Новое'))
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+        unread = await sync_to_async(list)(Notification.objects.filter(read=False).values_list('pk', flat=True))
+        self.assertNotIn(fresh.pk, unread)
+        self.assertNotIn(backlog.pk, unread)
+        self.assertEqual(len(unread), 1)
+
+    async def test_one_analytics_snapshot_for_all_subscribers(self, geocode_location):
+        communicators = [await self.connect('ws/analytics/') for _ in range(3)]
+        for communicator in communicators:
+            initial = await communicator.receive_json_from()
+            self.assertEqual((initial['type'], initial['version']), ('analytics_update', 1))
+            self.assertEqual(initial['data']['active_events'], 1)
+
+        # Снимок считается один раз, подписчикам уходят только изменившиеся ключи
+        entry = await sync_to_async(broadcast_analytics)()
+        self.assertEqual(entry['version'], 2)
+        for communicator in communicators:
+            self.assertEqual(await communicator.receive_json_from(), {
+                'type': 'analytics_diff', 'version': 2, 'data': {'online_users': 3, 'connections': 3},
+            })
+
+        # Без изменений версия та же и рассылки нет
+        self.assertEqual((await sync_to_async(broadcast_analytics)())['version'], 2)
+        self.assertTrue(await communicators[0].receive_nothing())
+
+        await sync_to_async(Registration.objects.create)(user=self.user, event=self.event)
+        entry = await sync_to_async(broadcast_analytics)()
+        self.assertEqual(entry['version'], 3)
+        for communicator in communicators:
+            message = await communicator.receive_json_from()
+            self.assertEqual(message['type'], 'live_update')
+            self.assertEqual((message['data']['user'], message['data']['event']), ('player', 'Концерт'))
+            self.assertEqual((await communicator.receive_json_from())['data'], {'registrations_last_hour': 1})
+            await communicator.disconnect()
+        self.assertEqual((await sync_to_async(get_analytics_snapshot)())['version'], 3)
+
+    async def test_presence_counts_users_and_expires_dropped_connections(self, geocode_location):
+        guests = [await self.connect('ws/analytics/') for _ in range(2)]
+        tabs = [await self.connect('ws/notifications/', user=self.user) for _ in range(2)]
+        self.assertEqual(await sync_to_async(online_counts)(), (3, 4))
+
+        await tabs[0].disconnect()
+        self.assertEqual(await sync_to_async(online_counts)(), (3, 3))
+
+        # Соединение без пульса истекает, пульс тикера продлевает живые
+        store = get_presence_store()
+        for member, _ in store.zrevrange(0, -1):
+            store.zadd({member: 0})
+        self.assertEqual(await sync_to_async(online_counts)(), (0, 0))
+        await sync_to_async(broadcast_analytics)()
+        for communicator in guests + tabs[1:]:
+            await self.drain(communicator)
+        self.assertEqual(await sync_to_async(online_counts)(), (3, 3))
+        for communicator in guests + tabs[1:]:
+            await communicator.disconnect()
+        self.assertEqual(await sync_to_async(online_counts)(), (0, 0))
+
+    def test_benchmark_command(self, geocode_location):
+        users = User.objects.count()
+        out = StringIO()
+        call_command('benchmark_websockets', connections=6, rounds=2, stdout=out)
+
+        # 2 раунда: аналитике - лента и снимок, мероприятию - дельта, слушателям - уведомление
+        self.assertIn('6 соединений, 2 раундов: 16 сообщений', out.getvalue())
+        self.assertIn('SQL: 4.0 на тик аналитики', out.getvalue())
+        self.assertEqual(User.objects.count(), users)
@@ -0,0 +1,108 @@
+from io import StringIO
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from .. import recommendation_cache
+from ..models import Category, Event, Favorite, Registration, Review
+from ..recommendation_cache import (
+    get_recommended_events, invalidate_user_recommendations, recommendation_cache_stats, user_cache_key,
+)
+
+User = get_user_model()
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'recommendations-test'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE, EVENT_PROCESSING_ASYNC=False)
+@mock.patch.object(Event, 'geocode_location', autospec=True)
+class RecommendationCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organizer = User.objects.create_user(username='organizer', password='testpass123')
+        self.user = User.objects.create_user(username='visitor', password='testpass123')
+        category = Category.objects.create(name='Разное', slug='misc')
+        self.events = [
+            Event.objects.create(
+                title=f'Мероприятие {i}', description='Описание', location='',
+                date=timezone.now() + timedelta(days=7), organizer=self.organizer, category=category,
+            )
+            for i in range(4)
+        ]
+
+    def compute(self, ids):
+        return mock.patch.object(recommendation_cache, 'compute_recommendation_ids', return_value=ids)
+
+    def test_second_request_is_served_from_cache(self, geocode_location):
+        ids = [self.events[2].pk, self.events[0].pk]
+        with self.compute(ids) as compute:
+            first = get_recommended_events(self.user)
+            with self.assertNumQueries(1):  # только выборка мероприятий по ID
+                second = get_recommended_events(self.user)
+
+        compute.assert_called_once()
+        self.assertEqual([event.pk for event in first], ids)
+        self.assertEqual([event.pk for event in second], ids)
+        self.assertEqual(recommendation_cache_stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_inactive_events_are_skipped(self, geocode_location):
+        with self.compute([event.pk for event in self.events]):
+            get_recommended_events(self.user)
+        Event.objects.filter(pk=self.events[0].pk).update(is_active=False)
+        recommended = get_recommended_events(self.user, limit=2)
+        self.assertEqual([event.pk for event in recommended], [self.events[1].pk, self.events[2].pk])
+
+    def test_interactions_invalidate_user_cache(self, geocode_location):
+        key = user_cache_key(self.user.pk)
+        for create in (
+            lambda: Favorite.objects.create(user=self.user, event=self.events[0]),
+            lambda: Registration.objects.create(user=self.user, event=self.events[1]),
+            lambda: Review.objects.create(user=self.user, event=self.events[2], rating=5),
+        ):
+            cache.set(key, [self.events[3].pk])
+            with self.captureOnCommitCallbacks(execute=True):
+                create()
+            self.assertIsNone(cache.get(key))
+
+    def test_invalidation_survives_cache_outage(self, geocode_location):
+        with mock.patch.object(recommendation_cache.cache, 'delete', side_effect=ConnectionError):
+            invalidate_user_recommendations(self.user.pk)
+
+    def test_recommendations_survive_cache_outage(self, geocode_location):
+        ids = [self.events[1].pk]
+        broken = mock.Mock(side_effect=ConnectionError)
+        with self.compute(ids), mock.patch.multiple(recommendation_cache.cache, get=broken, set=broken, add=broken):
+            recommended = get_recommended_events(self.user)
+            popular = get_recommended_events(AnonymousUser())
+        self.assertEqual([event.pk for event in recommended], ids)
+        self.assertEqual(len(popular), len(self.events))
+
+    def test_anonymous_users_share_popular_list(self, geocode_location):
+        Registration.objects.create(user=self.user, event=self.events[3], status='confirmed')
+        first = get_recommended_events(AnonymousUser(), limit=1)
+        with self.assertNumQueries(1):
+            second = get_recommended_events(AnonymousUser(), limit=1)
+        self.assertEqual(first[0].pk, self.events[3].pk)
+        self.assertEqual(second, first)
+
+    def test_precompute_fills_cache_for_active_users(self, geocode_location):
+        User.objects.filter(pk=self.user.pk).update(last_login=timezone.now())
+        User.objects.filter(pk=self.organizer.pk).update(last_login=timezone.now() - timedelta(days=30))
+
+        out = StringIO()
+        with self.compute([self.events[1].pk]):
+            call_command('precompute_recommendations', stdout=out)
+
+        self.assertIn('для 1 пользователей', out.getvalue())
+        self.assertEqual(cache.get(user_cache_key(self.user.pk)), [self.events[1].pk])
+        self.assertIsNone(cache.get(user_cache_key(self.organizer.pk)))
+
+    def test_real_engine_result_is_cached(self, geocode_location):
+        Favorite.objects.create(user=self.user, event=self.events[0])
+        recommended = get_recommended_events(self.user)
+        self.assertNotIn(self.events[0].pk, [event.pk for event in recommended])
+        self.assertIsNotNone(cache.get(user_cache_key(self.user.pk)))
@@ -0,0 +1,63 @@
+from io import StringIO
+from datetime import timedelta
+from types import SimpleNamespace
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+from ..models import Event, Favorite
+from ..recommendation_eval import Interaction, evaluate_engine, percentile, time_split
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'eval-test'}}
+
+
+class EvaluationMetricsTest(SimpleTestCase):
+    def test_time_split_drops_already_known_pairs(self):
+        now = timezone.now()
+        items = [Interaction(Favorite, i, user, event, now + timedelta(hours=i))
+                 for i, (user, event) in enumerate([(1, 10), (1, 11), (2, 10), (1, 10), (2, 12)])]
+        train, test = time_split(items, holdout=0.4)
+        self.assertEqual(len(train), 3)
+        self.assertEqual([(item.user_id, item.event_id) for item in test], [(2, 12)])
+
+    def test_precision_recall_coverage(self):
+        events = {pk: SimpleNamespace(id=pk) for pk in range(1, 6)}
+        recommendations = {'a': [1, 2], 'b': [3, 1]}
+        report = evaluate_engine(
+            'fake', lambda user, k: [events[pk] for pk in recommendations[user]],
+            {'a': {1, 4}, 'b': {5}}, k=2, catalog_size=5,
+        )
+        self.assertEqual(report.users, 2)
+        self.assertAlmostEqual(report.precision, (1 / 2 + 0) / 2)
+        self.assertAlmostEqual(report.recall, (1 / 2 + 0) / 2)
+        self.assertAlmostEqual(report.coverage, 3 / 5)
+        self.assertEqual(report.queries_avg, 0)
+
+    def test_engine_error_is_reported(self):
+        def broken(user, k):
+            raise NameError('missing helper')
+        report = evaluate_engine('broken', broken, {'a': {1}}, k=5, catalog_size=1)
+        self.assertEqual(report.error, 'NameError: missing helper')
+
+    def test_percentile(self):
+        self.assertEqual(percentile([5, 1, 3, 2, 4], 50), 3)
+        self.assertEqual(percentile(list(range(1, 101)), 95), 95)
+        self.assertEqual(percentile([], 95), 0.0)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, EVENT_PROCESSING_ASYNC=False)
+class EvaluateCommandTest(TestCase):
+    def test_synthetic_run_reports_engines_and_rolls_back(self):
+        out = StringIO()
+        call_command(
+            'evaluate_recommendations', synthetic=True, users=30, events=24, interactions=5,
+            k=5, engines='content,collaborative', stdout=out,
+        )
+        output = out.getvalue()
+        self.assertIn('Синтетический набор: 150 взаимодействий', output)
+        self.assertRegex(output, r'content\s+\d+\s+0\.\d{3}')
+        self.assertRegex(output, r'collaborative\s+\d+\s+0\.\d{3}')
+        self.assertFalse(Event.objects.exists())
+
+    def test_live_data_requires_flag(self):
+        with self.assertRaisesMessage(CommandError, '--live-data'):
+            call_command('evaluate_recommendations', stdout=StringIO())
@@ -0,0 +1,143 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.utils import timezone
+from datetime import timedelta
+from PIL import Image
+from .. import renditions
+from ..models import Event, Category, Advertisement, ImageRendition
+from ..processing import process_event
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image(name='photo.jpg', size=(2000, 1500)):
+    output = io.BytesIO()
+    Image.new('RGB', size, '#3366cc').save(output, format='JPEG')
+    return SimpleUploadedFile(name, output.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, EVENT_PROCESSING_ASYNC=False)
+@mock.patch.object(Event, 'geocode_location', autospec=True)
+class ImageRenditionsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', password='testpass123')
+        self.category = Category.objects.create(name='Музыка', slug='music')
+        self.event = Event.objects.create(
+            title='Концерт',
+            description='Описание',
+            date=timezone.now() + timedelta(days=7),
+            location='Москва',
+            organizer=self.organizer,
+            category=self.category,
+            image=make_image(),
+        )
+
+    def test_generate_renditions(self, geocode_location):
+        created = renditions.generate_renditions(self.event)
+        formats = renditions.get_formats()
+        self.assertEqual(len(created), len(renditions.RENDITION_PRESETS) * len(formats))
+        for rendition in self.event.renditions.all():
+            max_width, max_height = renditions.RENDITION_PRESETS[rendition.preset]
+            self.assertLessEqual(rendition.width, max_width)
+            self.assertLessEqual(rendition.height, max_height)
+            self.assertEqual(rendition.size_bytes, rendition.file.size)
+            self.assertEqual(rendition.source, self.event.image.name)
+
+        # Повторный вызов без изменений ничего не пересоздает
+        self.assertEqual(renditions.generate_renditions(self.event), [])
+
+    def test_failed_insert_removes_saved_files(self, geocode_location):
+        saved = []
+        field_file_class = ImageRendition.file.field.attr_class
+        original_save = field_file_class.save
+
+        def remember(field_file, name, content, save=True):
+            original_save(field_file, name, content, save)
+            saved.append((field_file.storage, field_file.name))
+
+        with mock.patch.object(field_file_class, 'save', remember), \
+                mock.patch.object(ImageRendition.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                renditions.generate_renditions(self.event)
+
+        self.assertEqual(len(saved), len(renditions.RENDITION_PRESETS) * len(renditions.get_formats()))
+        self.assertFalse(any(storage.exists(name) for storage, name in saved))
+        self.assertFalse(self.event.renditions.exists())
+
+    def test_processing_pipeline_creates_renditions(self, geocode_location):
+        process_event(self.event.pk)
+        self.assertTrue(self.event.renditions.filter(preset='card', format='webp').exists())
+
+    def test_new_image_replaces_renditions(self, geocode_location):
+        renditions.generate_renditions(self.event)
+        old = self.event.renditions.get(preset='card', format='jpeg')
+        storage = old.file.storage
+        self.assertTrue(storage.exists(old.file.name))
+
+        self.event.image = make_image('new.jpg', (640, 480))
+        self.event.save()
+        renditions.generate_renditions(self.event)
+
+        self.assertFalse(storage.exists(old.file.name))
+        card = self.event.renditions.get(preset='card', format='jpeg')
+        self.assertEqual((card.width, card.height), (427, 320))
+
+    def test_event_image_tag(self, geocode_location):
+        renditions.generate_renditions(self.event)
+        event = Event.objects.prefetch_related('renditions').get(pk=self.event.pk)
+        template = Template('{% load image_tags %}{% event_image event "card" css_class="event-image" alt=event.title %}')
+        with self.assertNumQueries(0):
+            html = template.render(Context({'event': event}))
+
+        card = event.renditions.get(preset='card', format='jpeg')
+        self.assertIn('<picture>', html)
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn(f'src="{card.url}"', html)
+        self.assertIn(f'{card.url} {card.width}w', html)
+        self.assertIn(f'width="{card.width}" height="{card.height}"', html)
+        self.assertIn('loading="lazy"', html)
+
+    def test_event_image_tag_before_processing(self, geocode_location):
+        template = Template('{% load image_tags %}{% event_image event "card" %}')
+        html = template.render(Context({'event': self.event}))
+        self.assertNotIn('<picture>', html)
+        self.assertIn(f'src="{self.event.image.url}"', html)
+
+    def test_get_image_url_does_not_touch_filesystem(self, geocode_location):
+        self.event.image.name = 'events/missing.jpg'
+        with mock.patch('os.path.exists') as exists:
+            self.assertTrue(self.event.get_image_url().endswith('events/missing.jpg'))
+        exists.assert_not_called()
+
+    def test_advertisement_renditions_on_image_change(self, geocode_location):
+        now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            ad = Advertisement.objects.create(
+                title='Баннер', link='https://example.com', image=make_image('ad.jpg'),
+                start_date=now, end_date=now + timedelta(days=1),
+            )
+        self.assertTrue(ad.renditions.exists())
+
+        # Счетчик показов не должен запускать обработку
+        with self.captureOnCommitCallbacks() as callbacks:
+            ad.increment_impression()
+        self.assertEqual(callbacks, [])
+
+        files = [rendition.file.name for rendition in ad.renditions.all()]
+        storage = ImageRendition._meta.get_field('file').storage
+        ad.delete()
+        self.assertFalse(ImageRendition.objects.filter(file__in=files).exists())
+        self.assertFalse(any(storage.exists(name) for name in files))
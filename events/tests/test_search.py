@@ -0,0 +1,70 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from model_bakery import baker
+from ..models import Event, Category
+from ..search import search_events, stem_word, normalize_text
+
+User = get_user_model()
+
+
+class StemmingTest(TestCase):
+    def test_russian_endings(self):
+        self.assertEqual(stem_word('концерты'), stem_word('концерт'))
+        self.assertEqual(stem_word('выставкой'), stem_word('выставка'))
+        self.assertEqual(stem_word('Jazz'), 'jazz')
+
+    def test_normalize_text(self):
+        self.assertEqual(normalize_text('Ёлочные игрушки!'), 'елочн игрушк')
+
+
+class SearchEventsTest(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', password='testpass123')
+        self.category = Category.objects.create(name='Музыка', slug='music')
+        self.jazz = self.make_event(title='Джазовый концерт', description='Вечер живой музыки')
+        self.lecture = self.make_event(
+            title='Лекция о космосе', description='После лекции будет концерт'
+        )
+        self.english = self.make_event(title='Running workshop', description='Morning runners meetup')
+
+    def make_event(self, **kwargs):
+        return baker.make(
+            Event, organizer=self.organizer, category=self.category,
+            latitude=55.75, longitude=37.61, short_description='', location='Москва', **kwargs
+        )
+
+    def test_inflected_russian_query(self):
+        found = list(search_events('концерты'))
+        self.assertEqual(set(found), {self.jazz, self.lecture})
+
+    def test_title_match_ranked_first(self):
+        found = list(search_events('концерт'))
+        self.assertEqual(found[0], self.jazz)
+        self.assertGreater(found[0].search_rank, found[1].search_rank)
+
+    def test_english_stemming(self):
+        self.assertEqual(list(search_events('run')), [self.english])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.lecture.title = 'Лекция о звездах'
+        self.lecture.description = 'Астрономия'
+        self.lecture.save()
+        self.assertEqual(list(search_events('концерт')), [self.jazz])
+        self.jazz.delete()
+        self.assertFalse(search_events('концерт').exists())
+
+    def test_query_syntax_is_escaped(self):
+        self.assertFalse(search_events('" OR * NEAR(').exists())
+
+    def test_list_view_uses_search(self):
+        response = self.client.get(reverse('event_list'), {'search': 'космос'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['events']), [self.lecture])
+
+    def test_api_search_filter(self):
+        response = self.client.get(reverse('events-list'), {'search': 'концерт'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        results = data['results'] if isinstance(data, dict) else data
+        self.assertEqual([item['id'] for item in results], [self.jazz.pk, self.lecture.pk])
@@ -0,0 +1,142 @@
+from unittest import mock
+from io import StringIO
+from datetime import timedelta
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+from ..ai_recommendations import AIRecommendationEngine
+from ..models import Category, Event, EventSimilarity, EventTerm, Favorite, SimilarityTerm
+from .. import similarity
+from ..similarity import (
+    SimilarityIndex, rebuild_similarity_index, recommend_for_user, similar_events, update_event_similarity,
+)
+
+User = get_user_model()
+
+TEXTS = {
+    'jazz': ('Джазовый концерт', 'Живой джаз и саксофон в клубе'),
+    'jazz2': ('Вечер джаза', 'Саксофон, контрабас и джаз до утра'),
+    'python': ('Курс Python', 'Программирование на Python для начинающих'),
+    'django': ('Мастер-класс Django', 'Веб-разработка на Python и Django'),
+    'yoga': ('Йога в парке', 'Утренняя практика на свежем воздухе'),
+}
+
+
+@override_settings(EVENT_PROCESSING_ASYNC=False)
+@mock.patch.object(Event, 'geocode_location', autospec=True)
+class SimilarityIndexTest(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', password='testpass123')
+        self.user = User.objects.create_user(username='visitor', password='testpass123')
+        self.category = Category.objects.create(name='Разное', slug='misc')
+        self.events = {key: self.create_event(title, description) for key, (title, description) in TEXTS.items()}
+
+    def create_event(self, title, description, **kwargs):
+        return Event.objects.create(
+            title=title, description=description, short_description='', location='',
+            date=timezone.now() + timedelta(days=7), organizer=self.organizer, category=self.category, **kwargs
+        )
+
+    def neighbors(self, key):
+        return [event.pk for event in similar_events(self.events[key])]
+
+    def test_index_finds_text_neighbors(self, geocode_location):
+        index = SimilarityIndex.build()
+        jazz, jazz2, python = self.events['jazz'].pk, self.events['jazz2'].pk, self.events['python'].pk
+        self.assertEqual(index.neighbors(jazz, 1)[0][0], jazz2)
+        self.assertNotIn(python, index.scores(jazz))
+        score = index.scores(jazz)[jazz2]
+        self.assertAlmostEqual(score, index.scores(jazz2)[jazz])
+        self.assertLessEqual(score, 1.0)
+
+    def test_rebuild_stores_top_k(self, geocode_location):
+        self.assertEqual(rebuild_similarity_index(top_k=1), len(TEXTS))
+        self.assertEqual(self.neighbors('python'), [self.events['django'].pk])
+        self.assertFalse(EventSimilarity.objects.filter(event=self.events['jazz']).exclude(
+            similar_event=self.events['jazz2']).exists())
+
+    def test_new_event_is_indexed_incrementally(self, geocode_location):
+        rebuild_similarity_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            flask = self.create_event('Курс Flask', 'Веб-разработка на Python и Flask')
+        self.assertEqual(similar_events(flask)[0].pk, self.events['django'].pk)
+        # Новое мероприятие попало и в соседи уже проиндексированных
+        self.assertIn(flask.pk, self.neighbors('django'))
+        self.assertNotIn(flask.pk, self.neighbors('yoga'))
+
+    def test_update_tokenizes_only_changed_event(self, geocode_location):
+        rebuild_similarity_index(top_k=1)
+        self.assertEqual(SimilarityTerm.objects.get(term='python').df, 2)
+        flask = self.create_event('Курс Flask', 'Веб-разработка на Python и Flask')
+
+        with mock.patch.object(similarity, 'event_text', wraps=similarity.event_text) as event_text:
+            self.assertEqual(update_event_similarity(flask.pk, top_k=1), 1)
+        event_text.assert_called_once()
+        self.assertEqual(SimilarityTerm.objects.get(term='python').df, 3)
+        self.assertEqual(similar_events(flask)[0].pk, self.events['django'].pk)
+        # Лишний сосед вытеснен, у django по-прежнему top_k
+        self.assertEqual(EventSimilarity.objects.filter(event=self.events['django']).count(), 1)
+
+        Event.objects.filter(pk=flask.pk).update(is_active=False)
+        self.assertEqual(update_event_similarity(flask.pk), 0)
+        self.assertEqual(SimilarityTerm.objects.get(term='python').df, 2)
+        self.assertFalse(EventTerm.objects.filter(event=flask).exists())
+
+    def test_edit_and_deactivation_update_neighbors(self, geocode_location):
+        rebuild_similarity_index()
+        yoga = self.events['yoga']
+        with self.captureOnCommitCallbacks(execute=True):
+            yoga.description = 'Джаз и саксофон на свежем воздухе'
+            yoga.save()
+        self.assertIn(self.events['jazz'].pk, [event.pk for event in similar_events(yoga)])
+        self.assertIn(yoga.pk, self.neighbors('jazz'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            yoga.is_active = False
+            yoga.save(update_fields=['is_active'])
+        self.assertFalse(EventSimilarity.objects.filter(event=yoga).exists())
+        self.assertNotIn(yoga.pk, self.neighbors('jazz'))
+
+    def test_counter_updates_do_not_reindex(self, geocode_location):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Event.objects.get(pk=self.events['jazz'].pk).save(update_fields=['latitude', 'longitude'])
+        self.assertEqual(callbacks, [])
+
+    def test_only_text_changes_reindex(self, geocode_location):
+        event = Event.objects.get(pk=self.events['jazz'].pk)
+        with mock.patch.object(similarity, 'schedule_similarity_update') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                event.tickets_available = 10
+                event.save()
+                event.title = 'Джазовый концерт'
+                event.save()
+            schedule.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                event.title = 'Джаз в парке'
+                event.save()
+                event.save()
+            schedule.assert_called_once_with(event.pk)
+
+    def test_recommendations_merge_user_history(self, geocode_location):
+        rebuild_similarity_index()
+        Favorite.objects.create(user=self.user, event=self.events['python'])
+        Favorite.objects.create(user=self.user, event=self.events['jazz'])
+
+        with self.assertNumQueries(4):  # избранное, регистрации, соседи, мероприятия
+            recommended = [event.pk for event in recommend_for_user(self.user, limit=2)]
+        self.assertCountEqual(recommended, [self.events['django'].pk, self.events['jazz2'].pk])
+        self.assertEqual(recommend_for_user(User.objects.create_user(username='new', password='x')), [])
+
+    def test_engine_uses_index(self, geocode_location):
+        rebuild_similarity_index()
+        Favorite.objects.create(user=self.user, event=self.events['python'])
+        recommended = AIRecommendationEngine().get_content_based_recommendations(self.user, limit=1)
+        self.assertEqual([event.pk for event in recommended], [self.events['django'].pk])
+
+    def test_command(self, geocode_location):
+        out = StringIO()
+        call_command('rebuild_similarity_index', top_k=3, stdout=out)
+        self.assertIn(f'{len(TEXTS)} мероприятий', out.getvalue())
+        self.assertTrue(EventSimilarity.objects.exists())
@@ -0,0 +1,123 @@
+import threading
+import time
+from io import StringIO
+from unittest import mock
+from django.test import TestCase
+from django.core.management import call_command
+from ..models import ExternalEvent, ExternalEventSource
+from ..sync import PER_DOMAIN_LIMIT, sync_sources
+
+PAGE = b'''
+<html><body>
+  <div class="event-card"><h3>%s</h3></div>
+  <div class="event-card"><h3>%s</h3></div>
+</body></html>
+'''
+
+
+def response(status_code=200, content=b'', headers=None):
+    return mock.Mock(status_code=status_code, content=content, headers=headers or {}, raise_for_status=mock.Mock())
+
+
+class ExternalSyncTest(TestCase):
+    def setUp(self):
+        self.source = ExternalEventSource.objects.create(name='Culture.ru', url='https://www.culture.ru/afisha')
+
+    def sync(self, *responses):
+        with mock.patch('requests.Session.get', side_effect=list(responses)) as get:
+            results = sync_sources([ExternalEventSource.objects.get(pk=self.source.pk)])
+        return results[0], get
+
+    def test_first_sync_creates_events_and_stores_validators(self):
+        result, _ = self.sync(response(content=PAGE % (b'Concert', b'Exhibition'), headers={'ETag': '"v1"'}))
+
+        self.assertEqual((result.status, result.created, result.updated), ('synced', 2, 0))
+        self.assertEqual(ExternalEvent.objects.filter(source=self.source).count(), 2)
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.etag, '"v1"')
+        self.assertTrue(self.source.content_hash)
+        self.assertIsNotNone(self.source.last_sync)
+
+    def test_not_modified_skips_parsing(self):
+        self.sync(response(content=PAGE % (b'Concert', b'Exhibition'), headers={'ETag': '"v1"', 'Last-Modified': 'Wed, 01 Oct 2026 10:00:00 GMT'}))
+
+        with self.assertNumQueries(2):  # чтение источника + сохранение last_sync
+            result, get = self.sync(response(status_code=304))
+        self.assertEqual(result.status, 'not_modified')
+        headers = get.call_args.kwargs['headers']
+        self.assertEqual(headers['If-None-Match'], '"v1"')
+        self.assertEqual(headers['If-Modified-Since'], 'Wed, 01 Oct 2026 10:00:00 GMT')
+
+    def test_same_content_hash_skips_parsing(self):
+        page = PAGE % (b'Concert', b'Exhibition')
+        self.sync(response(content=page))
+        with mock.patch('events.parsers.CultureRuParser.parse_content') as parse_content:
+            result, _ = self.sync(response(content=page))
+        self.assertEqual(result.status, 'unchanged')
+        parse_content.assert_not_called()
+
+    def test_changed_content_upserts(self):
+        self.sync(response(content=PAGE % (b'Concert', b'Exhibition')))
+        event = ExternalEvent.objects.filter(source=self.source).order_by('pk').first()
+        ExternalEvent.objects.filter(pk=event.pk).update(title='Старое название')
+
+        result, _ = self.sync(response(content=PAGE % (b'Concert', b'Exhibition') + b'<!-- v2 -->'))
+        self.assertEqual((result.created, result.updated), (0, 2))
+        event.refresh_from_db()
+        self.assertNotEqual(event.title, 'Старое название')
+        self.assertEqual(ExternalEvent.objects.filter(source=self.source).count(), 2)
+
+    def test_failing_source_does_not_stop_others(self):
+        broken = ExternalEventSource.objects.create(name='Relax', url='https://afisha.relax.by/')
+
+        def get(url, **kwargs):
+            if 'relax' in url:
+                raise ConnectionError('timeout')
+            return response(content=PAGE % (b'Concert', b'Exhibition'))
+
+        with mock.patch('requests.Session.get', side_effect=get):
+            results = {r.source.pk: r for r in sync_sources(ExternalEventSource.objects.all(), workers=2)}
+
+        self.assertEqual(results[broken.pk].status, 'error')
+        self.assertEqual(results[self.source.pk].created, 2)
+
+    def test_domain_limit_covers_following_pages(self):
+        for name in ('Театры', 'Кино', 'Выставки'):
+            ExternalEventSource.objects.create(
+                name=name, url=f'https://www.culture.ru/{name}', parser_config={'page_param': 'page', 'max_pages': 2}
+            )
+        lock, active, peak = threading.Lock(), [0], [0]
+
+        def get(url, **kwargs):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            page = PAGE % (url.encode() + b' 1', url.encode() + b' 2')
+            if 'page=' in url:
+                paged = mock.MagicMock(status_code=200)
+                paged.iter_content.return_value = [page]
+                return paged
+            return response(content=page)
+
+        with mock.patch('requests.Session.get', side_effect=get) as session_get:
+            results = sync_sources(ExternalEventSource.objects.all(), workers=4)
+
+        self.assertEqual(session_get.call_count, 7)
+        self.assertTrue(all(result.status == 'synced' for result in results))
+        self.assertLessEqual(peak[0], PER_DOMAIN_LIMIT)
+
+    def test_source_without_parser_is_skipped(self):
+        self.source.url = 'https://example.com/afisha'
+        self.source.save()
+        result, get = self.sync()
+        self.assertEqual(result.status, 'unsupported')
+        get.assert_not_called()
+
+    def test_command_reports_per_source(self):
+        out = StringIO()
+        with mock.patch('requests.Session.get', return_value=response(content=PAGE % (b'A', b'B'))):
+            call_command('sync_external_events', stdout=out)
+        self.assertIn('Culture.ru: создано 2, обновлено 0', out.getvalue())
@@ -0,0 +1,96 @@
+from io import StringIO
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Category, Event, EventStatistic, Favorite, Registration, TrendingScore
+from ..trending import TRENDING_HALF_LIFE, compute_trending_scores, decay, decayed_counts, trending_events
+
+User = get_user_model()
+
+
+@override_settings(EVENT_PROCESSING_ASYNC=False)
+@mock.patch.object(Event, 'geocode_location', autospec=True)
+class TrendingScoreTest(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', password='testpass123')
+        self.category = Category.objects.create(name='Разное', slug='misc')
+        self.now = timezone.now()
+        self.fresh, self.old_buzz, self.quiet = [self.create_event(f'Мероприятие {i}') for i in range(3)]
+        self.past = self.create_event('Прошедшее', date=self.now - timedelta(days=1))
+
+    def create_event(self, title, **kwargs):
+        data = {
+            'title': title, 'description': 'Описание', 'location': '', 'organizer': self.organizer,
+            'category': self.category, 'date': self.now + timedelta(days=10),
+        }
+        data.update(kwargs)
+        return Event.objects.create(**data)
+
+    def interact(self, event, count, age, model=Favorite):
+        for i in range(count):
+            user = User.objects.create_user(username=f'u-{event.pk}-{model.__name__}-{age}-{i}', password='x')
+            if model is Favorite:
+                obj = Favorite.objects.create(user=user, event=event)
+                model.objects.filter(pk=obj.pk).update(created_at=self.now - age)
+            else:
+                obj = Registration.objects.create(user=user, event=event, status='confirmed')
+                model.objects.filter(pk=obj.pk).update(registration_date=self.now - age)
+
+    def test_decay(self, geocode_location):
+        self.assertEqual(decay(timedelta(0)), 1.0)
+        self.assertAlmostEqual(decay(TRENDING_HALF_LIFE), 0.5)
+
+        rows = [(1, self.now), (2, self.now - TRENDING_HALF_LIFE), (1, self.now - 2 * TRENDING_HALF_LIFE)]
+        scores, counts = decayed_counts(rows, self.now)
+        self.assertAlmostEqual(scores[1], 1.25)
+        self.assertAlmostEqual(scores[2], 0.5)
+        self.assertEqual(counts, {1: 2, 2: 1})
+        self.assertEqual(decayed_counts([], self.now), ({}, {}))
+
+    def test_recent_activity_outranks_older_activity(self, geocode_location):
+        self.interact(self.fresh, 2, timedelta(hours=1))
+        self.interact(self.old_buzz, 4, timedelta(days=4))
+        self.interact(self.old_buzz, 3, timedelta(days=30), model=Registration)  # за пределами окна
+        self.interact(self.past, 5, timedelta(hours=1))
+
+        self.assertEqual(compute_trending_scores(now=self.now), 2)
+
+        with self.assertNumQueries(1):
+            ranked = [event.pk for event in trending_events()]
+        self.assertEqual(ranked, [self.fresh.pk, self.old_buzz.pk])
+        row = TrendingScore.objects.get(event=self.old_buzz)
+        self.assertEqual((row.favorites, row.registrations), (4, 0))
+        self.assertAlmostEqual(row.score, 4 * 1.5 * 0.5 ** 4, places=3)
+        self.assertFalse(TrendingScore.objects.filter(event=self.past).exists())
+
+    def test_views_count_as_increment_since_last_run(self, geocode_location):
+        EventStatistic.objects.filter(event=self.quiet).update(views_count=100)
+        compute_trending_scores(now=self.now)
+        self.assertEqual(TrendingScore.objects.get(event=self.quiet).score, 0)
+
+        EventStatistic.objects.filter(event=self.quiet).update(views_count=110)
+        compute_trending_scores(now=self.now + timedelta(minutes=15))
+        row = TrendingScore.objects.get(event=self.quiet)
+        self.assertEqual((row.views, row.views_total), (10, 110))
+        self.assertAlmostEqual(row.score, 5.0)
+
+    def test_deactivated_events_are_dropped(self, geocode_location):
+        self.interact(self.fresh, 1, timedelta(hours=1))
+        compute_trending_scores(now=self.now)
+        Event.objects.filter(pk=self.fresh.pk).update(is_active=False)
+        compute_trending_scores(now=self.now + timedelta(minutes=15))
+        self.assertFalse(TrendingScore.objects.filter(event=self.fresh).exists())
+
+    def test_api_and_command(self, geocode_location):
+        self.interact(self.fresh, 1, timedelta(hours=1))
+        out = StringIO()
+        call_command('update_trending_scores', stdout=out)
+        self.assertIn('1 мероприятий', out.getvalue())
+
+        response = self.client.get(reverse('events-trending'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.json()], [self.fresh.pk])
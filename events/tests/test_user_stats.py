@@ -0,0 +1,122 @@
+from io import StringIO
+from datetime import timedelta
+from unittest import mock
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+from ..gamification.achievements import reset_achievement_index
+from ..gamification.core import gamification_engine
+from ..models import Achievement, Category, Event, Favorite, Registration, Review, UserAchievement, UserProfile
+
+User = get_user_model()
+
+
+@override_settings(EVENT_PROCESSING_ASYNC=False)
+@mock.patch.object(Event, 'geocode_location', autospec=True)
+class UserProfileCountersTest(TestCase):
+    def setUp(self):
+        # Индекс живет между тестами, а созданные достижения откатываются
+        reset_achievement_index()
+        self.addCleanup(reset_achievement_index)
+        self.organizer = User.objects.create_user(username='organizer', password='testpass123')
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.music = Category.objects.create(name='Музыка', slug='music')
+        self.sport = Category.objects.create(name='Спорт', slug='sport')
+        self.concerts = [self.create_event(f'Концерт {i}', self.music) for i in range(2)]
+        self.marathon = self.create_event('Марафон', self.sport)
+
+    def create_event(self, title, category):
+        return Event.objects.create(
+            title=title, description='Описание', location='', organizer=self.organizer,
+            category=category, date=timezone.now() + timedelta(days=7),
+        )
+
+    def profile(self, user=None):
+        return UserProfile.objects.get(user=user or self.user)
+
+    def test_counters_follow_signals(self, geocode_location):
+        registrations = [Registration.objects.create(user=self.user, event=event) for event in self.concerts]
+        marathon = Registration.objects.create(user=self.user, event=self.marathon)
+        Favorite.objects.create(user=self.user, event=self.marathon)
+        Review.objects.create(user=self.user, event=self.concerts[0], rating=5)
+
+        self.assertEqual(self.profile().stats, {
+            'events_created': 0, 'events_attended': 3, 'reviews_written': 1,
+            'favorites_added': 1, 'days_active': 1, 'categories_explored': 2,
+        })
+        self.assertEqual(self.profile(self.organizer).events_created, 3)
+
+        marathon.delete()
+        registrations[0].delete()
+        profile = self.profile()
+        self.assertEqual((profile.events_attended, profile.categories_explored, profile.days_active), (1, 1, 1))
+        registrations[1].delete()
+        self.assertEqual(self.profile().days_active, 0)
+
+        self.concerts[0].delete()
+        self.assertEqual(self.profile(self.organizer).events_created, 2)
+
+    def test_rebuild_fixes_drift_with_grouped_queries(self, geocode_location):
+        Registration.objects.create(user=self.user, event=self.concerts[0])
+        old = Registration.objects.create(user=self.user, event=self.marathon)
+        Registration.objects.filter(pk=old.pk).update(registration_date=timezone.now() - timedelta(days=40))
+        UserProfile.objects.update(events_created=7, events_attended=0, days_active=5)
+
+        with CaptureQueriesContext(connection) as few_users:
+            self.assertEqual(UserProfile.rebuild(), 2)
+        self.assertEqual(self.profile().stats, {
+            'events_created': 0, 'events_attended': 2, 'reviews_written': 0,
+            'favorites_added': 0, 'days_active': 1, 'categories_explored': 2,
+        })
+        self.assertEqual(self.profile(self.organizer).events_created, 3)
+
+        for i in range(5):
+            User.objects.create_user(username=f'extra{i}', password='testpass123')
+        with CaptureQueriesContext(connection) as more_users:
+            UserProfile.rebuild()
+        self.assertEqual(len(more_users), len(few_users))
+
+    def test_rebuild_creates_missing_profiles(self, geocode_location):
+        UserProfile.objects.filter(user=self.user).delete()
+        Favorite.objects.create(user=self.user, event=self.marathon)
+        UserProfile.objects.filter(user=self.user).delete()
+
+        UserProfile.rebuild(User.objects.filter(pk=self.user.pk))
+        self.assertEqual(self.profile().favorites_added, 1)
+
+    def test_stale_instance_does_not_overwrite_counters(self, geocode_location):
+        profile = self.profile()
+        Favorite.objects.create(user=self.user, event=self.marathon)
+        profile.total_points = 42
+        profile.save()
+
+        profile = self.profile()
+        self.assertEqual((profile.total_points, profile.favorites_added), (42, 1))
+
+    def test_requirements_use_profile_counters(self, geocode_location):
+        achievement = Achievement.objects.create(
+            name='Коллекционер', description='', achievement_type='exploration',
+            points=20, requirement={'favorites_added': 2, 'categories_explored': 1},
+        )
+        for event in self.concerts:
+            Favorite.objects.create(user=self.user, event=event)
+        Registration.objects.create(user=self.user, event=self.marathon)
+
+        profile = self.profile()
+        with self.assertNumQueries(0):
+            self.assertTrue(gamification_engine._check_requirement(profile, achievement.requirement))
+        self.assertFalse(gamification_engine._check_requirement(profile, {'reviews_written': 1}))
+        gamification_engine.handle_user_action(self.user, 'add_favorite')
+
+        self.assertTrue(UserAchievement.objects.get(user=self.user, achievement=achievement).is_unlocked)
+        self.assertEqual(self.profile().total_points, 20)
+
+    def test_command(self, geocode_location):
+        UserProfile.objects.update(events_created=0)
+        out = StringIO()
+        call_command('rebuild_user_stats', '--user', str(self.organizer.pk), stdout=out)
+        self.assertIn('Статистика пересчитана: 1 профилей', out.getvalue())
+        self.assertEqual(self.profile(self.organizer).events_created, 3)
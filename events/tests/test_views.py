@@ -130,4 +130,65 @@ class ReviewViewsTest(TestCase):
             reverse('add_review', args=[test_event.pk])
         )
         # Необходимо перенаправить, поскольку пользователь не зарегистрирован
-        assert response.status_code == 302
\ No newline at end of file
+        assert response.status_code == 302
+
+class CombinedFeedViewsTest(TestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from ..models import ExternalEvent, ExternalEventSource
+
+        self.user = User.objects.create_user(username='organizer', password='testpass123')
+        self.category = Category.objects.create(name='Музыка', slug='music')
+        now = timezone.now()
+        source = ExternalEventSource.objects.create(name='KudaGo', url='https://example.com')
+        for day in (1, 3, 5):
+            baker.make(
+                Event, title=f'Internal {day}', organizer=self.user, category=self.category,
+                date=now + timedelta(days=day), latitude=55.75, longitude=37.61, price=0,
+            )
+        for day in (2, 4):
+            ExternalEvent.objects.create(
+                source=source, external_id=str(day), title=f'External {day}',
+                description='', short_description='', date=now + timedelta(days=day),
+                location='Москва', external_url=f'https://example.com/{day}', category='Концерты',
+            )
+        ExternalEvent.objects.create(
+            source=source, external_id='old', title='External old', description='',
+            short_description='', date=now - timedelta(days=10), location='Москва',
+            external_url='https://example.com/old', category='Концерты', is_archived=True,
+        )
+
+    def test_combined_feed_ordered_in_sql(self):
+        response = self.client.get(reverse('combined_events'))
+        self.assertEqual(response.status_code, 200)
+        events = response.context['events']
+        self.assertEqual(
+            [event['title'] for event in events],
+            ['Internal 1', 'External 2', 'Internal 3', 'External 4', 'Internal 5'],
+        )
+        internal = events[0]
+        self.assertEqual(internal['url'], reverse('event_detail', kwargs={'pk': internal['id']}))
+        self.assertEqual(internal['source_name'], 'EventHub')
+        self.assertTrue(internal['is_free'])
+        self.assertEqual(events[1]['url'], 'https://example.com/2')
+
+    def test_combined_feed_paginates_in_sql(self):
+        from ..views import CombinedEventsView
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        CombinedEventsView.paginate_by = 2
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('combined_events'), {'page': 2})
+        finally:
+            CombinedEventsView.paginate_by = 20
+        self.assertEqual([event['title'] for event in response.context['events']], ['Internal 3', 'External 4'])
+        union = [q['sql'] for q in queries if 'UNION ALL' in q['sql'] and 'LIMIT' in q['sql']]
+        self.assertEqual(len(union), 1)
+
+    def test_archive_newest_first(self):
+        response = self.client.get(reverse('archive'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([event['title'] for event in response.context['events']], ['External old'])
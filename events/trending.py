@@ -0,0 +1,122 @@
+"""
+Мероприятия «в тренде».
+
+Задача update_trending_scores (каждые 15 минут) берет регистрации и
+избранное предстоящих активных мероприятий за последние TRENDING_WINDOW
+и прирост просмотров с прошлого пересчета, считает оценку с экспоненциальным
+затуханием и сохраняет ее в TrendingScore. Страницы и API читают уже
+отсортированные мероприятия одним запросом (trending_events()).
+
+Оценка: сумма весов взаимодействий, каждое умножено на
+0.5 ** (возраст / TRENDING_HALF_LIFE); просмотры считаются свежими.
+Затухание и суммы по мероприятиям считаются векторно (NumPy) по массивам
+из values_list().
+"""
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Event, EventStatistic, Favorite, Registration, TrendingScore
+
+TRENDING_WINDOW = timedelta(days=7)
+TRENDING_HALF_LIFE = timedelta(hours=24)
+
+REGISTRATION_WEIGHT = 2.0
+FAVORITE_WEIGHT = 1.5
+VIEW_WEIGHT = 0.5
+
+
+def decay(age, half_life=TRENDING_HALF_LIFE):
+    return math.pow(0.5, max(age.total_seconds(), 0) / half_life.total_seconds())
+
+
+def decayed_counts(rows, now, half_life=TRENDING_HALF_LIFE):
+    """
+    Строки (event_id, время) -> ({event_id: сумма затуханий}, {event_id: число строк}).
+    Возрасты собираются в массив, затухание и суммы по мероприятиям - NumPy.
+    """
+    rows = list(rows)
+    if not rows:
+        return {}, {}
+    event_ids = np.fromiter((event_id for event_id, _ in rows), dtype=np.int64, count=len(rows))
+    ages = np.fromiter(((now - created).total_seconds() for _, created in rows), dtype=np.float64, count=len(rows))
+    weights = np.power(0.5, np.maximum(ages, 0) / half_life.total_seconds())
+    ids, positions, counts = np.unique(event_ids, return_inverse=True, return_counts=True)
+    sums = np.bincount(positions, weights=weights)
+    ids = ids.tolist()
+    return dict(zip(ids, sums.tolist())), dict(zip(ids, counts.tolist()))
+
+
+def compute_trending_scores(now=None):
+    """Пересчитывает TrendingScore; возвращает число мероприятий с ненулевой оценкой"""
+    now = now or timezone.now()
+    since = now - TRENDING_WINDOW
+    candidates = Event.objects.filter(is_active=True, date__gte=now)
+
+    registration_scores, registrations = decayed_counts(
+        Registration.objects.filter(
+            event__in=candidates, status='confirmed', registration_date__gte=since,
+        ).values_list('event_id', 'registration_date'),
+        now,
+    )
+    favorite_scores, favorites = decayed_counts(
+        Favorite.objects.filter(
+            event__in=candidates, created_at__gte=since,
+        ).values_list('event_id', 'created_at'),
+        now,
+    )
+    scores = defaultdict(float)
+    for weight, source in ((REGISTRATION_WEIGHT, registration_scores), (FAVORITE_WEIGHT, favorite_scores)):
+        for event_id, score in source.items():
+            scores[event_id] += weight * score
+
+    # Просмотры хранятся только общим счетчиком - берем прирост с прошлого пересчета
+    previous_views = dict(TrendingScore.objects.values_list('event_id', 'views_total'))
+    views_total = dict(
+        EventStatistic.objects.filter(event__in=candidates).values_list('event_id', 'views_count')
+    )
+    views = {
+        event_id: max(total - previous_views.get(event_id, total), 0)
+        for event_id, total in views_total.items()
+    }
+    for event_id, count in views.items():
+        scores[event_id] += VIEW_WEIGHT * count
+
+    # Строки нужны и мероприятиям без активности: в них хранится счетчик просмотров для следующего прироста
+    event_ids = set(candidates.values_list('id', flat=True))
+    rows = [
+        TrendingScore(
+            event_id=event_id,
+            score=scores.get(event_id, 0.0),
+            registrations=registrations.get(event_id, 0),
+            favorites=favorites.get(event_id, 0),
+            views=views.get(event_id, 0),
+            views_total=views_total.get(event_id, 0),
+            computed_at=now,
+        )
+        for event_id in event_ids
+    ]
+    with transaction.atomic():
+        TrendingScore.objects.bulk_create(
+            rows,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['event'],
+            update_fields=['score', 'registrations', 'favorites', 'views', 'views_total', 'computed_at'],
+        )
+        # Прошедшие и снятые с публикации мероприятия не обновились - удаляем их строки
+        TrendingScore.objects.filter(computed_at__lt=now).delete()
+    return sum(1 for row in rows if row.score > 0)
+
+
+def trending_events(queryset=None, limit=10):
+    """Мероприятия по убыванию TrendingScore; один запрос с JOIN"""
+    if queryset is None:
+        queryset = Event.objects.all()
+    return queryset.filter(
+        is_active=True, date__gte=timezone.now(), trending__score__gt=0,
+    ).order_by('-trending__score')[:limit]
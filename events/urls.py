@@ -36,6 +36,7 @@ urlpatterns = [
     path('event/<int:pk>/update/', EventUpdateView.as_view(), name='event_update'),
     path('event/<int:pk>/delete/', EventDeleteView.as_view(), name='event_delete'),
     # path('map-test/', views.map_test_view, name='map_test'),
+    path('search/', EventSearchView.as_view(), name='event_search'),
     path('map/', views.EventsMapView.as_view(), name='events_map'),
     path('api/events/map/', views.events_map_api, name='events_map_api'),
     path('sitemap/', SitemapView.as_view(), name='sitemap'),
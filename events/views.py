@@ -7,7 +7,7 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.urls import reverse_lazy
-from django.db.models import Q, Count, Avg
+from django.db.models import Q, Count, Avg, Sum
 from django_filters import FilterSet, CharFilter, NumberFilter, ChoiceFilter, DateFilter
 from django.utils import timezone
 from django.http import JsonResponse
@@ -26,6 +26,11 @@ from django.contrib.auth.views import LogoutView
 from django.contrib.auth import get_user_model
 from django.core.serializers.json import DjangoJSONEncoder
 from .decorators import organizer_required, admin_required
+from .search import search_events
+from .trending import trending_events
+from .pagination import KeysetPaginationMixin
+from .combined_feed import combined_feed, decorate_feed_page
+from .geo import CLUSTER_MAX_ZOOM, MAP_MARKERS_LIMIT, cluster_events, filter_bbox, parse_bbox
 from django.utils.decorators import method_decorator
 from .models import ProjectPromoVideo
 from django.core.serializers import serialize
@@ -70,7 +75,7 @@ def ad_impression(request, ad_id):
 
 
 # ==================== КЛАССЫ ПРЕДСТАВЛЕНИЙ ====================
-class EventListView(ListView):
+class EventListView(KeysetPaginationMixin, ListView):
     """Список активных мероприятий с улучшенным контекстом"""
     model = Event
     template_name = 'events/event_list.html'
@@ -96,18 +101,14 @@ class EventListView(ListView):
         # Поиск
         search_query = self.request.GET.get('q')
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(short_description__icontains=search_query)
-            )
+            return search_events(search_query, queryset.select_related('category', 'organizer'))
         
         return queryset.select_related('category', 'organizer').order_by('-created_at')
 
     def get_queryset(self):
         queryset = Event.objects.filter(is_active=True).select_related(
             'category', 'organizer'
-        ).prefetch_related('tags')
+        ).prefetch_related('tags', 'renditions').with_stats()
         
         # Применяем фильтры
         category = self.request.GET.get('category')
@@ -119,11 +120,8 @@ class EventListView(ListView):
         if event_type:
             queryset = queryset.filter(event_type=event_type)
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(location__icontains=search)
-            )
+            # Полнотекстовый поиск, результаты по релевантности
+            return search_events(search, queryset)
         
         return queryset.order_by('-date')
 
@@ -233,10 +231,11 @@ class EventListView(ListView):
         context = super().get_context_data(**kwargs)
         
         # Получаем проморолики проекта
-        project_promos = ProjectPromoVideo.objects.filter(is_active=True)
+        project_promos = ProjectPromoVideo.objects.filter(is_active=True).prefetch_related('renditions')
         
         context.update({
             'project_promos': project_promos,
+            'trending_events': trending_events(Event.objects.select_related('category'), limit=6),
             'total_events': Event.objects.filter(is_active=True).count(),
             'total_users': User.objects.count(),
             'total_cities': Event.objects.filter(is_active=True)
@@ -253,7 +252,7 @@ class AboutProjectView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        project_promos = ProjectPromoVideo.objects.filter(is_active=True)
+        project_promos = ProjectPromoVideo.objects.filter(is_active=True).prefetch_related('renditions')
         
         context.update({
             'project_promos': {
@@ -286,22 +285,16 @@ class EventDetailView(DetailView):
     context_object_name = 'event'
 
     def get_queryset(self):
-        return Event.objects.filter(is_active=True).select_related('category', 'organizer')
+        return Event.objects.filter(is_active=True).select_related('category', 'organizer').with_stats()
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         event = context['event']
 
-        # Вычисляем значения ВРУЧНУЮ в контексте
-        context['registrations_count'] = event.registrations.filter(status='confirmed').count()
-        
-        # Вычисляем средний рейтинг
-        reviews = event.reviews.all()
-        if reviews:
-            context['average_rating'] = sum(review.rating for review in reviews) / reviews.count()
-        else:
-            context['average_rating'] = 0
-            
+        # Счетчики уже посчитаны аннотацией with_stats()
+        context['registrations_count'] = event.registrations_count
+        context['average_rating'] = event.average_rating
+
         # Используем capacity вместо max_participants
         context['available_spots'] = event.capacity - context['registrations_count']
 
@@ -445,15 +438,11 @@ class EventFilter(FilterSet):
         fields = ['category', 'event_type', 'min_price', 'max_price', 'start_date', 'end_date']
     
     def search_filter(self, queryset, name, value):
-        """Поиск по названию и описанию"""
-        return queryset.filter(
-            Q(title__icontains=value) | 
-            Q(description__icontains=value) |
-            Q(short_description__icontains=value)
-        )
+        """Полнотекстовый поиск по названию, описанию и месту проведения"""
+        return search_events(value, queryset)
 
 
-class EventSearchView(ListView):
+class EventSearchView(KeysetPaginationMixin, ListView):
     """Расширенный поиск мероприятий с фильтрами"""
     model = Event
     template_name = 'events/event_search.html'
@@ -464,22 +453,21 @@ class EventSearchView(ListView):
         queryset = Event.objects.filter(
             is_active=True, 
             date__gte=timezone.now()
-        ).select_related('organizer').annotate(
-            registrations_count=Count('registrations'),
-            average_rating=Avg('reviews__rating')
-        )
+        ).select_related('organizer').with_stats()
         
         # Применяем фильтры
         self.filterset = EventFilter(self.request.GET, queryset=queryset)
         
-        # Сортировка
-        sort_by = self.request.GET.get('sort', 'date')
-        if sort_by == 'price':
+        # Сортировка (при поиске по умолчанию - по релевантности)
+        sort_by = self.request.GET.get('sort') or ('relevance' if self.request.GET.get('q') else 'date')
+        if sort_by == 'relevance' and self.request.GET.get('q'):
+            return self.filterset.qs
+        elif sort_by == 'price':
             return self.filterset.qs.order_by('price')
         elif sort_by == 'price_desc':
             return self.filterset.qs.order_by('-price')
         elif sort_by == 'rating':
-            return self.filterset.qs.order_by('-average_rating')
+            return self.filterset.qs.order_by('-_average_rating')
         else:
             return self.filterset.qs.order_by('date')
     
@@ -487,7 +475,7 @@ class EventSearchView(ListView):
         context = super().get_context_data(**kwargs)
         context['filterset'] = self.filterset
         context['search_query'] = self.request.GET.get('q', '')
-        context['current_sort'] = self.request.GET.get('sort', 'date')
+        context['current_sort'] = self.request.GET.get('sort') or ('relevance' if self.request.GET.get('q') else 'date')
         context['categories'] = Category.objects.all()
         return context
 
@@ -504,9 +492,9 @@ class OrganizerDashboardView(LoginRequiredMixin, TemplateView):
             'total_events': user_events.count(),
             'active_events': user_events.filter(is_active=True, date__gte=timezone.now()).count(),
             'past_events': user_events.filter(date__lt=timezone.now()).count(),
-            'total_registrations': Registration.objects.filter(
-                event__organizer=self.request.user
-            ).count(),
+            'total_registrations': user_events.aggregate(
+                total=Sum('eventstatistic__registrations_count')
+            )['total'] or 0,
         }
         return context
 
@@ -531,30 +519,16 @@ class FavoriteListView(LoginRequiredMixin, ListView):
     context_object_name = 'favorites'
 
     def get_queryset(self):
-        # Запрос с аннотациями для оптимизации
+        # Счетчики мероприятия берутся из EventStatistic тем же запросом
         return Favorite.objects.filter(
             user=self.request.user
-        ).select_related('event', 'event__organizer').prefetch_related(
-            'event__registrations',
-            'event__reviews'
-        )
+        ).select_related('event', 'event__organizer', 'event__eventstatistic').prefetch_related('event__renditions')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
         # Добавляем дополнительную информацию для каждого избранного мероприятия
         for favorite in context['favorites']:
-            # Временные атрибуты с префиксом _
-            favorite.event._registrations_count = favorite.event.registrations.count()
-            favorite.event._reviews_count = favorite.event.reviews.count()
-            
-            # Средний рейтинг вычисляем через агрегацию по отзывам
-            if favorite.event._reviews_count > 0:
-                total_rating = sum(review.rating for review in favorite.event.reviews.all())
-                favorite.event._average_rating = total_rating / favorite.event._reviews_count
-            else:
-                favorite.event._average_rating = 0
-            
             # Краткое описание
             if not favorite.event.short_description:
                 favorite.event._short_description = "Описание отсутствует"
@@ -889,7 +863,7 @@ class CombinedEventsView(ListView):
         internal_events = Event.objects.filter(
             is_active=True,
             date__gte=timezone.now()
-        ).select_related('organizer', 'category')
+        )
         
         # Применяем фильтры к внутренним мероприятиям по категории (модель Category)
         if self.request.GET.get('category'):
@@ -902,79 +876,18 @@ class CombinedEventsView(ListView):
         external_events = ExternalEvent.objects.filter(
             is_archived=False,
             date__gte=timezone.now()
-        ).select_related('source')
+        )
 
         # Внешние мероприятия НЕ имеют event_type или category (в вашей модели),
         # поэтому фильтрация по ним НЕ ПРИМЕНЯЕТСЯ к external_events
 
-        # === ОБЪЕДИНЕНИЕ === и сортируем по дате
-        combined = []
-        
-        # Преобразуем внутренние мероприятия
-        for event in internal_events:
-            # ВЫЧИСЛЯЕМ ВРУЧНУЮ - используем поле status вместо is_confirmed
-            registrations_count = event.registrations.filter(status='confirmed').count()
-            avg_rating = event.reviews.aggregate(avg=Avg('rating'))['avg'] or 0
-            
-            combined.append({
-                'type': 'internal',
-                'object': event,
-                'title': event.title,
-                'description': event.description,
-                'date': event.date,
-                'location': event.location,
-                'price': event.price,
-                'is_free': event.price == 0,
-                'image_url': event.get_image_url() if hasattr(event, 'get_image_url') else '',
-                'category': self._get_event_category(event),
-                'url': event.get_absolute_url(),
-                'source_name': 'EventHub',
-                'is_past': False,
-                'average_rating': avg_rating,
-                'registrations_count': registrations_count
-            })
-        
-        # Преобразуем внешние мероприятия
-        for event in external_events:
-            combined.append({
-                'type': 'external',
-                'object': event,
-                'title': event.title,
-                'description': event.description,
-                'date': event.date,
-                'location': event.location,
-                'price': event.price,
-                'is_free': event.is_free,
-                'image_url': event.image_url,
-                'category': event.category,
-                'url': event.external_url,
-                'source_name': event.source.name,
-                'is_past': event.is_past_event,
-            })
-        
-        # Сортируем по дате
-        combined.sort(key=lambda x: x['date'])
-        return combined
-    
-    def _get_event_category(self, event):
-        """Внутренний метод для получения категории мероприятия"""
-        try:
-            # Если есть property get_category_display_name
-            if hasattr(event, 'get_category_display_name'):
-                return event.get_category_display_name
-            # Если есть стандартный метод Django get_FOO_display
-            elif hasattr(event, 'get_category_display'):
-                return event.get_category_display()
-            # Если есть связанная категория
-            elif hasattr(event, 'category') and event.category:
-                return event.category.name
-            else:
-                return 'Не указана'
-        except Exception:
-            return 'Не указана'
+        # === ОБЪЕДИНЕНИЕ === UNION ALL с сортировкой по дате и пагинацией в SQL
+        return combined_feed(internal_events, external_events)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        # Ссылки и изображения дополняются только для строк текущей страницы
+        context['events'] = context['object_list'] = decorate_feed_page(context['events'])
         context['page_title'] = 'Все мероприятия'
         context['current_time'] = timezone.now()
         
@@ -1007,36 +920,12 @@ class ArchiveEventsView(ListView):
             is_archived=True
         )
         
-        combined = []
-        
-        for event in internal_archive:
-            combined.append({
-                'type': 'internal',
-                'object': event,
-                'title': event.title,
-                'date': event.date,
-                'location': event.location,
-                'is_past': event.date < timezone.now(),
-                'source_name': 'EventHub',
-            })
-        
-        for event in external_archive:
-            combined.append({
-                'type': 'external', 
-                'object': event,
-                'title': event.title,
-                'date': event.date,
-                'location': event.location,
-                'is_past': True,
-                'source_name': event.source.name,
-            })
-
-        # Сортируем по дате (сначала самые новые прошедшие)        
-        combined.sort(key=lambda x: x['date'], reverse=True)
-        return combined
+        # Сначала самые новые прошедшие
+        return combined_feed(internal_archive, external_archive, newest_first=True)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context['events'] = context['object_list'] = decorate_feed_page(context['events'])
         context['page_title'] = 'Архив мероприятий'
         return context
     
@@ -1061,19 +950,9 @@ class ExternalEventsView(ListView):
     
 
 def get_ai_recommended_events(request):
-    """Представление для AI-рекомендаций"""
-    if request.user.is_authenticated:
-        # Для авторизованных - AI рекомендации
-        from .ai_recommendations import AIRecommendationEngine
-        engine = AIRecommendationEngine()
-        recommendations = engine.get_hybrid_recommendations(request.user, 6)
-    else:
-        # Для неавторизованных - популярные мероприятия
-        recommendations = Event.objects.filter(is_active=True).annotate(
-            registrations_count=Count('registrations')
-        ).order_by('-registrations_count')[:6]
-    
-    return recommendations
+    """Представление для AI-рекомендаций (из кеша, см. events/recommendation_cache.py)"""
+    from .recommendation_cache import get_recommended_events
+    return get_recommended_events(request.user, 6)
 
 class EventsMapView(TemplateView):
     template_name = "events/events_map.html"
@@ -1093,20 +972,16 @@ class EventsMapView(TemplateView):
             Q(latitude__isnull=False) & 
             Q(longitude__isnull=False) &
             Q(is_active=True)
-        )[:20]
+        ).select_related('category', 'organizer').with_stats()[:20]
+        # Один запрос вместо count() + exists() + итерации
+        events_with_coords = list(events_with_coords)
         
-        print(f"Найдено мероприятий с координатами: {events_with_coords.count()}")
+        print(f"Найдено мероприятий с координатами: {len(events_with_coords)}")
         
         # Если есть мероприятия с координатами - используем их
-        if events_with_coords.exists():
+        if events_with_coords:
             events_data = []
             for event in events_with_coords:
-                # ВЫЧИСЛЯЕМ ВРУЧНУЮ для каждого события - используем status вместо is_confirmed
-                registrations_count = event.registrations.filter(status='confirmed').count()
-                
-                # Вычисляем средний рейтинг
-                avg_rating = event.reviews.aggregate(avg=Avg('rating'))['avg'] or 0
-                
                 events_data.append({
                     'id': event.id,
                     'title': event.title,
@@ -1118,8 +993,8 @@ class EventsMapView(TemplateView):
                     'category_name': event.category.name if event.category else 'Другое',
                     'organizer_name': getattr(event.organizer, 'username', 'Неизвестно'),
                     'short_description': event.short_description or event.description[:100] + '...' if event.description else 'Описание отсутствует',
-                    'average_rating': float(avg_rating),
-                    'registrations_count': registrations_count,
+                    'average_rating': float(event.average_rating),
+                    'registrations_count': event.registrations_count,
                     'url': f"/event/{event.id}/"
                 })
             context['events_count'] = len(events_data)
@@ -1136,47 +1011,73 @@ class EventsMapView(TemplateView):
         
         return context
     
+def _map_marker(event):
+    """Данные маркера мероприятия для карты"""
+    return {
+        'id': event.id,
+        'title': event.title,
+        'description': event.description,
+        'location': event.location,
+        'latitude': event.latitude,
+        'longitude': event.longitude,
+        'start_date': event.date.isoformat() if event.date else None,
+        'category_id': event.category_id,
+        'category_name': event.category.name if event.category else '',
+        'price': float(event.price) if event.price else 0,
+        'max_participants': event.capacity,
+        'organizer': event.organizer.get_full_name() if event.organizer else 'Неизвестно',
+        'average_rating': float(event.average_rating),
+        'registrations_count': event.registrations_count,
+        'url': event.get_absolute_url(),
+        'image_url': event.get_image_url('map'),
+    }
+
+
 def events_map_api(request):
-    """API для получения мероприятий для карты (JSON)"""
-    from django.db.models import Q
-    from .models import Event
-    from django.db.models import Avg
-    
-    # ПРОСТОЙ запрос без аннотаций
+    """
+    API для карты (JSON).
+
+    ?bbox=min_lon,min_lat,max_lon,max_lat&zoom=N - только мероприятия в области
+    просмотра; при zoom < CLUSTER_MAX_ZOOM маркеры объединяются в кластеры на
+    стороне сервера. Без bbox - список первых ?limit= мероприятий, как раньше.
+    """
     events = Event.objects.filter(
-        Q(latitude__isnull=False) & 
-        Q(longitude__isnull=False) &
-        Q(is_active=True)
-    ).select_related('category')[:50]  # Ограничиваем количество
-    
-    events_data = []
-    for event in events:
-        # ВЫЧИСЛЯЕМ ВРУЧНУЮ для каждого события
-        registrations_count = event.registrations.filter(is_confirmed=True).count()
-        
-        # Вычисляем средний рейтинг
-        avg_rating = event.reviews.aggregate(avg=Avg('rating'))['avg'] or 0
-        
-        events_data.append({
-            'id': event.id,
-            'title': event.title,
-            'description': event.description,
-            'location': event.location,
-            'latitude': event.latitude,
-            'longitude': event.longitude,
-            'start_date': event.start_date.isoformat() if event.start_date else None,
-            'end_date': event.end_date.isoformat() if event.end_date else None,
-            'category_id': event.category.id if event.category else None,
-            'category_name': event.category.name if event.category else '',
-            'price': float(event.price) if event.price else 0,
-            'max_participants': event.max_participants,
-            'organizer': event.organizer.get_full_name() if event.organizer else 'Неизвестно',
-            'average_rating': float(avg_rating),
-            'registrations_count': registrations_count,
-            'url': event.get_absolute_url()
-        })
-    
-    return JsonResponse(events_data, safe=False)
+        latitude__isnull=False,
+        longitude__isnull=False,
+        is_active=True
+    )
+
+    bbox = request.GET.get('bbox')
+    if not bbox:
+        try:
+            limit = min(int(request.GET.get('limit', 50)), 200)
+        except ValueError:
+            limit = 50
+        events = events.select_related('category', 'organizer').prefetch_related('renditions').with_stats()[:limit]
+        return JsonResponse([_map_marker(event) for event in events], safe=False)
+
+    try:
+        bbox = parse_bbox(bbox)
+        zoom = int(request.GET.get('zoom', CLUSTER_MAX_ZOOM))
+    except ValueError:
+        return JsonResponse({'error': 'Неверные параметры bbox/zoom'}, status=400)
+
+    events = filter_bbox(events, bbox)
+    if zoom < CLUSTER_MAX_ZOOM:
+        clusters = cluster_events(events, zoom)
+        # Одиночные ячейки отдаем как обычные маркеры
+        single_ids = [cluster['event_id'] for cluster in clusters if cluster['event_id']]
+        markers = events.filter(pk__in=single_ids)
+        clusters = [cluster for cluster in clusters if not cluster['event_id']]
+    else:
+        markers, clusters = events, []
+
+    markers = markers.select_related('category', 'organizer').prefetch_related('renditions').with_stats()[:MAP_MARKERS_LIMIT]
+    return JsonResponse({
+        'zoom': zoom,
+        'clusters': clusters,
+        'events': [_map_marker(event) for event in markers],
+    })
 
 # # ==================== СИСТЕМА ПОПУТЧИКОВ ====================
 
@@ -1398,52 +1299,6 @@ def events_map_api(request):
 #     return redirect('my_buddy_requests')
 # # ============================================================
 
-class ArchiveEventsView(ListView):
-    """Архив прошедших мероприятий"""
-    template_name = 'events/archive.html'
-    paginate_by = 20
-    context_object_name = 'events'
-    
-    def get_queryset(self):
-        # Архив внутренних мероприятий
-        internal_archive = Event.objects.filter(
-            Q(is_active=False) | Q(date__lt=timezone.now())  # Исправлено: date вместо start_date
-        )
-        
-        # Архив внешних мероприятий
-        external_archive = ExternalEvent.objects.filter(
-            is_archived=True
-        )
-        
-        combined = []
-        
-        for event in internal_archive:
-            combined.append({
-                'type': 'internal',
-                'object': event,
-                'title': event.title,
-                'date': event.date,  # Исправлено: date вместо start_date
-                'location': event.location,
-                'is_past': event.date < timezone.now(),  # Исправлено: date вместо start_date
-                'source_name': 'EventHub',
-            })
-        
-        for event in external_archive:
-            combined.append({
-                'type': 'external', 
-                'object': event,
-                'title': event.title,
-                'date': event.date,
-                'location': event.location,
-                'is_past': True,
-                'source_name': event.source.name,
-            })
-
-        # Сортируем по дате (сначала самые новые прошедшие)        
-        combined.sort(key=lambda x: x['date'], reverse=True)
-        return combined
-    
-
 class ExternalEventsView(ListView):
     """Только внешние мероприятия"""
     template_name = 'events/external_events.html'
@@ -1464,19 +1319,9 @@ class ExternalEventsView(ListView):
     
 
 def get_ai_recommended_events(request):
-    """Представление для AI-рекомендаций"""
-    if request.user.is_authenticated:
-        engine = AIRecommendationEngine()
-
-        recommendations = engine.get_hybrid_recommendations(request.user, 6)
-    else:
-        # Для неавторизованных - популярные мероприятия
-        from .models import Event
-        recommendations = Event.objects.filter(is_active=True).annotate(
-            registrations_count=Count('registrations')
-        ).order_by('-registrations_count')[:6]
-    
-    return recommendations
+    """Представление для AI-рекомендаций (из кеша, см. events/recommendation_cache.py)"""
+    from .recommendation_cache import get_recommended_events
+    return get_recommended_events(request.user, 6)
 
 
 class OrganizerSolutionsView(TemplateView):
@@ -2051,43 +1896,15 @@ class LeaderboardView(LoginRequiredMixin, TemplateView):
     template_name = 'events/leaderboard.html'
     
     def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+        from .gamification.leaderboard import get_leaderboard, leaderboard_entries
         
-        # Заглушка для данных таблицы лидеров
-        leaderboard_data = [
-            {
-                'rank': 1,
-                'username': 'Лидер',
-                'points': 1000,
-                'level': 5,
-                'avatar': '/static/images/avatars/1.png'
-            },
-            {
-                'rank': 2,
-                'username': 'Второй',
-                'points': 800,
-                'level': 4,
-                'avatar': '/static/images/avatars/2.png'
-            },
-            {
-                'rank': 3,
-                'username': 'Третий',
-                'points': 600,
-                'level': 3,
-                'avatar': '/static/images/avatars/3.png'
-            },
-            {
-                'rank': 4,
-                'username': self.request.user.username,
-                'points': 150,
-                'level': 1,
-                'avatar': '/static/images/avatars/default.png'
-            }
-        ]
+        context = super().get_context_data(**kwargs)
         
-        context['leaderboard'] = leaderboard_data
-        context['user_rank'] = 4  # Ранг текущего пользователя
-        context['total_players'] = len(leaderboard_data)
+        # Топ-50 и место пользователя берутся из сортированного множества
+        leaderboard = get_leaderboard()
+        context['leaderboard'] = leaderboard_entries(limit=50)
+        context['user_rank'] = leaderboard.rank(self.request.user.pk)
+        context['total_players'] = leaderboard.count()
         
         return context
     
@@ -63,35 +63,16 @@ def leaderboard(request):
     """
     Получение таблицы лидеров
     """
+    from .gamification.leaderboard import get_leaderboard, leaderboard_entries
+    
     try:
-        leaderboard_data = [
-            {
-                'rank': 1,
-                'user_id': 1,
-                'username': 'Лидер',
-                'points': 1000,
-                'level': 5
-            },
-            {
-                'rank': 2,
-                'user_id': 2,
-                'username': 'Второй',
-                'points': 800,
-                'level': 4
-            },
-            {
-                'rank': 3,
-                'user_id': 3,
-                'username': 'Третий',
-                'points': 600,
-                'level': 3
-            }
-        ]
+        limit = min(int(request.GET.get('limit', 10)), 100)
+        offset = max(int(request.GET.get('offset', 0)), 0)
         
         return JsonResponse({
             'success': True,
-            'leaderboard': leaderboard_data,
-            'total_players': len(leaderboard_data)
+            'leaderboard': leaderboard_entries(limit, offset),
+            'total_players': get_leaderboard().count()
         })
         
     except Exception as e:
@@ -146,22 +127,17 @@ class LeaderboardView(TemplateView):
     template_name = 'events/gamification/leaderboard.html'
     
     def get_context_data(self, **kwargs):
-        from .models import Leaderboard
+        from .gamification.leaderboard import get_leaderboard, leaderboard_entries
         
         context = super().get_context_data(**kwargs)
         
         # Получаем топ-50 игроков
-        leaders = Leaderboard.objects.select_related('user').order_by('position')[:50]
-        
-        context['leaders'] = leaders
-        context['total_players'] = Leaderboard.objects.count()
+        leaderboard = get_leaderboard()
+        context['leaders'] = leaderboard_entries(limit=50)
+        context['total_players'] = leaderboard.count()
         
         # Позиция текущего пользователя если авторизован
         if self.request.user.is_authenticated:
-            try:
-                user_position = Leaderboard.objects.get(user=self.request.user)
-                context['user_position'] = user_position
-            except Leaderboard.DoesNotExist:
-                pass
+            context['user_position'] = leaderboard.rank(self.request.user.pk)
         
         return context
\ No newline at end of file
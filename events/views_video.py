@@ -94,7 +94,7 @@ class AboutProjectView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        project_promos = ProjectPromoVideo.objects.filter(is_active=True)
+        project_promos = ProjectPromoVideo.objects.filter(is_active=True).prefetch_related('renditions')
         
         context.update({
             'project_promos': {
@@ -2,9 +2,7 @@ import requests
 from django.conf import settings
 from django.core.cache import cache
 import logging
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
-import time
+from .geocoding import city_coordinates, get_geocoder
 
 logger = logging.getLogger(__name__)
 
@@ -12,7 +10,6 @@ class WeatherService:
     def __init__(self):
         self.api_key = getattr(settings, 'OPENWEATHER_API_KEY', '')
         self.base_url = "http://api.openweathermap.org/data/2.5"
-        self.geolocator = Nominatim(user_agent="eventhub_app")
     
     def get_event_weather(self, event):
         """Получение прогноза погоды для мероприятия"""
@@ -59,54 +56,21 @@ class WeatherService:
         return None
     
     def geocode_location(self, location):
-        """Улучшенное геокодирование"""
-        try:
-            # Сначала пробуем нашу базу городов
-            city_coords = self._get_city_coordinates(location)
-            if city_coords:
-                return city_coords
-            
-            # Если не нашли, используем внешний сервис
-            time.sleep(1)  # Чтобы не превысить лимиты
-            geo_location = self.geolocator.geocode(location, country_codes='ru', language='ru')
-            
-            if geo_location:
-                return {
-                    'lat': geo_location.latitude,
-                    'lon': geo_location.longitude,
-                    'address': geo_location.address
-                }
-                
-        except (GeocoderTimedOut, GeocoderServiceError) as e:
-            logger.error(f"Geocoding error for {location}: {e}")
-        
+        """Координаты для прогноза: достаточно точности до города"""
+        result = get_geocoder().geocode(location, precision='city')
+        if result:
+            return {
+                'lat': result.latitude,
+                'lon': result.longitude,
+                'address': result.display_name
+            }
         return None
     
     def _get_city_coordinates(self, location):
-        """Расширенная база координат городов"""
-        cities = {
-            'москва': {'lat': 55.7558, 'lon': 37.6173},
-            'санкт-петербург': {'lat': 59.9311, 'lon': 30.3609},
-            'новосибирск': {'lat': 55.0084, 'lon': 82.9357},
-            'екатеринбург': {'lat': 56.8389, 'lon': 60.6057},
-            'казань': {'lat': 55.7961, 'lon': 49.1064},
-            'нижний новгород': {'lat': 56.3269, 'lon': 44.0059},
-            'челябинск': {'lat': 55.1644, 'lon': 61.4368},
-            'самара': {'lat': 53.1959, 'lon': 50.1002},
-            'омск': {'lat': 54.9924, 'lon': 73.3686},
-            'ростов-на-дону': {'lat': 47.2224, 'lon': 39.7186},
-            'уфа': {'lat': 54.7351, 'lon': 55.9587},
-            'красноярск': {'lat': 56.0153, 'lon': 92.8932},
-            'пермь': {'lat': 58.0105, 'lon': 56.2502},
-            'воронеж': {'lat': 51.6615, 'lon': 39.2003},
-            'волгоград': {'lat': 48.7080, 'lon': 44.5133},
-        }
-        
-        location_lower = location.lower().strip()
-        for city, coords in cities.items():
-            if city in location_lower:
-                return coords
-        
+        """Координаты города из общей таблицы (events.geocoding.CITY_COORDINATES)"""
+        result = city_coordinates(location)
+        if result:
+            return {'lat': result.latitude, 'lon': result.longitude}
         return None
     
     def extract_event_forecast(self, weather_data, event_date):
@@ -16,12 +16,10 @@ django.setup()
 # ВРЕМЕННО отключаем проблемные сигналы
 from django.db.models.signals import post_save
 from events import models as events_models
+from events import notification_fanout
 
-# Отключаем сигнал, который вызывает ошибку
-try:
-    post_save.disconnect(events_models.notify_subscribers, sender=events_models.Event)
-except:
-    pass
+# Отключаем рассылку подписчикам о создаваемых мероприятиях
+post_save.disconnect(notification_fanout.schedule_subscriber_notifications, sender=events_models.Event)
 
 from events.models import Event, Category, Tag
 from django.contrib.auth import get_user_model